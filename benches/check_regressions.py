@@ -0,0 +1,54 @@
+"""Fail when a Criterion benchmark regressed against a saved baseline.
+
+Usage:
+    cargo bench --bench core -- --save-baseline main      # on the base commit
+    cargo bench --bench core -- --baseline main           # on the change
+    python benches/check_regressions.py --threshold 0.10
+"""
+
+import os
+import sys
+import json
+import argparse
+
+
+def find_changes(criterion_dir):
+    """Yield (benchmark id, relative change of the mean) for every benchmark
+    Criterion compared against a baseline."""
+    for dirpath, _, files in os.walk(criterion_dir):
+        if os.path.basename(dirpath) != "change" or "estimates.json" not in files:
+            continue
+        with open(os.path.join(dirpath, "estimates.json"), "r") as f:
+            estimates = json.load(f)
+        bench_id = os.path.relpath(os.path.dirname(dirpath), criterion_dir)
+        yield bench_id, estimates["mean"]["point_estimate"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--criterion-dir", default=os.path.join("target", "criterion"))
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args()
+
+    changes = sorted(find_changes(args.criterion_dir))
+    if not changes:
+        print(f"No baseline comparisons found under {args.criterion_dir}")
+        sys.exit(1)
+
+    regressions = []
+    for bench_id, change in changes:
+        marker = "REGRESSION" if change > args.threshold else ""
+        print(f"{bench_id:<40} {change:+7.1%} {marker}")
+        if change > args.threshold:
+            regressions.append(bench_id)
+
+    if regressions:
+        print(
+            f"{len(regressions)} benchmark(s) regressed by more than "
+            f"{args.threshold:.0%}"
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
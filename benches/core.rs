@@ -0,0 +1,148 @@
+use criterion::{criterion_group, criterion_main, BenchmarkId, Criterion, Throughput};
+use pyo3::prelude::*;
+use ruxpy::blob::Blob;
+use ruxpy::hashing::{hash_bytes, HashAlgorithm};
+use ruxpy::ruxpy_tree::RuxpyTree;
+use ruxpy::starlog::serde_json_to_pyobject;
+use ruxpy::{dircache, walker};
+use serde_json::{json, Map, Value};
+use std::fs;
+use std::hint::black_box;
+use tempfile::TempDir;
+
+const TREE_FILES: usize = 2_000;
+const IGNORED_FILES: usize = 5_000;
+
+/// Creates a spacedock with `TREE_FILES` tracked files spread over nested
+/// directories, plus an ignored `target/` directory the walkers must prune.
+fn setup_repo() -> TempDir {
+    let dir = tempfile::tempdir().unwrap();
+    let root = dir.path();
+    fs::create_dir_all(root.join(".dock/objects")).unwrap();
+    fs::write(root.join(".dockignore"), "target/\n*.log\n").unwrap();
+
+    for i in 0..TREE_FILES {
+        let sub = root.join(format!("src/m{}/n{}", i % 16, i % 7));
+        fs::create_dir_all(&sub).unwrap();
+        fs::write(
+            sub.join(format!("f{}.rs", i)),
+            format!("// file {}\n", i).repeat(64),
+        )
+        .unwrap();
+    }
+    for i in 0..IGNORED_FILES {
+        let sub = root.join(format!("target/debug/d{}", i % 32));
+        fs::create_dir_all(&sub).unwrap();
+        fs::write(sub.join(format!("o{}.o", i)), b"object").unwrap();
+    }
+    dir
+}
+
+fn repo_str(repo: &TempDir) -> &str {
+    repo.path().to_str().unwrap()
+}
+
+fn bench_hashing(c: &mut Criterion) {
+    for algorithm in [HashAlgorithm::Sha3_256, HashAlgorithm::Blake3] {
+        let mut group = c.benchmark_group(format!("hash_bytes/{}", algorithm.name()));
+        for size in [4 << 10, 1 << 20, 16 << 20] {
+            let data = vec![0x5au8; size];
+            group.throughput(Throughput::Bytes(size as u64));
+            group.bench_with_input(BenchmarkId::from_parameter(size), &data, |b, data| {
+                b.iter(|| hash_bytes(algorithm, black_box(data)))
+            });
+        }
+        group.finish();
+    }
+}
+
+fn bench_list_files(c: &mut Criterion) {
+    let repo = setup_repo();
+    let mut group = c.benchmark_group("list_all_files");
+    group.bench_function("walk", |b| b.iter(|| walker::walk(repo.path())));
+    dircache::list_files(repo.path());
+    group.bench_function("dircache_warm", |b| {
+        b.iter(|| dircache::list_files(repo.path()))
+    });
+    group.finish();
+}
+
+fn bench_build_tree(c: &mut Criterion) {
+    let repo = setup_repo();
+    c.bench_function("build_tree", |b| {
+        b.iter(|| RuxpyTree::build_tree(repo_str(&repo)).unwrap())
+    });
+}
+
+fn bench_tree_json(c: &mut Criterion) {
+    let mut tree = Map::new();
+    for i in 0..50_000u32 {
+        tree.insert(
+            format!("src/m{}/n{}/f{}.rs", i % 16, i % 7, i),
+            Value::String(hash_bytes(HashAlgorithm::Sha3_256, &i.to_le_bytes())),
+        );
+    }
+    let tree = Value::Object(tree);
+    let tree_json = serde_json::to_string(&tree).unwrap();
+
+    let mut group = c.benchmark_group("tree_json");
+    group.throughput(Throughput::Bytes(tree_json.len() as u64));
+    group.bench_function("parse", |b| {
+        b.iter(|| serde_json::from_str::<Value>(black_box(&tree_json)).unwrap())
+    });
+    group.bench_function("serialize", |b| {
+        b.iter(|| serde_json::to_string(black_box(&tree)).unwrap())
+    });
+    group.finish();
+}
+
+fn bench_warp(c: &mut Criterion) {
+    let repo = setup_repo();
+    let repo_path = repo_str(&repo);
+    for rel in walker::walk(repo.path()).files {
+        Blob::save_blob(repo_path, &rel).unwrap();
+    }
+    let tree_json = RuxpyTree::build_tree(repo_path).unwrap();
+    let tree_hash = RuxpyTree::write_tree_object(&tree_json, repo_path).unwrap();
+
+    c.bench_function("warp_to_course", |b| {
+        b.iter(|| RuxpyTree::warp_to_course(&tree_hash, repo_path).unwrap())
+    });
+}
+
+fn bench_json_to_pyobject(c: &mut Criterion) {
+    let files: Map<String, Value> = (0..10_000)
+        .map(|i: u32| {
+            (
+                format!("src/f{}.rs", i),
+                Value::String(hash_bytes(HashAlgorithm::Sha3_256, &i.to_le_bytes())),
+            )
+        })
+        .collect();
+    let starlog = json!({
+        "author": "Jean-Luc Picard",
+        "email": "picard@enterprise.fed",
+        "message": "Engage",
+        "parent": null,
+        "timestamp": "2025-09-23T00:00:00",
+        "files": files,
+    });
+
+    pyo3::prepare_freethreaded_python();
+    Python::with_gil(|py| {
+        c.bench_function("serde_json_to_pyobject", |b| {
+            b.iter(|| serde_json_to_pyobject(py, black_box(&starlog)).unwrap())
+        });
+    });
+}
+
+criterion_group!(
+    benches,
+    bench_hashing,
+    bench_list_files,
+    bench_build_tree,
+    bench_tree_json,
+    bench_warp,
+    bench_json_to_pyobject
+);
+criterion_main!(benches);
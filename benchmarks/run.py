@@ -0,0 +1,182 @@
+"""End-to-end benchmarks of the ruxpy CLI against synthetic spacedocks.
+
+Usage:
+    python benchmarks/run.py --files 10000 --history 50 --output results.json
+    python benchmarks/run.py --compare old.json new.json --threshold 0.10
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from dataclasses import fields
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import SpacedockShape, generate_spacedock, write_file  # noqa: E402
+
+RUXPY = [sys.executable, "-m", "ruxpy.cli"]
+
+
+def run_command(args, cwd, count_syscalls=False):
+    """Run one ruxpy command and return wall time, peak RSS and syscalls."""
+    argv = RUXPY + args
+    trace_path = None
+    if count_syscalls:
+        fd, trace_path = tempfile.mkstemp(suffix=".strace")
+        os.close(fd)
+        argv = ["strace", "-f", "-c", "-o", trace_path] + argv
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        argv, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    _, status, rusage = os.wait4(process.pid, 0)
+    wall = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise RuntimeError(f"ruxpy {' '.join(args)} exited {process.returncode}")
+
+    sample = {"wall_s": wall, "peak_rss_kb": rusage.ru_maxrss}
+    if trace_path is not None:
+        sample["syscalls"] = parse_strace_total(trace_path)
+        os.remove(trace_path)
+    return sample
+
+
+def parse_strace_total(path):
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip().endswith("total"):
+                numbers = re.findall(r"\d+(?:\.\d+)?", line)
+                # seconds, usecs/call, calls, [errors,] total
+                return int(numbers[3]) if len(numbers) >= 4 else None
+    return None
+
+
+def summarize(samples):
+    walls = [s["wall_s"] for s in samples]
+    summary = {
+        "runs": len(samples),
+        "median_wall_s": statistics.median(walls),
+        "min_wall_s": min(walls),
+        "peak_rss_kb": max(s["peak_rss_kb"] for s in samples),
+    }
+    syscalls = [s["syscalls"] for s in samples if s.get("syscalls") is not None]
+    if syscalls:
+        summary["median_syscalls"] = statistics.median(syscalls)
+    return summary
+
+
+def benchmark(shape, repeat, count_syscalls, workdir):
+    repo = os.path.join(workdir, "spacedock")
+    paths = generate_spacedock(repo, shape)
+    rng = random.Random(shape.seed + 1)
+    changed_per_run = max(1, int(len(paths) * shape.churn))
+
+    samples = {}
+
+    def measure(name, args, cwd=repo):
+        samples.setdefault(name, []).append(run_command(args, cwd, count_syscalls))
+
+    for n in range(repeat):
+        empty = os.path.join(workdir, f"empty-{n}")
+        os.makedirs(empty)
+        measure("start", ["start"], cwd=empty)
+        shutil.rmtree(empty)
+
+        changed = rng.sample(paths, changed_per_run)
+        for rel_path in changed:
+            write_file(rng, repo, rel_path, shape.mean_size)
+        measure("scan", ["scan"])
+        measure("beam", ["beam", *changed])
+        measure("starlog -c", ["starlog", "-cm", f"Benchmark {n}"])
+        measure("starlog -l", ["starlog", "-l"])
+        measure("course", ["course"])
+        if shape.courses > 0:
+            measure("warp", ["warp", "course-0"])
+            run_command(["warp", "core"], repo)
+
+    return {name: summarize(runs) for name, runs in samples.items()}
+
+
+def compare(old_path, new_path, threshold):
+    with open(old_path, "r") as f:
+        old = json.load(f)["results"]
+    with open(new_path, "r") as f:
+        new = json.load(f)["results"]
+
+    regressions = []
+    for name, result in new.items():
+        if name not in old:
+            continue
+        before = old[name]["median_wall_s"]
+        after = result["median_wall_s"]
+        change = (after - before) / before if before else 0.0
+        marker = "REGRESSION" if change > threshold else ""
+        print(f"{name:<12} {before:9.4f}s -> {after:9.4f}s  {change:+7.1%} {marker}")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    defaults = SpacedockShape()
+    for field in fields(SpacedockShape):
+        parser.add_argument(
+            f"--{field.name.replace('_', '-')}",
+            type=field.type if field.type in (int, float, str) else str,
+            default=getattr(defaults, field.name),
+        )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--syscalls", action="store_true", help="Count via strace")
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(*args.compare, args.threshold)
+        sys.exit(1 if regressions else 0)
+
+    if args.syscalls and shutil.which("strace") is None:
+        parser.error("--syscalls needs strace on PATH")
+
+    shape = SpacedockShape(
+        **{f.name: getattr(args, f.name) for f in fields(SpacedockShape)}
+    )
+    with tempfile.TemporaryDirectory(prefix="ruxpy-bench-") as workdir:
+        results = benchmark(shape, args.repeat, args.syscalls, workdir)
+
+    report = {
+        "ruxpy_version": subprocess.run(
+            RUXPY + ["--version"], capture_output=True, text=True
+        ).stdout.strip(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "shape": shape.as_dict(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, result in results.items():
+        print(
+            f"{name:<12} median {result['median_wall_s']:.4f}s  "
+            f"peak RSS {result['peak_rss_kb']} KB"
+        )
+
+
+if __name__ == "__main__":
+    main()
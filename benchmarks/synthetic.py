@@ -0,0 +1,114 @@
+"""Generator for synthetic spacedocks used by the benchmark harness."""
+
+import os
+import math
+import random
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from click.testing import CliRunner
+from ruxpy.cli import main
+
+
+@dataclass
+class SpacedockShape:
+    files: int = 1000
+    size_distribution: str = "lognormal"  # or "uniform"
+    mean_size: int = 4096
+    max_size: int = 1 << 20
+    depth: int = 3
+    fanout: int = 8
+    history: int = 10
+    courses: int = 3
+    churn: float = 0.01  # fraction of files modified per starlog
+    seed: int = 0
+
+    def as_dict(self):
+        return asdict(self)
+
+
+@contextmanager
+def working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def invoke(runner, args):
+    result = runner.invoke(main, args)
+    if result.exit_code != 0 or "[ERROR]" in result.output:
+        raise RuntimeError(f"ruxpy {' '.join(args[:3])} failed:\n{result.output}")
+    return result
+
+
+def file_size(rng, shape):
+    if shape.size_distribution == "uniform":
+        size = rng.randint(0, 2 * shape.mean_size)
+    else:
+        # lognormal with the requested mean: mu = ln(mean) - sigma^2 / 2
+        sigma = 1.0
+        mu = math.log(max(shape.mean_size, 1)) - sigma**2 / 2
+        size = int(rng.lognormvariate(mu, sigma))
+    return min(size, shape.max_size)
+
+
+def file_paths(rng, shape):
+    paths = []
+    for i in range(shape.files):
+        depth = rng.randint(0, shape.depth)
+        dirs = [f"d{rng.randrange(shape.fanout)}" for _ in range(depth)]
+        paths.append("/".join(dirs + [f"f{i}.bin"]))
+    return paths
+
+
+def write_file(rng, repo, rel_path, size):
+    full_path = os.path.join(repo, rel_path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, "wb") as f:
+        f.write(rng.randbytes(size))
+
+
+def record(runner, files, message):
+    invoke(runner, ["beam", *files])
+    invoke(runner, ["starlog", "-cm", message])
+
+
+def generate_spacedock(repo, shape):
+    """Create a spacedock at `repo` with the given shape.
+
+    The working tree is left clean on course `core`, so every benchmarked
+    command (including `warp`) can run against it.
+    """
+    rng = random.Random(shape.seed)
+    os.makedirs(repo, exist_ok=True)
+    runner = CliRunner()
+
+    with working_directory(repo):
+        invoke(runner, ["start"])
+        invoke(runner, ["config", "-sn", "Jean-Luc Picard", "-se", "jl@enterprise.fed"])
+
+        paths = file_paths(rng, shape)
+        for rel_path in paths:
+            write_file(rng, repo, rel_path, file_size(rng, shape))
+        record(runner, paths, "Initial starlog")
+
+        changed_per_entry = max(1, int(len(paths) * shape.churn))
+        for entry in range(1, shape.history):
+            changed = rng.sample(paths, changed_per_entry)
+            for rel_path in changed:
+                write_file(rng, repo, rel_path, file_size(rng, shape))
+            record(runner, changed, f"Starlog {entry}")
+
+        for n in range(shape.courses):
+            course = f"course-{n}"
+            invoke(runner, ["course", course])
+            invoke(runner, ["warp", course])
+            changed = rng.sample(paths, changed_per_entry)
+            for rel_path in changed:
+                write_file(rng, repo, rel_path, file_size(rng, shape))
+            record(runner, changed, f"Diverge {course}")
+            invoke(runner, ["warp", "core"])
+
+    return paths
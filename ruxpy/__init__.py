@@ -1,31 +1,68 @@
 __version__ = "1.0.0"
 
-from ruxpy.utils.config import Config
-from ruxpy.utils.messages import Messages
-from ruxpy.utils.course import (
-    get_course_name,
-    list_repo_files,
-    load_staged_files,
-    safe_load_staged_files,
-    check_stage_path_exists,
-    list_unstaged_files,
-)
-from ruxpy.utils.init import (
-    get_paths,
-)
-
-# Import Rust extension and expose its functions
-from .ruxpy import (
-    init_object_dir,
-    save_starlog,
-    list_all_files,
-    filter_ignored_files,
-    Courses,
-    Blob,
-    Spacedock,
-    Starlog,
-    RuxpyTree,
-)
+import importlib
+
+# Public names are resolved on first access so that importing the package
+# (e.g. for `ruxpy --version`) loads neither the Rust extension nor tomlkit.
+_LAZY_ATTRS = {
+    # Rust extensions
+    "init_object_dir": "ruxpy.ruxpy",
+    "save_starlog": "ruxpy.ruxpy",
+    "list_all_files": "ruxpy.ruxpy",
+    "filter_ignored_files": "ruxpy.ruxpy",
+    "hash_object": "ruxpy.ruxpy",
+    "hash_file_object": "ruxpy.ruxpy",
+    "hash_file_objects": "ruxpy.ruxpy",
+    "expand_pathspecs": "ruxpy.ruxpy",
+    "get_hash_algorithm": "ruxpy.ruxpy",
+    "format_version_for": "ruxpy.ruxpy",
+    "Courses": "ruxpy.ruxpy",
+    "Blob": "ruxpy.ruxpy",
+    "Spacedock": "ruxpy.ruxpy",
+    "Starlog": "ruxpy.ruxpy",
+    "RuxpyTree": "ruxpy.ruxpy",
+    "Monitor": "ruxpy.ruxpy",
+    "Trace": "ruxpy.ruxpy",
+    "Gc": "ruxpy.ruxpy",
+    "Fsck": "ruxpy.ruxpy",
+    "Revision": "ruxpy.ruxpy",
+    "LocalClone": "ruxpy.ruxpy",
+    "Dedupe": "ruxpy.ruxpy",
+    "Stage": "ruxpy.ruxpy",
+    "HistoryStream": "ruxpy.ruxpy",
+    "GitImport": "ruxpy.ruxpy",
+    "Fleet": "ruxpy.ruxpy",
+    "Refs": "ruxpy.ruxpy",
+    "Ancestry": "ruxpy.ruxpy",
+    # Python utils
+    "get_course_name": "ruxpy.utils.course",
+    "list_repo_files": "ruxpy.utils.course",
+    "load_staged_files": "ruxpy.utils.course",
+    "safe_load_staged_files": "ruxpy.utils.course",
+    "check_stage_path_exists": "ruxpy.utils.course",
+    "list_unstaged_files": "ruxpy.utils.course",
+    "load_course_tree_hash": "ruxpy.utils.course",
+    "get_paths": "ruxpy.utils.init",
+    "Messages": "ruxpy.utils.messages",
+    "Config": "ruxpy.utils.config",
+    "get_counters": "ruxpy.utils.trace",
+    "reset_counters": "ruxpy.utils.trace",
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
+
 
 __all__ = [
     # Rust extensions
@@ -34,11 +71,30 @@ __all__ = [
     "find_dock_root",
     "list_all_files",
     "filter_ignored_files",
+    "hash_object",
+    "hash_file_object",
+    "hash_file_objects",
+    "expand_pathspecs",
+    "get_hash_algorithm",
+    "format_version_for",
     "Courses",
     "Blob",
     "Spacedock",
     "Starlog",
     "RuxpyTree",
+    "Monitor",
+    "Trace",
+    "Gc",
+    "Fsck",
+    "Revision",
+    "LocalClone",
+    "Dedupe",
+    "Stage",
+    "HistoryStream",
+    "GitImport",
+    "Fleet",
+    "Refs",
+    "Ancestry",
     # Python utils
     "get_course_name",
     "list_repo_files",
@@ -46,7 +102,10 @@ __all__ = [
     "safe_load_staged_files",
     "check_stage_path_exists",
     "list_unstaged_files",
+    "load_course_tree_hash",
     "get_paths",
     "Messages",
     "Config",
+    "get_counters",
+    "reset_counters",
 ]
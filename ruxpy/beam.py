@@ -1,20 +1,37 @@
 import os
 import click
 import json
-import hashlib
 from ruxpy import (
     Messages,
+    Refs,
     Spacedock,
-    safe_load_staged_files,
+    Stage,
+    expand_pathspecs,
     get_paths,
+    hash_file_objects,
 )
-from ruxpy import filter_ignored_files
+
+# Files hashed per call while checking against the latest starlog; the
+# progress bar is redrawn once per batch.
+HASH_BATCH = 1024
+
+
+def read_stdin_paths():
+    """NUL-separated paths from stdin, as produced by `find -print0`."""
+    data = click.get_binary_stream("stdin").read()
+    return [os.fsdecode(path) for path in data.split(b"\0") if path.strip()]
 
 
 @click.command()
-@click.argument("files", nargs=-1)
-def beam(files):
-    """Stage files for the next starlog (commit)"""
+@click.argument("pathspecs", nargs=-1)
+@click.option(
+    "-a", "--all", "beam_all", is_flag=True, help="Beam every file not ignored"
+)
+def beam(pathspecs, beam_all):
+    """Stage files, directories or glob patterns for the next starlog (commit)
+
+    Pass - to read a NUL-separated list of paths from stdin.
+    """
 
     paths = {}
     try:
@@ -33,35 +50,40 @@ def beam(files):
         )
         return
 
-    stage_path = paths["stage"]
-    staged_files = safe_load_staged_files(stage_path)
+    specs = [spec for spec in pathspecs if spec != "-"]
+    if "-" in pathspecs:
+        specs.extend(read_stdin_paths())
+    if not specs and not beam_all:
+        Messages.echo_error("Nothing to beam. Pass files, directories or --all")
+        return
 
-    files_to_check = list(files)
-    files_not_ignored = filter_ignored_files(files_to_check)
+    try:
+        files, unmatched = expand_pathspecs(str(paths["repo"]), specs, beam_all)
+    except Exception as e:
+        Messages.echo_error(str(e))
+        return
 
-    if len(files_not_ignored) == 0:
+    for spec in unmatched:
+        Messages.echo_warning(f"{spec} did not match any file, skipped")
+
+    if len(files) == 0:
         Messages.echo_info(
             "No files beamed!\n"
             "If you think it's unexpected, check if .dockignore is present."
         )
         return
 
-    for file in files_not_ignored:
-        if not os.path.exists(file):
-            Messages.echo_error(f"Failed to locate {file}")
-            return
-
     # Load the latest starlog
     with open(paths["helm_f"], "r") as f:
         content = f.read().strip()
 
     course_name = content.split(":")[-1].strip().split("/")[-1]
 
-    current_starlog_path = os.path.join(paths["links"], "helm", course_name)
-
     try:
-        with open(current_starlog_path, "r") as f:
-            current_starlog_hash = f.read()
+        # Loose or packed course ref
+        current_starlog_hash = (
+            Refs.course_tip(os.path.join(paths["links"], "helm"), course_name) or ""
+        )
 
         if not current_starlog_hash:
             # No starlogs yet
@@ -84,51 +106,40 @@ def beam(files):
         # No starlogs yet
         starlog_obj = {"files": {}}
 
-    Messages.echo_info("Starting to beam the files...")
-
-    # only append if its not staged previously
-    total = len(files_not_ignored)
-    for idx, file in enumerate(files_not_ignored, 1):
-        percent_done = int((idx / total) * 100)
-
-        if file in starlog_obj["files"]:
-            if not os.path.exists(file):
-                # File is deleted or missing
-                click.echo(
-                    f"{file}\t\t[{percent_done}%] "
-                    f"{click.style('[skipped: not found]', fg='yellow')}"
-                )
-                continue
-
-            with open(file, "rb") as f:
-                content = f.read()
-
-            hash_obj = hashlib.sha3_256()
-            hash_obj.update(content)
-            digest = hash_obj.hexdigest()
-
-            if digest == starlog_obj["files"][file]:
-                # File is already committed and unchanged, skip staging
-                click.echo(
-                    f"{file}\t\t[{percent_done}%] "
-                    f"{
-                        click.style(
-                            '[skipped: unchanged and present in latest starlog]',
-                            fg='yellow',
-                        )
-                    }"
-                )
-                continue
-
-        click.echo(f"{file}\t\t[...{percent_done}%]")
-
-        if file not in staged_files:
-            staged_files.append(file)
-
-    with open(paths["stage"], "w") as f:
-        json.dump(staged_files, f)
-
-    feedback = """Files successfully beamed to the spacedock.
+    # Files unchanged since the latest starlog are not staged again
+    committed = starlog_obj["files"]
+    to_check = [file for file in files if file in committed]
+    unchanged = set()
+    with click.progressbar(
+        length=len(to_check),
+        label="Comparing with the latest starlog",
+        file=click.get_text_stream("stderr"),
+    ) as bar:
+        for start in range(0, len(to_check), HASH_BATCH):
+            end = start + HASH_BATCH
+            batch = to_check[start:end]
+            digests = hash_file_objects(str(paths["repo"]), batch)
+            unchanged.update(
+                file
+                for file, digest in zip(batch, digests)
+                if digest == committed[file]
+            )
+            bar.update(len(batch))
+
+    # Blobs are written now, so recording a starlog only assembles the tree;
+    # beaming a staged file again refreshes its blob
+    beamed = [file for file in files if file not in unchanged]
+    try:
+        Stage.add(str(paths["repo"]), beamed)
+    except Exception as e:
+        Messages.echo_error(str(e))
+        return
+
+    if unchanged:
+        Messages.echo_info(
+            f"Skipped {len(unchanged)} file(s) unchanged since the latest starlog"
+        )
+    feedback = f"""{len(beamed)} file(s) successfully beamed to the spacedock.
 Use ruxpy starlog to record."""
 
     Messages.echo_success(f"{feedback}")
@@ -1,27 +1,74 @@
+import os
+import importlib
 import click
-from .starlog import starlog
-from .config import config
-from .start import start
-from .scan import scan
-from .beam import beam
-from .course import course
-from .warp import warp
 
 
-@click.group()
+class LazyGroup(click.Group):
+    """A click group that imports each subcommand's module only when the
+    subcommand is looked up."""
+
+    def __init__(self, *args, lazy_subcommands=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # command name -> "module.attribute"
+        self.lazy_subcommands = lazy_subcommands or {}
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_subcommands))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name in self.lazy_subcommands:
+            return self._load_command(cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+    def _load_command(self, cmd_name):
+        module_name, attr_name = self.lazy_subcommands[cmd_name].rsplit(".", 1)
+        command = getattr(importlib.import_module(module_name), attr_name)
+        self.add_command(command, cmd_name)
+        del self.lazy_subcommands[cmd_name]
+        return command
+
+
+@click.group(
+    cls=LazyGroup,
+    lazy_subcommands={
+        "starlog": "ruxpy.starlog.starlog",
+        "config": "ruxpy.config.config",
+        "start": "ruxpy.start.start",
+        "scan": "ruxpy.scan.scan",
+        "beam": "ruxpy.beam.beam",
+        "course": "ruxpy.course.course",
+        "warp": "ruxpy.warp.warp",
+        "monitor": "ruxpy.monitor.monitor",
+        "server": "ruxpy.server.server",
+        "gc": "ruxpy.gc.gc",
+        "fsck": "ruxpy.fsck.fsck",
+        "worktree": "ruxpy.worktree.worktree",
+        "show": "ruxpy.show.show",
+        "ls-tree": "ruxpy.show.ls_tree",
+        "dedupe": "ruxpy.dedupe.dedupe",
+        "fast-import": "ruxpy.fast_stream.fast_import",
+        "fast-export": "ruxpy.fast_stream.fast_export",
+        "import-git": "ruxpy.import_git.import_git",
+        "fleet": "ruxpy.fleet.fleet",
+    },
+)
 @click.version_option(version="0.1.0")
-def main():
+@click.option(
+    "--timings", is_flag=True, help="Print time spent per phase and work counters"
+)
+@click.pass_context
+def main(ctx, timings):
     """Ruxpy - A hybrid Rust/Python version control system"""
-    pass
 
+    trace_mode = os.environ.get("RUXPY_TRACE")
+    if not (timings or trace_mode):
+        return
+
+    from ruxpy.utils.trace import CommandTrace, enable_tracing
 
-main.add_command(starlog)
-main.add_command(config)
-main.add_command(start)
-main.add_command(scan)
-main.add_command(beam)
-main.add_command(course)
-main.add_command(warp)
+    enable_tracing()
+    command_trace = CommandTrace(ctx.invoked_subcommand, timings, trace_mode)
+    ctx.call_on_close(command_trace.finish)
 
 
 if __name__ == "__main__":
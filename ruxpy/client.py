@@ -0,0 +1,83 @@
+import os
+import sys
+import json
+import base64
+import socket
+
+SOCKET_NAME = "server.sock"
+
+
+def get_socket_path(repo_path):
+    return os.path.join(repo_path, ".dock", SOCKET_NAME)
+
+
+def find_socket(start_path):
+    current = os.path.abspath(start_path)
+    while True:
+        socket_path = get_socket_path(current)
+        if os.path.exists(socket_path):
+            return socket_path
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None
+        current = parent
+
+
+def forward(argv, cwd=None):
+    """Run a CLI command on the spacedock's server.
+
+    Returns the command's exit code, or None when no server is listening.
+    Standard input and the command's output travel base64-encoded, so
+    binary streams pass through unchanged.
+    """
+    cwd = os.path.abspath(cwd or os.getcwd())
+    socket_path = find_socket(cwd)
+    if socket_path is None:
+        return None
+
+    request = {"argv": list(argv), "cwd": cwd, "color": sys.stdout.isatty()}
+    stdin = sys.stdin
+    if stdin is not None and not stdin.isatty() and stdin.readable():
+        request["stdin"] = base64.b64encode(stdin.buffer.read()).decode("ascii")
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        return None
+
+    # Once the request is sent the server may have run the command, so a
+    # failure from here on is reported rather than run again in-process
+    with sock:
+        try:
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            with sock.makefile("rb") as f:
+                response = json.loads(f.readline())
+            output = base64.b64decode(response["output"])
+            exit_code = response["exit_code"]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            sys.stderr.write(
+                f"[ERROR] Lost the server while running the command: {e}\n"
+            )
+            return 1
+
+    sys.stdout.flush()
+    sys.stdout.buffer.write(output)
+    sys.stdout.buffer.flush()
+    return exit_code
+
+
+def main():
+    exit_code = forward(sys.argv[1:])
+    if exit_code is None:
+        # No server for this spacedock: run the command in-process
+        from ruxpy.cli import main as cli_main
+
+        cli_main()
+        return
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,16 +3,26 @@ import click
 from ruxpy import (
     # find_dock_root_py,
     get_paths,
+    Ancestry,
     Courses,
     Messages,
+    Refs,
     Spacedock,
 )
+from ruxpy.utils.worktree import course_in_use, get_common_dock
 
 
 @click.command()
 @click.argument("course_name", required=False)
 @click.option("-d", "--delete", is_flag=True, help="Delete the course")
-def course(course_name: str, delete: bool):
+@click.option("--pack", is_flag=True, help="Pack all courses into one file")
+@click.option(
+    "-v",
+    "--verbose",
+    is_flag=True,
+    help="Show each course's tip and how far it has diverged from core",
+)
+def course(course_name: str, delete: bool, pack: bool, verbose: bool):
     dock_root = Spacedock.find_dock_root(None)
     if dock_root is None:  # Not a ruxpy repository
         Messages.echo_error(
@@ -26,7 +36,18 @@ def course(course_name: str, delete: bool):
             Messages.echo_error("The spacedock is corrupted. Please run 'ruxpy start'")
             return
 
-    if delete and course_name:
+    if pack:
+        try:
+            count = Refs.pack_courses(paths["helm_d"])
+            Messages.echo_success(f"Packed {count} courses")
+        except Exception as e:
+            Messages.echo_error(str(e))
+    elif delete and course_name:
+        common_dock = get_common_dock(paths["dock"])
+        in_use = course_in_use(common_dock, course_name, exclude=paths["repo"])
+        if in_use is not None:
+            Messages.echo_error(f"Course {course_name} is checked out at {in_use}")
+            return
         try:
             Messages.echo_info(f"Deleting course: {course_name}")
             Courses.delete_course(course_name)
@@ -46,11 +67,42 @@ def course(course_name: str, delete: bool):
             os.path.join(paths["links"], "helm"), paths["helm_f"]
         )
 
+        details = {}
+        if verbose:
+            try:
+                details = {
+                    entry["course"]: entry
+                    for entry in Ancestry.courses(str(paths["repo"]))
+                }
+            except Exception as e:
+                Messages.echo_error(str(e))
+                return
+            width = max((len(course) for course in courses), default=0)
+
         label = "[On Course] =>"
         padding = " " * (len(label) + 1)
         for course in courses:
+            line = course
+            if verbose and course in details:
+                line = f"{course.ljust(width)}  {describe_course(details[course])}"
             if course == current:
-                click.echo(f"{click.style(label, fg='green')} {course}")
+                click.echo(f"{click.style(label, fg='green')} {line}")
                 continue
 
-            click.echo(f"{padding}{course}")
+            click.echo(f"{padding}{line}")
+
+
+def describe_course(entry):
+    """Short tip of a course and its divergence from core."""
+    if entry["tip"] is None:
+        return "(no starlogs)"
+    tip = entry["tip"][:10]
+    divergence = entry["divergence"]
+    if entry["course"] == "core" or divergence is None:
+        return tip
+    if divergence["merge_base"] is None:
+        return f"{tip}  unrelated to core"
+    ahead, behind = divergence["ahead"], divergence["behind"]
+    if not ahead and not behind:
+        return f"{tip}  even with core"
+    return f"{tip}  {ahead} ahead, {behind} behind core"
@@ -0,0 +1,29 @@
+import click
+from ruxpy import Dedupe, Messages, Spacedock, get_paths
+from ruxpy.gc import format_bytes
+
+
+@click.command()
+@click.argument("shared_store", type=click.Path(file_okay=False))
+def dedupe(shared_store):
+    """Move objects into a store shared with other spacedocks"""
+
+    dock_root = Spacedock.find_dock_root(None)
+    if dock_root is None:  # Not a ruxpy repository
+        Messages.echo_error(
+            "The spacedock is not initialized. Please run 'ruxpy start'"
+        )
+        return
+
+    paths = get_paths(dock_root)
+    try:
+        report = Dedupe.run(str(paths["repo"]), shared_store)
+    except Exception as e:
+        Messages.echo_error(f"Deduplication stopped: {e}")
+        return
+
+    Messages.echo_success(
+        f"Moved {report['objects_moved']} object(s) to {shared_store} and "
+        f"dropped {report['objects_removed']} local duplicate(s), "
+        f"freeing {format_bytes(report['bytes_freed'])}"
+    )
@@ -0,0 +1,50 @@
+import click
+from ruxpy import HistoryStream, Messages
+from ruxpy.show import find_repo
+
+
+@click.command("fast-import")
+@click.argument("stream", type=click.File("rb"), default="-")
+@click.pass_context
+def fast_import(ctx, stream):
+    """Import blobs, starlogs and courses from a stream (default: stdin)"""
+
+    repo = find_repo()
+    if repo is None:
+        return
+
+    try:
+        report = HistoryStream.import_stream(repo, stream)
+    except Exception as e:
+        Messages.echo_error(f"Import stopped: {e}")
+        ctx.exit(1)
+
+    Messages.echo_success(
+        f"Imported {report['starlogs']} starlog(s) and {report['blobs']} blob(s), "
+        f"updating {report['courses']} course(s)"
+    )
+    Messages.echo_info("Use ruxpy warp to check out an imported course.")
+
+
+@click.command("fast-export")
+@click.argument("courses", nargs=-1)
+@click.option(
+    "-o",
+    "--output",
+    type=click.File("wb"),
+    default="-",
+    help="Write the stream to a file instead of stdout",
+)
+@click.pass_context
+def fast_export(ctx, courses, output):
+    """Write the history of courses (default: all) as a stream"""
+
+    repo = find_repo()
+    if repo is None:
+        return
+
+    try:
+        HistoryStream.export_stream(repo, output, list(courses))
+    except Exception as e:
+        Messages.echo_error(f"Export stopped: {e}")
+        ctx.exit(1)
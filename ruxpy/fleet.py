@@ -0,0 +1,76 @@
+import asyncio
+import json
+import os
+import click
+from ruxpy import Fleet, Messages
+
+CHANGE_KINDS = ("staged", "modified", "deleted", "untracked")
+
+
+def scan(paths, concurrency=None):
+    """Status of every spacedock in `paths`, in order.
+
+    Each result is a dict with `path`, `course`, `tip`, the `staged`,
+    `modified`, `deleted` and `untracked` file lists, `clean`, and `error`
+    (None unless that spacedock could not be scanned). The scans run
+    natively on a shared worker pool of `concurrency` threads (one per core
+    by default) with the GIL released.
+    """
+    return Fleet.scan([os.fspath(path) for path in paths], concurrency)
+
+
+async def scan_async(paths, concurrency=None):
+    """`scan` without blocking the event loop."""
+    return await asyncio.to_thread(scan, paths, concurrency)
+
+
+@click.group()
+def fleet():
+    """Work with many spacedocks at once"""
+
+
+@fleet.command("scan")
+@click.argument("paths", nargs=-1, type=click.Path(file_okay=False))
+@click.option(
+    "-f",
+    "--from-file",
+    type=click.File("r"),
+    help="Read spacedock paths, one per line, from a file ('-' for stdin)",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    help="Spacedocks scanned at once (default: one per core)",
+)
+@click.option(
+    "--json", "as_json", is_flag=True, help="Print one JSON object per spacedock"
+)
+@click.pass_context
+def fleet_scan(ctx, paths, from_file, jobs, as_json):
+    """Show the status of many spacedocks"""
+
+    paths = list(paths)
+    if from_file is not None:
+        paths += [line.strip() for line in from_file if line.strip()]
+    if not paths:
+        Messages.echo_error("No spacedocks given")
+        ctx.exit(1)
+
+    results = scan(paths, concurrency=jobs)
+    for result in results:
+        if as_json:
+            click.echo(json.dumps(result, sort_keys=True))
+        elif result["error"] is not None:
+            Messages.echo_error(f"{result['path']}: {result['error']}")
+        else:
+            changes = ", ".join(
+                f"{len(result[kind])} {kind}" for kind in CHANGE_KINDS if result[kind]
+            )
+            click.echo(
+                f"{result['path']}: on course '-{result['course']}-', "
+                f"{changes or 'clean'}"
+            )
+
+    if any(result["error"] is not None for result in results):
+        ctx.exit(1)
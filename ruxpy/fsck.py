@@ -0,0 +1,37 @@
+import click
+from ruxpy import Fsck, Messages, Spacedock, get_paths
+
+
+@click.command()
+@click.option(
+    "--quick", is_flag=True, help="Only check that objects exist and have sane sizes"
+)
+@click.pass_context
+def fsck(ctx, quick):
+    """Verify the integrity of objects, starlogs and course history"""
+
+    dock_root = Spacedock.find_dock_root(None)
+    if dock_root is None:  # Not a ruxpy repository
+        Messages.echo_error(
+            "The spacedock is not initialized. Please run 'ruxpy start'"
+        )
+        return
+
+    paths = get_paths(dock_root)
+    try:
+        report = Fsck.run(str(paths["repo"]), quick)
+    except Exception as e:
+        Messages.echo_error(f"Integrity check failed to run: {e}")
+        ctx.exit(2)
+
+    for kind, object_id, detail in report["problems"]:
+        Messages.echo_error(f"{kind} {object_id}: {detail}")
+
+    summary = (
+        f"Checked {report['objects_checked']} object(s) and "
+        f"{report['starlogs_checked']} starlog(s) reachable from courses"
+    )
+    if report["problems"]:
+        Messages.echo_warning(f"{summary}; found {len(report['problems'])} problem(s)")
+        ctx.exit(1)
+    Messages.echo_success(f"{summary}; no problems found")
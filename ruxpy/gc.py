@@ -0,0 +1,45 @@
+import click
+from ruxpy import Gc, Messages, Spacedock, get_paths
+
+
+def format_bytes(size):
+    units = ["B", "KiB", "MiB", "GiB"]
+    while size >= 1024 and len(units) > 1:
+        size /= 1024
+        units.pop(0)
+    return f"{size:.1f} {units[0]}" if units[0] != "B" else f"{size} B"
+
+
+@click.command()
+@click.option(
+    "--grace-days",
+    type=click.IntRange(min=0),
+    default=14,
+    show_default=True,
+    help="Keep unreachable objects younger than this many days",
+)
+@click.option("--dry-run", is_flag=True, help="Report what would be removed")
+def gc(grace_days, dry_run):
+    """Remove starlogs and objects that no course or stage can reach"""
+
+    dock_root = Spacedock.find_dock_root(None)
+    if dock_root is None:  # Not a ruxpy repository
+        Messages.echo_error(
+            "The spacedock is not initialized. Please run 'ruxpy start'"
+        )
+        return
+
+    paths = get_paths(dock_root)
+    try:
+        report = Gc.run(str(paths["repo"]), grace_days * 24 * 60 * 60, dry_run)
+    except Exception as e:
+        Messages.echo_error(f"Garbage collection aborted, nothing was removed: {e}")
+        return
+
+    verb = "Would remove" if dry_run else "Removed"
+    Messages.echo_success(
+        f"{verb} {report['objects_removed']} object(s) and "
+        f"{report['starlogs_removed']} starlog(s), "
+        f"reclaiming {format_bytes(report['bytes_reclaimed'])}; "
+        f"{report['objects_kept']} object(s) kept"
+    )
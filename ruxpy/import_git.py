@@ -0,0 +1,29 @@
+import click
+from ruxpy import GitImport, Messages
+from ruxpy.show import find_repo
+
+
+@click.command("import-git")
+@click.argument("source", type=click.Path(exists=True, file_okay=False))
+@click.pass_context
+def import_git(ctx, source):
+    """Import the branches and history of a local Git repository"""
+
+    repo = find_repo()
+    if repo is None:
+        return
+
+    try:
+        report = GitImport.run(repo, source)
+    except Exception as e:
+        Messages.echo_error(f"Import stopped: {e}")
+        Messages.echo_info("Run the command again to resume the import.")
+        ctx.exit(1)
+
+    Messages.echo_success(
+        f"Imported {report['commits']} commit(s) and {report['blobs']} blob(s), "
+        f"updating {report['courses']} course(s)"
+    )
+    if report["skipped"]:
+        Messages.echo_info(f"{report['skipped']} commit(s) were already imported.")
+    Messages.echo_info("Use ruxpy warp to check out an imported course.")
@@ -0,0 +1,71 @@
+import os
+import sys
+import signal
+import subprocess
+import click
+from ruxpy import (
+    Messages,
+    Monitor,
+    Spacedock,
+    get_paths,
+)
+
+
+@click.command()
+@click.option("--stop", is_flag=True, help="Stop the running monitor")
+@click.option("--status", is_flag=True, help="Show whether the monitor is running")
+@click.option(
+    "--foreground", is_flag=True, hidden=True, help="Run the monitor in this process"
+)
+def monitor(stop, status, foreground):
+    """Watch the working tree so scan does not have to walk it"""
+
+    dock_root = Spacedock.find_dock_root(None)
+    if dock_root is None:  # Not a ruxpy repository
+        Messages.echo_error(
+            "The spacedock is not initialized. Please run 'ruxpy start'"
+        )
+        return
+
+    paths = get_paths(dock_root)
+    repo = str(paths["repo"])
+    pid = Monitor.get_pid(repo)
+
+    if status:
+        if Monitor.is_running(repo):
+            Messages.echo_info(f"Monitor is running (pid {pid})")
+        elif pid is not None:
+            Messages.echo_warning("Monitor is stale; scans walk the working tree.")
+        else:
+            Messages.echo_info("Monitor is not running")
+        return
+
+    if stop:
+        if pid is None:
+            Messages.echo_info("Monitor is not running")
+            return
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except (ProcessLookupError, PermissionError):
+            pass
+        Monitor.clear(repo)
+        Messages.echo_success("Monitor stopped")
+        return
+
+    if foreground:
+        Monitor.run(repo)
+        return
+
+    if Monitor.is_running(repo):
+        Messages.echo_info(f"Monitor is already running (pid {pid})")
+        return
+
+    process = subprocess.Popen(
+        [sys.executable, "-m", "ruxpy.cli", "monitor", "--foreground"],
+        cwd=repo,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    Messages.echo_success(f"Monitor started (pid {process.pid})")
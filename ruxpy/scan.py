@@ -1,17 +1,19 @@
 import os
 import click
 import json
-import hashlib
 from ruxpy import (
     get_course_name,
     check_stage_path_exists,
     load_staged_files,
     Messages,
+    Refs,
     Spacedock,
     list_repo_files,
     list_unstaged_files,
     get_paths,
+    hash_file_object,
 )
+from ruxpy.utils.trace import span
 
 
 @click.command()
@@ -50,9 +52,10 @@ def scan():
     # Load the latest starlog entry
     _ = os.path.join(paths["dock"], "starlogs")
 
-    current_starlog_path = os.path.join(paths["links"], "helm", course_name)
-    with open(current_starlog_path, "r") as f:
-        current_starlog_hash = f.read()
+    # Loose or packed course ref
+    current_starlog_hash = (
+        Refs.course_tip(os.path.join(paths["links"], "helm"), course_name) or ""
+    )
 
     starlog_obj_path = os.path.join(
         paths["dock"], "starlogs", current_starlog_hash[:2], current_starlog_hash[2:]
@@ -80,33 +83,32 @@ def scan():
     with open(starlog_obj_path, "r") as f:
         starlog_obj = json.load(f)
 
-    working_dir = list_repo_files(paths["repo"])
+    with span("scan_list_files"):
+        working_dir = list_repo_files(paths["repo"])
 
     untracked = []
     modified = []
     deleted = []
 
-    for file in working_dir:
-        if file not in starlog_obj["files"]:
-            untracked.append(file)
-            continue
-
-        with open(file, "rb") as f:
-            content = f.read()
+    with span("scan_compare"):
+        for file in working_dir:
+            if file not in starlog_obj["files"]:
+                untracked.append(file)
+                continue
 
-        hash_obj = hashlib.sha3_256()
-        hash_obj.update(content)
-        digest = hash_obj.hexdigest()
+            digest = hash_file_object(str(paths["repo"]), file)
 
-        if digest != starlog_obj["files"][file]:
-            modified.append(file)
+            if digest != starlog_obj["files"][file]:
+                modified.append(file)
 
-    for file, _ in starlog_obj["files"].items():
-        if file not in working_dir:
-            deleted.append(file)
+        present = set(working_dir)
+        for file, _ in starlog_obj["files"].items():
+            if file not in present:
+                deleted.append(file)
 
-    untracked = [f for f in untracked if f not in staged_files]
-    modified = [f for f in modified if f not in staged_files]
+    staged = set(staged_files)
+    untracked = [f for f in untracked if f not in staged]
+    modified = [f for f in modified if f not in staged]
 
     click.echo("Ready to record into starlog:")
     for file in staged_files:
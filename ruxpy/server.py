@@ -0,0 +1,175 @@
+import io
+import os
+import sys
+import json
+import base64
+import signal
+import socket
+import socketserver
+import subprocess
+import click
+from ruxpy import Messages, Spacedock, get_paths
+from ruxpy.client import get_socket_path
+
+PID_NAME = "server.pid"
+
+
+def make_response(output, exit_code):
+    """Response to a forwarded command; `output` is the raw bytes it wrote."""
+    return {"output": base64.b64encode(output).decode("ascii"), "exit_code": exit_code}
+
+
+class CommandHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+        except json.JSONDecodeError:
+            return
+        response = self.server.execute(request)
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class CommandServer(socketserver.UnixStreamServer):
+    """Runs forwarded CLI commands inside one resident process.
+
+    Requests are handled one at a time because each command runs in the
+    client's working directory and writes to the process's standard
+    streams, which are swapped for buffers while it runs.
+    """
+
+    def __init__(self, socket_path, cli):
+        super().__init__(socket_path, CommandHandler)
+        self.cli = cli
+
+    def execute(self, request):
+        argv = request.get("argv", [])
+        if argv[:1] == ["server"]:
+            return make_response(
+                b"[ERROR] The server cannot manage itself remotely.\n", 1
+            )
+
+        try:
+            os.chdir(request["cwd"])
+            stdin = io.BytesIO(base64.b64decode(request.get("stdin") or ""))
+        except (KeyError, OSError, ValueError) as e:
+            return make_response(f"[ERROR] {e}\n".encode("utf-8"), 1)
+
+        output = io.BytesIO()
+        streams = (sys.stdin, sys.stdout, sys.stderr)
+        # stdout and stderr share one buffer, so their lines stay in order
+        sys.stdin = io.TextIOWrapper(stdin, encoding="utf-8")
+        sys.stdout = io.TextIOWrapper(output, encoding="utf-8", write_through=True)
+        sys.stderr = io.TextIOWrapper(output, encoding="utf-8", write_through=True)
+        try:
+            exit_code = self.run(argv, request.get("color", False))
+        finally:
+            # Detached, so dropping the wrappers does not close the buffers
+            for stream in (sys.stdin, sys.stdout, sys.stderr):
+                stream.detach()
+            sys.stdin, sys.stdout, sys.stderr = streams
+
+        return make_response(output.getvalue(), exit_code)
+
+    def run(self, argv, color):
+        """Runs one command and returns its exit code. Errors are reported
+        the way the CLI reports them, and never stop the server."""
+        try:
+            result = self.cli.main(
+                argv, prog_name="ruxpy", standalone_mode=False, color=color
+            )
+        except click.ClickException as e:
+            e.show()
+            return e.exit_code
+        except click.Abort:
+            click.echo("Aborted!", err=True)
+            return 1
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                return e.code or 0
+            click.echo(e.code, err=True)
+            return 1
+        except Exception as e:
+            Messages.echo_error(e)
+            return 1
+        # --help and --version exit early with their code
+        return result if isinstance(result, int) else 0
+
+
+def is_server_running(socket_path):
+    if not os.path.exists(socket_path):
+        return False
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+        return True
+    except OSError:
+        return False
+
+
+@click.command()
+@click.option("--stop", is_flag=True, help="Stop the running server")
+@click.option("--status", is_flag=True, help="Show whether the server is running")
+@click.option("--foreground", is_flag=True, hidden=True, help="Serve from this process")
+def server(stop, status, foreground):
+    """Keep ruxpy resident to answer forwarded commands quickly"""
+
+    dock_root = Spacedock.find_dock_root(None)
+    if dock_root is None:  # Not a ruxpy repository
+        Messages.echo_error(
+            "The spacedock is not initialized. Please run 'ruxpy start'"
+        )
+        return
+
+    paths = get_paths(dock_root)
+    repo = str(paths["repo"])
+    socket_path = get_socket_path(repo)
+    pid_path = os.path.join(paths["dock"], PID_NAME)
+    running = is_server_running(socket_path)
+
+    if status:
+        if running:
+            Messages.echo_info(f"Server is listening on {socket_path}")
+        else:
+            Messages.echo_info("Server is not running")
+        return
+
+    if stop:
+        try:
+            with open(pid_path, "r") as f:
+                os.kill(int(f.read().strip()), signal.SIGTERM)
+        except (FileNotFoundError, ValueError, ProcessLookupError, PermissionError):
+            pass
+        for path in (socket_path, pid_path):
+            if os.path.exists(path):
+                os.remove(path)
+        Messages.echo_success("Server stopped")
+        return
+
+    if running:
+        Messages.echo_info(f"Server is already listening on {socket_path}")
+        return
+
+    if foreground:
+        from ruxpy.cli import main
+
+        if os.path.exists(socket_path):
+            # Left behind by a server that did not shut down cleanly
+            os.remove(socket_path)
+        with open(pid_path, "w") as f:
+            f.write(str(os.getpid()))
+        with CommandServer(socket_path, main) as command_server:
+            command_server.serve_forever()
+        return
+
+    process = subprocess.Popen(
+        [sys.executable, "-m", "ruxpy.cli", "server", "--foreground"],
+        cwd=repo,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    Messages.echo_success(
+        f"Server started (pid {process.pid}). "
+        f"Use ruxpy-client in place of ruxpy to forward commands to it."
+    )
@@ -0,0 +1,61 @@
+import click
+from ruxpy import Messages, Revision, Spacedock, get_paths
+
+
+def find_repo():
+    dock_root = Spacedock.find_dock_root(None)
+    if dock_root is None:  # Not a ruxpy repository
+        Messages.echo_error(
+            "The spacedock is not initialized. Please run 'ruxpy start'"
+        )
+        return None
+    return str(get_paths(dock_root)["repo"])
+
+
+@click.command()
+@click.argument("spec", metavar="<starlog>:<path>")
+@click.pass_context
+def show(ctx, spec):
+    """Print a file as recorded by a starlog or course, without warping"""
+
+    rev, sep, path = spec.partition(":")
+    if not sep or not rev or not path:
+        Messages.echo_error("Expected <starlog>:<path>, e.g. core:README.md")
+        ctx.exit(1)
+
+    repo = find_repo()
+    if repo is None:
+        return
+
+    try:
+        Revision.write_file(repo, rev, path, click.get_binary_stream("stdout"))
+    except Exception as e:
+        Messages.echo_error(str(e))
+        ctx.exit(1)
+
+
+@click.command("ls-tree")
+@click.argument("rev", metavar="<starlog>")
+@click.argument("directory", default="")
+@click.option(
+    "-r", "--recursive", is_flag=True, help="List every file below the directory"
+)
+@click.pass_context
+def ls_tree(ctx, rev, directory, recursive):
+    """List a directory as recorded by a starlog or course"""
+
+    repo = find_repo()
+    if repo is None:
+        return
+
+    try:
+        entries = Revision.ls_tree(repo, rev, directory, recursive)
+    except Exception as e:
+        Messages.echo_error(str(e))
+        ctx.exit(1)
+
+    for kind, object_id, path in entries:
+        if kind == "tree":
+            click.echo(f"tree {'-':<64}\t{path}/")
+        else:
+            click.echo(f"blob {object_id}\t{path}")
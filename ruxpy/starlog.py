@@ -1,9 +1,6 @@
 import os
 from datetime import datetime
 import json
-import hashlib
-import tomlkit
-from tomlkit import exceptions
 from collections import defaultdict
 import click
 from ruxpy import ruxpy
@@ -137,6 +134,9 @@ Files yet to be beamed:
 
         if message:
             # Gather config metadata
+            import tomlkit
+            from tomlkit import exceptions
+
             config_path = paths["config"]
             with open(config_path, "r") as f:
                 config = tomlkit.parse(f.read())
@@ -153,36 +153,37 @@ Files yet to be beamed:
 
             timestamp = datetime.now().isoformat()
 
-            staged_hash_list = {}
-            saved_count = 0
-            for file in staged_files:
-                # if file is deleted or missing from working_dir, then skip it
-                if not os.path.exists(file):
-                    Messages.echo_warning(
-                        f"File '{file}' was deleted and will not be committed."
-                    )
-                    continue
-                hash = ruxpy.Blob.save_blob(paths["repo"], file)
-                staged_hash_list[file] = hash
-                saved_count += 1
+            try:
+                # Entries as beamed, so that only these are unstaged once the
+                # starlog is recorded and files beamed meanwhile stay staged
+                beamed = ruxpy.Stage.entries(str(paths["repo"]))
+
+                # Blobs were written at beam time; only files changed since
+                # then are read again
+                staged_hash_list, missing = ruxpy.Stage.resolve(str(paths["repo"]))
+            except RuntimeError as e:
+                Messages.echo_error(f"Reading the stage failed! {e}")
+                return
+            for file in missing:
+                Messages.echo_warning(
+                    f"File '{file}' was deleted and will not be committed."
+                )
 
-            if saved_count == 0:
+            if len(staged_hash_list) == 0:
                 Messages.echo_warning("No files to make a starlog entry!")
-                with open(paths["stage"], "w") as f:
-                    json.dump([], f)
+                ruxpy.Stage.remove(str(paths["repo"]), list(beamed), beamed)
                 return
 
             helm_path = paths["helm_f"]
-            course_path = ""
+            course = ""
             try:
                 with open(helm_path, "r") as f:
                     content = f.read().strip()
                 if content.startswith("link:"):
-                    course_file = content.split("link:")[1].strip()
-                    course_path = os.path.join(paths["dock"], course_file)
-                    if os.path.isfile(course_path):
-                        with open(course_path, "r") as cf:
-                            parent = cf.read().strip()
+                    course = content.split("link:")[1].strip().split("/")[-1]
+                    # Loose or packed course ref
+                    parent = ruxpy.Refs.course_tip(paths["helm_d"], course)
+                    if parent is not None:
                         if not parent:
                             parent = None  # Initial starlog
                     else:
@@ -217,26 +218,13 @@ Files yet to be beamed:
                     Messages.echo_error(f"Opening parent starlog failed! {e}")
                     return
 
-                all_files = list_repo_files(paths["repo"])
-                current_hashes = {}
-                for file in all_files:
-                    with open(file, "rb") as f:
-                        content = f.read()
-                    hash_obj = hashlib.sha3_256()
-                    hash_obj.update(content)
-                    digest = hash_obj.hexdigest()
-                    current_hashes[file] = digest
-
+                # Only the stage is hashed; a renamed file is recorded once
+                # its new path is beamed, and files that were not beamed
+                # keep their blob from the parent
+                all_files = set(list_repo_files(paths["repo"]))
                 for pfile, pf_hash in parent_files.items():
-                    if pfile in all_files:
-                        # check if file is modified but not staged
-                        if pfile not in staged_files:
-                            starlog_obj["files"][pfile] = pf_hash
-                    else:
-                        # check for renamed files
-                        for file, fhash in current_hashes.items():
-                            if fhash == pf_hash and file not in parent_files:
-                                starlog_obj["files"][file] = pf_hash
+                    if pfile in all_files and pfile not in staged_hash_list:
+                        starlog_obj["files"][pfile] = pf_hash
 
             # Build tree and add it to starlog_obj
             try:
@@ -254,11 +242,19 @@ Files yet to be beamed:
             starlog_bytes = serialized.encode("utf-8")
             starlog_hash = ruxpy.save_starlog(paths["repo"], starlog_bytes)
 
-            with open(course_path, "w") as f:
-                f.write(starlog_hash)
+            # Another starlog recorded on this course since `parent` was
+            # read must not be overwritten
+            try:
+                ruxpy.Refs.update_course(
+                    paths["helm_d"], course, starlog_hash, expected=parent or ""
+                )
+            except RuntimeError as e:
+                Messages.echo_error(
+                    f"The course moved while recording the starlog, try again: {e}"
+                )
+                return
 
-            with open(paths["stage"], "w") as f:
-                json.dump([], f)
+            ruxpy.Stage.remove(str(paths["repo"]), list(beamed), beamed)
 
             Messages.echo_success("Starlog entry saved! Next course?")
 
@@ -311,13 +307,10 @@ def get_starlog_objects_list(paths: dict) -> list | None:
 
 
 def get_course_hash_map(course_dir):
+    # Packed courses come from one read; only loose refs are opened
     course_hash_map = defaultdict(list)
-    for dirpath, _, files in os.walk(course_dir):
-        course_files = files
-
-        for file in course_files:
-            with open(os.path.join(dirpath, file), "r") as f:
-                course_hash_map[f.read()].append(file)
+    for course, tip in ruxpy.Refs.courses(str(course_dir)).items():
+        course_hash_map[tip].append(course)
 
     return course_hash_map
 
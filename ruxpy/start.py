@@ -1,55 +1,131 @@
 import os
 import click
-from ruxpy import Spacedock, ruxpy
+from ruxpy import LocalClone, Messages, RuxpyTree, Spacedock, Stage, ruxpy
 from ruxpy import (
+    format_version_for,
+    get_course_name,
     get_paths,
+    load_course_tree_hash,
 )
 
 
+def default_config(hash_algorithm="sha3-256", object_store="loose"):
+    config = (
+        "# config.toml\n\n"
+        "[core]\n"
+        f"format_version = {format_version_for(hash_algorithm)}\n"
+    )
+    if object_store != "loose":
+        config += f'object_store = "{object_store}"\n'
+    return config
+
+
+def create_spacedock(dir_path, hash_algorithm, object_store="loose"):
+    paths = get_paths(dir_path)
+
+    dock_path = paths["dock"]
+    os.makedirs(dock_path, exist_ok=True)
+
+    # Create the objects dir
+    ruxpy.init_object_dir(dir_path)
+
+    # Create config.toml
+    config_path = paths["config"]
+    with open(config_path, "w") as f:
+        f.write(default_config(hash_algorithm, object_store))
+
+    # Create HELM pointer file
+    helm_path = paths["helm_f"]
+    with open(helm_path, "w") as f:
+        f.write("link: links/helm/core\n")
+
+    # Create the links directory
+    links_path = paths["links"]
+    os.makedirs(os.path.join(links_path, "helm"), exist_ok=True)
+    core_path = paths["core"]
+    with open(core_path, "w") as f:
+        f.write("")
+
+    # Create stage file for staging area
+    Stage.clear(str(paths["repo"]))
+
+    # Create the starlogs dir
+    starlog_path = os.path.join(dock_path, "starlogs")
+    os.makedirs(starlog_path, exist_ok=True)
+    return paths
+
+
+def clone_spacedock(source, path):
+    source_root = Spacedock.find_dock_root(str(source))
+    if source_root is None:
+        Messages.echo_error(f"{source} is not inside a spacedock")
+        return
+
+    dir_path = os.path.abspath(path)
+    if Spacedock.find_dock_root(dir_path) is not None:
+        Messages.echo_error(f"{dir_path} is already inside a spacedock")
+        return
+    if os.path.exists(dir_path) and os.listdir(dir_path):
+        Messages.echo_error(f"{dir_path} already exists and is not empty")
+        return
+
+    os.makedirs(dir_path, exist_ok=True)
+    # The source's config.toml replaces the default one
+    paths = create_spacedock(dir_path, "sha3-256")
+    source_repo = get_paths(source_root)["repo"]
+    try:
+        report = LocalClone.run(str(source_repo), dir_path)
+        course = get_course_name(paths["helm_f"])
+        tree_hash = load_course_tree_hash(paths["dock"], course)
+        if tree_hash is not None:
+            RuxpyTree.warp_to_course(tree_hash, dir_path)
+    except Exception as e:
+        Messages.echo_error(f"Cloning {source_repo} failed: {e}")
+        return
+
+    click.echo(
+        f"Cloned {source_repo} into {dir_path} on course '-{course}-' "
+        f"({report['linked']} object(s) linked, {report['copied']} copied)"
+    )
+
+
 @click.command()
 @click.argument("path", default=".")
-def start(path):
+@click.option(
+    "--hash",
+    "hash_algorithm",
+    type=click.Choice(["sha3-256", "blake3"]),
+    default="sha3-256",
+    show_default=True,
+    help="Object hash algorithm; fixed for the lifetime of the spacedock",
+)
+@click.option(
+    "--object-store",
+    type=click.Choice(["loose", "pack", "sqlite"]),
+    default="loose",
+    show_default=True,
+    help="Keep each object in its own file, or all of them in one pack file "
+    "or SQLite database",
+)
+@click.option(
+    "--from",
+    "source",
+    type=click.Path(exists=True, file_okay=False),
+    help="Clone a local spacedock, hardlinking its objects",
+)
+def start(path, hash_algorithm, object_store, source):
     """Start a new ruxpy repository"""
 
+    if source is not None:
+        clone_spacedock(source, path)
+        return
+
     # Check for spacedock
     dock_root = Spacedock.find_dock_root(str(path))
 
     if dock_root is None:
         # Create new spacedock
-        dir_path = os.path.abspath(path)
-        paths = get_paths(dir_path)
-
-        dock_path = paths["dock"]
-        os.makedirs(dock_path, exist_ok=True)
-
-        # Create the objects dir
-        ruxpy.init_object_dir(dir_path)
-
-        # Create config.toml
-        config_path = paths["config"]
-        with open(config_path, "w") as f:
-            f.write("# config.toml\n")
-
-        # Create HELM pointer file
-        helm_path = paths["helm_f"]
-        with open(helm_path, "w") as f:
-            f.write("link: links/helm/core\n")
-
-        # Create the links directory
-        links_path = paths["links"]
-        os.makedirs(os.path.join(links_path, "helm"), exist_ok=True)
-        core_path = paths["core"]
-        with open(core_path, "w") as f:
-            f.write("")
-
-        # Create stage file for staging area
-        stage_path = paths["stage"]
-        with open(stage_path, "w") as f:
-            f.write("[]")
-
-        # Create the starlogs dir
-        starlog_path = os.path.join(dock_path, "starlogs")
-        os.makedirs(starlog_path, exist_ok=True)
+        paths = create_spacedock(os.path.abspath(path), hash_algorithm, object_store)
 
         click.echo(f"Initialized ruxpy repository in {paths['repo']}...")
     else:
@@ -81,8 +157,7 @@ def start(path):
 
                 if Spacedock.get_path_kind(path) == "File":
                     if path == "stage":
-                        with open(paths["stage"], "w") as f:
-                            f.write("[]")
+                        Stage.clear(str(paths["repo"]))
 
                     if path == "helm_f":
                         with open(paths["helm_f"], "w") as f:
@@ -93,6 +168,8 @@ def start(path):
                             f.write("")
 
                     if path == "config":
+                        # Objects may already exist, so keep the format that
+                        # predates format versions rather than guessing.
                         with open(paths["config"], "w") as f:
                             f.write("# config.toml\n")
 
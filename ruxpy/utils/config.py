@@ -1,10 +1,9 @@
-import tomlkit
-from tomlkit import exceptions
-
-
 class Config:
     @staticmethod
     def read_config(path):
+        import tomlkit
+        from tomlkit import exceptions
+
         try:
             with open(path, "r") as f:
                 config = tomlkit.parse(f.read())
@@ -15,5 +14,7 @@ class Config:
 
     @staticmethod
     def write_config(path, config):
+        import tomlkit
+
         with open(path, "w") as f:
             f.write(tomlkit.dumps(config))
@@ -3,7 +3,7 @@ import json
 from .init import get_paths
 
 # from .starlog import Starlog
-from ..ruxpy import list_all_files, Spacedock, Starlog
+from ..ruxpy import list_all_files, Refs, Spacedock, Stage, Starlog
 
 
 def get_course_name(path):
@@ -20,14 +20,15 @@ def list_repo_files(repo_path):
 
 
 def load_staged_files(stage_path):
-    with open(stage_path, "r") as f:
-        return json.load(f)
+    """Sorted paths staged in the index at `<repo>/.dock/stage`."""
+    repo_path = os.path.dirname(os.path.dirname(os.path.abspath(stage_path)))
+    return Stage.paths(repo_path)
 
 
 def safe_load_staged_files(stage_path, default=None):
     try:
         return load_staged_files(stage_path)
-    except (FileNotFoundError, json.JSONDecodeError):
+    except RuntimeError:
         return default if default is not None else []
 
 
@@ -50,7 +51,8 @@ def list_unstaged_files(repo_path: str):
     all_files = list_repo_files(repo_path)
 
     stage_path = os.path.join(repo_path, ".dock", "stage")
-    staged_files = safe_load_staged_files(stage_path)
+    staged_files = set(safe_load_staged_files(stage_path))
+    committed_files = set(committed_files)
 
     unstaged_files = []
     for file in all_files:
@@ -58,3 +60,17 @@ def list_unstaged_files(repo_path: str):
             unstaged_files.append(file)
 
     return unstaged_files
+
+
+def load_course_tree_hash(dock_path, course):
+    """Tree hash of the tip of `course`, or None if it has no starlogs."""
+    starlog_hash = Refs.course_tip(os.path.join(dock_path, "links", "helm"), course)
+    if starlog_hash is None:
+        raise FileNotFoundError(f"Course {course} does not exist")
+    if not starlog_hash:
+        return None
+    starlog_path = os.path.join(
+        dock_path, "starlogs", starlog_hash[:2], starlog_hash[2:]
+    )
+    with open(starlog_path, "r") as f:
+        return json.load(f)["tree"]
@@ -0,0 +1,142 @@
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+TRACE_ENV = "RUXPY_TRACE"
+TRACE_FILE_ENV = "RUXPY_TRACE_FILE"
+
+# Checked before touching the Rust extension, so spans cost nothing
+# unless tracing was switched on.
+_enabled = False
+
+
+def _trace():
+    from ..ruxpy import Trace
+
+    return Trace
+
+
+def enable_tracing():
+    global _enabled
+    _enabled = True
+    _trace().enable()
+
+
+def disable_tracing():
+    global _enabled
+    _enabled = False
+    _trace().disable()
+
+
+def _now_us():
+    return time.time_ns() // 1000
+
+
+@contextmanager
+def span(name):
+    """Record the enclosed block as a span next to the Rust core's spans."""
+    if not _enabled:
+        yield
+        return
+
+    start = _now_us()
+    try:
+        yield
+    finally:
+        _trace().record_span(name, start, _now_us() - start)
+
+
+def get_counters():
+    """Work counters of this process (files stat'ed, bytes hashed, objects
+    written and skipped, cache hits) as a dict."""
+    return dict(_trace().counters())
+
+
+def reset_counters():
+    _trace().reset()
+
+
+def get_spans():
+    return [
+        {"name": name, "start_us": start, "duration_us": duration, "tid": tid}
+        for name, start, duration, tid in _trace().spans()
+    ]
+
+
+def format_timings(spans, counters):
+    totals = defaultdict(lambda: [0, 0])
+    for s in spans:
+        totals[s["name"]][0] += 1
+        totals[s["name"]][1] += s["duration_us"]
+
+    lines = [f"{'phase':<28}{'calls':>8}{'total ms':>12}"]
+    for name, (calls, total_us) in sorted(
+        totals.items(), key=lambda item: item[1][1], reverse=True
+    ):
+        lines.append(f"{name:<28}{calls:>8}{total_us / 1000:>12.2f}")
+    lines.append("")
+    lines.append("Counters:")
+    for name, value in counters.items():
+        lines.append(f"  {name:<26}{value:>12}")
+    return "\n".join(lines)
+
+
+def write_chrome_trace(path, spans, counters):
+    import json
+
+    pid = os.getpid()
+    events = [
+        {
+            "name": s["name"],
+            "ph": "X",
+            "ts": s["start_us"],
+            "dur": s["duration_us"],
+            "pid": pid,
+            "tid": s["tid"],
+        }
+        for s in spans
+    ]
+    end_us = max((s["start_us"] + s["duration_us"] for s in spans), default=0)
+    events.append(
+        {"name": "counters", "ph": "C", "ts": end_us, "pid": pid, "args": counters}
+    )
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+class CommandTrace:
+    """Times one CLI command and reports it when the command finishes.
+
+    Spans and counters are process-wide, so they are cleared when the
+    command starts and tracing is switched off when it finishes; commands
+    run one after another in one process (tests, the command server) are
+    then reported separately.
+    """
+
+    def __init__(self, command, print_timings, trace_mode):
+        self.command = command or "ruxpy"
+        self.print_timings = print_timings
+        self.trace_mode = trace_mode
+        _trace().reset()
+        self.start = _now_us()
+
+    def finish(self):
+        import click
+
+        _trace().record_span(
+            f"ruxpy {self.command}", self.start, _now_us() - self.start
+        )
+        disable_tracing()
+        spans = get_spans()
+        counters = get_counters()
+
+        # RUXPY_TRACE=chrome writes a trace file; any other value, such as
+        # 1, asks for the same summary as --timings
+        if self.print_timings or self.trace_mode not in (None, "chrome"):
+            click.echo(format_timings(spans, counters), err=True)
+
+        if self.trace_mode == "chrome":
+            path = os.environ.get(TRACE_FILE_ENV) or f"ruxpy-trace-{os.getpid()}.json"
+            write_chrome_trace(path, spans, counters)
+            click.echo(f"Chrome trace written to {path}", err=True)
@@ -0,0 +1,39 @@
+import os
+from .course import get_course_name
+
+WORKTREES_DIR = "worktrees"
+COMMONDIR_FILE = "commondir"
+# Shared with the main spacedock; HELM, stage and caches stay per worktree.
+SHARED_ITEMS = ["objects", "starlogs", "links", "config.toml"]
+
+
+def get_common_dock(dock_path):
+    """The main spacedock's .dock for a linked worktree, else dock_path."""
+    try:
+        with open(os.path.join(dock_path, COMMONDIR_FILE), "r") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return dock_path
+
+
+def list_worktrees(common_dock):
+    """(name, path) of every linked worktree, main spacedock first."""
+    worktrees = [("(main)", os.path.dirname(common_dock))]
+    registry = os.path.join(common_dock, WORKTREES_DIR)
+    if os.path.isdir(registry):
+        for name in sorted(os.listdir(registry)):
+            with open(os.path.join(registry, name), "r") as f:
+                worktrees.append((name, f.read().strip()))
+    return worktrees
+
+
+def course_in_use(common_dock, course, exclude=None):
+    """Path of the worktree (or main spacedock) on course, other than
+    exclude, or None."""
+    for _, path in list_worktrees(common_dock):
+        if exclude is not None and os.path.realpath(path) == os.path.realpath(exclude):
+            continue
+        helm_path = os.path.join(path, ".dock", "HELM")
+        if os.path.isfile(helm_path) and get_course_name(helm_path) == course:
+            return path
+    return None
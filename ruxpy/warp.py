@@ -7,9 +7,11 @@ from ruxpy import (
     RuxpyTree,
     Courses,
     Starlog,
+    Refs,
     safe_load_staged_files,
     list_unstaged_files,
 )
+from ruxpy.utils.worktree import course_in_use, get_common_dock
 
 
 @click.command
@@ -36,6 +38,12 @@ def warp(course):
 
     try:
         course_exists = Courses.check_course_existence(str(course))
+        common_dock = get_common_dock(paths["dock"])
+        in_use = course_in_use(common_dock, str(course), exclude=paths["repo"])
+        if course_exists and in_use is not None:
+            Messages.echo_error(f"Course {course} is checked out at {in_use}")
+            return
+
         if course_exists:
             dest_starlog_hash = Courses.get_latest_starlog_hash(str(course))
             dest_tree_hash = Starlog.get_tree_hash(dest_starlog_hash)
@@ -58,8 +66,7 @@ def warp(course):
             RuxpyTree.warp_to_course(dest_tree_hash, str(paths["repo"]))
 
             helm_file = paths["helm_f"]
-            with open(helm_file, "w") as f:
-                f.write(f"link: links/helm/{course}")
+            Refs.update(helm_file, f"link: links/helm/{course}")
 
             Messages.echo_success("Warped successfully")
 
@@ -0,0 +1,125 @@
+import os
+import click
+from ruxpy import (
+    Courses,
+    Messages,
+    Refs,
+    RuxpyTree,
+    Spacedock,
+    Stage,
+    get_course_name,
+    get_paths,
+    load_course_tree_hash,
+)
+from ruxpy.utils.worktree import (
+    COMMONDIR_FILE,
+    SHARED_ITEMS,
+    WORKTREES_DIR,
+    course_in_use,
+    get_common_dock,
+    list_worktrees,
+)
+
+
+@click.group()
+def worktree():
+    """Check out several courses at once, sharing one object store"""
+
+
+@worktree.command("add")
+@click.argument("directory", type=click.Path(file_okay=False))
+@click.argument("course")
+def add(directory, course):
+    """Create a working directory for COURSE at DIRECTORY"""
+
+    dock_root = Spacedock.find_dock_root(None)
+    if dock_root is None:  # Not a ruxpy repository
+        Messages.echo_error(
+            "The spacedock is not initialized. Please run 'ruxpy start'"
+        )
+        return
+
+    paths = get_paths(dock_root)
+    common_dock = os.path.abspath(get_common_dock(paths["dock"]))
+    target = os.path.abspath(directory)
+
+    # Loose or packed course ref
+    if Refs.course_tip(os.path.join(common_dock, "links", "helm"), course) is None:
+        Messages.echo_error(
+            f"Course {course} does not exist. "
+            "Please use `ruxpy course <course-name>` to create one."
+        )
+        return
+
+    in_use = course_in_use(common_dock, course)
+    if in_use is not None:
+        Messages.echo_error(f"Course {course} is already checked out at {in_use}")
+        return
+
+    if os.path.exists(target) and os.listdir(target):
+        Messages.echo_error(f"{target} already exists and is not empty")
+        return
+
+    if Spacedock.find_dock_root(os.path.dirname(target)) is not None:
+        Messages.echo_error("A worktree cannot be created inside a spacedock")
+        return
+
+    name = os.path.basename(target)
+    registry = os.path.join(common_dock, WORKTREES_DIR)
+    os.makedirs(registry, exist_ok=True)
+    suffix = 1
+    while os.path.exists(os.path.join(registry, name)):
+        suffix += 1
+        name = f"{os.path.basename(target)}-{suffix}"
+
+    dock_path = os.path.join(target, ".dock")
+    os.makedirs(dock_path)
+    for item in SHARED_ITEMS:
+        source = os.path.join(common_dock, item)
+        os.symlink(
+            source,
+            os.path.join(dock_path, item),
+            target_is_directory=os.path.isdir(source),
+        )
+    with open(os.path.join(dock_path, COMMONDIR_FILE), "w") as f:
+        f.write(common_dock)
+    with open(os.path.join(dock_path, "HELM"), "w") as f:
+        f.write(f"link: links/helm/{course}\n")
+    Stage.clear(target)
+    with open(os.path.join(registry, name), "w") as f:
+        f.write(target)
+
+    try:
+        tree_hash = load_course_tree_hash(common_dock, course)
+        if tree_hash is not None:
+            RuxpyTree.warp_to_course(tree_hash, target)
+    except Exception as e:
+        Messages.echo_error(f"Checking out {course} failed: {e}")
+        return
+
+    Messages.echo_success(f"Worktree {name} on course '-{course}-' created at {target}")
+
+
+@worktree.command("list")
+def list_cmd():
+    """List the main spacedock and its linked worktrees"""
+
+    dock_root = Spacedock.find_dock_root(None)
+    if dock_root is None:  # Not a ruxpy repository
+        Messages.echo_error(
+            "The spacedock is not initialized. Please run 'ruxpy start'"
+        )
+        return
+
+    paths = get_paths(dock_root)
+    common_dock = os.path.abspath(get_common_dock(paths["dock"]))
+    courses = set(Courses.list_all(os.path.join(common_dock, "links", "helm")))
+    for name, path in list_worktrees(common_dock):
+        helm_path = os.path.join(path, ".dock", "HELM")
+        if not os.path.isfile(helm_path):
+            click.echo(f"{name}\t{path}\t{click.style('[missing]', fg='red')}")
+            continue
+        course = get_course_name(helm_path)
+        if course not in courses:
+            course = click.style(f"{course} (deleted)", fg="red")
+        click.echo(f"{name}\t{path}\t-{course}-")
@@ -0,0 +1,118 @@
+use std::collections::HashMap;
+use std::fs;
+use std::io::Write;
+use std::path::{Path, PathBuf};
+use std::sync::{Arc, Mutex};
+use std::time::SystemTime;
+
+/// Lists, one per line, object directories that reads fall back to when an
+/// object is not in the spacedock's own store. Relative paths are relative
+/// to `.dock/objects`. Writes always go to the spacedock's own store.
+pub const ALTERNATES_FILE: &str = "info/alternates";
+
+/// Parsed alternates per spacedock, revalidated by the file's mtime so that
+/// per-object fallbacks cost one `stat`.
+type AlternatesCache = HashMap<PathBuf, (Option<SystemTime>, Arc<Vec<PathBuf>>)>;
+static ALTERNATES: Mutex<Option<AlternatesCache>> = Mutex::new(None);
+
+pub fn objects_dir(repo: &Path) -> PathBuf {
+    repo.join(".dock").join("objects")
+}
+
+pub fn alternates_path(repo: &Path) -> PathBuf {
+    objects_dir(repo).join(ALTERNATES_FILE)
+}
+
+fn read_alternates(repo: &Path) -> Vec<PathBuf> {
+    let objects = objects_dir(repo);
+    let Ok(contents) = fs::read_to_string(alternates_path(repo)) else {
+        return Vec::new();
+    };
+    contents
+        .lines()
+        .map(str::trim)
+        .filter(|line| !line.is_empty() && !line.starts_with('#'))
+        .map(|line| objects.join(line))
+        .collect()
+}
+
+/// Alternate object directories of the spacedock at `repo`, in lookup order.
+pub fn alternates(repo: &Path) -> Arc<Vec<PathBuf>> {
+    let mtime = fs::metadata(alternates_path(repo))
+        .and_then(|m| m.modified())
+        .ok();
+
+    let mut guard = ALTERNATES.lock().unwrap();
+    let cache = guard.get_or_insert_with(HashMap::new);
+    if let Some((cached_mtime, dirs)) = cache.get(repo) {
+        if *cached_mtime == mtime {
+            return Arc::clone(dirs);
+        }
+    }
+
+    let dirs = Arc::new(read_alternates(repo));
+    cache.insert(repo.to_path_buf(), (mtime, Arc::clone(&dirs)));
+    dirs
+}
+
+/// Adds `dir` to the alternates of `repo` unless already listed; returns
+/// whether the file changed.
+pub fn add_alternate(repo: &Path, dir: &Path) -> Result<bool, String> {
+    if read_alternates(repo).iter().any(|d| d == dir) {
+        return Ok(false);
+    }
+    let path = alternates_path(repo);
+    if let Some(parent) = path.parent() {
+        fs::create_dir_all(parent)
+            .map_err(|e| format!("Failed to create {}: {}", parent.display(), e))?;
+    }
+    let mut file = fs::OpenOptions::new()
+        .create(true)
+        .append(true)
+        .open(&path)
+        .map_err(|e| format!("Failed to open alternates: {}", e))?;
+    writeln!(file, "{}", dir.display())
+        .map_err(|e| format!("Failed to write alternates: {}", e))?;
+    Ok(true)
+}
+
+/// Path of `rel` (a fan-out path such as `ab/cdef...`) in the spacedock's
+/// own store, or else in the first alternate that has it.
+pub fn find(repo: &Path, rel: &Path) -> Option<PathBuf> {
+    let local = objects_dir(repo).join(rel);
+    if local.exists() {
+        return Some(local);
+    }
+    alternates(repo)
+        .iter()
+        .map(|dir| dir.join(rel))
+        .find(|path| path.exists())
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn test_find_falls_back_to_alternates() {
+        let repo = tempfile::tempdir().unwrap();
+        let shared = tempfile::tempdir().unwrap();
+        fs::create_dir_all(objects_dir(repo.path()).join("aa")).unwrap();
+        fs::create_dir_all(shared.path().join("bb")).unwrap();
+        fs::write(objects_dir(repo.path()).join("aa/01"), "local").unwrap();
+        fs::write(shared.path().join("bb/02"), "shared").unwrap();
+
+        assert!(find(repo.path(), Path::new("bb/02")).is_none());
+        assert!(add_alternate(repo.path(), shared.path()).unwrap());
+        assert!(!add_alternate(repo.path(), shared.path()).unwrap());
+
+        assert_eq!(
+            find(repo.path(), Path::new("aa/01")).unwrap(),
+            objects_dir(repo.path()).join("aa/01")
+        );
+        assert_eq!(
+            find(repo.path(), Path::new("bb/02")).unwrap(),
+            shared.path().join("bb/02")
+        );
+    }
+}
@@ -0,0 +1,412 @@
+use pyo3::exceptions::PyRuntimeError;
+use pyo3::prelude::*;
+use pyo3::types::PyDict;
+use rayon::prelude::*;
+use serde::Deserialize;
+use std::collections::HashMap;
+use std::fs::{self, OpenOptions};
+use std::io::{ErrorKind, Write};
+use std::path::{Path, PathBuf};
+
+use crate::reachability::{self, is_object_id};
+use crate::refs;
+use crate::revision;
+use crate::trace;
+
+/// Parent and generation of every starlog seen so far, one
+/// `<starlog> <parent or -> <generation>` line each, appended as new
+/// starlogs are reached. A root starlog has generation 1, any other one
+/// one more than its parent. Deleting the file only costs a rebuild.
+pub const GRAPH_FILE: &str = "starlog-graph";
+
+/// Only the field of a starlog that the graph needs.
+#[derive(Deserialize)]
+struct ParentOnly {
+    parent: Option<String>,
+}
+
+#[derive(Debug, Clone, PartialEq, Eq)]
+struct Node {
+    parent: Option<String>,
+    generation: u64,
+}
+
+pub fn graph_path(repo: &Path) -> PathBuf {
+    repo.join(".dock").join(GRAPH_FILE)
+}
+
+/// Starlog ancestry of a spacedock, loaded from the graph file and extended
+/// from starlogs on demand.
+pub struct Graph {
+    repo: PathBuf,
+    nodes: HashMap<String, Node>,
+    added: Vec<String>,
+    /// The file ended in a line cut short, which the next save must not
+    /// continue.
+    torn: bool,
+}
+
+/// How two starlogs relate: their merge base, if they share history, and
+/// the starlogs each one has that the other lacks.
+#[derive(Debug, Clone, PartialEq, Eq)]
+pub struct Divergence {
+    pub merge_base: Option<String>,
+    pub ahead: u64,
+    pub behind: u64,
+}
+
+fn parse_line(line: &str) -> Option<(String, Node)> {
+    let mut fields = line.split(' ');
+    let (id, parent, generation) = (fields.next()?, fields.next()?, fields.next()?);
+    if fields.next().is_some() || !is_object_id(id) {
+        return None;
+    }
+    let parent = match parent {
+        "-" => None,
+        parent if is_object_id(parent) => Some(parent.to_string()),
+        _ => return None,
+    };
+    let generation = generation.parse().ok().filter(|g| *g > 0)?;
+    Some((id.to_string(), Node { parent, generation }))
+}
+
+impl Graph {
+    pub fn load(repo: &Path) -> Result<Graph, String> {
+        let _span = trace::span("graph_load");
+        let path = graph_path(repo);
+        let contents = match fs::read_to_string(&path) {
+            Ok(contents) => contents,
+            Err(e) if e.kind() == ErrorKind::NotFound => String::new(),
+            Err(e) => return Err(format!("Failed to read {}: {}", path.display(), e)),
+        };
+        // Lines are appended parents first. A last line without its line
+        // feed was cut short by a crash, and even one that parses (a
+        // generation of 12 cut to 1) is skipped. So is a line whose
+        // generation does not follow its parent's, or whose parent is
+        // unknown; those starlogs are recomputed when reached.
+        let complete = contents.rfind('\n').map_or(0, |end| end + 1);
+        let mut nodes: HashMap<String, Node> = HashMap::new();
+        for (id, node) in contents[..complete].lines().filter_map(parse_line) {
+            let expected = match &node.parent {
+                None => Some(1),
+                Some(parent) => nodes.get(parent).map(|p| p.generation + 1),
+            };
+            if expected == Some(node.generation) {
+                nodes.insert(id, node);
+            }
+        }
+        Ok(Graph {
+            repo: repo.to_path_buf(),
+            nodes,
+            added: Vec::new(),
+            torn: complete < contents.len(),
+        })
+    }
+
+    fn read_parent(&self, id: &str) -> Result<Option<String>, String> {
+        let path = reachability::starlog_path(&self.repo, id);
+        let data = fs::read(&path).map_err(|e| format!("Failed to read starlog {}: {}", id, e))?;
+        let starlog: ParentOnly = serde_json::from_slice(&data)
+            .map_err(|e| format!("Failed to parse starlog {}: {}", id, e))?;
+        Ok(starlog.parent)
+    }
+
+    /// Generation of starlog `id`. Starlogs not in the graph yet are read
+    /// back to the nearest one that is, or to the root, and added.
+    pub fn generation(&mut self, id: &str) -> Result<u64, String> {
+        let mut chain = Vec::new();
+        let mut cursor = Some(id.to_string());
+        let mut generation = 0;
+        while let Some(hash) = cursor {
+            if let Some(node) = self.nodes.get(&hash) {
+                generation = node.generation;
+                break;
+            }
+            let parent = self.read_parent(&hash)?;
+            cursor = parent.clone();
+            chain.push((hash, parent));
+        }
+        for (hash, parent) in chain.into_iter().rev() {
+            generation += 1;
+            self.nodes.insert(hash.clone(), Node { parent, generation });
+            self.added.push(hash);
+        }
+        Ok(self.nodes[id].generation)
+    }
+
+    fn node(&self, id: &str) -> &Node {
+        &self.nodes[id]
+    }
+
+    /// Merge base of `ours` and `theirs` and how far each has moved past it.
+    /// Only the starlogs between the two tips and their merge base are
+    /// visited: the tip with the higher generation is walked back first,
+    /// then both together until they meet.
+    pub fn compare(&mut self, ours: &str, theirs: &str) -> Result<Divergence, String> {
+        self.generation(ours)?;
+        self.generation(theirs)?;
+        Ok(self.compare_known(ours, theirs))
+    }
+
+    /// `compare` for starlogs already in the graph.
+    fn compare_known(&self, ours: &str, theirs: &str) -> Divergence {
+        let (mut a, mut b) = (ours, theirs);
+        let (mut ahead, mut behind) = (0, 0);
+        while a != b {
+            let (node_a, node_b) = (self.node(a), self.node(b));
+            let step_a = node_a.generation >= node_b.generation;
+            let step_b = node_b.generation >= node_a.generation;
+            let next_a = if step_a {
+                node_a.parent.as_deref()
+            } else {
+                Some(a)
+            };
+            let next_b = if step_b {
+                node_b.parent.as_deref()
+            } else {
+                Some(b)
+            };
+            let (Some(next_a), Some(next_b)) = (next_a, next_b) else {
+                // Reached a root without meeting: unrelated histories
+                return Divergence {
+                    merge_base: None,
+                    ahead: self.node(ours).generation,
+                    behind: self.node(theirs).generation,
+                };
+            };
+            ahead += step_a as u64;
+            behind += step_b as u64;
+            (a, b) = (next_a, next_b);
+        }
+        Divergence {
+            merge_base: Some(a.to_string()),
+            ahead,
+            behind,
+        }
+    }
+
+    /// Appends the starlogs added since loading to the graph file.
+    pub fn save(&mut self) -> Result<(), String> {
+        if self.added.is_empty() {
+            return Ok(());
+        }
+        let mut lines = String::new();
+        if self.torn {
+            lines.push('\n');
+        }
+        for hash in &self.added {
+            let node = &self.nodes[hash];
+            let parent = node.parent.as_deref().unwrap_or("-");
+            lines.push_str(&format!("{} {} {}\n", hash, parent, node.generation));
+        }
+        let path = graph_path(&self.repo);
+        // One append per save, so concurrent savers never interleave lines
+        OpenOptions::new()
+            .create(true)
+            .append(true)
+            .open(&path)
+            .and_then(|mut file| file.write_all(lines.as_bytes()))
+            .map_err(|e| format!("Failed to write {}: {}", path.display(), e))?;
+        self.added.clear();
+        self.torn = false;
+        Ok(())
+    }
+}
+
+/// Divergence of `ours` from `theirs`, each a course name or starlog id.
+pub fn compare(repo: &Path, ours: &str, theirs: &str) -> Result<Divergence, String> {
+    let _span = trace::span("merge_base");
+    let ours = revision::resolve_starlog(repo, ours)?;
+    let theirs = revision::resolve_starlog(repo, theirs)?;
+    let mut graph = Graph::load(repo)?;
+    let divergence = graph.compare(&ours, &theirs)?;
+    graph.save()?;
+    Ok(divergence)
+}
+
+/// Every course with its tip (`None` before its first starlog) and its
+/// divergence from course `base` (`None` when either has no starlogs).
+pub fn course_divergence(
+    repo: &Path,
+    base: &str,
+) -> Result<Vec<(String, Option<String>, Option<Divergence>)>, String> {
+    let _span = trace::span("course_divergence");
+    let courses = refs::course_map(&reachability::helm_dir(repo))?;
+    let base_tip = courses
+        .get(base)
+        .ok_or_else(|| format!("Course {} does not exist", base))?
+        .clone();
+
+    let mut graph = Graph::load(repo)?;
+    for tip in courses.values().filter(|tip| !tip.is_empty()) {
+        graph.generation(tip)?;
+    }
+    graph.save()?;
+
+    // The graph is complete for every tip, so the walks run in parallel
+    let graph = &graph;
+    Ok(courses
+        .into_par_iter()
+        .map(|(course, tip)| {
+            let divergence = (!tip.is_empty() && !base_tip.is_empty())
+                .then(|| graph.compare_known(&tip, &base_tip));
+            (course, Some(tip).filter(|tip| !tip.is_empty()), divergence)
+        })
+        .collect())
+}
+
+fn divergence_dict<'py>(py: Python<'py>, divergence: &Divergence) -> PyResult<Bound<'py, PyDict>> {
+    let dict = PyDict::new(py);
+    dict.set_item("merge_base", &divergence.merge_base)?;
+    dict.set_item("ahead", divergence.ahead)?;
+    dict.set_item("behind", divergence.behind)?;
+    Ok(dict)
+}
+
+#[pyclass]
+pub struct Ancestry;
+
+#[pymethods]
+impl Ancestry {
+    /// Merge base of two courses or starlogs, or None for unrelated
+    /// histories.
+    #[staticmethod]
+    fn merge_base(py: Python<'_>, repo_path: &str, a: &str, b: &str) -> PyResult<Option<String>> {
+        py.allow_threads(|| compare(Path::new(repo_path), a, b))
+            .map(|divergence| divergence.merge_base)
+            .map_err(PyRuntimeError::new_err)
+    }
+
+    /// Starlogs in `a` but not in `b`, and in `b` but not in `a`.
+    #[staticmethod]
+    fn ahead_behind(py: Python<'_>, repo_path: &str, a: &str, b: &str) -> PyResult<(u64, u64)> {
+        py.allow_threads(|| compare(Path::new(repo_path), a, b))
+            .map(|divergence| (divergence.ahead, divergence.behind))
+            .map_err(PyRuntimeError::new_err)
+    }
+
+    /// Every course as a dict with `course`, `tip` and `divergence` from
+    /// `base` (a dict with `merge_base`, `ahead` and `behind`, or None when
+    /// either course has no starlogs), sorted by course.
+    #[staticmethod]
+    #[pyo3(signature = (repo_path, base="core"))]
+    fn courses(py: Python<'_>, repo_path: &str, base: &str) -> PyResult<Vec<PyObject>> {
+        let courses = py
+            .allow_threads(|| course_divergence(Path::new(repo_path), base))
+            .map_err(PyRuntimeError::new_err)?;
+        courses
+            .into_iter()
+            .map(|(course, tip, divergence)| {
+                let dict = PyDict::new(py);
+                dict.set_item("course", course)?;
+                dict.set_item("tip", tip)?;
+                match divergence {
+                    Some(divergence) => {
+                        dict.set_item("divergence", divergence_dict(py, &divergence)?)?
+                    }
+                    None => dict.set_item("divergence", py.None())?,
+                }
+                Ok(dict.into())
+            })
+            .collect()
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use serde_json::json;
+
+    /// Writes a starlog with `parent` and returns its id.
+    fn starlog(repo: &Path, parent: Option<&str>, message: &str) -> String {
+        let data = json!({"parent": parent, "message": message, "files": {}}).to_string();
+        let id =
+            crate::hashing::hash_bytes(crate::hashing::HashAlgorithm::Sha3_256, data.as_bytes());
+        let path = reachability::starlog_path(repo, &id);
+        fs::create_dir_all(path.parent().unwrap()).unwrap();
+        fs::write(path, data).unwrap();
+        id
+    }
+
+    fn chain(repo: &Path, from: Option<&str>, len: usize, name: &str) -> Vec<String> {
+        let mut ids: Vec<String> = Vec::new();
+        for i in 0..len {
+            let parent = ids.last().map(String::as_str).or(from);
+            let id = starlog(repo, parent, &format!("{} {}", name, i));
+            ids.push(id);
+        }
+        ids
+    }
+
+    #[test]
+    fn test_compare_finds_merge_base_and_counts() {
+        let dir = tempfile::tempdir().unwrap();
+        let repo = dir.path();
+        let core = chain(repo, None, 50, "core");
+        let feature = chain(repo, Some(&core[29]), 7, "feature");
+
+        let mut graph = Graph::load(repo).unwrap();
+        let divergence = graph.compare(&feature[6], &core[49]).unwrap();
+        assert_eq!(divergence.merge_base.as_deref(), Some(core[29].as_str()));
+        assert_eq!((divergence.ahead, divergence.behind), (7, 20));
+        assert_eq!(graph.generation(&feature[6]).unwrap(), 37);
+
+        let behind = graph.compare(&core[10], &core[49]).unwrap();
+        assert_eq!(behind.merge_base.as_deref(), Some(core[10].as_str()));
+        assert_eq!((behind.ahead, behind.behind), (0, 39));
+
+        let other = chain(repo, None, 3, "other");
+        let unrelated = graph.compare(&other[2], &core[4]).unwrap();
+        assert_eq!(unrelated.merge_base, None);
+        assert_eq!((unrelated.ahead, unrelated.behind), (3, 5));
+    }
+
+    #[test]
+    fn test_graph_file_is_reused_and_extended() {
+        let dir = tempfile::tempdir().unwrap();
+        let repo = dir.path();
+        let core = chain(repo, None, 20, "core");
+
+        let mut graph = Graph::load(repo).unwrap();
+        assert_eq!(graph.generation(&core[19]).unwrap(), 20);
+        graph.save().unwrap();
+
+        // Known starlogs are no longer read
+        fs::remove_file(reachability::starlog_path(repo, &core[5])).unwrap();
+        let more = chain(repo, Some(&core[19]), 2, "more");
+        let mut graph = Graph::load(repo).unwrap();
+        assert_eq!(graph.generation(&more[1]).unwrap(), 22);
+        assert_eq!(graph.compare(&core[3], &more[1]).unwrap().behind, 18);
+        graph.save().unwrap();
+
+        let lines = fs::read_to_string(graph_path(repo)).unwrap();
+        assert_eq!(lines.lines().count(), 22);
+    }
+
+    #[test]
+    fn test_graph_skips_torn_and_inconsistent_lines() {
+        let dir = tempfile::tempdir().unwrap();
+        let repo = dir.path();
+        let core = chain(repo, None, 12, "core");
+        let mut lines = String::new();
+        for (i, id) in core.iter().enumerate().take(10) {
+            let parent = if i == 0 { "-" } else { core[i - 1].as_str() };
+            lines.push_str(&format!("{} {} {}\n", id, parent, i + 1));
+        }
+        // A generation that does not follow its parent's, then a line whose
+        // generation 12 was cut to 1 by a crash
+        lines.push_str(&format!("{} {} 7\n", core[10], core[9]));
+        lines.push_str(&format!("{} {} 1", core[11], core[10]));
+        fs::write(graph_path(repo), &lines).unwrap();
+
+        let mut graph = Graph::load(repo).unwrap();
+        assert_eq!(graph.nodes.len(), 10);
+        assert_eq!(graph.generation(&core[11]).unwrap(), 12);
+        graph.save().unwrap();
+
+        let graph = Graph::load(repo).unwrap();
+        assert_eq!(graph.nodes.len(), 12);
+        assert_eq!(graph.node(&core[10]).generation, 11);
+        assert_eq!(graph.node(&core[11]).generation, 12);
+    }
+}
@@ -1,44 +1,61 @@
+use pyo3::exceptions::PyRuntimeError;
 use pyo3::prelude::*;
-use sha3::{Digest, Sha3_256};
-use std::fs::{self, File};
+use std::fs::File;
 use std::io::Read;
 use std::path::Path;
 
+use crate::chunking;
+use crate::hashing;
+use crate::repo_config;
+use crate::trace::{self, Counter};
+
+/// Stores the file at `file_path` (relative to `repo` or absolute) as a
+/// blob and returns its id.
+pub fn store_file(repo: &Path, file_path: &str) -> Result<String, String> {
+    let _span = trace::span("save_blob");
+    let full_path = repo.join(file_path);
+    let err = |e: std::io::Error| format!("Failed to read {}: {}", full_path.display(), e);
+    let mut file = File::open(&full_path).map_err(err)?;
+
+    let config = repo_config::core_config(repo)?;
+    let algorithm = hashing::HashAlgorithm::from_format_version(config.format_version)?;
+
+    // Large files are stored as deduplicated chunks
+    let size = file.metadata().map_err(err)?.len();
+    if config.chunk_threshold > 0 && size >= config.chunk_threshold {
+        return chunking::save_chunked(repo, algorithm, &full_path);
+    }
+
+    let mut contents = Vec::new();
+    file.read_to_end(&mut contents).map_err(err)?;
+    let hash = hashing::hash_bytes(algorithm, &contents);
+
+    // Objects are content-addressed, so an existing one is already correct
+    if chunking::blob_exists(repo, &hash) {
+        trace::add(Counter::ObjectsSkipped, 1);
+        return Ok(hash);
+    }
+    chunking::put_object(repo, &hash, &contents)?;
+
+    Ok(hash)
+}
+
 #[pyclass]
 pub struct Blob;
 
 #[pymethods]
 impl Blob {
     #[staticmethod]
-    fn read_blob(repo_path: &str, hash: &str) -> PyResult<Vec<u8>> {
-        let (subdir, filename) = hash.split_at(2);
-        let obj_path = Path::new(repo_path).join(".dock").join("objects");
-        let file_path = Path::new(&obj_path).join(subdir).join(filename);
-        let contents = fs::read(file_path)?;
+    pub fn read_blob(repo_path: &str, hash: &str) -> PyResult<Vec<u8>> {
+        // Chunked blobs are reassembled
+        let mut contents = Vec::new();
+        chunking::copy_blob_to(Path::new(repo_path), hash, &mut contents)
+            .map_err(PyRuntimeError::new_err)?;
         Ok(contents)
     }
 
     #[staticmethod]
-    fn save_blob(repo_path: &str, file_path: &str) -> PyResult<String> {
-        let full_path = Path::new(repo_path).join(file_path);
-        let mut file = File::open(&full_path)?;
-        let mut contents = Vec::new();
-        file.read_to_end(&mut contents)?;
-
-        // Hash the contents
-        let mut hasher = Sha3_256::new();
-        hasher.update(&contents);
-        let hash = format!("{:x}", hasher.finalize());
-
-        let (subdir, filename) = hash.split_at(2);
-        let obj_path = Path::new(repo_path).join(".dock").join("objects");
-        let dir_path = Path::new(&obj_path).join(subdir);
-        fs::create_dir_all(&dir_path)?;
-        let file_path = dir_path.join(filename);
-
-        // Write to objects directory
-        fs::write(file_path, contents)?;
-
-        Ok(hash)
+    pub fn save_blob(repo_path: &str, file_path: &str) -> PyResult<String> {
+        store_file(Path::new(repo_path), file_path).map_err(PyRuntimeError::new_err)
     }
 }
@@ -0,0 +1,350 @@
+use serde::{Deserialize, Serialize};
+use std::fs;
+use std::io::{Read, Write};
+use std::path::{Path, PathBuf};
+
+use crate::alternates;
+use crate::hashing::{self, HashAlgorithm, Hasher};
+use crate::object_store::{self, ObjectStore};
+use crate::trace::{self, Counter};
+
+/// Chunk manifests live next to whole blobs, at the blob's path plus this
+/// suffix, so a blob id resolves to exactly one of the two.
+pub const MANIFEST_SUFFIX: &str = ".chunks";
+
+pub const MIN_CHUNK: usize = 64 * 1024;
+pub const AVG_CHUNK: usize = 256 * 1024;
+pub const MAX_CHUNK: usize = 1024 * 1024;
+
+// FastCDC normalized chunking: a stricter mask before the average size and
+// a looser one after it keeps chunk sizes close to AVG_CHUNK. The gear hash
+// shifts left, so only its high bits cover the whole 64-byte window.
+const MASK_STRICT: u64 = !0u64 << (64 - 20);
+const MASK_LOOSE: u64 = !0u64 << (64 - 16);
+
+const fn gear_table() -> [u64; 256] {
+    // splitmix64, so the table (and every chunk boundary) is fixed forever
+    let mut table = [0u64; 256];
+    let mut state: u64 = 0x9e37_79b9_7f4a_7c15;
+    let mut i = 0;
+    while i < 256 {
+        state = state.wrapping_add(0x9e37_79b9_7f4a_7c15);
+        let mut z = state;
+        z = (z ^ (z >> 30)).wrapping_mul(0xbf58_476d_1ce4_e5b9);
+        z = (z ^ (z >> 27)).wrapping_mul(0x94d0_49bb_1331_11eb);
+        table[i] = z ^ (z >> 31);
+        i += 1;
+    }
+    table
+}
+
+static GEAR: [u64; 256] = gear_table();
+
+/// Length of the first chunk of `data`, which holds at least one chunk's
+/// worth of bytes unless the input is exhausted.
+fn cut_point(data: &[u8]) -> usize {
+    if data.len() <= MIN_CHUNK {
+        return data.len();
+    }
+    let end = data.len().min(MAX_CHUNK);
+    let normal = AVG_CHUNK.min(end);
+    let mut h: u64 = 0;
+    let mut i = MIN_CHUNK;
+    while i < normal {
+        h = (h << 1).wrapping_add(GEAR[data[i] as usize]);
+        if h & MASK_STRICT == 0 {
+            return i + 1;
+        }
+        i += 1;
+    }
+    while i < end {
+        h = (h << 1).wrapping_add(GEAR[data[i] as usize]);
+        if h & MASK_LOOSE == 0 {
+            return i + 1;
+        }
+        i += 1;
+    }
+    end
+}
+
+/// Streams `reader` through the content-defined chunker, calling `f` with
+/// each chunk in order. At most two maximum-size chunks are held in memory.
+pub fn for_each_chunk<R: Read>(
+    mut reader: R,
+    mut f: impl FnMut(&[u8]) -> Result<(), String>,
+) -> Result<(), String> {
+    let mut buf = vec![0u8; 2 * MAX_CHUNK];
+    let (mut start, mut end, mut eof) = (0, 0, false);
+    loop {
+        if !eof && end - start < MAX_CHUNK {
+            buf.copy_within(start..end, 0);
+            end -= start;
+            start = 0;
+            while end < buf.len() {
+                let n = reader
+                    .read(&mut buf[end..])
+                    .map_err(|e| format!("Failed to read file: {}", e))?;
+                if n == 0 {
+                    eof = true;
+                    break;
+                }
+                end += n;
+            }
+        }
+        if start == end {
+            return Ok(());
+        }
+        let len = cut_point(&buf[start..end]);
+        f(&buf[start..start + len])?;
+        start += len;
+    }
+}
+
+#[derive(Serialize, Deserialize, Debug, Clone, PartialEq, Eq)]
+pub struct ChunkRef {
+    pub hash: String,
+    pub size: u64,
+}
+
+/// Stored in place of a large blob: the blob id is still the hash of the
+/// whole content, so scans compare files exactly as for whole blobs.
+#[derive(Serialize, Deserialize, Debug, Clone, PartialEq, Eq)]
+pub struct Manifest {
+    pub size: u64,
+    pub chunks: Vec<ChunkRef>,
+}
+
+/// `ab/cdef...`, the path of object key `hash` in a loose store.
+pub(crate) fn fanout(hash: &str) -> PathBuf {
+    let (subdir, filename) = hash.split_at(2);
+    Path::new(subdir).join(filename)
+}
+
+/// Where `hash` is written in the spacedock's own loose store.
+pub fn object_path(repo: &Path, hash: &str) -> PathBuf {
+    alternates::objects_dir(repo).join(fanout(hash))
+}
+
+pub fn manifest_path(repo: &Path, hash: &str) -> PathBuf {
+    let mut path = object_path(repo, hash).into_os_string();
+    path.push(MANIFEST_SUFFIX);
+    PathBuf::from(path)
+}
+
+/// Where object `hash` can be read in a loose store, its own or an
+/// alternate.
+pub fn find_object(repo: &Path, hash: &str) -> Option<PathBuf> {
+    alternates::find(repo, &fanout(hash))
+}
+
+/// Object store key of the chunk manifest of blob `hash`.
+pub fn manifest_key(hash: &str) -> String {
+    format!("{}{}", hash, MANIFEST_SUFFIX)
+}
+
+/// Whether `hash` is stored, either whole or as a chunk manifest.
+pub fn blob_exists(repo: &Path, hash: &str) -> bool {
+    object_store::open(repo)
+        .is_ok_and(|store| store.contains(hash) || store.contains(&manifest_key(hash)))
+}
+
+/// Contents of object `hash` (a tree, chunk or whole blob).
+pub fn read_object(repo: &Path, hash: &str) -> Result<Vec<u8>, String> {
+    object_store::open(repo)?
+        .read(hash)?
+        .ok_or_else(|| format!("Object {} missing in object store", hash))
+}
+
+pub fn read_manifest(repo: &Path, hash: &str) -> Result<Option<Manifest>, String> {
+    let Some(contents) = object_store::open(repo)?.read(&manifest_key(hash))? else {
+        return Ok(None);
+    };
+    serde_json::from_slice(&contents)
+        .map(Some)
+        .map_err(|e| format!("Failed to parse manifest {}: {}", hash, e))
+}
+
+/// Stores `data` as object `key` unless it is already stored.
+pub fn put_object(repo: &Path, key: &str, data: &[u8]) -> Result<(), String> {
+    put_into(&*object_store::open(repo)?, key, data)
+}
+
+/// `put_object` into an already opened store.
+pub fn put_into(store: &dyn ObjectStore, key: &str, data: &[u8]) -> Result<(), String> {
+    let written = store.write(key, data)?;
+    let counter = if written {
+        Counter::ObjectsWritten
+    } else {
+        Counter::ObjectsSkipped
+    };
+    trace::add(counter, 1);
+    Ok(())
+}
+
+/// Writes `data` to `path` through a synced temporary file in the same
+/// directory that is then renamed into place. `path` is either missing or
+/// whole, even after a crash, so a file that exists is never half written
+/// and skipping existing objects is safe.
+pub fn write_atomic(path: &Path, data: &[u8]) -> Result<(), String> {
+    let err = |e: std::io::Error| format!("Failed to write {}: {}", path.display(), e);
+    let dir = path.parent().unwrap_or(Path::new("."));
+    fs::create_dir_all(dir).map_err(err)?;
+    let mut tmp = tempfile::NamedTempFile::new_in(dir).map_err(err)?;
+    tmp.write_all(data).map_err(err)?;
+    tmp.as_file().sync_all().map_err(err)?;
+    tmp.persist(path).map_err(|e| err(e.error))?;
+    Ok(())
+}
+
+/// Writes `data` to the file `path` unless it already exists; for stores
+/// that are files in every backend, such as starlogs.
+pub fn write_object(path: &Path, data: &[u8]) -> Result<(), String> {
+    if path.exists() {
+        trace::add(Counter::ObjectsSkipped, 1);
+        return Ok(());
+    }
+    write_atomic(path, data)?;
+    trace::add(Counter::ObjectsWritten, 1);
+    Ok(())
+}
+
+/// Splits the file at `path` into chunk objects and records it as a
+/// manifest. Only chunks not already in the store are written, so storing a
+/// new version of a large file costs its changed regions, not its size.
+pub fn save_chunked(repo: &Path, algorithm: HashAlgorithm, path: &Path) -> Result<String, String> {
+    let file =
+        fs::File::open(path).map_err(|e| format!("Failed to open {}: {}", path.display(), e))?;
+    save_chunked_from(repo, algorithm, file)
+}
+
+/// `save_chunked` for content that is not in a file.
+pub fn save_chunked_from(
+    repo: &Path,
+    algorithm: HashAlgorithm,
+    reader: impl Read,
+) -> Result<String, String> {
+    let _span = trace::span("save_chunked");
+    let mut whole = Hasher::new(algorithm);
+    let mut manifest = Manifest {
+        size: 0,
+        chunks: Vec::new(),
+    };
+    for_each_chunk(reader, |chunk| {
+        whole.update(chunk);
+        let hash = hashing::hash_bytes(algorithm, chunk);
+        put_object(repo, &hash, chunk)?;
+        manifest.size += chunk.len() as u64;
+        manifest.chunks.push(ChunkRef {
+            hash,
+            size: chunk.len() as u64,
+        });
+        Ok(())
+    })?;
+
+    let hash = whole.finalize();
+    if !blob_exists(repo, &hash) {
+        let json = serde_json::to_vec(&manifest)
+            .map_err(|e| format!("Failed to serialize manifest: {}", e))?;
+        put_object(repo, &manifest_key(&hash), &json)?;
+    } else {
+        trace::add(Counter::ObjectsSkipped, 1);
+    }
+    Ok(hash)
+}
+
+/// Size of the content of blob `hash`, without reading it.
+pub fn blob_size(repo: &Path, hash: &str) -> Result<u64, String> {
+    if let Some(size) = object_store::open(repo)?.size(hash)? {
+        return Ok(size);
+    }
+    match read_manifest(repo, hash)? {
+        Some(manifest) => Ok(manifest.size),
+        None => Err(format!("Blob {} missing in object store", hash)),
+    }
+}
+
+/// Streams the content of blob `hash` into `out`, reassembling chunked
+/// blobs one chunk at a time.
+pub fn copy_blob_to(repo: &Path, hash: &str, out: &mut impl Write) -> Result<u64, String> {
+    let store = object_store::open(repo)?;
+    if let Some(written) = store.copy_to(hash, &mut *out)? {
+        return Ok(written);
+    }
+    let Some(manifest) = read_manifest(repo, hash)? else {
+        return Err(format!("Blob {} missing in object store", hash));
+    };
+    let mut written = 0;
+    for chunk in &manifest.chunks {
+        written += store
+            .copy_to(&chunk.hash, &mut *out)?
+            .ok_or_else(|| format!("Chunk {} of blob {} missing", chunk.hash, hash))?;
+    }
+    Ok(written)
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn pseudo_random(len: usize, seed: u64) -> Vec<u8> {
+        let mut state = seed;
+        (0..len)
+            .map(|_| {
+                state ^= state << 13;
+                state ^= state >> 7;
+                state ^= state << 17;
+                state as u8
+            })
+            .collect()
+    }
+
+    fn chunks_of(data: &[u8]) -> Vec<Vec<u8>> {
+        let mut chunks = Vec::new();
+        for_each_chunk(data, |c| {
+            chunks.push(c.to_vec());
+            Ok(())
+        })
+        .unwrap();
+        chunks
+    }
+
+    #[test]
+    fn test_chunks_cover_input_within_bounds() {
+        let data = pseudo_random(5 * MAX_CHUNK + 123, 7);
+        let chunks = chunks_of(&data);
+        assert_eq!(chunks.concat(), data);
+        for chunk in &chunks[..chunks.len() - 1] {
+            assert!(chunk.len() >= MIN_CHUNK && chunk.len() <= MAX_CHUNK);
+        }
+    }
+
+    #[test]
+    fn test_insertion_only_changes_nearby_chunks() {
+        let data = pseudo_random(8 * MAX_CHUNK, 11);
+        let mut edited = data.clone();
+        edited.splice(MAX_CHUNK..MAX_CHUNK, b"inserted bytes".iter().copied());
+
+        let before = chunks_of(&data);
+        let after = chunks_of(&edited);
+        let shared = after.iter().filter(|c| before.contains(c)).count();
+        assert!(shared + 3 >= after.len());
+    }
+
+    #[test]
+    fn test_save_chunked_round_trips() {
+        let dir = tempfile::tempdir().unwrap();
+        let repo = dir.path();
+        let data = pseudo_random(3 * MAX_CHUNK, 3);
+        let path = repo.join("big.bin");
+        fs::write(&path, &data).unwrap();
+
+        let hash = save_chunked(repo, HashAlgorithm::Sha3_256, &path).unwrap();
+        assert_eq!(hash, hashing::hash_bytes(HashAlgorithm::Sha3_256, &data));
+        assert!(!object_path(repo, &hash).exists());
+        assert!(manifest_path(repo, &hash).exists());
+
+        let mut out = Vec::new();
+        copy_blob_to(repo, &hash, &mut out).unwrap();
+        assert_eq!(out, data);
+    }
+}
@@ -0,0 +1,179 @@
+use pyo3::exceptions::PyRuntimeError;
+use pyo3::prelude::*;
+use pyo3::types::PyDict;
+use rayon::prelude::*;
+use std::fs;
+use std::io;
+use std::path::Path;
+
+use crate::alternates;
+use crate::object_store;
+use crate::reachability::{self, list_loose};
+use crate::refs;
+use crate::repo_config::CONFIG_FILE;
+use crate::trace;
+
+#[derive(Default, Debug, Clone, Copy, PartialEq, Eq)]
+pub struct CloneReport {
+    /// Objects and starlogs shared with the source through hardlinks.
+    pub linked: u64,
+    /// Objects and starlogs copied because linking failed, e.g. across
+    /// filesystems.
+    pub copied: u64,
+    pub bytes_copied: u64,
+    pub courses: u64,
+}
+
+/// Hardlinks `src` to `dst`, falling back to a copy. `fs::copy` uses
+/// `copy_file_range` on Linux, which reflinks on filesystems that support
+/// it. Returns whether the file was linked.
+fn link_or_copy(src: &Path, dst: &Path) -> Result<bool, String> {
+    match fs::hard_link(src, dst) {
+        Ok(()) => Ok(true),
+        // Objects are immutable, so an existing file already has the content
+        Err(e) if e.kind() == io::ErrorKind::AlreadyExists => Ok(true),
+        Err(_) => fs::copy(src, dst)
+            .map(|_| false)
+            .map_err(|e| format!("Failed to copy {}: {}", src.display(), e)),
+    }
+}
+
+/// Shares every file of the fan-out store `src` with `dst`; returns
+/// `(linked, copied, bytes copied)`.
+fn clone_store(src: &Path, dst: &Path) -> Result<(u64, u64, u64), String> {
+    list_loose(src)
+        .par_iter()
+        .map(|loose| {
+            let rel = loose
+                .path
+                .strip_prefix(src)
+                .map_err(|e| format!("Unexpected object path: {}", e))?;
+            let target = dst.join(rel);
+            if let Some(parent) = target.parent() {
+                fs::create_dir_all(parent)
+                    .map_err(|e| format!("Failed to create {}: {}", parent.display(), e))?;
+            }
+            if link_or_copy(&loose.path, &target)? {
+                Ok((1, 0, 0))
+            } else {
+                Ok((0, 1, loose.size))
+            }
+        })
+        .try_reduce(|| (0, 0, 0), |a, b| Ok((a.0 + b.0, a.1 + b.1, a.2 + b.2)))
+}
+
+/// Fills the freshly started spacedock at `dst` from the one at `src`:
+/// objects and starlogs are hardlinked, course refs, config and HELM are
+/// copied. The working tree is left for the caller to check out.
+pub fn clone_local(src: &Path, dst: &Path) -> Result<CloneReport, String> {
+    let _span = trace::span("clone");
+    object_store::require_loose(src, "start --from")?;
+    let src_dock = src.join(".dock");
+    let dst_dock = dst.join(".dock");
+    let mut report = CloneReport::default();
+
+    for store in ["objects", "starlogs"] {
+        let (linked, copied, bytes) = clone_store(&src_dock.join(store), &dst_dock.join(store))?;
+        report.linked += linked;
+        report.copied += copied;
+        report.bytes_copied += bytes;
+    }
+
+    // Objects the source reads from alternates are not linked above
+    for dir in alternates::alternates(src).iter() {
+        alternates::add_alternate(dst, dir)?;
+    }
+
+    let src_helm = reachability::helm_dir(src);
+    let dst_helm = reachability::helm_dir(dst);
+    fs::create_dir_all(&dst_helm).map_err(|e| format!("Failed to create courses: {}", e))?;
+    let entries = fs::read_dir(&src_helm).map_err(|e| format!("Failed to list courses: {}", e))?;
+    for entry in entries.flatten() {
+        let name = entry.file_name();
+        if entry.file_type().is_ok_and(|t| t.is_file())
+            && !refs::is_lock_file(&name.to_string_lossy())
+        {
+            fs::copy(entry.path(), dst_helm.join(&name))
+                .map_err(|e| format!("Failed to copy course: {}", e))?;
+            report.courses += 1;
+        }
+    }
+    let src_packed = refs::packed_courses_path(&src_helm);
+    if src_packed.is_file() {
+        fs::copy(&src_packed, refs::packed_courses_path(&dst_helm))
+            .map_err(|e| format!("Failed to copy courses: {}", e))?;
+        report.courses = refs::course_map(&dst_helm)?.len() as u64;
+    }
+
+    // Copied rather than linked: both may be edited in either spacedock
+    for name in [CONFIG_FILE, "HELM"] {
+        let path = src_dock.join(name);
+        if path.exists() {
+            fs::copy(&path, dst_dock.join(name))
+                .map_err(|e| format!("Failed to copy {}: {}", name, e))?;
+        }
+    }
+    Ok(report)
+}
+
+#[pyclass]
+pub struct LocalClone;
+
+#[pymethods]
+impl LocalClone {
+    /// Fill the new spacedock at `dst_repo` from the one at `src_repo`;
+    /// returns the report as a dict.
+    #[staticmethod]
+    fn run(py: Python<'_>, src_repo: &str, dst_repo: &str) -> PyResult<PyObject> {
+        let report = py
+            .allow_threads(|| clone_local(Path::new(src_repo), Path::new(dst_repo)))
+            .map_err(PyRuntimeError::new_err)?;
+
+        let dict = PyDict::new(py);
+        dict.set_item("linked", report.linked)?;
+        dict.set_item("copied", report.copied)?;
+        dict.set_item("bytes_copied", report.bytes_copied)?;
+        dict.set_item("courses", report.courses)?;
+        Ok(dict.into())
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use crate::chunking::object_path;
+
+    #[test]
+    fn test_clone_links_objects_and_copies_refs() {
+        let src = tempfile::tempdir().unwrap();
+        let dst = tempfile::tempdir().unwrap();
+        let blob = object_path(src.path(), "aa01");
+        fs::create_dir_all(blob.parent().unwrap()).unwrap();
+        fs::write(&blob, "blob").unwrap();
+        let starlog = reachability::starlog_path(src.path(), "bb02");
+        fs::create_dir_all(starlog.parent().unwrap()).unwrap();
+        fs::write(&starlog, "{}").unwrap();
+        fs::create_dir_all(reachability::helm_dir(src.path())).unwrap();
+        fs::write(reachability::helm_dir(src.path()).join("core"), "bb02").unwrap();
+        fs::write(src.path().join(".dock/HELM"), "link: links/helm/core\n").unwrap();
+
+        let report = clone_local(src.path(), dst.path()).unwrap();
+        assert_eq!(report.linked + report.copied, 2);
+        assert_eq!(report.courses, 1);
+        assert_eq!(fs::read(object_path(dst.path(), "aa01")).unwrap(), b"blob");
+        assert_eq!(
+            fs::read_to_string(reachability::helm_dir(dst.path()).join("core")).unwrap(),
+            "bb02"
+        );
+
+        #[cfg(unix)]
+        {
+            use std::os::unix::fs::MetadataExt;
+            let ino = |p: &Path| fs::metadata(p).unwrap().ino();
+            assert_eq!(ino(&blob), ino(&object_path(dst.path(), "aa01")));
+        }
+
+        // A second run finds everything in place
+        assert!(clone_local(src.path(), dst.path()).is_ok());
+    }
+}
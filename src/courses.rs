@@ -1,8 +1,8 @@
+use crate::refs;
 use crate::spacedock::Spacedock;
 use crate::starlog::Starlog;
 use pyo3::{exceptions::PyRuntimeError, prelude::*};
-use std::{fs, path::PathBuf};
-use walkdir::WalkDir;
+use std::{fs, path::Path};
 
 #[pyclass]
 pub struct Courses;
@@ -21,21 +21,9 @@ impl Courses {
 impl Courses {
     #[staticmethod]
     pub fn list_all(dir_path: &str) -> Vec<String> {
-        let files = WalkDir::new(dir_path)
-            .min_depth(1)
-            .max_depth(1)
-            .into_iter()
-            .filter_map(|entry| {
-                entry.ok().and_then(|e| {
-                    if e.file_type().is_file() {
-                        e.file_name().to_str().map(|s| s.to_string())
-                    } else {
-                        None
-                    }
-                })
-            })
-            .collect();
-        files
+        refs::course_map(Path::new(dir_path))
+            .map(|courses| courses.into_keys().collect())
+            .unwrap_or_default()
     }
 
     #[staticmethod]
@@ -56,32 +44,28 @@ impl Courses {
     #[staticmethod]
     pub fn check_course_existence(course: &str) -> bool {
         let helm_path = Spacedock::get_path_info_internal("helm_d");
-        let courses = Courses::list_all(helm_path.unwrap().path.to_string().as_str());
-
-        courses.iter().any(|key| key == course)
+        refs::course_tip(Path::new(helm_path.unwrap().path), course).is_ok_and(|tip| tip.is_some())
     }
 
     #[staticmethod]
     pub fn get_latest_starlog_hash(course: &str) -> PyResult<String> {
         let helm_path = Spacedock::get_path_info_internal("helm_d");
-        let course_path = PathBuf::from(helm_path.unwrap().path).join(course);
-        let hash = std::fs::read_to_string(course_path).map_err(|e| {
+        let hash = refs::course_tip(Path::new(helm_path.unwrap().path), course).map_err(|e| {
             PyRuntimeError::new_err(format!(
                 "Failed to read the latest starlog hash of the course {}",
                 e
             ))
         })?;
-        Ok(hash)
+        hash.ok_or_else(|| PyRuntimeError::new_err(format!("Course {} does not exist", course)))
     }
 
     #[staticmethod]
     pub fn create_course(name: &str) -> PyResult<()> {
         if let Some(course_dir) = Spacedock::get_path_info_internal("helm_d") {
-            let course_path = PathBuf::from(course_dir.path).join(name);
             match Starlog::get_latest_starlog_hash_internal() {
                 Ok(latest_starlog_hash) => {
-                    fs::write(course_path, latest_starlog_hash)?;
-                    Ok(())
+                    refs::create_course(Path::new(course_dir.path), name, &latest_starlog_hash)
+                        .map_err(PyRuntimeError::new_err)
                 }
                 Err(msg) => Err(pyo3::exceptions::PyRuntimeError::new_err(msg)),
             }
@@ -108,14 +92,8 @@ impl Courses {
             }
             // delete name course
             if let Some(course_dir) = Spacedock::get_path_info_internal("helm_d") {
-                let course_path = PathBuf::from(course_dir.path).join(name);
-                match fs::remove_file(course_path) {
-                    Ok(()) => Ok(()),
-                    Err(msg) => Err(pyo3::exceptions::PyRuntimeError::new_err(format!(
-                        "{:?}",
-                        msg
-                    ))),
-                }
+                refs::delete_course(Path::new(course_dir.path), name)
+                    .map_err(PyRuntimeError::new_err)
             } else {
                 Err(pyo3::exceptions::PyRuntimeError::new_err(
                     "Cannot get course directory path",
@@ -0,0 +1,154 @@
+use pyo3::exceptions::PyRuntimeError;
+use pyo3::prelude::*;
+use pyo3::types::PyDict;
+use rayon::prelude::*;
+use std::fs;
+use std::path::Path;
+
+use crate::alternates;
+use crate::object_store;
+use crate::reachability::list_loose;
+use crate::trace;
+
+#[derive(Default, Debug, Clone, Copy, PartialEq, Eq)]
+pub struct DedupeReport {
+    /// Objects the shared store did not have yet.
+    pub objects_moved: u64,
+    /// Local copies dropped because the shared store already had them.
+    pub objects_removed: u64,
+    pub bytes_freed: u64,
+}
+
+/// Puts `src` at `dst`: a rename on the same filesystem, otherwise a copy
+/// to a temporary name renamed into place so readers never see a partial
+/// object.
+fn move_object(src: &Path, dst: &Path) -> Result<(), String> {
+    if let Some(parent) = dst.parent() {
+        fs::create_dir_all(parent)
+            .map_err(|e| format!("Failed to create {}: {}", parent.display(), e))?;
+    }
+    if fs::rename(src, dst).is_ok() {
+        return Ok(());
+    }
+    let mut tmp = dst.as_os_str().to_owned();
+    tmp.push(format!(".tmp-{}", std::process::id()));
+    fs::copy(src, &tmp)
+        .and_then(|_| fs::rename(&tmp, dst))
+        .map_err(|e| {
+            let _ = fs::remove_file(&tmp);
+            format!("Failed to move {}: {}", src.display(), e)
+        })?;
+    fs::remove_file(src).map_err(|e| format!("Failed to remove {}: {}", src.display(), e))
+}
+
+/// Moves every object of the spacedock at `repo` into the shared store
+/// `shared` and lists it as an alternate. Objects the shared store already
+/// has are removed locally, so running this in each spacedock of a host
+/// leaves one copy of each object. Starlogs stay local.
+pub fn dedupe(repo: &Path, shared: &Path) -> Result<DedupeReport, String> {
+    let _span = trace::span("dedupe");
+    object_store::require_loose(repo, "dedupe")?;
+    fs::create_dir_all(shared)
+        .map_err(|e| format!("Failed to create {}: {}", shared.display(), e))?;
+    let shared = shared
+        .canonicalize()
+        .map_err(|e| format!("Failed to resolve {}: {}", shared.display(), e))?;
+    let objects = alternates::objects_dir(repo);
+    if objects.canonicalize().ok().as_deref() == Some(shared.as_path()) {
+        return Err("The shared store is this spacedock's own object store".to_string());
+    }
+
+    // Listed first, so every object stays readable while it moves
+    alternates::add_alternate(repo, &shared)?;
+
+    list_loose(&objects)
+        .par_iter()
+        .map(|loose| {
+            let rel = loose
+                .path
+                .strip_prefix(&objects)
+                .map_err(|e| format!("Unexpected object path: {}", e))?;
+            let target = shared.join(rel);
+            match fs::metadata(&target) {
+                // Content-addressed, so a same-sized copy is the same object
+                Ok(meta) if meta.len() == loose.size => {
+                    fs::remove_file(&loose.path)
+                        .map_err(|e| format!("Failed to remove {}: {}", loose.path.display(), e))?;
+                    Ok((0, 1, loose.size))
+                }
+                Ok(_) => Err(format!(
+                    "{} differs from the shared copy; run `ruxpy fsck`",
+                    loose.id
+                )),
+                Err(_) => {
+                    move_object(&loose.path, &target)?;
+                    Ok((1, 0, 0))
+                }
+            }
+        })
+        .try_reduce(|| (0, 0, 0), |a, b| Ok((a.0 + b.0, a.1 + b.1, a.2 + b.2)))
+        .map(
+            |(objects_moved, objects_removed, bytes_freed)| DedupeReport {
+                objects_moved,
+                objects_removed,
+                bytes_freed,
+            },
+        )
+}
+
+#[pyclass]
+pub struct Dedupe;
+
+#[pymethods]
+impl Dedupe {
+    /// Move the objects of the spacedock at `repo_path` into `shared_dir`;
+    /// returns the report as a dict.
+    #[staticmethod]
+    fn run(py: Python<'_>, repo_path: &str, shared_dir: &str) -> PyResult<PyObject> {
+        let report = py
+            .allow_threads(|| dedupe(Path::new(repo_path), Path::new(shared_dir)))
+            .map_err(PyRuntimeError::new_err)?;
+
+        let dict = PyDict::new(py);
+        dict.set_item("objects_moved", report.objects_moved)?;
+        dict.set_item("objects_removed", report.objects_removed)?;
+        dict.set_item("bytes_freed", report.bytes_freed)?;
+        Ok(dict.into())
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use crate::chunking::{self, object_path};
+
+    fn write_object(repo: &Path, hash: &str, contents: &str) {
+        let path = object_path(repo, hash);
+        fs::create_dir_all(path.parent().unwrap()).unwrap();
+        fs::write(path, contents).unwrap();
+    }
+
+    #[test]
+    fn test_dedupe_keeps_one_copy_readable_from_both() {
+        let first = tempfile::tempdir().unwrap();
+        let second = tempfile::tempdir().unwrap();
+        let shared = tempfile::tempdir().unwrap();
+        write_object(first.path(), "aa01", "common");
+        write_object(second.path(), "aa01", "common");
+        write_object(second.path(), "bb02", "unique");
+
+        let report = dedupe(first.path(), shared.path()).unwrap();
+        assert_eq!(report.objects_moved, 1);
+        let report = dedupe(second.path(), shared.path()).unwrap();
+        assert_eq!(report.objects_moved, 1);
+        assert_eq!(report.objects_removed, 1);
+        assert_eq!(report.bytes_freed, "common".len() as u64);
+
+        for repo in [first.path(), second.path()] {
+            assert!(!object_path(repo, "aa01").exists());
+            let found = chunking::find_object(repo, "aa01").unwrap();
+            assert_eq!(fs::read_to_string(found).unwrap(), "common");
+        }
+        assert!(chunking::find_object(first.path(), "bb02").is_some());
+    }
+}
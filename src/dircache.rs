@@ -0,0 +1,304 @@
+use ignore::gitignore::{Gitignore, GitignoreBuilder};
+use serde::{Deserialize, Serialize};
+use std::collections::HashMap;
+use std::fs;
+use std::io::Write;
+use std::path::{Path, PathBuf};
+use std::sync::Mutex;
+use std::time::{SystemTime, UNIX_EPOCH};
+
+use crate::hashing::{self, HashAlgorithm};
+use crate::trace::{self, Counter};
+use crate::walker::{is_internal_name, DOCKIGNORE};
+
+/// Cache file under `.dock/` holding per-directory listings.
+pub const DIRCACHE_FILE: &str = "dircache";
+const DIRCACHE_VERSION: u32 = 1;
+
+/// The last cache read or written by this process, with the mtime of the
+/// file it came from, so a resident server skips re-parsing it.
+static RESIDENT: Mutex<Option<(PathBuf, u64, DirCache)>> = Mutex::new(None);
+
+/// Directories modified this close to the moment they were listed are
+/// re-read next time, since a coarse mtime may hide a later change.
+const RACY_WINDOW_NS: u64 = 2_000_000_000;
+
+#[derive(Serialize, Deserialize)]
+struct CachedDir {
+    mtime_ns: u64,
+    ignore_hash: String,
+    files: Vec<String>,
+    subdirs: Vec<String>,
+}
+
+#[derive(Serialize, Deserialize)]
+struct DirCache {
+    version: u32,
+    listed_at_ns: u64,
+    dirs: HashMap<String, CachedDir>,
+}
+
+impl DirCache {
+    fn empty(listed_at_ns: u64) -> Self {
+        DirCache {
+            version: DIRCACHE_VERSION,
+            listed_at_ns,
+            dirs: HashMap::new(),
+        }
+    }
+
+    fn load(path: &Path) -> Option<DirCache> {
+        let file_mtime = mtime_ns(path)?;
+        let mut resident = RESIDENT.lock().unwrap();
+        if let Some((cached_path, cached_mtime, _)) = resident.as_ref() {
+            if cached_path == path && *cached_mtime == file_mtime {
+                return resident.take().map(|(_, _, cache)| cache);
+            }
+        }
+        drop(resident);
+
+        let contents = fs::read(path).ok()?;
+        let cache: DirCache = serde_json::from_slice(&contents).ok()?;
+        (cache.version == DIRCACHE_VERSION).then_some(cache)
+    }
+
+    fn save(&self, path: &Path) -> std::io::Result<()> {
+        let dir = path.parent().unwrap_or(Path::new("."));
+        let mut tmp = tempfile::NamedTempFile::new_in(dir)?;
+        tmp.write_all(&serde_json::to_vec(self)?)?;
+        tmp.persist(path).map_err(|e| e.error)?;
+        Ok(())
+    }
+
+    fn keep_resident(self, path: &Path) {
+        if let Some(file_mtime) = mtime_ns(path) {
+            *RESIDENT.lock().unwrap() = Some((path.to_path_buf(), file_mtime, self));
+        }
+    }
+
+    /// Cached listing of `rel_dir`, if it is still valid.
+    fn fresh(&self, rel_dir: &str, mtime_ns: u64, ignore_hash: &str) -> Option<&CachedDir> {
+        self.dirs.get(rel_dir).filter(|cached| {
+            cached.mtime_ns == mtime_ns
+                && cached.ignore_hash == ignore_hash
+                && mtime_ns.saturating_add(RACY_WINDOW_NS) < self.listed_at_ns
+        })
+    }
+}
+
+fn now_ns() -> u64 {
+    SystemTime::now()
+        .duration_since(UNIX_EPOCH)
+        .map(|d| d.as_nanos() as u64)
+        .unwrap_or(0)
+}
+
+fn mtime_ns(path: &Path) -> Option<u64> {
+    let modified = fs::metadata(path).ok()?.modified().ok()?;
+    modified
+        .duration_since(UNIX_EPOCH)
+        .ok()
+        .map(|d| d.as_nanos() as u64)
+}
+
+fn join_rel(rel_dir: &str, name: &str) -> String {
+    if rel_dir.is_empty() {
+        name.to_string()
+    } else {
+        format!("{}/{}", rel_dir, name)
+    }
+}
+
+struct CachedWalk<'a> {
+    root: &'a Path,
+    previous: Option<DirCache>,
+    next: DirCache,
+    ignores: Vec<Gitignore>,
+    files: Vec<String>,
+    changed: bool,
+}
+
+impl CachedWalk<'_> {
+    fn is_ignored(&self, path: &Path, is_dir: bool) -> bool {
+        for gitignore in self.ignores.iter().rev() {
+            let matched = gitignore.matched(path, is_dir);
+            if matched.is_ignore() {
+                return true;
+            }
+            if matched.is_whitelist() {
+                return false;
+            }
+        }
+        false
+    }
+
+    fn read_dir(&self, dir: &Path) -> (Vec<String>, Vec<String>) {
+        let mut files = Vec::new();
+        let mut subdirs = Vec::new();
+        let Ok(entries) = fs::read_dir(dir) else {
+            return (files, subdirs);
+        };
+        for entry in entries.filter_map(|e| e.ok()) {
+            let Ok(file_type) = entry.file_type() else {
+                continue;
+            };
+            let name = entry.file_name().to_string_lossy().to_string();
+            if file_type.is_dir() {
+                if is_internal_name(&name) || self.is_ignored(&entry.path(), true) {
+                    continue;
+                }
+                subdirs.push(name);
+            } else if file_type.is_file() && !self.is_ignored(&entry.path(), false) {
+                files.push(name);
+            }
+        }
+        files.sort_unstable();
+        subdirs.sort_unstable();
+        (files, subdirs)
+    }
+
+    fn visit(&mut self, rel_dir: &str, parent_ignore_hash: &str) {
+        let dir: PathBuf = self.root.join(rel_dir);
+        let Some(mtime) = mtime_ns(&dir) else {
+            return;
+        };
+        trace::add(Counter::FilesStat, 1);
+
+        // The rules in effect are this directory's .dockignore on top of
+        // every ancestor's, so the hash chains down the tree.
+        let dockignore = fs::read(dir.join(DOCKIGNORE)).ok();
+        let mut rules = parent_ignore_hash.as_bytes().to_vec();
+        if let Some(contents) = &dockignore {
+            rules.extend_from_slice(contents);
+        }
+        let ignore_hash = hashing::hash_bytes(HashAlgorithm::Sha3_256, &rules);
+
+        let pushed = dockignore.is_some() && {
+            let mut builder = GitignoreBuilder::new(&dir);
+            builder.add(dir.join(DOCKIGNORE));
+            match builder.build() {
+                Ok(gitignore) => {
+                    self.ignores.push(gitignore);
+                    true
+                }
+                Err(_) => false,
+            }
+        };
+
+        let cached = self
+            .previous
+            .as_ref()
+            .and_then(|cache| cache.fresh(rel_dir, mtime, &ignore_hash))
+            .map(|cached| (cached.files.clone(), cached.subdirs.clone()));
+        let (files, subdirs) = match cached {
+            Some(listing) => {
+                trace::add(Counter::CacheHits, 1);
+                listing
+            }
+            None => {
+                self.changed = true;
+                self.read_dir(&dir)
+            }
+        };
+
+        for name in files.iter() {
+            self.files.push(join_rel(rel_dir, name));
+        }
+        for name in subdirs.iter() {
+            self.visit(&join_rel(rel_dir, name), &ignore_hash);
+        }
+
+        self.next.dirs.insert(
+            rel_dir.to_string(),
+            CachedDir {
+                mtime_ns: mtime,
+                ignore_hash,
+                files,
+                subdirs,
+            },
+        );
+        if pushed {
+            self.ignores.pop();
+        }
+    }
+}
+
+/// Lists the working tree files of the spacedock at `root`, skipping the
+/// `readdir` of every directory whose mtime and effective `.dockignore`
+/// rules are unchanged since the last listing in `.dock/dircache`.
+pub fn list_files(root: &Path) -> Vec<String> {
+    let _span = trace::span("dircache");
+    let cache_path = root.join(".dock").join(DIRCACHE_FILE);
+    let previous = DirCache::load(&cache_path);
+
+    let mut walk = CachedWalk {
+        root,
+        next: DirCache::empty(now_ns()),
+        changed: previous.is_none(),
+        previous,
+        ignores: Vec::new(),
+        files: Vec::new(),
+    };
+    walk.visit("", "");
+
+    let mut files = walk.files;
+    if walk.changed {
+        // The cache is an optimisation only; a failed write costs a re-read.
+        if walk.next.save(&cache_path).is_ok() {
+            walk.next.keep_resident(&cache_path);
+        }
+    } else if let Some(previous) = walk.previous {
+        previous.keep_resident(&cache_path);
+    }
+
+    files.sort_unstable();
+    files
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn setup_repo() -> tempfile::TempDir {
+        let dir = tempfile::tempdir().unwrap();
+        let root = dir.path();
+        fs::create_dir_all(root.join(".dock")).unwrap();
+        fs::create_dir_all(root.join("src/gen")).unwrap();
+        fs::write(root.join("README.md"), "engage").unwrap();
+        fs::write(root.join("src/main.rs"), "fn main() {}").unwrap();
+        fs::write(root.join("src/gen/code.rs"), "// generated").unwrap();
+        dir
+    }
+
+    #[test]
+    fn test_list_files_writes_cache_and_sees_new_files() {
+        let repo = setup_repo();
+        let root = repo.path();
+
+        let first = list_files(root);
+        assert_eq!(first, vec!["README.md", "src/gen/code.rs", "src/main.rs"]);
+        assert!(root.join(".dock").join(DIRCACHE_FILE).is_file());
+
+        fs::write(root.join("src/lib.rs"), "pub fn warp() {}").unwrap();
+        let second = list_files(root);
+        assert!(second.contains(&"src/lib.rs".to_string()));
+        assert_eq!(second, walk_files(root));
+    }
+
+    #[test]
+    fn test_list_files_revalidates_on_dockignore_change() {
+        let repo = setup_repo();
+        let root = repo.path();
+
+        list_files(root);
+        fs::write(root.join(".dockignore"), "gen/\n").unwrap();
+
+        let files = list_files(root);
+        assert!(!files.contains(&"src/gen/code.rs".to_string()));
+        assert_eq!(files, walk_files(root));
+    }
+
+    fn walk_files(root: &Path) -> Vec<String> {
+        crate::walker::walk(root).files
+    }
+}
@@ -0,0 +1,289 @@
+use pyo3::exceptions::PyRuntimeError;
+use pyo3::prelude::*;
+use pyo3::types::PyDict;
+use rayon::prelude::*;
+use rayon::{ThreadPool, ThreadPoolBuilder};
+use serde_json::Value;
+use std::collections::{HashMap, HashSet};
+use std::fs;
+use std::path::Path;
+use std::sync::{Arc, Mutex};
+
+use crate::hashing::{self, HashAlgorithm};
+use crate::reachability;
+use crate::refs;
+use crate::repo_config;
+use crate::revision;
+use crate::spacedock::Spacedock;
+use crate::stage;
+use crate::trace;
+
+/// Worker pools by size, shared by every fleet scan of this process.
+static POOLS: Mutex<Vec<(usize, Arc<ThreadPool>)>> = Mutex::new(Vec::new());
+
+fn pool(threads: usize) -> Result<Arc<ThreadPool>, String> {
+    let mut pools = POOLS.lock().unwrap();
+    if let Some((_, pool)) = pools.iter().find(|(size, _)| *size == threads) {
+        return Ok(pool.clone());
+    }
+    let pool = ThreadPoolBuilder::new()
+        .num_threads(threads)
+        .thread_name(|i| format!("ruxpy-fleet-{}", i))
+        .build()
+        .map_err(|e| format!("Failed to start worker pool: {}", e))?;
+    let pool = Arc::new(pool);
+    pools.push((threads, pool.clone()));
+    Ok(pool)
+}
+
+/// What `ruxpy scan` reports for one spacedock.
+#[derive(Default, Debug, Clone, PartialEq, Eq)]
+pub struct RepoStatus {
+    pub course: String,
+    /// Latest starlog of the course; `None` before the first starlog.
+    pub tip: Option<String>,
+    pub staged: Vec<String>,
+    pub modified: Vec<String>,
+    pub deleted: Vec<String>,
+    pub untracked: Vec<String>,
+}
+
+impl RepoStatus {
+    pub fn is_clean(&self) -> bool {
+        self.staged.is_empty()
+            && self.modified.is_empty()
+            && self.deleted.is_empty()
+            && self.untracked.is_empty()
+    }
+}
+
+/// Course that the HELM of the spacedock at `repo` links to.
+pub fn current_course(repo: &Path) -> Result<String, String> {
+    let helm = Spacedock::get_path_info_internal("helm_f").map_or(".dock/HELM", |p| p.path);
+    let contents =
+        fs::read_to_string(repo.join(helm)).map_err(|e| format!("Failed to read HELM: {}", e))?;
+    let link = contents
+        .trim()
+        .strip_prefix("link:")
+        .ok_or_else(|| "HELM does not point to a course".to_string())?;
+    link.trim()
+        .rsplit('/')
+        .next()
+        .filter(|course| !course.is_empty())
+        .map(str::to_string)
+        .ok_or_else(|| "HELM does not point to a course".to_string())
+}
+
+/// Status of the spacedock at `repo`: staged paths, tracked files whose
+/// content differs from the course tip, tracked files that are gone and
+/// files that are neither tracked nor staged. Files are hashed in parallel.
+pub fn status(repo: &Path) -> Result<RepoStatus, String> {
+    let _span = trace::span("fleet_status");
+    let missing = Spacedock::get_missing_spacedock_items_core(&repo.to_string_lossy());
+    if !missing.is_empty() {
+        return Err(format!("Not a spacedock (missing {})", missing.join(", ")));
+    }
+
+    let course = current_course(repo)?;
+    let tip = refs::course_tip(&reachability::helm_dir(repo), &course)?
+        .ok_or_else(|| format!("Course {} does not exist", course))?;
+    let tip = Some(tip).filter(|tip| !tip.is_empty());
+    let staged: Vec<String> = stage::load(repo)?.into_keys().collect();
+    let working = crate::working_files(repo);
+
+    let tracked = match &tip {
+        Some(tip) => match revision::load_starlog(repo, tip)?.get("files") {
+            Some(Value::Object(files)) => files
+                .iter()
+                .filter_map(|(path, id)| Some((path.clone(), id.as_str()?.to_string())))
+                .collect(),
+            _ => return Err(format!("Starlog {} has no files", tip)),
+        },
+        None => HashMap::new(),
+    };
+
+    let algorithm =
+        HashAlgorithm::from_format_version(repo_config::core_config(repo)?.format_version)?;
+    let staged_set: HashSet<&str> = staged.iter().map(String::as_str).collect();
+    let modified = working
+        .par_iter()
+        .filter(|path| !staged_set.contains(path.as_str()))
+        .filter_map(|path| {
+            let recorded = tracked.get(path)?;
+            match hashing::hash_file(algorithm, &repo.join(path)) {
+                Ok(hash) if hash == *recorded => None,
+                // A file removed while scanning shows as modified
+                _ => Some(path.clone()),
+            }
+        })
+        .collect();
+
+    let present: HashSet<&str> = working.iter().map(String::as_str).collect();
+    let mut deleted: Vec<String> = tracked
+        .keys()
+        .filter(|path| !present.contains(path.as_str()))
+        .cloned()
+        .collect();
+    deleted.sort_unstable();
+    let untracked = working
+        .iter()
+        .filter(|path| !tracked.contains_key(*path) && !staged_set.contains(path.as_str()))
+        .cloned()
+        .collect();
+
+    Ok(RepoStatus {
+        course,
+        tip,
+        staged,
+        modified,
+        deleted,
+        untracked,
+    })
+}
+
+/// Status of every spacedock in `repos`, in order, running `concurrency`
+/// repositories at a time (all cores when `None`). Each repository's files
+/// are hashed on the same pool, so a fleet scan never oversubscribes.
+pub fn scan(
+    repos: &[String],
+    concurrency: Option<usize>,
+) -> Result<Vec<Result<RepoStatus, String>>, String> {
+    let _span = trace::span("fleet_scan");
+    let run = || {
+        repos
+            .par_iter()
+            .with_max_len(1)
+            .map(|repo| status(Path::new(repo)))
+            .collect()
+    };
+    match concurrency {
+        Some(0) => Err("concurrency must be at least 1".to_string()),
+        Some(threads) => Ok(pool(threads)?.install(run)),
+        None => Ok(run()),
+    }
+}
+
+#[pyclass]
+pub struct Fleet;
+
+#[pymethods]
+impl Fleet {
+    /// Status of each spacedock in `repo_paths` as a list of dicts with
+    /// `path`, `course`, `tip`, `staged`, `modified`, `deleted`,
+    /// `untracked`, `clean` and `error` (set when the status failed).
+    #[staticmethod]
+    #[pyo3(signature = (repo_paths, concurrency=None))]
+    fn scan(
+        py: Python<'_>,
+        repo_paths: Vec<String>,
+        concurrency: Option<usize>,
+    ) -> PyResult<Vec<PyObject>> {
+        let results = py
+            .allow_threads(|| scan(&repo_paths, concurrency))
+            .map_err(PyRuntimeError::new_err)?;
+
+        repo_paths
+            .iter()
+            .zip(results)
+            .map(|(path, result)| {
+                let dict = PyDict::new(py);
+                dict.set_item("path", path)?;
+                let status = match result {
+                    Ok(status) => {
+                        dict.set_item("clean", status.is_clean())?;
+                        dict.set_item("error", py.None())?;
+                        status
+                    }
+                    Err(e) => {
+                        dict.set_item("clean", false)?;
+                        dict.set_item("error", e)?;
+                        RepoStatus::default()
+                    }
+                };
+                dict.set_item("course", status.course)?;
+                dict.set_item("tip", status.tip)?;
+                dict.set_item("staged", status.staged)?;
+                dict.set_item("modified", status.modified)?;
+                dict.set_item("deleted", status.deleted)?;
+                dict.set_item("untracked", status.untracked)?;
+                Ok(dict.into())
+            })
+            .collect()
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn spacedock() -> tempfile::TempDir {
+        let dir = tempfile::tempdir().unwrap();
+        let root = dir.path();
+        for sub in [".dock/objects", ".dock/starlogs", ".dock/links/helm"] {
+            fs::create_dir_all(root.join(sub)).unwrap();
+        }
+        fs::write(root.join(".dock/HELM"), "link: links/helm/core\n").unwrap();
+        fs::write(root.join(".dock/links/helm/core"), "").unwrap();
+        fs::write(root.join(".dock/stage"), "[]").unwrap();
+        fs::write(root.join(".dock/config.toml"), "").unwrap();
+        dir
+    }
+
+    #[test]
+    fn test_status_reports_each_kind_of_change() {
+        let dir = spacedock();
+        let root = dir.path();
+        let algorithm = HashAlgorithm::Sha3_256;
+        fs::write(root.join("kept.txt"), "kept").unwrap();
+        fs::write(root.join("edited.txt"), "after").unwrap();
+        fs::write(root.join("new.txt"), "new").unwrap();
+        fs::write(root.join("beamed.txt"), "beamed").unwrap();
+        stage::update(
+            root,
+            &[(
+                "beamed.txt".to_string(),
+                Some(stage::StageEntry {
+                    hash: hashing::hash_bytes(algorithm, b"beamed"),
+                    size: 6,
+                    mtime_ns: 0,
+                }),
+            )],
+        )
+        .unwrap();
+
+        let files = serde_json::json!({
+            "kept.txt": hashing::hash_bytes(algorithm, b"kept"),
+            "edited.txt": hashing::hash_bytes(algorithm, b"before"),
+            "gone.txt": hashing::hash_bytes(algorithm, b"gone"),
+        });
+        let starlog = serde_json::to_vec(&serde_json::json!({ "files": files })).unwrap();
+        let tip = hashing::hash_bytes(algorithm, &starlog);
+        let path = reachability::starlog_path(root, &tip);
+        fs::create_dir_all(path.parent().unwrap()).unwrap();
+        fs::write(path, starlog).unwrap();
+        fs::write(root.join(".dock/links/helm/core"), &tip).unwrap();
+
+        let status = status(root).unwrap();
+        assert_eq!(status.course, "core");
+        assert_eq!(status.tip.as_deref(), Some(tip.as_str()));
+        assert_eq!(status.staged, ["beamed.txt"]);
+        assert_eq!(status.modified, ["edited.txt"]);
+        assert_eq!(status.deleted, ["gone.txt"]);
+        assert_eq!(status.untracked, ["new.txt"]);
+    }
+
+    #[test]
+    fn test_scan_keeps_order_and_reports_errors_per_repo() {
+        let clean = spacedock();
+        let missing = tempfile::tempdir().unwrap();
+        let repos = [
+            missing.path().to_string_lossy().to_string(),
+            clean.path().to_string_lossy().to_string(),
+        ];
+
+        let results = scan(&repos, Some(2)).unwrap();
+        assert!(results[0].is_err());
+        assert!(results[1].as_ref().unwrap().is_clean());
+        assert!(scan(&repos, Some(0)).is_err());
+    }
+}
@@ -0,0 +1,352 @@
+use pyo3::exceptions::PyRuntimeError;
+use pyo3::prelude::*;
+use pyo3::types::PyDict;
+use rayon::prelude::*;
+use serde_json::Value;
+use std::collections::{HashMap, HashSet};
+use std::fs;
+use std::path::Path;
+
+use crate::chunking::{self, Manifest};
+use crate::hashing::{self, HashAlgorithm, Hasher};
+use crate::objcache;
+use crate::object_store;
+use crate::reachability::{self, list_loose, Loose};
+use crate::trace;
+
+/// One problem found by [`check`]; checking carries on past it.
+#[derive(Debug, Clone, PartialEq, Eq)]
+pub struct Problem {
+    /// `missing`, `corrupt`, `size` or `unreadable`.
+    pub kind: &'static str,
+    pub id: String,
+    pub detail: String,
+}
+
+impl Problem {
+    fn new(kind: &'static str, id: &str, detail: impl Into<String>) -> Self {
+        Problem {
+            kind,
+            id: id.to_string(),
+            detail: detail.into(),
+        }
+    }
+}
+
+#[derive(Debug, Default)]
+pub struct FsckReport {
+    pub objects_checked: u64,
+    pub starlogs_checked: u64,
+    pub problems: Vec<Problem>,
+}
+
+/// Checks chunk existence and sizes against the manifest of blob `id`.
+fn check_manifest(repo: &Path, id: &str, manifest: &Manifest) -> Vec<Problem> {
+    let mut problems = Vec::new();
+    let total: u64 = manifest.chunks.iter().map(|c| c.size).sum();
+    if total != manifest.size {
+        problems.push(Problem::new(
+            "size",
+            id,
+            format!(
+                "manifest lists {} bytes of chunks for {} bytes",
+                total, manifest.size
+            ),
+        ));
+    }
+    for chunk in &manifest.chunks {
+        match chunking::find_object(repo, &chunk.hash).map(fs::metadata) {
+            None | Some(Err(_)) => problems.push(Problem::new(
+                "missing",
+                &chunk.hash,
+                format!("chunk of blob {}", id),
+            )),
+            Some(Ok(meta)) if meta.len() != chunk.size => problems.push(Problem::new(
+                "size",
+                &chunk.hash,
+                format!(
+                    "chunk is {} bytes, manifest says {}",
+                    meta.len(),
+                    chunk.size
+                ),
+            )),
+            Some(Ok(_)) => {}
+        }
+    }
+    problems
+}
+
+/// Follows every course ref through starlogs, trees and chunk manifests and
+/// reports whatever is missing or unreadable. Returns the starlogs visited.
+fn check_connectivity(repo: &Path, problems: &mut Vec<Problem>) -> u64 {
+    let tips = match reachability::course_tips(repo) {
+        Ok(tips) => tips,
+        Err(e) => {
+            problems.push(Problem::new("unreadable", "links/helm", e));
+            return 0;
+        }
+    };
+
+    // blob id -> first starlog seen referring to it, for the report
+    let mut blobs: HashMap<String, String> = HashMap::new();
+    let mut visited = HashSet::new();
+    for (course, tip) in tips {
+        let mut pending = vec![(tip, format!("tip of course {}", course))];
+        while let Some((hash, referrer)) = pending.pop() {
+            if !reachability::is_object_id(&hash) {
+                problems.push(Problem::new(
+                    "unreadable",
+                    &hash,
+                    format!("bad starlog id in {}", referrer),
+                ));
+                continue;
+            }
+            if !visited.insert(hash.clone()) {
+                continue;
+            }
+            let path = reachability::starlog_path(repo, &hash);
+            if !path.exists() {
+                problems.push(Problem::new(
+                    "missing",
+                    &hash,
+                    format!("starlog, {}", referrer),
+                ));
+                continue;
+            }
+            let starlog = match objcache::load_json(&path) {
+                Ok(starlog) => starlog,
+                Err(e) => {
+                    problems.push(Problem::new("unreadable", &hash, e));
+                    continue;
+                }
+            };
+            if let Some(parent) = starlog.get("parent").and_then(Value::as_str) {
+                pending.push((parent.to_string(), format!("parent of starlog {}", hash)));
+            }
+
+            let mut ids: Vec<String> = Vec::new();
+            if let Some(files) = starlog.get("files").and_then(Value::as_object) {
+                ids.extend(files.values().filter_map(Value::as_str).map(String::from));
+            }
+            if let Some(tree) = starlog.get("tree").and_then(Value::as_str) {
+                if let Some(tree_path) = chunking::find_object(repo, tree) {
+                    match objcache::load_json(&tree_path) {
+                        Ok(tree_obj) => {
+                            if let Some(entries) = tree_obj.as_object() {
+                                ids.extend(
+                                    entries.values().filter_map(Value::as_str).map(String::from),
+                                );
+                            }
+                        }
+                        Err(e) => problems.push(Problem::new("unreadable", tree, e)),
+                    }
+                } else {
+                    problems.push(Problem::new(
+                        "missing",
+                        tree,
+                        format!("tree of starlog {}", hash),
+                    ));
+                }
+            }
+            for id in ids {
+                blobs.entry(id).or_insert_with(|| hash.clone());
+            }
+        }
+    }
+
+    let blob_problems: Vec<Problem> = blobs
+        .par_iter()
+        .flat_map_iter(|(id, starlog)| {
+            if chunking::find_object(repo, id).is_some() {
+                return Vec::new();
+            }
+            match chunking::read_manifest(repo, id) {
+                Ok(Some(manifest)) => check_manifest(repo, id, &manifest),
+                Ok(None) => vec![Problem::new(
+                    "missing",
+                    id,
+                    format!("blob in starlog {}", starlog),
+                )],
+                Err(e) => vec![Problem::new("unreadable", id, e)],
+            }
+        })
+        .collect();
+    problems.extend(blob_problems);
+    visited.len() as u64
+}
+
+/// Rehashes one loose object (or reassembles a chunked blob) and compares
+/// the digest with its name.
+fn rehash(repo: &Path, algorithm: HashAlgorithm, loose: &Loose) -> Option<Problem> {
+    let digest = if loose.manifest {
+        let manifest = match chunking::read_manifest(repo, &loose.id) {
+            Ok(Some(manifest)) => manifest,
+            Ok(None) => return None,
+            Err(e) => return Some(Problem::new("unreadable", &loose.id, e)),
+        };
+        let mut hasher = Hasher::new(algorithm);
+        let size = match chunking::copy_blob_to(repo, &loose.id, &mut hasher) {
+            Ok(size) => size,
+            // Missing chunks are reported by the connectivity check
+            Err(_) => return None,
+        };
+        if size != manifest.size {
+            return Some(Problem::new(
+                "size",
+                &loose.id,
+                format!(
+                    "reassembles to {} bytes, manifest says {}",
+                    size, manifest.size
+                ),
+            ));
+        }
+        hasher.finalize()
+    } else {
+        match hashing::hash_file(algorithm, &loose.path) {
+            Ok(digest) => digest,
+            Err(e) => return Some(Problem::new("unreadable", &loose.id, e)),
+        }
+    };
+    (digest != loose.id).then(|| {
+        Problem::new(
+            "corrupt",
+            &loose.id,
+            format!("content hashes to {}", digest),
+        )
+    })
+}
+
+/// Without `quick`, also catches truncation to zero bytes; with it, that is
+/// the only content check.
+fn check_size(algorithm: HashAlgorithm, loose: &Loose) -> Option<Problem> {
+    (loose.size == 0 && !loose.manifest && loose.id != hashing::hash_bytes(algorithm, b""))
+        .then(|| Problem::new("size", &loose.id, "object is empty"))
+}
+
+/// Verifies the spacedock at `repo`: every object and starlog is rehashed
+/// across all cores (only sized with `quick`), and every course ref is
+/// followed to make sure the objects it needs exist.
+pub fn check(repo: &Path, quick: bool) -> Result<FsckReport, String> {
+    let _span = trace::span("fsck");
+    object_store::require_loose(repo, "fsck")?;
+    let algorithm = hashing::repo_algorithm(repo)?;
+    let dock = repo.join(".dock");
+    let mut report = FsckReport::default();
+
+    for store in ["objects", "starlogs"] {
+        let loose = list_loose(&dock.join(store));
+        report.objects_checked += loose.len() as u64;
+        let problems: Vec<Problem> = loose
+            .par_iter()
+            .filter_map(|loose| {
+                check_size(algorithm, loose).or_else(|| {
+                    if quick {
+                        None
+                    } else {
+                        rehash(repo, algorithm, loose)
+                    }
+                })
+            })
+            .collect();
+        report.problems.extend(problems);
+    }
+
+    report.starlogs_checked = check_connectivity(repo, &mut report.problems);
+    report
+        .problems
+        .sort_by(|a, b| (a.kind, &a.id).cmp(&(b.kind, &b.id)));
+    report.problems.dedup();
+    Ok(report)
+}
+
+#[pyclass]
+pub struct Fsck;
+
+#[pymethods]
+impl Fsck {
+    /// Check the spacedock at `repo_path`. Returns a dict with the counts
+    /// checked and `problems` as `(kind, id, detail)` tuples.
+    #[staticmethod]
+    #[pyo3(signature = (repo_path, quick=false))]
+    fn run(py: Python<'_>, repo_path: &str, quick: bool) -> PyResult<PyObject> {
+        let repo = Path::new(repo_path);
+        let report = py
+            .allow_threads(|| check(repo, quick))
+            .map_err(PyRuntimeError::new_err)?;
+
+        let problems: Vec<(&str, String, String)> = report
+            .problems
+            .into_iter()
+            .map(|p| (p.kind, p.id, p.detail))
+            .collect();
+        let dict = PyDict::new(py);
+        dict.set_item("objects_checked", report.objects_checked)?;
+        dict.set_item("starlogs_checked", report.starlogs_checked)?;
+        dict.set_item("problems", problems)?;
+        Ok(dict.into())
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use serde_json::json;
+
+    fn store(path: std::path::PathBuf, contents: &[u8]) {
+        fs::create_dir_all(path.parent().unwrap()).unwrap();
+        fs::write(path, contents).unwrap();
+    }
+
+    /// A one-starlog spacedock; returns (starlog, tree, blob) ids.
+    fn setup(repo: &Path) -> (String, String, String) {
+        let sha3 = HashAlgorithm::Sha3_256;
+        let blob = hashing::hash_bytes(sha3, b"alpha");
+        store(chunking::object_path(repo, &blob), b"alpha");
+        let tree_json = json!({ "a.txt": blob }).to_string();
+        let tree = hashing::hash_bytes(sha3, tree_json.as_bytes());
+        store(chunking::object_path(repo, &tree), tree_json.as_bytes());
+        let starlog_json =
+            json!({"parent": null, "files": {"a.txt": blob}, "tree": tree}).to_string();
+        let starlog = hashing::hash_bytes(sha3, starlog_json.as_bytes());
+        store(
+            reachability::starlog_path(repo, &starlog),
+            starlog_json.as_bytes(),
+        );
+        fs::create_dir_all(reachability::helm_dir(repo)).unwrap();
+        fs::write(reachability::helm_dir(repo).join("core"), &starlog).unwrap();
+        (starlog, tree, blob)
+    }
+
+    #[test]
+    fn test_clean_spacedock_has_no_problems() {
+        let dir = tempfile::tempdir().unwrap();
+        setup(dir.path());
+        let report = check(dir.path(), false).unwrap();
+        assert_eq!(report.problems, Vec::new());
+        assert_eq!(report.objects_checked, 3);
+        assert_eq!(report.starlogs_checked, 1);
+    }
+
+    #[test]
+    fn test_reports_every_problem() {
+        let dir = tempfile::tempdir().unwrap();
+        let repo = dir.path();
+        let (_, tree, blob) = setup(repo);
+        fs::write(chunking::object_path(repo, &blob), b"tampered").unwrap();
+        fs::write(reachability::helm_dir(repo).join("lost"), "ab".repeat(32)).unwrap();
+
+        let kinds: Vec<&str> = check(repo, false)
+            .unwrap()
+            .problems
+            .iter()
+            .map(|p| p.kind)
+            .collect();
+        assert_eq!(kinds, vec!["corrupt", "missing"]);
+
+        // Quick mode trusts content but still sees missing objects
+        fs::remove_file(chunking::object_path(repo, &tree)).unwrap();
+        let quick = check(repo, true).unwrap();
+        assert!(quick.problems.iter().all(|p| p.kind == "missing"));
+        assert_eq!(quick.problems.len(), 2);
+    }
+}
@@ -0,0 +1,177 @@
+use pyo3::exceptions::PyRuntimeError;
+use pyo3::prelude::*;
+use pyo3::types::PyDict;
+use rayon::prelude::*;
+use std::collections::HashSet;
+use std::fs;
+use std::path::Path;
+use std::time::{Duration, SystemTime};
+
+use crate::object_store;
+use crate::reachability::{self, list_loose};
+use crate::trace;
+
+#[derive(Default, Debug, Clone, Copy, PartialEq, Eq)]
+pub struct GcReport {
+    pub objects_removed: u64,
+    pub starlogs_removed: u64,
+    pub objects_kept: u64,
+    pub bytes_reclaimed: u64,
+}
+
+/// Removes unreachable files of `store` older than `cutoff`; returns
+/// `(removed, kept, bytes reclaimed)`.
+fn sweep(
+    store: &Path,
+    reachable: &HashSet<String>,
+    cutoff: SystemTime,
+    dry_run: bool,
+) -> (u64, u64, u64) {
+    list_loose(store)
+        .par_iter()
+        .map(|loose| {
+            // Young objects may belong to a starlog that is being recorded
+            if reachable.contains(&loose.id) || loose.modified > cutoff {
+                return (0, 1, 0);
+            }
+            if dry_run || fs::remove_file(&loose.path).is_ok() {
+                (1, 0, loose.size)
+            } else {
+                (0, 1, 0)
+            }
+        })
+        .reduce(|| (0, 0, 0), |a, b| (a.0 + b.0, a.1 + b.1, a.2 + b.2))
+}
+
+/// Deletes starlogs and objects that no course ref or stage reaches and
+/// that are older than `grace`.
+pub fn collect(repo: &Path, grace: Duration, dry_run: bool) -> Result<GcReport, String> {
+    let _span = trace::span("gc");
+    object_store::require_loose(repo, "gc")?;
+    let tips: Vec<String> = reachability::course_tips(repo)?
+        .into_iter()
+        .map(|(_, hash)| hash)
+        .collect();
+    let mut reachable = reachability::mark(repo, &tips)?;
+    reachable
+        .objects
+        .extend(reachability::staged_objects(repo)?);
+    let cutoff = SystemTime::now()
+        .checked_sub(grace)
+        .unwrap_or(SystemTime::UNIX_EPOCH);
+
+    let dock = repo.join(".dock");
+    let (objects_removed, objects_kept, object_bytes) =
+        sweep(&dock.join("objects"), &reachable.objects, cutoff, dry_run);
+    let (starlogs_removed, _, starlog_bytes) =
+        sweep(&dock.join("starlogs"), &reachable.starlogs, cutoff, dry_run);
+
+    Ok(GcReport {
+        objects_removed,
+        starlogs_removed,
+        objects_kept,
+        bytes_reclaimed: object_bytes + starlog_bytes,
+    })
+}
+
+#[pyclass]
+pub struct Gc;
+
+#[pymethods]
+impl Gc {
+    /// Collect garbage in the spacedock at `repo_path`; returns the report
+    /// as a dict.
+    #[staticmethod]
+    #[pyo3(signature = (repo_path, grace_secs, dry_run=false))]
+    fn run(py: Python<'_>, repo_path: &str, grace_secs: u64, dry_run: bool) -> PyResult<PyObject> {
+        let repo = Path::new(repo_path);
+        let report = py
+            .allow_threads(|| collect(repo, Duration::from_secs(grace_secs), dry_run))
+            .map_err(PyRuntimeError::new_err)?;
+
+        let dict = PyDict::new(py);
+        dict.set_item("objects_removed", report.objects_removed)?;
+        dict.set_item("starlogs_removed", report.starlogs_removed)?;
+        dict.set_item("objects_kept", report.objects_kept)?;
+        dict.set_item("bytes_reclaimed", report.bytes_reclaimed)?;
+        Ok(dict.into())
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use crate::chunking::{self, object_path};
+    use crate::stage;
+    use serde_json::json;
+
+    fn write_starlog(repo: &Path, hash: &str, value: serde_json::Value) {
+        let path = reachability::starlog_path(repo, hash);
+        fs::create_dir_all(path.parent().unwrap()).unwrap();
+        fs::write(path, value.to_string()).unwrap();
+    }
+
+    fn write_object(repo: &Path, hash: &str, contents: &str) {
+        let path = object_path(repo, hash);
+        fs::create_dir_all(path.parent().unwrap()).unwrap();
+        fs::write(path, contents).unwrap();
+    }
+
+    #[test]
+    fn test_collect_keeps_reachable_and_removes_garbage() {
+        let dir = tempfile::tempdir().unwrap();
+        let repo = dir.path();
+        fs::create_dir_all(reachability::helm_dir(repo)).unwrap();
+
+        write_object(repo, "aa01", "kept blob");
+        write_object(repo, "bb02", "{\"a.txt\": \"aa01\"}");
+        write_object(repo, "cc03", "garbage blob");
+        write_starlog(
+            repo,
+            "dd04",
+            json!({"parent": null, "files": {"a.txt": "aa01"}, "tree": "bb02"}),
+        );
+        let orphan = json!({"parent": null, "files": {}});
+        write_starlog(repo, "ee05", orphan.clone());
+        fs::write(reachability::helm_dir(repo).join("core"), "dd04").unwrap();
+
+        let report = collect(repo, Duration::ZERO, false).unwrap();
+        assert_eq!(report.objects_removed, 1);
+        assert_eq!(report.starlogs_removed, 1);
+        assert_eq!(
+            report.bytes_reclaimed,
+            ("garbage blob".len() + orphan.to_string().len()) as u64
+        );
+        assert!(object_path(repo, "aa01").exists());
+        assert!(object_path(repo, "bb02").exists());
+        assert!(!object_path(repo, "cc03").exists());
+        assert!(reachability::starlog_path(repo, "dd04").exists());
+    }
+
+    #[test]
+    fn test_collect_keeps_staged_blobs() {
+        let dir = tempfile::tempdir().unwrap();
+        let repo = dir.path();
+        fs::create_dir_all(reachability::helm_dir(repo)).unwrap();
+        fs::create_dir_all(repo.join(".dock/objects")).unwrap();
+        fs::write(repo.join("a.txt"), "staged only").unwrap();
+        stage::add(repo, &["a.txt".to_string()]).unwrap();
+        let staged = stage::load(repo).unwrap()["a.txt"].hash.clone();
+
+        let report = collect(repo, Duration::ZERO, false).unwrap();
+        assert_eq!(report.objects_removed, 0);
+        assert!(chunking::blob_exists(repo, &staged));
+    }
+
+    #[test]
+    fn test_grace_period_protects_new_objects() {
+        let dir = tempfile::tempdir().unwrap();
+        let repo = dir.path();
+        fs::create_dir_all(reachability::helm_dir(repo)).unwrap();
+        write_object(repo, "cc03", "fresh garbage");
+
+        let report = collect(repo, Duration::from_secs(3600), false).unwrap();
+        assert_eq!(report.objects_removed, 0);
+        assert!(object_path(repo, "cc03").exists());
+    }
+}
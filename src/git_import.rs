@@ -0,0 +1,384 @@
+use pyo3::exceptions::PyRuntimeError;
+use pyo3::prelude::*;
+use pyo3::types::PyDict;
+use rayon::prelude::*;
+use std::collections::{HashMap, HashSet};
+use std::fs::{self, OpenOptions};
+use std::io::{self, Write};
+use std::path::Path;
+use std::sync::Arc;
+
+use crate::chunking;
+use crate::git_objects::{self, Commit, GitObjects, Kind};
+use crate::hashing::{self, HashAlgorithm};
+use crate::history_stream::{check_course_name, Batch, Signature, Tree};
+use crate::reachability;
+use crate::refs;
+use crate::repo_config;
+use crate::trace;
+
+/// Checkpoint in `.dock`: one `c <commit> <starlog>` or `b <git blob>
+/// <blob>` line per imported object, appended after each batch is on disk.
+/// A later run skips everything listed, so an interrupted import resumes
+/// and a repeated one only adds new commits.
+pub const GIT_MAP_FILE: &str = "git-map";
+/// Commits translated per batch; their new blobs are converted in parallel.
+const COMMIT_BATCH: usize = 1024;
+/// Flattened Git trees kept for reuse by the next commits.
+const SUBTREE_CACHE: usize = 100_000;
+
+#[derive(Default, Debug, Clone, Copy, PartialEq, Eq)]
+pub struct GitImportReport {
+    pub commits: u64,
+    /// Commits found in the checkpoint of an earlier run.
+    pub skipped: u64,
+    pub blobs: u64,
+    pub courses: u64,
+}
+
+/// Git id -> ruxpy id for commits and blobs imported by earlier runs.
+type IdMap = HashMap<String, String>;
+
+fn load_map(path: &Path) -> Result<(IdMap, IdMap), String> {
+    let mut commits = IdMap::new();
+    let mut blobs = IdMap::new();
+    let contents = match fs::read_to_string(path) {
+        Ok(contents) => contents,
+        Err(e) if e.kind() == io::ErrorKind::NotFound => return Ok((commits, blobs)),
+        Err(e) => return Err(format!("Failed to read {}: {}", path.display(), e)),
+    };
+    for line in contents.lines() {
+        let mut fields = line.split(' ');
+        match (fields.next(), fields.next(), fields.next()) {
+            (Some("c"), Some(git_id), Some(id)) => commits.insert(git_id.into(), id.into()),
+            (Some("b"), Some(git_id), Some(id)) => blobs.insert(git_id.into(), id.into()),
+            // A line cut short by an interruption
+            _ => continue,
+        };
+    }
+    Ok((commits, blobs))
+}
+
+/// Branch names become course names; courses cannot contain `/`.
+fn course_name(branch: &str) -> String {
+    branch.replace('/', "-")
+}
+
+/// Commits to translate, each after its first parent. Starlogs have one
+/// parent, so a merge is recorded on its first-parent line only.
+fn commits_to_import(
+    db: &GitObjects,
+    tips: &[String],
+    done: &IdMap,
+) -> Result<Vec<(String, Commit)>, String> {
+    let mut order = Vec::new();
+    let mut visited = HashSet::new();
+    let mut parsed = HashMap::new();
+    let mut stack: Vec<(String, bool)> = tips.iter().map(|tip| (tip.clone(), false)).collect();
+    while let Some((id, parent_done)) = stack.pop() {
+        if parent_done {
+            let commit = parsed.remove(&id).expect("parsed before its parent");
+            order.push((id, commit));
+            continue;
+        }
+        if done.contains_key(&id) || !visited.insert(id.clone()) {
+            continue;
+        }
+        let object = db.read(&id)?;
+        if object.kind != Kind::Commit {
+            return Err(format!("Git object {} is not a commit", id));
+        }
+        let commit = git_objects::parse_commit(&object.data)?;
+        stack.push((id.clone(), true));
+        if let Some(parent) = commit.parents.first() {
+            stack.push((parent.clone(), false));
+        }
+        parsed.insert(id, commit);
+    }
+    Ok(order)
+}
+
+type Files = Arc<Vec<(String, String)>>;
+
+/// `(path, Git blob id)` for every file below tree `id`, reusing the
+/// flattened subtrees that did not change since earlier commits.
+fn flatten(db: &GitObjects, id: &str, cache: &mut HashMap<String, Files>) -> Result<Files, String> {
+    if let Some(files) = cache.get(id) {
+        return Ok(files.clone());
+    }
+    let object = db.read(id)?;
+    if object.kind != Kind::Tree {
+        return Err(format!("Git object {} is not a tree", id));
+    }
+    let mut files = Vec::new();
+    for (name, mode, child) in git_objects::parse_tree(&object.data, db.hash_len())? {
+        match mode & 0o170000 {
+            0o040000 => {
+                for (path, blob) in flatten(db, &child, cache)?.iter() {
+                    files.push((format!("{}/{}", name, path), blob.clone()));
+                }
+            }
+            // Submodules point at commits of another repository
+            0o160000 => {}
+            // Files, executables and symlinks (stored as their target)
+            _ => files.push((name, child)),
+        }
+    }
+    let files = Arc::new(files);
+    if cache.len() >= SUBTREE_CACHE {
+        cache.clear();
+    }
+    cache.insert(id.to_string(), files.clone());
+    Ok(files)
+}
+
+/// Stores Git blob `git_id` as a ruxpy blob and returns its id.
+fn store_blob(
+    repo: &Path,
+    db: &GitObjects,
+    algorithm: HashAlgorithm,
+    chunk_threshold: u64,
+    git_id: &str,
+) -> Result<String, String> {
+    let object = db.read(git_id)?;
+    if object.kind != Kind::Blob {
+        return Err(format!("Git object {} is not a blob", git_id));
+    }
+    if chunk_threshold > 0 && object.data.len() as u64 >= chunk_threshold {
+        return chunking::save_chunked_from(repo, algorithm, object.data.as_slice());
+    }
+    let hash = hashing::hash_bytes(algorithm, &object.data);
+    if !chunking::blob_exists(repo, &hash) {
+        chunking::put_object(repo, &hash, &object.data)?;
+    }
+    Ok(hash)
+}
+
+/// Imports the branches of the Git repository at `source` into the
+/// spacedock at `repo`: commits become starlogs, branches become courses
+/// and blobs are rehashed with the spacedock's algorithm.
+pub fn import_git(repo: &Path, source: &Path) -> Result<GitImportReport, String> {
+    let _span = trace::span("import_git");
+    let git_dir = git_objects::git_dir(source)?;
+    let db = GitObjects::open(&git_dir)?;
+    let branches = git_objects::branches(&git_dir)?;
+    let config = repo_config::core_config(repo)?;
+    let algorithm = HashAlgorithm::from_format_version(config.format_version)?;
+    let mut courses: HashMap<String, &str> = HashMap::new();
+    for (branch, _) in &branches {
+        let course = course_name(branch);
+        check_course_name(&course)?;
+        if let Some(other) = courses.insert(course.clone(), branch) {
+            return Err(format!(
+                "Branches {} and {} would both become course {}; rename one of them first",
+                other, branch, course
+            ));
+        }
+    }
+
+    let map_path = repo.join(".dock").join(GIT_MAP_FILE);
+    let (mut commits, mut blobs) = load_map(&map_path)?;
+    let mut checkpoint = OpenOptions::new()
+        .create(true)
+        .append(true)
+        .open(&map_path)
+        .map_err(|e| format!("Failed to open {}: {}", map_path.display(), e))?;
+
+    let tips: Vec<String> = branches.iter().map(|(_, id)| id.clone()).collect();
+    let pending = commits_to_import(&db, &tips, &commits)?;
+    let mut report = GitImportReport {
+        skipped: commits.len() as u64,
+        ..Default::default()
+    };
+    let mut batch = Batch::new(repo)?;
+    let mut subtrees = HashMap::new();
+
+    for chunk in pending.chunks(COMMIT_BATCH) {
+        let trees = chunk
+            .iter()
+            .map(|(_, commit)| flatten(&db, &commit.tree, &mut subtrees))
+            .collect::<Result<Vec<_>, String>>()?;
+
+        let mut seen = HashSet::new();
+        let new_blobs: Vec<&str> = trees
+            .iter()
+            .flat_map(|files| files.iter())
+            .map(|(_, blob)| blob.as_str())
+            .filter(|blob| !blobs.contains_key(*blob) && seen.insert(*blob))
+            .collect();
+        let converted = new_blobs
+            .par_iter()
+            .map(|git_id| -> Result<(String, String), String> {
+                let id = store_blob(repo, &db, algorithm, config.chunk_threshold, git_id)?;
+                Ok((git_id.to_string(), id))
+            })
+            .collect::<Result<Vec<_>, String>>()?;
+
+        let mut lines = String::new();
+        report.blobs += converted.len() as u64;
+        for (git_id, id) in converted {
+            lines.push_str(&format!("b {} {}\n", git_id, id));
+            blobs.insert(git_id, id);
+        }
+
+        for ((commit_id, commit), files) in chunk.iter().zip(&trees) {
+            let tree: Tree = files
+                .iter()
+                .map(|(path, blob)| (path.clone(), blobs[blob].clone()))
+                .collect();
+            let parent = match commit.parents.first() {
+                Some(parent) => Some(commits.get(parent).cloned().ok_or_else(|| {
+                    format!("Parent {} of {} was not imported", parent, commit_id)
+                })?),
+                None => None,
+            };
+            let signature = Signature {
+                author: commit.author.clone(),
+                email: commit.email.clone(),
+                timestamp: git_objects::iso_timestamp(commit.time, commit.offset_minutes),
+                message: commit.message.trim_end_matches('\n').to_string(),
+            };
+            let hash =
+                batch.queue_starlog(repo, algorithm, &tree, parent.as_deref(), &signature)?;
+            lines.push_str(&format!("c {} {}\n", commit_id, hash));
+            commits.insert(commit_id.clone(), hash);
+            report.commits += 1;
+        }
+
+        // The checkpoint only ever names starlogs that are on disk
+        batch.flush()?;
+        checkpoint
+            .write_all(lines.as_bytes())
+            .map_err(|e| format!("Failed to write {}: {}", map_path.display(), e))?;
+    }
+
+    let helm = reachability::helm_dir(repo);
+    fs::create_dir_all(&helm).map_err(|e| format!("Failed to create courses dir: {}", e))?;
+    for (branch, tip) in &branches {
+        let course = course_name(branch);
+        refs::write_ref(&helm.join(&course), &commits[tip])?;
+        report.courses += 1;
+    }
+    Ok(report)
+}
+
+#[pyclass]
+pub struct GitImport;
+
+#[pymethods]
+impl GitImport {
+    /// Import the Git repository at `source` into the spacedock at
+    /// `repo_path`; returns the counts of commits, skipped commits, blobs and
+    /// courses as a dict.
+    #[staticmethod]
+    fn run(py: Python<'_>, repo_path: &str, source: &str) -> PyResult<PyObject> {
+        let report = py
+            .allow_threads(|| import_git(Path::new(repo_path), Path::new(source)))
+            .map_err(PyRuntimeError::new_err)?;
+
+        let dict = PyDict::new(py);
+        dict.set_item("commits", report.commits)?;
+        dict.set_item("skipped", report.skipped)?;
+        dict.set_item("blobs", report.blobs)?;
+        dict.set_item("courses", report.courses)?;
+        Ok(dict.into())
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use crate::revision;
+    use flate2::write::ZlibEncoder;
+    use flate2::Compression;
+    use std::sync::atomic::{AtomicU64, Ordering};
+
+    /// Loose objects are found by name and never rehashed, so tests can
+    /// use any unique id.
+    fn git_id() -> String {
+        static NEXT: AtomicU64 = AtomicU64::new(1);
+        format!("{:040x}", NEXT.fetch_add(1, Ordering::Relaxed))
+    }
+
+    fn write_loose(git_dir: &Path, kind: &str, data: &[u8]) -> String {
+        let id = git_id();
+        let mut raw = format!("{} {}\0", kind, data.len()).into_bytes();
+        raw.extend_from_slice(data);
+        let mut encoder = ZlibEncoder::new(Vec::new(), Compression::default());
+        encoder.write_all(&raw).unwrap();
+        let path = git_dir.join("objects").join(&id[..2]).join(&id[2..]);
+        fs::create_dir_all(path.parent().unwrap()).unwrap();
+        fs::write(path, encoder.finish().unwrap()).unwrap();
+        id
+    }
+
+    fn tree_entry(mode: &str, name: &str, id: &str) -> Vec<u8> {
+        let mut entry = format!("{} {}\0", mode, name).into_bytes();
+        let raw: Vec<u8> = (0..id.len())
+            .step_by(2)
+            .map(|i| u8::from_str_radix(&id[i..i + 2], 16).unwrap())
+            .collect();
+        entry.extend_from_slice(&raw);
+        entry
+    }
+
+    fn commit(git_dir: &Path, tree: &str, parent: Option<&str>, message: &str) -> String {
+        let parent = parent.map_or(String::new(), |p| format!("parent {}\n", p));
+        let body = format!(
+            "tree {}\n{}author Jean-Luc Picard <picard@example.com> 1700000000 +0000\n\
+             committer Jean-Luc Picard <picard@example.com> 1700000000 +0000\n\n{}\n",
+            tree, parent, message
+        );
+        write_loose(git_dir, "commit", body.as_bytes())
+    }
+
+    #[test]
+    fn test_import_git_translates_history_and_resumes() {
+        let source = tempfile::tempdir().unwrap();
+        let git_dir = source.path().join(".git");
+        fs::create_dir_all(git_dir.join("refs/heads/feature")).unwrap();
+
+        let readme = write_loose(&git_dir, "blob", b"readme");
+        let lib = write_loose(&git_dir, "blob", b"lib");
+        let src = write_loose(&git_dir, "tree", &tree_entry("100644", "lib.rs", &lib));
+        let mut root = tree_entry("100644", "README.md", &readme);
+        root.extend(tree_entry("40000", "src", &src));
+        let root = write_loose(&git_dir, "tree", &root);
+        let first = commit(&git_dir, &root, None, "first");
+        let second = commit(&git_dir, &src, Some(&first), "second");
+        fs::write(git_dir.join("refs/heads/main"), &first).unwrap();
+        fs::write(git_dir.join("refs/heads/feature/x"), &second).unwrap();
+
+        let spacedock = tempfile::tempdir().unwrap();
+        let repo = spacedock.path();
+        fs::create_dir_all(repo.join(".dock/links/helm")).unwrap();
+        let report = import_git(repo, source.path()).unwrap();
+        assert_eq!((report.commits, report.blobs, report.courses), (2, 2, 2));
+
+        let hash = revision::lookup_path(repo, "main", "src/lib.rs").unwrap();
+        let mut content = Vec::new();
+        chunking::copy_blob_to(repo, &hash, &mut content).unwrap();
+        assert_eq!(content, b"lib");
+        let feature = revision::resolve_starlog(repo, "feature-x").unwrap();
+        let starlog = revision::load_starlog(repo, &feature).unwrap();
+        assert_eq!(starlog["message"], "second");
+        assert_eq!(starlog["timestamp"], "2023-11-14T22:13:20+00:00");
+
+        // Already imported commits come from the checkpoint
+        let report = import_git(repo, source.path()).unwrap();
+        assert_eq!((report.commits, report.skipped), (0, 2));
+
+        // `feature/x` already became course `feature-x`
+        fs::write(git_dir.join("refs/heads/feature-x"), &first).unwrap();
+        let err = import_git(repo, source.path()).unwrap_err();
+        assert!(
+            err.contains("would both become course feature-x"),
+            "{}",
+            err
+        );
+        assert_eq!(
+            revision::resolve_starlog(repo, "feature-x").unwrap(),
+            feature
+        );
+    }
+}
@@ -0,0 +1,658 @@
+//! Read-only access to a Git object database: loose objects and version 2
+//! packfiles, including offset and reference deltas.
+
+use flate2::bufread::ZlibDecoder;
+use std::collections::HashMap;
+use std::fs::{self, File};
+use std::io::{self, BufRead, BufReader, Read};
+use std::path::{Path, PathBuf};
+use std::sync::{Arc, Mutex};
+
+/// Delta bases kept in memory; the cache is emptied when it grows past this
+/// many bytes.
+const DELTA_CACHE_BYTES: usize = 256 << 20;
+/// Read-ahead for a packed entry: its header and the start of its zlib
+/// stream usually fit.
+const ENTRY_BUFFER: usize = 8 << 10;
+
+#[derive(Debug, Clone, Copy, PartialEq, Eq)]
+pub enum Kind {
+    Commit,
+    Tree,
+    Blob,
+    Tag,
+}
+
+impl Kind {
+    fn from_code(code: u8) -> Option<Kind> {
+        match code {
+            1 => Some(Kind::Commit),
+            2 => Some(Kind::Tree),
+            3 => Some(Kind::Blob),
+            4 => Some(Kind::Tag),
+            _ => None,
+        }
+    }
+
+    fn from_name(name: &[u8]) -> Option<Kind> {
+        match name {
+            b"commit" => Some(Kind::Commit),
+            b"tree" => Some(Kind::Tree),
+            b"blob" => Some(Kind::Blob),
+            b"tag" => Some(Kind::Tag),
+            _ => None,
+        }
+    }
+}
+
+#[derive(Debug)]
+pub struct Object {
+    pub kind: Kind,
+    pub data: Vec<u8>,
+}
+
+pub fn to_hex(bytes: &[u8]) -> String {
+    bytes.iter().map(|b| format!("{:02x}", b)).collect()
+}
+
+fn inflate(data: impl BufRead, size_hint: usize) -> Result<Vec<u8>, String> {
+    let mut out = Vec::with_capacity(size_hint);
+    ZlibDecoder::new(data)
+        .read_to_end(&mut out)
+        .map_err(|e| format!("Corrupt zlib data: {}", e))?;
+    Ok(out)
+}
+
+/// Variable-length size of a delta header, starting at `*pos`.
+fn delta_size(delta: &[u8], pos: &mut usize) -> Result<usize, String> {
+    let mut size = 0usize;
+    let mut shift = 0;
+    loop {
+        let byte = *delta.get(*pos).ok_or("Truncated delta")?;
+        *pos += 1;
+        size |= ((byte & 0x7f) as usize) << shift;
+        shift += 7;
+        if byte & 0x80 == 0 {
+            return Ok(size);
+        }
+    }
+}
+
+/// Rebuilds an object from its delta base and a Git delta.
+pub fn apply_delta(base: &[u8], delta: &[u8]) -> Result<Vec<u8>, String> {
+    let mut pos = 0;
+    if delta_size(delta, &mut pos)? != base.len() {
+        return Err("Delta does not match its base".to_string());
+    }
+    let target_len = delta_size(delta, &mut pos)?;
+    let mut out = Vec::with_capacity(target_len);
+    while pos < delta.len() {
+        let op = delta[pos];
+        pos += 1;
+        if op & 0x80 != 0 {
+            // Copy from the base: offset and size bytes present per bit
+            let mut offset = 0usize;
+            let mut size = 0usize;
+            for i in 0..4 {
+                if op & (1 << i) != 0 {
+                    offset |= (*delta.get(pos).ok_or("Truncated delta")? as usize) << (8 * i);
+                    pos += 1;
+                }
+            }
+            for i in 0..3 {
+                if op & (0x10 << i) != 0 {
+                    size |= (*delta.get(pos).ok_or("Truncated delta")? as usize) << (8 * i);
+                    pos += 1;
+                }
+            }
+            if size == 0 {
+                size = 0x10000;
+            }
+            let chunk = base
+                .get(offset..offset + size)
+                .ok_or("Delta copies past the end of its base")?;
+            out.extend_from_slice(chunk);
+        } else if op != 0 {
+            let chunk = delta.get(pos..pos + op as usize).ok_or("Truncated delta")?;
+            out.extend_from_slice(chunk);
+            pos += op as usize;
+        } else {
+            return Err("Invalid delta instruction".to_string());
+        }
+    }
+    if out.len() != target_len {
+        return Err("Delta produced the wrong size".to_string());
+    }
+    Ok(out)
+}
+
+/// A packfile, read by offset on demand rather than loaded whole.
+struct Pack {
+    path: PathBuf,
+    file: File,
+}
+
+/// Reads a pack from `pos` on. Reads are positional, so threads resolving
+/// objects in parallel share one handle without seeking it.
+struct PackReader<'a> {
+    file: &'a File,
+    pos: u64,
+}
+
+impl Read for PackReader<'_> {
+    fn read(&mut self, buf: &mut [u8]) -> io::Result<usize> {
+        #[cfg(unix)]
+        let n = std::os::unix::fs::FileExt::read_at(self.file, buf, self.pos)?;
+        #[cfg(windows)]
+        let n = std::os::windows::fs::FileExt::seek_read(self.file, buf, self.pos)?;
+        self.pos += n as u64;
+        Ok(n)
+    }
+}
+
+fn read_byte(reader: &mut impl Read) -> io::Result<u8> {
+    let mut byte = [0u8; 1];
+    reader.read_exact(&mut byte)?;
+    Ok(byte[0])
+}
+
+/// A packed entry before delta resolution.
+enum Entry {
+    Whole(Object),
+    OfsDelta { base: u64, delta: Vec<u8> },
+    RefDelta { base: String, delta: Vec<u8> },
+}
+
+/// Object ids and pack offsets listed by a `.idx` file (version 1 or 2).
+fn read_index(path: &Path, hash_len: usize) -> Result<Vec<(String, u64)>, String> {
+    let data = fs::read(path).map_err(|e| format!("Failed to read {}: {}", path.display(), e))?;
+    let bad = || format!("Corrupt pack index {}", path.display());
+    let u32_at = |pos: usize| -> Result<u32, String> {
+        data.get(pos..pos + 4)
+            .map(|b| u32::from_be_bytes(b.try_into().unwrap()))
+            .ok_or_else(bad)
+    };
+
+    let mut entries = Vec::new();
+    if data.starts_with(b"\xfftOc") {
+        if u32_at(4)? != 2 {
+            return Err(format!(
+                "Unsupported pack index version in {}",
+                path.display()
+            ));
+        }
+        let count = u32_at(8 + 255 * 4)? as usize;
+        let names = 8 + 256 * 4;
+        let offsets = names + count * hash_len + count * 4;
+        let large = offsets + count * 4;
+        for i in 0..count {
+            let name = data
+                .get(names + i * hash_len..names + (i + 1) * hash_len)
+                .ok_or_else(bad)?;
+            let offset = u32_at(offsets + i * 4)?;
+            let offset = if offset & 0x8000_0000 != 0 {
+                let at = large + (offset & 0x7fff_ffff) as usize * 8;
+                data.get(at..at + 8)
+                    .map(|b| u64::from_be_bytes(b.try_into().unwrap()))
+                    .ok_or_else(bad)?
+            } else {
+                offset as u64
+            };
+            entries.push((to_hex(name), offset));
+        }
+    } else {
+        let count = u32_at(255 * 4)? as usize;
+        let start = 256 * 4;
+        let width = 4 + hash_len;
+        for i in 0..count {
+            let at = start + i * width;
+            let name = data.get(at + 4..at + width).ok_or_else(bad)?;
+            entries.push((to_hex(name), u32_at(at)? as u64));
+        }
+    }
+    Ok(entries)
+}
+
+/// The object database of a Git repository.
+pub struct GitObjects {
+    objects_dir: PathBuf,
+    hash_len: usize,
+    packs: Vec<Pack>,
+    /// Object id -> (pack, offset).
+    packed: HashMap<String, (usize, u64)>,
+    deltas: Mutex<(usize, HashMap<(usize, u64), Arc<Object>>)>,
+}
+
+impl GitObjects {
+    /// Opens the object database of the Git directory `git_dir` (the
+    /// `.git` directory or a bare repository).
+    pub fn open(git_dir: &Path) -> Result<GitObjects, String> {
+        let config = fs::read_to_string(git_dir.join("config")).unwrap_or_default();
+        let sha256 = config.lines().any(|line| {
+            let setting: String = line.split_whitespace().collect();
+            setting.eq_ignore_ascii_case("objectformat=sha256")
+        });
+        let hash_len = if sha256 { 32 } else { 20 };
+
+        let objects_dir = git_dir.join("objects");
+        if !objects_dir.is_dir() {
+            return Err(format!("{} is not a Git directory", git_dir.display()));
+        }
+        let mut packs = Vec::new();
+        let mut packed = HashMap::new();
+        let mut index_paths: Vec<PathBuf> = fs::read_dir(objects_dir.join("pack"))
+            .into_iter()
+            .flatten()
+            .flatten()
+            .map(|entry| entry.path())
+            .filter(|path| path.extension().is_some_and(|ext| ext == "idx"))
+            .collect();
+        index_paths.sort();
+        for index_path in index_paths {
+            let pack_path = index_path.with_extension("pack");
+            let err = |e: io::Error| format!("Failed to read {}: {}", pack_path.display(), e);
+            let file = File::open(&pack_path).map_err(err)?;
+            let mut magic = [0u8; 4];
+            PackReader {
+                file: &file,
+                pos: 0,
+            }
+            .read_exact(&mut magic)
+            .map_err(err)?;
+            if &magic != b"PACK" {
+                return Err(format!("{} is not a packfile", pack_path.display()));
+            }
+            for (id, offset) in read_index(&index_path, hash_len)? {
+                packed.entry(id).or_insert((packs.len(), offset));
+            }
+            packs.push(Pack {
+                path: pack_path,
+                file,
+            });
+        }
+
+        Ok(GitObjects {
+            objects_dir,
+            hash_len,
+            packs,
+            packed,
+            deltas: Mutex::new((0, HashMap::new())),
+        })
+    }
+
+    pub fn hash_len(&self) -> usize {
+        self.hash_len
+    }
+
+    pub fn read(&self, id: &str) -> Result<Arc<Object>, String> {
+        match self.packed.get(id) {
+            Some(&(pack, offset)) => self.read_packed(pack, offset),
+            None => self.read_loose(id).map(Arc::new),
+        }
+    }
+
+    fn read_loose(&self, id: &str) -> Result<Object, String> {
+        if id.len() < 3 {
+            return Err(format!("Invalid object id '{}'", id));
+        }
+        let path = self.objects_dir.join(&id[..2]).join(&id[2..]);
+        let compressed = fs::read(&path).map_err(|_| format!("Git object {} not found", id))?;
+        let raw = inflate(compressed.as_slice(), compressed.len() * 2)?;
+        let header_end = raw
+            .iter()
+            .position(|&b| b == 0)
+            .ok_or_else(|| format!("Corrupt Git object {}", id))?;
+        let kind = raw[..header_end]
+            .split(|&b| b == b' ')
+            .next()
+            .and_then(Kind::from_name)
+            .ok_or_else(|| format!("Unknown type of Git object {}", id))?;
+        Ok(Object {
+            kind,
+            data: raw[header_end + 1..].to_vec(),
+        })
+    }
+
+    fn entry(&self, pack: usize, offset: u64) -> Result<Entry, String> {
+        let Pack { path, file } = &self.packs[pack];
+        let bad = || format!("Corrupt entry at {} in {}", offset, path.display());
+        let mut reader = BufReader::with_capacity(ENTRY_BUFFER, PackReader { file, pos: offset });
+        let mut byte = read_byte(&mut reader).map_err(|_| bad())?;
+        let code = (byte >> 4) & 7;
+        let mut size = (byte & 0x0f) as usize;
+        let mut shift = 4;
+        while byte & 0x80 != 0 {
+            byte = read_byte(&mut reader).map_err(|_| bad())?;
+            size |= ((byte & 0x7f) as usize) << shift;
+            shift += 7;
+        }
+
+        match code {
+            6 => {
+                let mut byte = read_byte(&mut reader).map_err(|_| bad())?;
+                let mut back = (byte & 0x7f) as u64;
+                while byte & 0x80 != 0 {
+                    byte = read_byte(&mut reader).map_err(|_| bad())?;
+                    back = ((back + 1) << 7) | (byte & 0x7f) as u64;
+                }
+                let base = offset.checked_sub(back).ok_or_else(bad)?;
+                let delta = inflate(reader, size)?;
+                Ok(Entry::OfsDelta { base, delta })
+            }
+            7 => {
+                let mut base = vec![0u8; self.hash_len];
+                reader.read_exact(&mut base).map_err(|_| bad())?;
+                let delta = inflate(reader, size)?;
+                Ok(Entry::RefDelta {
+                    base: to_hex(&base),
+                    delta,
+                })
+            }
+            _ => {
+                let kind = Kind::from_code(code).ok_or_else(bad)?;
+                Ok(Entry::Whole(Object {
+                    kind,
+                    data: inflate(reader, size)?,
+                }))
+            }
+        }
+    }
+
+    fn cached(&self, key: (usize, u64)) -> Option<Arc<Object>> {
+        self.deltas.lock().unwrap().1.get(&key).cloned()
+    }
+
+    fn cache(&self, key: (usize, u64), object: &Arc<Object>) {
+        let mut guard = self.deltas.lock().unwrap();
+        let (bytes, map) = &mut *guard;
+        if *bytes + object.data.len() > DELTA_CACHE_BYTES {
+            map.clear();
+            *bytes = 0;
+        }
+        *bytes += object.data.len();
+        map.insert(key, object.clone());
+    }
+
+    /// Resolves a packed object, walking its delta chain iteratively.
+    fn read_packed(&self, pack: usize, offset: u64) -> Result<Arc<Object>, String> {
+        let mut chain = Vec::new();
+        let mut at = (pack, offset);
+        let mut object = loop {
+            if let Some(hit) = self.cached(at) {
+                break hit;
+            }
+            match self.entry(at.0, at.1)? {
+                Entry::Whole(object) => break Arc::new(object),
+                Entry::OfsDelta { base, delta } => {
+                    chain.push((at, delta));
+                    at = (at.0, base);
+                }
+                Entry::RefDelta { base, delta } => {
+                    chain.push((at, delta));
+                    match self.packed.get(&base) {
+                        Some(&location) => at = location,
+                        None => break Arc::new(self.read_loose(&base)?),
+                    }
+                }
+            }
+        };
+        // Intermediate results are the bases of the objects that follow
+        // them in the pack, so they are kept for the next reads
+        for (location, delta) in chain.into_iter().rev() {
+            object = Arc::new(Object {
+                kind: object.kind,
+                data: apply_delta(&object.data, &delta)?,
+            });
+            self.cache(location, &object);
+        }
+        Ok(object)
+    }
+}
+
+/// `(name, mode, object id)` for each entry of a tree object.
+pub fn parse_tree(data: &[u8], hash_len: usize) -> Result<Vec<(String, u32, String)>, String> {
+    let mut entries = Vec::new();
+    let mut pos = 0;
+    while pos < data.len() {
+        let space = data[pos..]
+            .iter()
+            .position(|&b| b == b' ')
+            .ok_or("Corrupt tree object")?;
+        let mode = std::str::from_utf8(&data[pos..pos + space])
+            .ok()
+            .and_then(|m| u32::from_str_radix(m, 8).ok())
+            .ok_or("Corrupt tree mode")?;
+        pos += space + 1;
+        let nul = data[pos..]
+            .iter()
+            .position(|&b| b == 0)
+            .ok_or("Corrupt tree object")?;
+        let name = String::from_utf8_lossy(&data[pos..pos + nul]).to_string();
+        pos += nul + 1;
+        let id = data.get(pos..pos + hash_len).ok_or("Corrupt tree object")?;
+        pos += hash_len;
+        entries.push((name, mode, to_hex(id)));
+    }
+    Ok(entries)
+}
+
+#[derive(Debug, Clone, PartialEq, Eq)]
+pub struct Commit {
+    pub tree: String,
+    pub parents: Vec<String>,
+    pub author: String,
+    pub email: String,
+    /// Seconds since the epoch and the author's UTC offset in minutes.
+    pub time: i64,
+    pub offset_minutes: i32,
+    pub message: String,
+}
+
+/// Parses `Name <email> 1700000000 +0100`.
+fn parse_signature(line: &str) -> Option<(String, String, i64, i32)> {
+    let (name, rest) = line.split_once('<')?;
+    let (email, rest) = rest.split_once('>')?;
+    let mut fields = rest.split_whitespace();
+    let time = fields.next()?.parse().ok()?;
+    let zone = fields.next().unwrap_or("+0000");
+    let sign = if zone.starts_with('-') { -1 } else { 1 };
+    let digits: i32 = zone.trim_start_matches(['+', '-']).parse().ok()?;
+    let offset = sign * ((digits / 100) * 60 + digits % 100);
+    Some((name.trim().to_string(), email.to_string(), time, offset))
+}
+
+pub fn parse_commit(data: &[u8]) -> Result<Commit, String> {
+    let text = String::from_utf8_lossy(data);
+    let (headers, message) = text.split_once("\n\n").unwrap_or((&text, ""));
+    let mut commit = Commit {
+        tree: String::new(),
+        parents: Vec::new(),
+        author: String::new(),
+        email: String::new(),
+        time: 0,
+        offset_minutes: 0,
+        message: message.to_string(),
+    };
+    for line in headers.lines() {
+        if let Some(tree) = line.strip_prefix("tree ") {
+            commit.tree = tree.trim().to_string();
+        } else if let Some(parent) = line.strip_prefix("parent ") {
+            commit.parents.push(parent.trim().to_string());
+        } else if let Some(author) = line.strip_prefix("author ") {
+            let (name, email, time, offset) =
+                parse_signature(author).ok_or("Corrupt commit author")?;
+            commit.author = name;
+            commit.email = email;
+            commit.time = time;
+            commit.offset_minutes = offset;
+        }
+    }
+    if commit.tree.is_empty() {
+        return Err("Commit has no tree".to_string());
+    }
+    Ok(commit)
+}
+
+/// ISO 8601 local time with its UTC offset, e.g. `2024-01-01T10:00:00+01:00`.
+pub fn iso_timestamp(time: i64, offset_minutes: i32) -> String {
+    let local = time + offset_minutes as i64 * 60;
+    let days = local.div_euclid(86_400);
+    let secs = local.rem_euclid(86_400);
+    // Civil date from days since 1970-01-01 (Howard Hinnant's algorithm)
+    let z = days + 719_468;
+    let era = z.div_euclid(146_097);
+    let doe = z - era * 146_097;
+    let yoe = (doe - doe / 1_460 + doe / 36_524 - doe / 146_096) / 365;
+    let doy = doe - (365 * yoe + yoe / 4 - yoe / 100);
+    let mp = (5 * doy + 2) / 153;
+    let day = doy - (153 * mp + 2) / 5 + 1;
+    let month = if mp < 10 { mp + 3 } else { mp - 9 };
+    let year = yoe + era * 400 + if month <= 2 { 1 } else { 0 };
+    let sign = if offset_minutes < 0 { '-' } else { '+' };
+    let offset = offset_minutes.abs();
+    format!(
+        "{:04}-{:02}-{:02}T{:02}:{:02}:{:02}{}{:02}:{:02}",
+        year,
+        month,
+        day,
+        secs / 3600,
+        secs / 60 % 60,
+        secs % 60,
+        sign,
+        offset / 60,
+        offset % 60
+    )
+}
+
+/// Branch name -> commit id, from `refs/heads` and `packed-refs`; loose
+/// refs take precedence.
+pub fn branches(git_dir: &Path) -> Result<Vec<(String, String)>, String> {
+    let mut refs = HashMap::new();
+    if let Ok(packed) = fs::read_to_string(git_dir.join("packed-refs")) {
+        for line in packed.lines() {
+            if let Some((id, name)) = line.split_once(' ') {
+                if let Some(branch) = name.strip_prefix("refs/heads/") {
+                    refs.insert(branch.to_string(), id.to_string());
+                }
+            }
+        }
+    }
+    let heads = git_dir.join("refs").join("heads");
+    for entry in walkdir::WalkDir::new(&heads).into_iter().flatten() {
+        if !entry.file_type().is_file() {
+            continue;
+        }
+        let Ok(rel) = entry.path().strip_prefix(&heads) else {
+            continue;
+        };
+        let name = rel.to_string_lossy().replace('\\', "/");
+        let id = fs::read_to_string(entry.path())
+            .map_err(|e| format!("Failed to read branch {}: {}", name, e))?;
+        refs.insert(name, id.trim().to_string());
+    }
+    let mut refs: Vec<(String, String)> = refs.into_iter().collect();
+    refs.sort();
+    Ok(refs)
+}
+
+/// The Git directory of a working tree or bare repository at `path`.
+pub fn git_dir(path: &Path) -> Result<PathBuf, String> {
+    let dot_git = path.join(".git");
+    if dot_git.is_dir() {
+        return Ok(dot_git);
+    }
+    if dot_git.is_file() {
+        // Linked worktrees and submodules point at their Git directory
+        let contents = fs::read_to_string(&dot_git)
+            .map_err(|e| format!("Failed to read {}: {}", dot_git.display(), e))?;
+        if let Some(dir) = contents.trim().strip_prefix("gitdir:") {
+            return Ok(path.join(dir.trim()));
+        }
+    }
+    if path.join("objects").is_dir() && path.join("HEAD").is_file() {
+        return Ok(path.to_path_buf());
+    }
+    Err(format!("{} is not a Git repository", path.display()))
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn test_apply_delta_copies_and_inserts() {
+        let base = b"hello world";
+        // base size 11, target size 11; copy "hello " then insert "there"
+        let delta = [11, 11, 0x90, 6, 5, b't', b'h', b'e', b'r', b'e'];
+        assert_eq!(apply_delta(base, &delta).unwrap(), b"hello there");
+        assert!(apply_delta(b"short", &delta).is_err());
+    }
+
+    fn zlib(data: &[u8]) -> Vec<u8> {
+        use flate2::write::ZlibEncoder;
+        use std::io::Write;
+        let mut encoder = ZlibEncoder::new(Vec::new(), flate2::Compression::default());
+        encoder.write_all(data).unwrap();
+        encoder.finish().unwrap()
+    }
+
+    #[test]
+    fn test_packed_objects_are_read_by_offset() {
+        let dir = tempfile::tempdir().unwrap();
+        let pack_dir = dir.path().join("objects/pack");
+        fs::create_dir_all(&pack_dir).unwrap();
+
+        // A blob, then a delta against it
+        let mut pack = b"PACK\0\0\0\x02\0\0\0\x02".to_vec();
+        let blob_at = pack.len() as u32;
+        pack.push(0x30 | 11);
+        pack.extend(zlib(b"hello world"));
+        let delta_at = pack.len() as u32;
+        let delta = [11, 11, 0x90, 6, 5, b't', b'h', b'e', b'r', b'e'];
+        pack.push(0x60 | delta.len() as u8);
+        pack.push((delta_at - blob_at) as u8);
+        pack.extend(zlib(&delta));
+        fs::write(pack_dir.join("pack-1.pack"), &pack).unwrap();
+
+        // Version 1 index: fan-out table, then offset and id per object
+        let (blob_id, delta_id) = ([0xaa; 20], [0xbb; 20]);
+        let mut index = Vec::new();
+        for first in 0..=255u8 {
+            let count = [blob_id[0], delta_id[0]]
+                .iter()
+                .filter(|&&b| b <= first)
+                .count() as u32;
+            index.extend(count.to_be_bytes());
+        }
+        for (offset, id) in [(blob_at, blob_id), (delta_at, delta_id)] {
+            index.extend(offset.to_be_bytes());
+            index.extend(id);
+        }
+        fs::write(pack_dir.join("pack-1.idx"), &index).unwrap();
+
+        let db = GitObjects::open(dir.path()).unwrap();
+        let delta = db.read(&to_hex(&delta_id)).unwrap();
+        assert_eq!(delta.kind, Kind::Blob);
+        assert_eq!(delta.data, b"hello there");
+        assert_eq!(db.read(&to_hex(&blob_id)).unwrap().data, b"hello world");
+    }
+
+    #[test]
+    fn test_parse_commit_and_timestamp() {
+        let raw = b"tree 4b825dc642cb6eb9a060e54bf8d69288fbee4904\n\
+            parent 1111111111111111111111111111111111111111\n\
+            author Jean-Luc Picard <picard@example.com> 1700000000 +0130\n\
+            committer Jean-Luc Picard <picard@example.com> 1700000000 +0130\n\
+            \n\
+            Engage\n";
+        let commit = parse_commit(raw).unwrap();
+        assert_eq!(commit.parents.len(), 1);
+        assert_eq!(commit.email, "picard@example.com");
+        assert_eq!(commit.message, "Engage\n");
+        assert_eq!(
+            iso_timestamp(commit.time, commit.offset_minutes),
+            "2023-11-14T23:43:20+01:30"
+        );
+        assert_eq!(iso_timestamp(0, -300), "1969-12-31T19:00:00-05:00");
+    }
+}
@@ -0,0 +1,262 @@
+use pyo3::exceptions::PyRuntimeError;
+use pyo3::prelude::*;
+use rayon::prelude::*;
+use sha3::{Digest, Sha3_256};
+use std::fs::File;
+use std::io::Read;
+use std::path::Path;
+
+use crate::repo_config;
+use crate::trace::{self, Counter};
+
+/// Repository format versions, recorded as `core.format_version` in
+/// `.dock/config.toml`. Spacedocks without the key predate it and use SHA3.
+pub const FORMAT_VERSION_SHA3: i64 = repo_config::DEFAULT_FORMAT_VERSION;
+pub const FORMAT_VERSION_BLAKE3: i64 = 2;
+
+/// Inputs at least this large are hashed across all cores in BLAKE3 mode;
+/// below it the thread handoff costs more than it saves.
+const PARALLEL_THRESHOLD: usize = 128 * 1024;
+
+#[derive(Clone, Copy, Debug, PartialEq, Eq)]
+pub enum HashAlgorithm {
+    Sha3_256,
+    Blake3,
+}
+
+impl HashAlgorithm {
+    pub fn from_format_version(version: i64) -> Result<Self, String> {
+        match version {
+            FORMAT_VERSION_SHA3 => Ok(HashAlgorithm::Sha3_256),
+            FORMAT_VERSION_BLAKE3 => Ok(HashAlgorithm::Blake3),
+            _ => Err(format!(
+                "Unsupported spacedock format version {}; upgrade ruxpy",
+                version
+            )),
+        }
+    }
+
+    pub fn from_name(name: &str) -> Result<Self, String> {
+        match name {
+            "sha3-256" => Ok(HashAlgorithm::Sha3_256),
+            "blake3" => Ok(HashAlgorithm::Blake3),
+            _ => Err(format!("Unknown hash algorithm '{}'", name)),
+        }
+    }
+
+    pub fn name(self) -> &'static str {
+        match self {
+            HashAlgorithm::Sha3_256 => "sha3-256",
+            HashAlgorithm::Blake3 => "blake3",
+        }
+    }
+
+    pub fn format_version(self) -> i64 {
+        match self {
+            HashAlgorithm::Sha3_256 => FORMAT_VERSION_SHA3,
+            HashAlgorithm::Blake3 => FORMAT_VERSION_BLAKE3,
+        }
+    }
+}
+
+/// Incremental form of [`hash_bytes`] for data that arrives in pieces.
+pub enum Hasher {
+    Sha3_256(Sha3_256),
+    Blake3(Box<blake3::Hasher>),
+}
+
+impl Hasher {
+    pub fn new(algorithm: HashAlgorithm) -> Self {
+        match algorithm {
+            HashAlgorithm::Sha3_256 => Hasher::Sha3_256(Sha3_256::new()),
+            HashAlgorithm::Blake3 => Hasher::Blake3(Box::new(blake3::Hasher::new())),
+        }
+    }
+
+    pub fn update(&mut self, data: &[u8]) {
+        trace::add(Counter::BytesHashed, data.len() as u64);
+        match self {
+            Hasher::Sha3_256(h) => h.update(data),
+            Hasher::Blake3(h) => {
+                if data.len() >= PARALLEL_THRESHOLD {
+                    h.update_rayon(data);
+                } else {
+                    h.update(data);
+                }
+            }
+        };
+    }
+
+    pub fn finalize(self) -> String {
+        match self {
+            Hasher::Sha3_256(h) => format!("{:x}", h.finalize()),
+            Hasher::Blake3(h) => h.finalize().to_hex().to_string(),
+        }
+    }
+}
+
+impl std::io::Write for Hasher {
+    fn write(&mut self, buf: &[u8]) -> std::io::Result<usize> {
+        self.update(buf);
+        Ok(buf.len())
+    }
+
+    fn flush(&mut self) -> std::io::Result<()> {
+        Ok(())
+    }
+}
+
+/// Object id of `data` as lowercase hex. Every object hash in ruxpy, from
+/// Rust or Python, goes through here.
+pub fn hash_bytes(algorithm: HashAlgorithm, data: &[u8]) -> String {
+    let mut h = Hasher::new(algorithm);
+    h.update(data);
+    h.finalize()
+}
+
+/// Hashes a file without keeping its contents; large files are memory
+/// mapped and tree-hashed in parallel in BLAKE3 mode.
+pub fn hash_file(algorithm: HashAlgorithm, path: &Path) -> Result<String, String> {
+    let err = |e: std::io::Error| format!("Failed to hash {}: {}", path.display(), e);
+    match algorithm {
+        HashAlgorithm::Sha3_256 => {
+            let mut file = File::open(path).map_err(err)?;
+            let mut h = Hasher::new(algorithm);
+            let mut buf = vec![0u8; 64 * 1024];
+            loop {
+                let n = file.read(&mut buf).map_err(err)?;
+                if n == 0 {
+                    break;
+                }
+                h.update(&buf[..n]);
+            }
+            Ok(h.finalize())
+        }
+        HashAlgorithm::Blake3 => {
+            let mut h = blake3::Hasher::new();
+            h.update_mmap_rayon(path).map_err(err)?;
+            trace::add(Counter::BytesHashed, h.count());
+            Ok(h.finalize().to_hex().to_string())
+        }
+    }
+}
+
+/// Hash algorithm selected by the format version of the spacedock at `root`.
+pub fn repo_algorithm(root: &Path) -> Result<HashAlgorithm, String> {
+    HashAlgorithm::from_format_version(repo_config::core_config(root)?.format_version)
+}
+
+/// Hashes with the algorithm of the spacedock at `repo_path`.
+#[pyfunction]
+pub fn hash_object(py: Python<'_>, repo_path: &str, data: &[u8]) -> PyResult<String> {
+    let algorithm = repo_algorithm(Path::new(repo_path)).map_err(PyRuntimeError::new_err)?;
+    Ok(py.allow_threads(|| hash_bytes(algorithm, data)))
+}
+
+/// Hashes `file_path` (relative to `repo_path` or absolute) with the
+/// algorithm of the spacedock at `repo_path`.
+#[pyfunction]
+pub fn hash_file_object(py: Python<'_>, repo_path: &str, file_path: &str) -> PyResult<String> {
+    let root = Path::new(repo_path);
+    let algorithm = repo_algorithm(root).map_err(PyRuntimeError::new_err)?;
+    let path = root.join(file_path);
+    py.allow_threads(|| hash_file(algorithm, &path))
+        .map_err(PyRuntimeError::new_err)
+}
+
+/// Hashes many files (relative to `repo_path` or absolute) across all
+/// cores; digests are returned in the order of `file_paths`.
+#[pyfunction]
+pub fn hash_file_objects(
+    py: Python<'_>,
+    repo_path: &str,
+    file_paths: Vec<String>,
+) -> PyResult<Vec<String>> {
+    let root = Path::new(repo_path);
+    let algorithm = repo_algorithm(root).map_err(PyRuntimeError::new_err)?;
+    py.allow_threads(|| {
+        file_paths
+            .par_iter()
+            .map(|file_path| hash_file(algorithm, &root.join(file_path)))
+            .collect::<Result<Vec<_>, _>>()
+    })
+    .map_err(PyRuntimeError::new_err)
+}
+
+/// Format version to record in a new spacedock for the named algorithm.
+#[pyfunction]
+pub fn format_version_for(algorithm: &str) -> PyResult<i64> {
+    HashAlgorithm::from_name(algorithm)
+        .map(HashAlgorithm::format_version)
+        .map_err(PyRuntimeError::new_err)
+}
+
+/// Name of the hash algorithm used by the spacedock at `repo_path`.
+#[pyfunction]
+pub fn get_hash_algorithm(repo_path: &str) -> PyResult<&'static str> {
+    repo_algorithm(Path::new(repo_path))
+        .map(HashAlgorithm::name)
+        .map_err(PyRuntimeError::new_err)
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use crate::repo_config::CONFIG_FILE;
+    use std::fs;
+
+    fn repo_with_config(contents: &str) -> tempfile::TempDir {
+        let dir = tempfile::tempdir().unwrap();
+        fs::create_dir_all(dir.path().join(".dock")).unwrap();
+        fs::write(dir.path().join(".dock").join(CONFIG_FILE), contents).unwrap();
+        dir
+    }
+
+    #[test]
+    fn test_missing_format_version_means_sha3() {
+        let repo = repo_with_config("# config.toml\nusername = \"picard\"\n");
+        assert_eq!(
+            repo_algorithm(repo.path()).unwrap(),
+            HashAlgorithm::Sha3_256
+        );
+    }
+
+    #[test]
+    fn test_format_version_selects_blake3() {
+        let repo = repo_with_config("[core]\nformat_version = 2\n");
+        assert_eq!(repo_algorithm(repo.path()).unwrap(), HashAlgorithm::Blake3);
+    }
+
+    #[test]
+    fn test_unknown_format_version_is_rejected() {
+        let repo = repo_with_config("[core]\nformat_version = 99\n");
+        assert!(repo_algorithm(repo.path()).is_err());
+    }
+
+    #[test]
+    fn test_hash_file_matches_hash_bytes() {
+        let dir = tempfile::tempdir().unwrap();
+        let path = dir.path().join("big.bin");
+        let data: Vec<u8> = (0..1_000_000u32).map(|i| (i % 251) as u8).collect();
+        fs::write(&path, &data).unwrap();
+
+        for algorithm in [HashAlgorithm::Sha3_256, HashAlgorithm::Blake3] {
+            assert_eq!(
+                hash_file(algorithm, &path).unwrap(),
+                hash_bytes(algorithm, &data)
+            );
+        }
+    }
+
+    #[test]
+    fn test_known_digests() {
+        assert_eq!(
+            hash_bytes(HashAlgorithm::Sha3_256, b""),
+            "a7ffc6f8bf1ed76651c14756a061d662f580ff4de43b49fa82d80a4b80f8434a"
+        );
+        assert_eq!(
+            hash_bytes(HashAlgorithm::Blake3, b""),
+            "af1349b9f5f9a1a6a0404dea36dcc9499bcb25c9adc112b7cc9a93cae41f3262"
+        );
+    }
+}
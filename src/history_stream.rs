@@ -0,0 +1,801 @@
+//! A line-oriented stream of blobs, starlogs and course resets for moving
+//! whole histories in and out of a spacedock in one process:
+//!
+//! ```text
+//! blob
+//! mark :1
+//! data 5
+//! hello
+//! reset core
+//! starlog core
+//! mark :2
+//! author Jean-Luc Picard <picard@example.com>
+//! timestamp 2024-01-01T00:00:00
+//! data 7
+//! message
+//! from :1            (parent; defaults to the course's current tip)
+//! deleteall          (start from an empty tree instead of the parent's)
+//! M :1 greeting.txt  (blob mark or id, then the path)
+//! D old.txt
+//!
+//! reset feature
+//! from :2
+//! done
+//! ```
+//!
+//! `data <n>` is followed by exactly `n` raw bytes. `reset` without `from`
+//! makes the course's next starlog a root.
+
+use pyo3::exceptions::PyRuntimeError;
+use pyo3::prelude::*;
+use pyo3::types::{PyBytes, PyDict};
+use rayon::prelude::*;
+use serde_json::{json, Value};
+use std::collections::{BTreeMap, HashMap, HashSet};
+use std::fs;
+use std::io::{self, BufRead, BufReader, BufWriter, Read, Write};
+use std::path::{Path, PathBuf};
+use std::sync::Arc;
+
+use crate::chunking;
+use crate::hashing::{self, HashAlgorithm};
+use crate::object_store::{self, ObjectStore};
+use crate::reachability;
+use crate::refs;
+use crate::repo_config;
+use crate::revision::{self, PyFileWriter, STREAM_BUFFER};
+use crate::trace;
+
+/// Objects and starlogs are buffered and written in parallel batches of at
+/// most this many files or bytes.
+const BATCH_OBJECTS: usize = 4096;
+const BATCH_BYTES: usize = 64 << 20;
+/// Trees of recently imported starlogs kept to apply the next starlog's
+/// changes without reading its parent back.
+const TREE_CACHE: usize = 64;
+
+/// Flat tree, `path -> blob id`.
+pub(crate) type Tree = BTreeMap<String, String>;
+
+/// Who recorded a starlog, when and why.
+pub(crate) struct Signature {
+    pub author: String,
+    pub email: String,
+    pub timestamp: String,
+    pub message: String,
+}
+
+#[derive(Default, Debug, Clone, Copy, PartialEq, Eq)]
+pub struct ImportReport {
+    pub blobs: u64,
+    pub starlogs: u64,
+    pub courses: u64,
+}
+
+#[derive(Default, Debug, Clone, Copy, PartialEq, Eq)]
+pub struct ExportReport {
+    pub blobs: u64,
+    pub starlogs: u64,
+}
+
+fn tree_from_json(tree: serde_json::Map<String, Value>) -> Tree {
+    tree.into_iter()
+        .map(|(path, hash)| (path, hash.as_str().unwrap_or_default().to_string()))
+        .collect()
+}
+
+fn str_field<'a>(value: &'a Value, key: &str) -> &'a str {
+    value.get(key).and_then(Value::as_str).unwrap_or_default()
+}
+
+/// Current tip of `course`, `None` when it has no starlogs or does not
+/// exist.
+fn read_tip(repo: &Path, course: &str) -> Result<Option<String>, String> {
+    Ok(refs::course_tip(&reachability::helm_dir(repo), course)?.filter(|tip| !tip.is_empty()))
+}
+
+pub(crate) fn check_course_name(course: &str) -> Result<(), String> {
+    if course.is_empty()
+        || course.starts_with('.')
+        || course.contains(['/', '\\'])
+        || refs::is_lock_file(course)
+    {
+        return Err(format!("Invalid course name '{}'", course));
+    }
+    Ok(())
+}
+
+/// Where a queued write goes.
+enum Target {
+    /// An object, by id, in the spacedock's object store.
+    Object(String),
+    /// A starlog file.
+    File(PathBuf),
+}
+
+/// Objects and starlogs waiting to be written.
+pub(crate) struct Batch {
+    store: Arc<dyn ObjectStore>,
+    pending: Vec<(Target, Vec<u8>)>,
+    bytes: usize,
+    /// Objects known to be stored or queued.
+    known: HashSet<String>,
+}
+
+impl Batch {
+    pub(crate) fn new(repo: &Path) -> Result<Batch, String> {
+        Ok(Batch {
+            store: object_store::open(repo)?,
+            pending: Vec::new(),
+            bytes: 0,
+            known: HashSet::new(),
+        })
+    }
+
+    fn push(&mut self, target: Target, data: Vec<u8>) -> Result<(), String> {
+        self.bytes += data.len();
+        self.pending.push((target, data));
+        if self.pending.len() >= BATCH_OBJECTS || self.bytes >= BATCH_BYTES {
+            self.flush()?;
+        }
+        Ok(())
+    }
+
+    pub(crate) fn flush(&mut self) -> Result<(), String> {
+        let _span = trace::span("import_write_batch");
+        self.pending
+            .par_iter()
+            .try_for_each(|(target, data)| match target {
+                Target::Object(hash) => chunking::put_into(&*self.store, hash, data),
+                Target::File(path) => chunking::write_object(path, data),
+            })?;
+        self.pending.clear();
+        self.bytes = 0;
+        Ok(())
+    }
+
+    pub(crate) fn has_object(&self, repo: &Path, hash: &str) -> bool {
+        self.known.contains(hash) || chunking::blob_exists(repo, hash)
+    }
+
+    /// Records an object that was written outside the batch.
+    pub(crate) fn mark_stored(&mut self, hash: String) {
+        self.known.insert(hash);
+    }
+
+    pub(crate) fn queue_object(
+        &mut self,
+        repo: &Path,
+        hash: &str,
+        data: Vec<u8>,
+    ) -> Result<(), String> {
+        if self.has_object(repo, hash) {
+            trace::add(trace::Counter::ObjectsSkipped, 1);
+        } else {
+            self.push(Target::Object(hash.to_string()), data)?;
+        }
+        self.known.insert(hash.to_string());
+        Ok(())
+    }
+
+    /// Queues a starlog recording `tree`, and the tree object; returns the
+    /// starlog id. Starlogs are serialized canonically, so the same history
+    /// always gets the same ids.
+    pub(crate) fn queue_starlog(
+        &mut self,
+        repo: &Path,
+        algorithm: HashAlgorithm,
+        tree: &Tree,
+        parent: Option<&str>,
+        signature: &Signature,
+    ) -> Result<String, String> {
+        let tree_json =
+            serde_json::to_vec(tree).map_err(|e| format!("Failed to serialize tree: {}", e))?;
+        let tree_hash = hashing::hash_bytes(algorithm, &tree_json);
+        self.queue_object(repo, &tree_hash, tree_json)?;
+
+        let starlog = json!({
+            "author": signature.author,
+            "email": signature.email,
+            "files": tree,
+            "message": signature.message,
+            "parent": parent,
+            "timestamp": signature.timestamp,
+            "tree": tree_hash,
+        });
+        let bytes = serde_json::to_vec(&starlog)
+            .map_err(|e| format!("Failed to serialize starlog: {}", e))?;
+        let hash = hashing::hash_bytes(algorithm, &bytes);
+        self.push(Target::File(reachability::starlog_path(repo, &hash)), bytes)?;
+        Ok(hash)
+    }
+}
+
+/// Reader that counts the line feeds passing through it, so line numbers
+/// in errors stay right after a data block.
+struct LineCounter<R> {
+    inner: R,
+    lines: u64,
+}
+
+impl<R: Read> Read for LineCounter<R> {
+    fn read(&mut self, buf: &mut [u8]) -> io::Result<usize> {
+        let n = self.inner.read(buf)?;
+        self.lines += buf[..n].iter().filter(|&&b| b == b'\n').count() as u64;
+        Ok(n)
+    }
+}
+
+struct Importer<'a, R> {
+    repo: &'a Path,
+    input: R,
+    line_no: u64,
+    peeked: Option<String>,
+    algorithm: HashAlgorithm,
+    chunk_threshold: u64,
+    batch: Batch,
+    marks: HashMap<String, String>,
+    /// Tips of the courses the stream touched.
+    tips: BTreeMap<String, Option<String>>,
+    trees: HashMap<String, Tree>,
+    report: ImportReport,
+}
+
+impl<'a, R: BufRead> Importer<'a, R> {
+    fn error(&self, message: impl std::fmt::Display) -> String {
+        format!("line {}: {}", self.line_no, message)
+    }
+
+    /// Next line without its line ending; `None` at the end of the stream.
+    fn next_line(&mut self) -> Result<Option<String>, String> {
+        if let Some(line) = self.peeked.take() {
+            return Ok(Some(line));
+        }
+        let mut buf = Vec::new();
+        let n = self
+            .input
+            .read_until(b'\n', &mut buf)
+            .map_err(|e| format!("Failed to read stream: {}", e))?;
+        if n == 0 {
+            return Ok(None);
+        }
+        self.line_no += 1;
+        if buf.last() == Some(&b'\n') {
+            buf.pop();
+        }
+        String::from_utf8(buf)
+            .map(Some)
+            .map_err(|_| self.error("line is not valid UTF-8"))
+    }
+
+    /// Consumes the next line if it starts with `keyword`, returning the
+    /// rest of it.
+    fn optional(&mut self, keyword: &str) -> Result<Option<String>, String> {
+        let Some(line) = self.next_line()? else {
+            return Ok(None);
+        };
+        match line.strip_prefix(keyword) {
+            Some(rest) if rest.is_empty() || rest.starts_with(' ') => {
+                Ok(Some(rest.trim_start().to_string()))
+            }
+            _ => {
+                self.peeked = Some(line);
+                Ok(None)
+            }
+        }
+    }
+
+    fn required(&mut self, keyword: &str) -> Result<String, String> {
+        self.optional(keyword)?
+            .ok_or_else(|| self.error(format!("expected '{}'", keyword)))
+    }
+
+    fn data_len(&mut self) -> Result<u64, String> {
+        let len = self.required("data")?;
+        len.parse()
+            .map_err(|_| self.error(format!("invalid data length '{}'", len)))
+    }
+
+    /// Skips the optional line feed after a `data` payload.
+    fn end_data(&mut self) -> Result<(), String> {
+        let buf = self
+            .input
+            .fill_buf()
+            .map_err(|e| format!("Failed to read stream: {}", e))?;
+        if buf.first() == Some(&b'\n') {
+            self.input.consume(1);
+            self.line_no += 1;
+        }
+        Ok(())
+    }
+
+    /// The `len` bytes of a data block whose `data` line was read.
+    fn read_payload(&mut self, len: u64) -> Result<Vec<u8>, String> {
+        let mut data = Vec::with_capacity(len as usize);
+        (&mut self.input)
+            .take(len)
+            .read_to_end(&mut data)
+            .map_err(|e| format!("Failed to read stream: {}", e))?;
+        self.line_no += data.iter().filter(|&&b| b == b'\n').count() as u64;
+        if data.len() as u64 != len {
+            return Err(self.error("stream ended inside a data block"));
+        }
+        self.end_data()?;
+        Ok(data)
+    }
+
+    fn blob(&mut self) -> Result<(), String> {
+        let mark = self.optional("mark")?;
+        let len = self.data_len()?;
+        let hash = if self.chunk_threshold > 0 && len >= self.chunk_threshold {
+            // Large blobs are chunked straight from the stream
+            let mut reader = LineCounter {
+                inner: (&mut self.input).take(len),
+                lines: 0,
+            };
+            let hash = chunking::save_chunked_from(self.repo, self.algorithm, &mut reader)?;
+            self.line_no += reader.lines;
+            if reader.inner.limit() > 0 {
+                return Err(self.error("stream ended inside a data block"));
+            }
+            self.end_data()?;
+            self.batch.mark_stored(hash.clone());
+            hash
+        } else {
+            let data = self.read_payload(len)?;
+            let hash = hashing::hash_bytes(self.algorithm, &data);
+            self.batch.queue_object(self.repo, &hash, data)?;
+            hash
+        };
+        self.report.blobs += 1;
+        if let Some(mark) = mark {
+            self.marks.insert(mark, hash);
+        }
+        Ok(())
+    }
+
+    fn tip(&mut self, course: &str) -> Result<Option<String>, String> {
+        if let Some(tip) = self.tips.get(course) {
+            return Ok(tip.clone());
+        }
+        read_tip(self.repo, course)
+    }
+
+    /// Starlog named by a `from` line: a mark, a course or a starlog id.
+    fn resolve_starlog(&mut self, rev: &str) -> Result<String, String> {
+        if rev.starts_with(':') {
+            return self
+                .marks
+                .get(rev)
+                .cloned()
+                .ok_or_else(|| self.error(format!("unknown mark {}", rev)));
+        }
+        if let Some(tip) = self.tips.get(rev) {
+            return tip
+                .clone()
+                .ok_or_else(|| self.error(format!("course {} has no starlogs", rev)));
+        }
+        self.batch.flush()?;
+        revision::resolve_starlog(self.repo, rev).map_err(|e| self.error(e))
+    }
+
+    fn tree_of(&mut self, starlog: &str) -> Result<Tree, String> {
+        if let Some(tree) = self.trees.get(starlog) {
+            return Ok(tree.clone());
+        }
+        self.batch.flush()?;
+        revision::load_tree(self.repo, starlog).map(tree_from_json)
+    }
+
+    fn blob_ref(&mut self, dataref: &str) -> Result<String, String> {
+        if dataref.starts_with(':') {
+            return self
+                .marks
+                .get(dataref)
+                .cloned()
+                .ok_or_else(|| self.error(format!("unknown mark {}", dataref)));
+        }
+        if self.batch.has_object(self.repo, dataref) {
+            return Ok(dataref.to_string());
+        }
+        Err(self.error(format!("blob {} is not in the object store", dataref)))
+    }
+
+    fn starlog(&mut self, course: &str) -> Result<(), String> {
+        check_course_name(course).map_err(|e| self.error(e))?;
+        let mark = self.optional("mark")?;
+        let author = self.required("author")?;
+        let (name, email) = author
+            .strip_suffix('>')
+            .and_then(|rest| rest.rsplit_once('<'))
+            .map(|(name, email)| (name.trim().to_string(), email.to_string()))
+            .ok_or_else(|| self.error("expected 'author <name> <<email>>'"))?;
+        let timestamp = self.required("timestamp")?;
+        let len = self.data_len()?;
+        let message = self.read_payload(len)?;
+        let message =
+            String::from_utf8(message).map_err(|_| self.error("message is not valid UTF-8"))?;
+
+        let parent = match self.optional("from")? {
+            Some(rev) => Some(self.resolve_starlog(&rev)?),
+            None => self.tip(course)?,
+        };
+        let mut tree = match &parent {
+            Some(parent) => self.tree_of(parent)?,
+            None => Tree::new(),
+        };
+
+        while let Some(line) = self.next_line()? {
+            if line.is_empty() {
+                break;
+            }
+            if line == "deleteall" {
+                tree.clear();
+            } else if let Some(rest) = line.strip_prefix("M ") {
+                let (dataref, path) = rest
+                    .split_once(' ')
+                    .ok_or_else(|| self.error("expected 'M <blob> <path>'"))?;
+                let hash = self.blob_ref(dataref)?;
+                tree.insert(path.to_string(), hash);
+            } else if let Some(path) = line.strip_prefix("D ") {
+                tree.remove(path);
+            } else {
+                self.peeked = Some(line);
+                break;
+            }
+        }
+
+        let signature = Signature {
+            author: name,
+            email,
+            timestamp,
+            message,
+        };
+        let hash = self.batch.queue_starlog(
+            self.repo,
+            self.algorithm,
+            &tree,
+            parent.as_deref(),
+            &signature,
+        )?;
+
+        if self.trees.len() >= TREE_CACHE {
+            self.trees.clear();
+        }
+        self.trees.insert(hash.clone(), tree);
+        if let Some(mark) = mark {
+            self.marks.insert(mark, hash.clone());
+        }
+        self.tips.insert(course.to_string(), Some(hash));
+        self.report.starlogs += 1;
+        Ok(())
+    }
+
+    fn reset(&mut self, course: &str) -> Result<(), String> {
+        check_course_name(course).map_err(|e| self.error(e))?;
+        let tip = match self.optional("from")? {
+            Some(rev) => Some(self.resolve_starlog(&rev)?),
+            None => None,
+        };
+        self.tips.insert(course.to_string(), tip);
+        Ok(())
+    }
+
+    fn run(&mut self) -> Result<(), String> {
+        while let Some(line) = self.next_line()? {
+            let (command, arg) = line.split_once(' ').unwrap_or((line.as_str(), ""));
+            let arg = arg.trim().to_string();
+            match command {
+                "" | "#" => {}
+                _ if command.starts_with('#') => {}
+                "blob" => self.blob()?,
+                "starlog" => self.starlog(&arg)?,
+                "reset" => self.reset(&arg)?,
+                "done" => break,
+                _ => return Err(self.error(format!("unknown command '{}'", command))),
+            }
+        }
+        Ok(())
+    }
+
+    /// Writes the remaining objects, then the course refs, so a course never
+    /// names a starlog that is not stored yet.
+    fn finish(&mut self) -> Result<(), String> {
+        self.batch.flush()?;
+        let helm = reachability::helm_dir(self.repo);
+        fs::create_dir_all(&helm).map_err(|e| format!("Failed to create courses dir: {}", e))?;
+        for (course, tip) in &self.tips {
+            refs::write_ref(&helm.join(course), tip.as_deref().unwrap_or_default())?;
+        }
+        self.report.courses = self.tips.len() as u64;
+        Ok(())
+    }
+}
+
+/// Imports the stream `input` into the spacedock at `repo`. Starlogs
+/// completed before an error in the stream are kept, with their courses.
+pub fn import(repo: &Path, input: impl Read) -> Result<ImportReport, String> {
+    let _span = trace::span("fast_import");
+    let config = repo_config::core_config(repo)?;
+    let mut importer = Importer {
+        repo,
+        input: BufReader::with_capacity(STREAM_BUFFER, input),
+        line_no: 0,
+        peeked: None,
+        algorithm: HashAlgorithm::from_format_version(config.format_version)?,
+        chunk_threshold: config.chunk_threshold,
+        batch: Batch::new(repo)?,
+        marks: HashMap::new(),
+        tips: BTreeMap::new(),
+        trees: HashMap::new(),
+        report: ImportReport::default(),
+    };
+    let result = importer.run();
+    importer.finish()?;
+    result.map(|_| importer.report)
+}
+
+/// Writes the history of `courses` (every course when empty) to `out`,
+/// each starlog after its parent and each blob once, before the first
+/// starlog that uses it.
+pub fn export(
+    repo: &Path,
+    courses: &[String],
+    out: &mut impl Write,
+) -> Result<ExportReport, String> {
+    let _span = trace::span("fast_export");
+    let tips = if courses.is_empty() {
+        reachability::course_tips(repo)?
+    } else {
+        courses
+            .iter()
+            .map(|course| match read_tip(repo, course)? {
+                Some(tip) => Ok((course.clone(), tip)),
+                None => Err(format!("Course {} has no starlogs", course)),
+            })
+            .collect::<Result<_, String>>()?
+    };
+
+    let err = |e: io::Error| format!("Failed to write stream: {}", e);
+    let mut next_mark = 0u64;
+    let mut blob_marks: HashMap<String, u64> = HashMap::new();
+    let mut starlog_marks: HashMap<String, u64> = HashMap::new();
+    let mut report = ExportReport::default();
+
+    for (course, tip) in &tips {
+        // Walk back to a root or to a starlog another course already wrote
+        let mut chain = Vec::new();
+        let mut cursor = Some(tip.clone());
+        while let Some(hash) = cursor {
+            if starlog_marks.contains_key(&hash) {
+                break;
+            }
+            let starlog = revision::load_starlog(repo, &hash)?;
+            cursor = starlog
+                .get("parent")
+                .and_then(Value::as_str)
+                .map(str::to_string);
+            chain.push((hash, starlog));
+        }
+        chain.reverse();
+
+        let mut parent_tree: Option<(String, Tree)> = None;
+        for (hash, starlog) in chain {
+            let parent = starlog.get("parent").and_then(Value::as_str);
+            let tree = tree_from_json(revision::load_tree(repo, &hash)?);
+            let base = match (parent, parent_tree.take()) {
+                (Some(p), Some((id, tree))) if p == id => tree,
+                (Some(p), _) => tree_from_json(revision::load_tree(repo, p)?),
+                (None, _) => Tree::new(),
+            };
+
+            for (path, blob) in &tree {
+                if base.get(path) == Some(blob) || blob_marks.contains_key(blob) {
+                    continue;
+                }
+                next_mark += 1;
+                let size = chunking::blob_size(repo, blob)?;
+                write!(out, "blob\nmark :{}\ndata {}\n", next_mark, size).map_err(err)?;
+                chunking::copy_blob_to(repo, blob, out)?;
+                out.write_all(b"\n").map_err(err)?;
+                blob_marks.insert(blob.clone(), next_mark);
+                report.blobs += 1;
+            }
+
+            if parent.is_none() {
+                writeln!(out, "reset {}", course).map_err(err)?;
+            }
+            next_mark += 1;
+            let message = str_field(&starlog, "message");
+            write!(
+                out,
+                "starlog {}\nmark :{}\nauthor {} <{}>\ntimestamp {}\ndata {}\n{}\n",
+                course,
+                next_mark,
+                str_field(&starlog, "author"),
+                str_field(&starlog, "email"),
+                str_field(&starlog, "timestamp"),
+                message.len(),
+                message
+            )
+            .map_err(err)?;
+            if let Some(parent) = parent {
+                match starlog_marks.get(parent) {
+                    Some(mark) => writeln!(out, "from :{}", mark),
+                    None => writeln!(out, "from {}", parent),
+                }
+                .map_err(err)?;
+            }
+            for (path, blob) in &tree {
+                if base.get(path) != Some(blob) {
+                    writeln!(out, "M :{} {}", blob_marks[blob], path).map_err(err)?;
+                }
+            }
+            for path in base.keys() {
+                if !tree.contains_key(path) {
+                    writeln!(out, "D {}", path).map_err(err)?;
+                }
+            }
+            out.write_all(b"\n").map_err(err)?;
+
+            starlog_marks.insert(hash.clone(), next_mark);
+            parent_tree = Some((hash, tree));
+            report.starlogs += 1;
+        }
+
+        if parent_tree.is_none() {
+            // The tip was already written for another course
+            writeln!(out, "reset {}\nfrom :{}\n", course, starlog_marks[tip]).map_err(err)?;
+        }
+    }
+    out.write_all(b"done\n").map_err(err)?;
+    Ok(report)
+}
+
+/// Reads from a Python binary file object, taking the GIL per call.
+struct PyFileReader(PyObject);
+
+impl Read for PyFileReader {
+    fn read(&mut self, buf: &mut [u8]) -> io::Result<usize> {
+        Python::with_gil(|py| {
+            let chunk = self
+                .0
+                .call_method1(py, "read", (buf.len(),))
+                .map_err(|e| io::Error::other(e.to_string()))?;
+            let chunk = chunk
+                .bind(py)
+                .downcast::<PyBytes>()
+                .map_err(|e| io::Error::other(e.to_string()))?;
+            let data = chunk.as_bytes();
+            buf[..data.len()].copy_from_slice(data);
+            Ok(data.len())
+        })
+    }
+}
+
+#[pyclass]
+pub struct HistoryStream;
+
+#[pymethods]
+impl HistoryStream {
+    /// Import the stream read from the binary file object `file`; returns
+    /// the counts of blobs, starlogs and courses as a dict.
+    #[staticmethod]
+    fn import_stream(py: Python<'_>, repo_path: &str, file: PyObject) -> PyResult<PyObject> {
+        let report = py
+            .allow_threads(|| import(Path::new(repo_path), PyFileReader(file)))
+            .map_err(PyRuntimeError::new_err)?;
+
+        let dict = PyDict::new(py);
+        dict.set_item("blobs", report.blobs)?;
+        dict.set_item("starlogs", report.starlogs)?;
+        dict.set_item("courses", report.courses)?;
+        Ok(dict.into())
+    }
+
+    /// Write the history of `courses` (all when empty) to the binary file
+    /// object `file`; returns the counts of blobs and starlogs as a dict.
+    #[staticmethod]
+    #[pyo3(signature = (repo_path, file, courses=Vec::new()))]
+    fn export_stream(
+        py: Python<'_>,
+        repo_path: &str,
+        file: PyObject,
+        courses: Vec<String>,
+    ) -> PyResult<PyObject> {
+        let report = py
+            .allow_threads(|| {
+                let mut out = BufWriter::with_capacity(STREAM_BUFFER, PyFileWriter(file));
+                let report = export(Path::new(repo_path), &courses, &mut out)?;
+                out.flush()
+                    .map_err(|e| format!("Failed to write stream: {}", e))?;
+                Ok::<_, String>(report)
+            })
+            .map_err(PyRuntimeError::new_err)?;
+
+        let dict = PyDict::new(py);
+        dict.set_item("blobs", report.blobs)?;
+        dict.set_item("starlogs", report.starlogs)?;
+        Ok(dict.into())
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn setup() -> tempfile::TempDir {
+        let dir = tempfile::tempdir().unwrap();
+        fs::create_dir_all(dir.path().join(".dock/objects")).unwrap();
+        fs::create_dir_all(dir.path().join(".dock/starlogs")).unwrap();
+        fs::create_dir_all(dir.path().join(".dock/links/helm")).unwrap();
+        dir
+    }
+
+    const STREAM: &str = "blob\nmark :1\ndata 5\nhello\n\
+        blob\nmark :2\ndata 3\nold\n\
+        reset core\n\
+        starlog core\nmark :3\nauthor Jean-Luc Picard <picard@example.com>\n\
+        timestamp 2024-01-01T00:00:00\ndata 5\nfirst\n\
+        M :1 greeting.txt\nM :2 old.txt\n\n\
+        starlog core\nmark :4\nauthor Jean-Luc Picard <picard@example.com>\n\
+        timestamp 2024-01-02T00:00:00\ndata 6\nsecond\nfrom :3\n\
+        D old.txt\n\n\
+        reset feature\nfrom :3\n\
+        done\n";
+
+    #[test]
+    fn test_import_writes_starlogs_and_courses() {
+        let dir = setup();
+        let repo = dir.path();
+        let report = import(repo, STREAM.as_bytes()).unwrap();
+        assert_eq!(
+            report,
+            ImportReport {
+                blobs: 2,
+                starlogs: 2,
+                courses: 2
+            }
+        );
+
+        let core = read_tip(repo, "core").unwrap().unwrap();
+        assert_eq!(
+            revision::lookup_path(repo, &core, "greeting.txt").unwrap(),
+            hashing::hash_bytes(HashAlgorithm::Sha3_256, b"hello")
+        );
+        assert!(revision::lookup_path(repo, &core, "old.txt").is_err());
+        let feature = read_tip(repo, "feature").unwrap().unwrap();
+        assert!(revision::lookup_path(repo, &feature, "old.txt").is_ok());
+        let starlog = revision::load_starlog(repo, &core).unwrap();
+        assert_eq!(starlog["parent"], Value::String(feature));
+    }
+
+    #[test]
+    fn test_export_round_trips_to_the_same_starlogs() {
+        let first = setup();
+        import(first.path(), STREAM.as_bytes()).unwrap();
+        let mut stream = Vec::new();
+        let report = export(first.path(), &[], &mut stream).unwrap();
+        assert_eq!(report.starlogs, 2);
+
+        let second = setup();
+        import(second.path(), stream.as_slice()).unwrap();
+        for course in ["core", "feature"] {
+            assert_eq!(
+                read_tip(first.path(), course).unwrap(),
+                read_tip(second.path(), course).unwrap()
+            );
+        }
+    }
+
+    #[test]
+    fn test_import_reports_the_failing_line() {
+        let dir = setup();
+        let err = import(dir.path(), "blob\ndata 3\nabc\nbogus\n".as_bytes()).unwrap_err();
+        assert!(err.starts_with("line 4:"), "{}", err);
+
+        let stream = "blob\ndata 5\na\nb\nc\nbogus\n";
+        let err = import(dir.path(), stream.as_bytes()).unwrap_err();
+        assert_eq!(err, "line 6: unknown command 'bogus'");
+    }
+}
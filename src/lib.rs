@@ -1,21 +1,63 @@
-mod blob;
-mod courses;
-mod ruxpy_tree;
-mod spacedock;
-mod starlog;
-
+// Modules are public so the Criterion benches in benches/ can reach the
+// primitives directly; Python only sees what `ruxpy` registers below.
+pub mod alternates;
+pub mod ancestry;
+pub mod blob;
+pub mod chunking;
+pub mod clone;
+pub mod courses;
+pub mod dedupe;
+pub mod dircache;
+pub mod fleet;
+pub mod fsck;
+pub mod gc;
+pub mod git_import;
+pub mod git_objects;
+pub mod hashing;
+pub mod history_stream;
+pub mod monitor;
+mod objcache;
+pub mod object_store;
+pub mod pathspec;
+pub mod reachability;
+pub mod refs;
+pub mod repo_config;
+pub mod revision;
+pub mod ruxpy_tree;
+pub mod spacedock;
+pub mod stage;
+pub mod starlog;
+pub mod trace;
+pub mod walker;
+
+use crate::ancestry::Ancestry;
 use crate::blob::Blob;
+use crate::clone::LocalClone;
 use crate::courses::Courses;
+use crate::dedupe::Dedupe;
+use crate::fleet::Fleet;
+use crate::fsck::Fsck;
+use crate::gc::Gc;
+use crate::git_import::GitImport;
+use crate::hashing::{
+    format_version_for, get_hash_algorithm, hash_file_object, hash_file_objects, hash_object,
+};
+use crate::history_stream::HistoryStream;
+use crate::monitor::Monitor;
+use crate::pathspec::expand_pathspecs;
+use crate::refs::Refs;
+use crate::revision::Revision;
 use crate::ruxpy_tree::RuxpyTree;
 use crate::spacedock::Spacedock;
+use crate::stage::Stage;
 use crate::starlog::Starlog;
+use crate::trace::Trace;
+use crate::walker::DockignoreMatcher;
 
-use ignore::gitignore::{Gitignore, GitignoreBuilder};
+use pyo3::exceptions::PyRuntimeError;
 use pyo3::prelude::*;
-use sha3::{Digest, Sha3_256};
 use std::fs;
-use std::path::Path;
-use walkdir::WalkDir;
+use std::path::{Path, PathBuf};
 
 #[pyfunction]
 fn init_object_dir(repo_path: &str) -> PyResult<()> {
@@ -26,93 +68,42 @@ fn init_object_dir(repo_path: &str) -> PyResult<()> {
 
 #[pyfunction]
 fn save_starlog(repo_path: &str, starlog_bytes: Vec<u8>) -> PyResult<String> {
-    let mut hasher = Sha3_256::new();
-    hasher.update(&starlog_bytes);
-    let hash = format!("{:x}", hasher.finalize());
-
-    let (subdir, filename) = hash.split_at(2);
-    let starlog_dir = Path::new(repo_path)
-        .join(".dock")
-        .join("starlogs")
-        .join(subdir);
-    fs::create_dir_all(&starlog_dir)?;
-    let starlog_path = starlog_dir.join(filename);
-
-    fs::write(starlog_path, &starlog_bytes)?;
-
+    let algorithm =
+        hashing::repo_algorithm(Path::new(repo_path)).map_err(PyRuntimeError::new_err)?;
+    let hash = hashing::hash_bytes(algorithm, &starlog_bytes);
+    let starlog_path = reachability::starlog_path(Path::new(repo_path), &hash);
+    chunking::write_object(&starlog_path, &starlog_bytes).map_err(PyRuntimeError::new_err)?;
     Ok(hash)
 }
 
 #[pyfunction]
-fn list_all_files(working_dir: &str) -> PyResult<Vec<String>> {
-    let matcher = get_dockignore_matcher();
+fn list_all_files(py: Python<'_>, working_dir: &str) -> PyResult<Vec<String>> {
     let base = Path::new(working_dir);
-    let files = WalkDir::new(base)
-        .into_iter()
-        .filter_map(|entry| {
-            entry.ok().and_then(|e| {
-                let path = e.path();
-                // Skip internal directories
-                let path_str = path.to_string_lossy();
-                if path_str.contains(".dock")
-                    || path_str.contains("__pycache__")
-                    || path_str.contains(".git")
-                {
-                    return None;
-                }
-
-                if e.file_type().is_file() {
-                    // Get relative path
-                    if let Ok(rel_path) = path.strip_prefix(base) {
-                        if is_ignored(rel_path, &matcher) {
-                            return None;
-                        }
-                        return Some(rel_path.to_string_lossy().to_string());
-                    }
-                    None
-                } else {
-                    None
-                }
-            })
-        })
-        .collect();
-    Ok(files)
-}
-
-/// Reads .dockignore from the current directory and returns a matcher.
-fn get_dockignore_matcher() -> Option<Gitignore> {
-    let dockignore_path = Path::new(".dockignore");
-    if dockignore_path.exists() {
-        let mut builder = GitignoreBuilder::new(".");
-        builder.add(dockignore_path);
-        let gitignore = builder
-            .build()
-            .map_err(|e| {
-                pyo3::exceptions::PyIOError::new_err(format!("Failed to parse .dockignore: {e}"))
-            })
-            .ok()?;
-        Some(gitignore)
-    } else {
-        None
-    }
+    Ok(py.allow_threads(|| working_files(base)))
 }
 
-/// Check if path should be ignored
-fn is_ignored(path: &Path, matcher: &Option<Gitignore>) -> bool {
-    if let Some(gitignore) = matcher {
-        gitignore.matched(path, false).is_ignore()
+/// Working tree files under `base`, from the monitor's journal when it is
+/// running, else from the directory cache of a spacedock, else by walking.
+pub(crate) fn working_files(base: &Path) -> Vec<String> {
+    if let Some(files) = monitor::monitored_files(base) {
+        files
+    } else if base.join(".dock").is_dir() {
+        dircache::list_files(base)
     } else {
-        false
+        walker::walk(base).files
     }
 }
 
 #[pyfunction]
 fn filter_ignored_files(files: Vec<String>) -> PyResult<Vec<String>> {
-    let matcher = get_dockignore_matcher();
+    let cwd = std::env::current_dir()?;
+    let root = Spacedock::find_dock_root(None)
+        .map(PathBuf::from)
+        .unwrap_or_else(|| cwd.clone());
+    let mut matcher = DockignoreMatcher::new(&root);
     let mut result = Vec::new();
     for path_str in files.iter() {
-        let path = std::path::Path::new(&path_str);
-        if !is_ignored(path, &matcher) {
+        if !matcher.is_ignored(&cwd.join(path_str)) {
             result.push(path_str.to_string());
         }
     }
@@ -126,11 +117,30 @@ fn ruxpy(m: &Bound<'_, PyModule>) -> PyResult<()> {
     m.add_function(wrap_pyfunction!(save_starlog, m)?)?;
     m.add_function(wrap_pyfunction!(list_all_files, m)?)?;
     m.add_function(wrap_pyfunction!(filter_ignored_files, m)?)?;
+    m.add_function(wrap_pyfunction!(hash_object, m)?)?;
+    m.add_function(wrap_pyfunction!(hash_file_object, m)?)?;
+    m.add_function(wrap_pyfunction!(hash_file_objects, m)?)?;
+    m.add_function(wrap_pyfunction!(expand_pathspecs, m)?)?;
+    m.add_function(wrap_pyfunction!(get_hash_algorithm, m)?)?;
+    m.add_function(wrap_pyfunction!(format_version_for, m)?)?;
     m.add_class::<Spacedock>()?;
     m.add_class::<Courses>()?;
     m.add_class::<Blob>()?;
     m.add_class::<Starlog>()?;
     m.add_class::<RuxpyTree>()?;
+    m.add_class::<Monitor>()?;
+    m.add_class::<Trace>()?;
+    m.add_class::<Gc>()?;
+    m.add_class::<Fsck>()?;
+    m.add_class::<Revision>()?;
+    m.add_class::<LocalClone>()?;
+    m.add_class::<Dedupe>()?;
+    m.add_class::<Stage>()?;
+    m.add_class::<HistoryStream>()?;
+    m.add_class::<GitImport>()?;
+    m.add_class::<Fleet>()?;
+    m.add_class::<Refs>()?;
+    m.add_class::<Ancestry>()?;
     Ok(())
 }
 
@@ -0,0 +1,494 @@
+use notify::{RecommendedWatcher, RecursiveMode, Watcher};
+use pyo3::exceptions::PyRuntimeError;
+use pyo3::prelude::*;
+use std::collections::{BTreeSet, HashSet};
+use std::fs::{self, File, OpenOptions};
+use std::io::Write;
+use std::path::{Path, PathBuf};
+use std::sync::atomic::{AtomicU64, Ordering};
+use std::sync::mpsc::{self, RecvTimeoutError};
+use std::time::{Duration, Instant, SystemTime, UNIX_EPOCH};
+
+use crate::trace;
+use crate::walker::{self, is_internal_name, to_rel_string, DockignoreMatcher, DOCKIGNORE};
+
+/// State directory of the monitor under `.dock/`.
+pub const MONITOR_DIR: &str = "monitor";
+const PID_FILE: &str = "pid";
+const HEARTBEAT_FILE: &str = "heartbeat";
+const SNAPSHOT_FILE: &str = "snapshot";
+const JOURNAL_FILE: &str = "journal";
+/// Readers create files here for the monitor to journal; see `sync_journal`.
+const COOKIE_DIR: &str = "cookies";
+
+const HEARTBEAT_INTERVAL: Duration = Duration::from_secs(1);
+/// A monitor that has not written a heartbeat for this long is ignored.
+const STALE_AFTER_NS: u64 = 5_000_000_000;
+/// Journal length after which the monitor rewrites its snapshot.
+const COMPACT_AFTER: usize = 10_000;
+/// How long a reader waits for its cookie before walking the tree instead.
+const COOKIE_TIMEOUT: Duration = Duration::from_secs(1);
+const COOKIE_POLL: Duration = Duration::from_millis(2);
+
+static COOKIE_SEQ: AtomicU64 = AtomicU64::new(0);
+
+fn now_ns() -> u64 {
+    SystemTime::now()
+        .duration_since(UNIX_EPOCH)
+        .map(|d| d.as_nanos() as u64)
+        .unwrap_or(0)
+}
+
+fn monitor_dir(root: &Path) -> PathBuf {
+    root.join(".dock").join(MONITOR_DIR)
+}
+
+/// Journal line for a cookie; it is under `.dock`, so it never names a
+/// working tree file.
+fn cookie_line(name: &str) -> String {
+    format!(".dock/{}/{}/{}", MONITOR_DIR, COOKIE_DIR, name)
+}
+
+fn write_atomic(path: &Path, contents: &[u8]) -> std::io::Result<()> {
+    let dir = path.parent().unwrap_or(Path::new("."));
+    let mut tmp = tempfile::NamedTempFile::new_in(dir)?;
+    tmp.write_all(contents)?;
+    tmp.persist(path).map_err(|e| e.error)?;
+    Ok(())
+}
+
+/// Watches the working tree and keeps a dirty-path journal on top of a
+/// snapshot of the file list.
+struct Daemon<'a> {
+    root: &'a Path,
+    dir: PathBuf,
+    watcher: RecommendedWatcher,
+    watched: HashSet<PathBuf>,
+    journal: File,
+    journal_len: usize,
+}
+
+impl Daemon<'_> {
+    fn watch_dir(&mut self, dir: PathBuf) {
+        if self.watched.contains(&dir) {
+            return;
+        }
+        if self
+            .watcher
+            .watch(&dir, RecursiveMode::NonRecursive)
+            .is_ok()
+        {
+            self.watched.insert(dir);
+        }
+    }
+
+    /// Starts watching any directory that is not watched yet, rewrites the
+    /// snapshot from a full walk and truncates the journal. Every directory
+    /// in the snapshot is watched before the walk that listed it, so a file
+    /// created between the walk and the watch cannot be missed; a walk that
+    /// finds unwatched directories is repeated once they are watched.
+    fn resnapshot(&mut self) -> Result<(), String> {
+        self.watch_dir(self.root.to_path_buf());
+        let tree = loop {
+            let tree = walker::walk(self.root);
+            let watched = self.watched.len();
+            for rel in &tree.dirs {
+                self.watch_dir(self.root.join(rel));
+            }
+            if self.watched.len() == watched {
+                break tree;
+            }
+        };
+        let mut snapshot = tree.files.join("\n");
+        snapshot.push('\n');
+        write_atomic(&self.dir.join(SNAPSHOT_FILE), snapshot.as_bytes())
+            .map_err(|e| format!("Failed to write monitor snapshot: {}", e))?;
+        self.journal = File::create(self.dir.join(JOURNAL_FILE))
+            .map_err(|e| format!("Failed to reset monitor journal: {}", e))?;
+        self.journal_len = 0;
+        Ok(())
+    }
+
+    fn record(&mut self, paths: &[PathBuf]) -> Result<bool, String> {
+        let mut lines = String::new();
+        let mut rescan = false;
+        let cookies = self.dir.join(COOKIE_DIR);
+        for path in paths {
+            if path.parent() == Some(cookies.as_path()) {
+                // A reader waits for this line; its removal needs no answer
+                if let Some(name) = path.file_name().and_then(|n| n.to_str()) {
+                    if path.exists() {
+                        lines.push_str(&cookie_line(name));
+                        lines.push('\n');
+                    }
+                }
+                continue;
+            }
+            let Some(rel) = to_rel_string(self.root, path) else {
+                continue;
+            };
+            if rel.is_empty() || rel.split('/').any(is_internal_name) {
+                continue;
+            }
+            if rel.rsplit('/').next() == Some(DOCKIGNORE) {
+                rescan = true;
+            }
+            if path.is_dir() {
+                // New directories may already hold files before the watch
+                // is in place; readers walk dirty directories in full.
+                for sub in walker::walk(path).dirs {
+                    self.watch_dir(path.join(sub));
+                }
+                self.watch_dir(path.clone());
+            } else if !path.exists() {
+                self.watched.remove(path);
+            }
+            lines.push_str(&rel);
+            lines.push('\n');
+            self.journal_len += 1;
+        }
+        if !lines.is_empty() {
+            self.journal
+                .write_all(lines.as_bytes())
+                .map_err(|e| format!("Failed to append to monitor journal: {}", e))?;
+        }
+        Ok(rescan || self.journal_len > COMPACT_AFTER)
+    }
+
+    fn heartbeat(&self) -> Result<(), String> {
+        fs::write(self.dir.join(HEARTBEAT_FILE), now_ns().to_string())
+            .map_err(|e| format!("Failed to write monitor heartbeat: {}", e))
+    }
+}
+
+/// Runs the monitor for the spacedock at `root` until `should_stop` says so.
+pub fn run(root: &Path, mut should_stop: impl FnMut() -> bool) -> Result<(), String> {
+    let dir = monitor_dir(root);
+    fs::create_dir_all(dir.join(COOKIE_DIR))
+        .map_err(|e| format!("Failed to create monitor dir: {}", e))?;
+    fs::write(dir.join(PID_FILE), std::process::id().to_string())
+        .map_err(|e| format!("Failed to write monitor pid: {}", e))?;
+
+    let (tx, rx) = mpsc::channel::<notify::Result<notify::Event>>();
+    let watcher = notify::recommended_watcher(tx)
+        .map_err(|e| format!("Failed to start filesystem watcher: {}", e))?;
+    let journal = OpenOptions::new()
+        .create(true)
+        .append(true)
+        .open(dir.join(JOURNAL_FILE))
+        .map_err(|e| format!("Failed to open monitor journal: {}", e))?;
+
+    let mut daemon = Daemon {
+        root,
+        dir,
+        watcher,
+        watched: HashSet::new(),
+        journal,
+        journal_len: 0,
+    };
+    daemon.watch_dir(daemon.dir.join(COOKIE_DIR));
+    daemon.resnapshot()?;
+    daemon.heartbeat()?;
+    let mut last_beat = Instant::now();
+
+    loop {
+        let needs_snapshot = match rx.recv_timeout(HEARTBEAT_INTERVAL) {
+            Ok(Ok(event)) => event.need_rescan() || daemon.record(&event.paths)?,
+            // A watcher error means events may have been dropped
+            Ok(Err(_)) => true,
+            Err(RecvTimeoutError::Timeout) => false,
+            Err(RecvTimeoutError::Disconnected) => break,
+        };
+        if needs_snapshot {
+            daemon.resnapshot()?;
+        }
+        if last_beat.elapsed() >= HEARTBEAT_INTERVAL {
+            daemon.heartbeat()?;
+            last_beat = Instant::now();
+        }
+        if should_stop() {
+            break;
+        }
+    }
+
+    clear(root);
+    Ok(())
+}
+
+/// Removes the monitor state so readers fall back to walking the tree.
+pub fn clear(root: &Path) {
+    let _ = fs::remove_dir_all(monitor_dir(root));
+}
+
+/// Pid recorded by the monitor of `root`, if one has been started.
+pub fn pid(root: &Path) -> Option<u32> {
+    fs::read_to_string(monitor_dir(root).join(PID_FILE))
+        .ok()?
+        .trim()
+        .parse()
+        .ok()
+}
+
+pub fn is_fresh(root: &Path) -> bool {
+    fs::read_to_string(monitor_dir(root).join(HEARTBEAT_FILE))
+        .ok()
+        .and_then(|beat| beat.trim().parse::<u64>().ok())
+        .is_some_and(|beat| now_ns().saturating_sub(beat) <= STALE_AFTER_NS)
+}
+
+/// Creates a cookie file and waits for the monitor to journal it. Events
+/// are journaled in order, so every change made before the cookie is then
+/// in the journal too, even if its event was still queued when the reader
+/// started. Returns the journal that holds the cookie, or `None` when the
+/// monitor did not answer within `COOKIE_TIMEOUT`.
+fn sync_journal(root: &Path) -> Option<String> {
+    let dir = monitor_dir(root);
+    let name = format!(
+        "{}-{}",
+        std::process::id(),
+        COOKIE_SEQ.fetch_add(1, Ordering::Relaxed)
+    );
+    let cookie = dir.join(COOKIE_DIR).join(&name);
+    File::create(&cookie).ok()?;
+    let line = cookie_line(&name);
+
+    let deadline = Instant::now() + COOKIE_TIMEOUT;
+    let journal = loop {
+        let journal = fs::read_to_string(dir.join(JOURNAL_FILE)).ok();
+        if journal
+            .as_deref()
+            .is_some_and(|journal| journal.lines().any(|l| l == line))
+        {
+            break journal;
+        }
+        if Instant::now() >= deadline {
+            break None;
+        }
+        std::thread::sleep(COOKIE_POLL);
+    };
+    let _ = fs::remove_file(&cookie);
+    journal
+}
+
+/// Working tree files as known to a running monitor: the snapshot with every
+/// journaled path re-checked on disk. Returns `None` when the monitor is not
+/// running, stale or does not answer a cookie in time, in which case callers
+/// must walk the tree.
+pub fn monitored_files(root: &Path) -> Option<Vec<String>> {
+    if !is_fresh(root) {
+        return None;
+    }
+    let _span = trace::span("monitor_journal");
+    let dir = monitor_dir(root);
+    // Read the journal before the snapshot: a compaction in between only
+    // makes the snapshot newer, and replaying old entries is harmless.
+    let journal = sync_journal(root)?;
+    let snapshot = fs::read_to_string(dir.join(SNAPSHOT_FILE)).ok()?;
+
+    let mut files: BTreeSet<String> = snapshot
+        .lines()
+        .filter(|l| !l.is_empty())
+        .map(|l| l.to_string())
+        .collect();
+
+    // Ignore a trailing line that is still being written
+    let complete = &journal[..journal.rfind('\n').map_or(0, |i| i + 1)];
+    let dirty: BTreeSet<&str> = complete
+        .lines()
+        .filter(|l| !l.is_empty() && !l.split('/').any(is_internal_name))
+        .collect();
+
+    let mut matcher = DockignoreMatcher::new(root);
+    for rel in dirty {
+        let prefix = format!("{}/", rel);
+        let stale: Vec<String> = files
+            .range(prefix.clone()..)
+            .take_while(|f| f.starts_with(&prefix))
+            .cloned()
+            .collect();
+        for f in stale {
+            files.remove(&f);
+        }
+        files.remove(rel);
+
+        let full = root.join(rel);
+        if matcher.is_ignored(&full) {
+            continue;
+        }
+        let Ok(meta) = fs::symlink_metadata(&full) else {
+            continue;
+        };
+        if meta.is_file() {
+            files.insert(rel.to_string());
+        } else if meta.is_dir() {
+            for f in walker::walk(&full).files {
+                if !matcher.is_ignored(&full.join(&f)) {
+                    files.insert(format!("{}{}", prefix, f));
+                }
+            }
+        }
+    }
+
+    Some(files.into_iter().collect())
+}
+
+#[pyclass]
+pub struct Monitor;
+
+#[pymethods]
+impl Monitor {
+    /// Watch the working tree of `repo_path` until interrupted.
+    #[staticmethod]
+    fn run(py: Python<'_>, repo_path: &str) -> PyResult<()> {
+        let root = Path::new(repo_path);
+        py.allow_threads(|| run(root, || Python::with_gil(|py| py.check_signals().is_err())))
+            .map_err(PyRuntimeError::new_err)
+    }
+
+    #[staticmethod]
+    fn is_running(repo_path: &str) -> bool {
+        is_fresh(Path::new(repo_path))
+    }
+
+    #[staticmethod]
+    fn get_pid(repo_path: &str) -> Option<u32> {
+        pid(Path::new(repo_path))
+    }
+
+    #[staticmethod]
+    fn clear(repo_path: &str) {
+        clear(Path::new(repo_path))
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    /// Journals the first cookie a reader creates, as a running monitor does.
+    fn answer_cookie(root: &Path) -> std::thread::JoinHandle<()> {
+        let state = monitor_dir(root);
+        fs::create_dir_all(state.join(COOKIE_DIR)).unwrap();
+        std::thread::spawn(move || loop {
+            let cookie = fs::read_dir(state.join(COOKIE_DIR)).unwrap().next();
+            if let Some(cookie) = cookie {
+                let name = cookie.unwrap().file_name().into_string().unwrap();
+                let mut journal = OpenOptions::new()
+                    .append(true)
+                    .open(state.join(JOURNAL_FILE))
+                    .unwrap();
+                // Followed by a batch that is still being written
+                write!(journal, "{}\npartial", cookie_line(&name)).unwrap();
+                return;
+            }
+            std::thread::sleep(COOKIE_POLL);
+        })
+    }
+
+    #[test]
+    fn test_monitored_files_replays_journal() {
+        let dir = tempfile::tempdir().unwrap();
+        let root = dir.path();
+        let state = monitor_dir(root);
+        fs::create_dir_all(&state).unwrap();
+        fs::create_dir_all(root.join("src/new")).unwrap();
+        fs::write(root.join("kept.txt"), "kept").unwrap();
+        fs::write(root.join("src/new/a.rs"), "a").unwrap();
+
+        fs::write(
+            state.join(SNAPSHOT_FILE),
+            "kept.txt\ngone.txt\nsrc/old.rs\n",
+        )
+        .unwrap();
+        fs::write(state.join(JOURNAL_FILE), "gone.txt\nsrc/old.rs\nsrc/new\n").unwrap();
+        fs::write(state.join(HEARTBEAT_FILE), now_ns().to_string()).unwrap();
+
+        let monitor = answer_cookie(root);
+        let files = monitored_files(root).unwrap();
+        monitor.join().unwrap();
+        assert_eq!(files, vec!["kept.txt", "src/new/a.rs"]);
+        assert_eq!(fs::read_dir(state.join(COOKIE_DIR)).unwrap().count(), 0);
+    }
+
+    #[test]
+    fn test_unanswered_cookie_falls_back_to_walking() {
+        let dir = tempfile::tempdir().unwrap();
+        let root = dir.path();
+        let state = monitor_dir(root);
+        fs::create_dir_all(state.join(COOKIE_DIR)).unwrap();
+        fs::write(state.join(SNAPSHOT_FILE), "kept.txt\n").unwrap();
+        fs::write(state.join(JOURNAL_FILE), "").unwrap();
+        // Heartbeat is fresh, but nothing journals the cookie
+        fs::write(state.join(HEARTBEAT_FILE), now_ns().to_string()).unwrap();
+
+        assert!(monitored_files(root).is_none());
+        assert_eq!(fs::read_dir(state.join(COOKIE_DIR)).unwrap().count(), 0);
+    }
+
+    #[test]
+    fn test_stale_monitor_is_ignored() {
+        let dir = tempfile::tempdir().unwrap();
+        let root = dir.path();
+        let state = monitor_dir(root);
+        fs::create_dir_all(&state).unwrap();
+        fs::write(state.join(SNAPSHOT_FILE), "kept.txt\n").unwrap();
+        fs::write(state.join(JOURNAL_FILE), "").unwrap();
+        fs::write(state.join(HEARTBEAT_FILE), "0").unwrap();
+
+        assert!(monitored_files(root).is_none());
+    }
+
+    #[test]
+    fn test_resnapshot_watches_directories_it_lists() {
+        let dir = tempfile::tempdir().unwrap();
+        let root = dir.path();
+        let state = monitor_dir(root);
+        fs::create_dir_all(&state).unwrap();
+        fs::create_dir_all(root.join("src/nested")).unwrap();
+        fs::write(root.join("src/nested/a.rs"), "a").unwrap();
+
+        let (tx, _rx) = mpsc::channel();
+        let mut daemon = Daemon {
+            root,
+            dir: state.clone(),
+            watcher: notify::recommended_watcher(tx).unwrap(),
+            watched: HashSet::new(),
+            journal: File::create(state.join(JOURNAL_FILE)).unwrap(),
+            journal_len: 0,
+        };
+        daemon.resnapshot().unwrap();
+        for rel in ["src", "src/nested"] {
+            assert!(daemon.watched.contains(&root.join(rel)), "{}", rel);
+        }
+        assert!(daemon.watched.contains(root));
+        let snapshot = fs::read_to_string(state.join(SNAPSHOT_FILE)).unwrap();
+        assert_eq!(snapshot, "src/nested/a.rs\n");
+    }
+
+    #[test]
+    fn test_record_journals_cookies_only_while_they_exist() {
+        let dir = tempfile::tempdir().unwrap();
+        let root = dir.path();
+        let state = monitor_dir(root);
+        fs::create_dir_all(state.join(COOKIE_DIR)).unwrap();
+        let cookie = state.join(COOKIE_DIR).join("1-0");
+        fs::write(&cookie, "").unwrap();
+
+        let (tx, _rx) = mpsc::channel();
+        let mut daemon = Daemon {
+            root,
+            dir: state.clone(),
+            watcher: notify::recommended_watcher(tx).unwrap(),
+            watched: HashSet::new(),
+            journal: File::create(state.join(JOURNAL_FILE)).unwrap(),
+            journal_len: 0,
+        };
+        daemon
+            .record(&[root.join(".dock/stage"), cookie.clone()])
+            .unwrap();
+        fs::remove_file(&cookie).unwrap();
+        daemon.record(&[cookie]).unwrap();
+        let journal = fs::read_to_string(state.join(JOURNAL_FILE)).unwrap();
+        assert_eq!(journal, ".dock/monitor/cookies/1-0\n");
+    }
+}
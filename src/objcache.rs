@@ -0,0 +1,54 @@
+use serde_json::Value;
+use std::collections::HashMap;
+use std::fs;
+use std::path::{Path, PathBuf};
+use std::sync::{Mutex, OnceLock};
+
+use crate::chunking;
+use crate::trace::{self, Counter};
+
+/// Upper bound on resident parsed objects before the cache starts over.
+const MAX_ENTRIES: usize = 4096;
+
+static PARSED: OnceLock<Mutex<HashMap<PathBuf, Value>>> = OnceLock::new();
+
+/// Reads and parses a content-addressed JSON object (starlog or tree).
+///
+/// Objects never change once written, so parsed values are kept for the
+/// life of the process; a long-running `ruxpy server` answers repeated
+/// commands without touching the object store again.
+pub fn load_json(path: &Path) -> Result<Value, String> {
+    cached(path, || {
+        fs::read(path).map_err(|e| format!("Failed to read object: {}", e))
+    })
+}
+
+/// `load_json` for object `hash` of the spacedock at `repo`, in whichever
+/// object store it uses.
+pub fn load_object(repo: &Path, hash: &str) -> Result<Value, String> {
+    cached(&chunking::object_path(repo, hash), || {
+        chunking::read_object(repo, hash)
+    })
+}
+
+/// Parsed JSON cached under `path`, reading it with `read` on a miss.
+fn cached(path: &Path, read: impl FnOnce() -> Result<Vec<u8>, String>) -> Result<Value, String> {
+    let key = std::path::absolute(path).unwrap_or_else(|_| path.to_path_buf());
+    let cache = PARSED.get_or_init(Default::default);
+    if let Some(value) = cache.lock().unwrap().get(&key) {
+        trace::add(Counter::CacheHits, 1);
+        return Ok(value.clone());
+    }
+    let _span = trace::span("parse_json");
+
+    let contents = read()?;
+    let parsed: Value =
+        serde_json::from_slice(&contents).map_err(|e| format!("Failed to parse JSON: {}", e))?;
+
+    let mut cache = cache.lock().unwrap();
+    if cache.len() >= MAX_ENTRIES {
+        cache.clear();
+    }
+    cache.insert(key, parsed.clone());
+    Ok(parsed)
+}
@@ -0,0 +1,733 @@
+use std::collections::HashMap;
+use std::fs::{self, File, OpenOptions};
+use std::io::{self, Read, Seek, SeekFrom, Write};
+use std::path::{Path, PathBuf};
+use std::sync::{Arc, Mutex, RwLock};
+use std::time::Duration;
+
+use rusqlite::{params, Connection, OptionalExtension};
+
+use crate::alternates;
+use crate::chunking;
+use crate::refs::Lock;
+use crate::repo_config;
+
+/// Single file holding every object of a `pack` store, in `.dock/objects`.
+pub const PACK_FILE: &str = "objects.pack";
+const PACK_MAGIC: &[u8; 8] = b"RXPACK2\n";
+/// Key length (u16), data length (u64), data checksum (u32) and header
+/// checksum (u32) before each record's key and data. The header checksum
+/// covers the fields before it and the key.
+const RECORD_HEADER: u64 = 2 + 8 + 4 + 4;
+
+/// SQLite database holding every object of a `sqlite` store, in
+/// `.dock/objects`.
+pub const SQLITE_FILE: &str = "objects.sqlite";
+/// How long a writer waits for another process's transaction.
+const SQLITE_BUSY_TIMEOUT: Duration = Duration::from_secs(10);
+
+/// Where the objects of a spacedock (blobs, chunks, chunk manifests and
+/// trees) are kept, chosen by `core.object_store` in `.dock/config.toml`.
+/// Starlogs and course refs are files in every backend.
+#[derive(Clone, Copy, Debug, Default, PartialEq, Eq)]
+pub enum Backend {
+    /// One file per object under `.dock/objects/xx/`, with alternates.
+    #[default]
+    Loose,
+    /// Every object appended to `.dock/objects/objects.pack`, for file
+    /// systems where many small files are slow or inodes are scarce.
+    Pack,
+    /// Every object in the SQLite database `.dock/objects/objects.sqlite`,
+    /// which also survives a writer crashing mid-write.
+    Sqlite,
+    /// Objects kept in process memory only, for tests and benchmarks.
+    Memory,
+}
+
+impl Backend {
+    pub fn from_name(name: &str) -> Result<Self, String> {
+        match name {
+            "loose" => Ok(Backend::Loose),
+            "pack" => Ok(Backend::Pack),
+            "sqlite" => Ok(Backend::Sqlite),
+            "memory" => Ok(Backend::Memory),
+            _ => Err(format!(
+                "Unknown object store '{}' (expected loose, pack, sqlite or memory)",
+                name
+            )),
+        }
+    }
+
+    pub fn name(self) -> &'static str {
+        match self {
+            Backend::Loose => "loose",
+            Backend::Pack => "pack",
+            Backend::Sqlite => "sqlite",
+            Backend::Memory => "memory",
+        }
+    }
+}
+
+/// Content-addressed storage for objects. Keys are object ids, or an id
+/// plus `chunking::MANIFEST_SUFFIX` for a chunk manifest; an object never
+/// changes once stored, so writing an existing key does nothing.
+pub trait ObjectStore: Send + Sync {
+    fn backend(&self) -> Backend;
+
+    /// Contents of `key`, or `None` when it is not stored.
+    fn read(&self, key: &str) -> Result<Option<Vec<u8>>, String>;
+
+    fn contains(&self, key: &str) -> bool;
+
+    /// Size of `key` without reading it, or `None` when it is not stored.
+    fn size(&self, key: &str) -> Result<Option<u64>, String>;
+
+    /// Stores `data` under `key` unless it is already stored; returns
+    /// whether anything was written.
+    fn write(&self, key: &str, data: &[u8]) -> Result<bool, String>;
+
+    /// Copies `key` into `out`; returns the bytes copied, or `None` when it
+    /// is not stored.
+    fn copy_to(&self, key: &str, out: &mut dyn Write) -> Result<Option<u64>, String> {
+        let Some(data) = self.read(key)? else {
+            return Ok(None);
+        };
+        out.write_all(&data)
+            .map_err(|e| format!("Failed to copy object {}: {}", key, e))?;
+        Ok(Some(data.len() as u64))
+    }
+}
+
+/// The default layout: `.dock/objects/ab/cdef...`, falling back to the
+/// alternates for reads.
+pub struct LooseStore {
+    repo: PathBuf,
+}
+
+impl LooseStore {
+    fn find(&self, key: &str) -> Option<PathBuf> {
+        alternates::find(&self.repo, &chunking::fanout(key))
+    }
+}
+
+impl ObjectStore for LooseStore {
+    fn backend(&self) -> Backend {
+        Backend::Loose
+    }
+
+    fn read(&self, key: &str) -> Result<Option<Vec<u8>>, String> {
+        let Some(path) = self.find(key) else {
+            return Ok(None);
+        };
+        match fs::read(&path) {
+            Ok(data) => Ok(Some(data)),
+            Err(e) if e.kind() == io::ErrorKind::NotFound => Ok(None),
+            Err(e) => Err(format!("Failed to read object {}: {}", key, e)),
+        }
+    }
+
+    fn contains(&self, key: &str) -> bool {
+        self.find(key).is_some()
+    }
+
+    fn size(&self, key: &str) -> Result<Option<u64>, String> {
+        let Some(path) = self.find(key) else {
+            return Ok(None);
+        };
+        fs::metadata(&path)
+            .map(|meta| Some(meta.len()))
+            .map_err(|e| format!("Failed to stat object {}: {}", key, e))
+    }
+
+    fn write(&self, key: &str, data: &[u8]) -> Result<bool, String> {
+        if self.contains(key) {
+            return Ok(false);
+        }
+        let path = alternates::objects_dir(&self.repo).join(chunking::fanout(key));
+        chunking::write_atomic(&path, data)?;
+        Ok(true)
+    }
+
+    fn copy_to(&self, key: &str, out: &mut dyn Write) -> Result<Option<u64>, String> {
+        let Some(path) = self.find(key) else {
+            return Ok(None);
+        };
+        let mut file =
+            File::open(&path).map_err(|e| format!("Failed to read object {}: {}", key, e))?;
+        io::copy(&mut file, out)
+            .map(Some)
+            .map_err(|e| format!("Failed to copy object {}: {}", key, e))
+    }
+}
+
+/// Location of a record's data in a pack file.
+#[derive(Clone, Copy)]
+struct PackRecord {
+    offset: u64,
+    len: u64,
+    checksum: u32,
+}
+
+/// Offsets of the records of a pack file, up to `end`.
+#[derive(Default)]
+struct PackIndex {
+    records: HashMap<String, PackRecord>,
+    /// Length of the file that has been indexed.
+    end: u64,
+    /// Key and start of the last record, when it was indexed from another
+    /// writer and its data has not been checked.
+    unchecked_tail: Option<(String, u64)>,
+}
+
+/// An append-only file of checksummed `key, data` records after a magic
+/// header. Other processes may append at any time; their records are
+/// indexed the next time a key is not found. Appends happen under the
+/// pack's lock file, and each writer first cuts off whatever a crashed
+/// writer left at the end, so a torn record never has whole ones after it.
+pub struct PackStore {
+    path: PathBuf,
+    index: Mutex<PackIndex>,
+}
+
+fn encode_record(key: &str, key_len: u16, data: &[u8]) -> Vec<u8> {
+    let mut record = Vec::with_capacity(RECORD_HEADER as usize + key.len() + data.len());
+    record.extend_from_slice(&key_len.to_le_bytes());
+    record.extend_from_slice(&(data.len() as u64).to_le_bytes());
+    record.extend_from_slice(&crc32fast::hash(data).to_le_bytes());
+    let mut hasher = crc32fast::Hasher::new();
+    hasher.update(&record);
+    hasher.update(key.as_bytes());
+    record.extend_from_slice(&hasher.finalize().to_le_bytes());
+    record.extend_from_slice(key.as_bytes());
+    record.extend_from_slice(data);
+    record
+}
+
+impl PackStore {
+    pub fn new(path: PathBuf) -> PackStore {
+        PackStore {
+            path,
+            index: Mutex::new(PackIndex::default()),
+        }
+    }
+
+    /// Indexes records appended since the last call. Indexing stops at a
+    /// record that is cut short or whose header does not match its
+    /// checksum: it is still being written, or its writer crashed and the
+    /// next writer cuts it off.
+    fn refresh(&self, index: &mut PackIndex) -> Result<(), String> {
+        let err = |e: io::Error| format!("Failed to read {}: {}", self.path.display(), e);
+        let mut file = match File::open(&self.path) {
+            Ok(file) => file,
+            Err(e) if e.kind() == io::ErrorKind::NotFound => return Ok(()),
+            Err(e) => return Err(err(e)),
+        };
+        let len = file.metadata().map_err(err)?.len();
+        if len <= index.end {
+            return Ok(());
+        }
+        let mut reader = io::BufReader::new(&mut file);
+        if index.end == 0 {
+            if len < PACK_MAGIC.len() as u64 {
+                return Ok(());
+            }
+            let mut magic = [0u8; 8];
+            reader.read_exact(&mut magic).map_err(err)?;
+            if &magic != PACK_MAGIC {
+                return Err(format!("{} is not an object pack", self.path.display()));
+            }
+            index.end = PACK_MAGIC.len() as u64;
+        } else {
+            reader.seek(SeekFrom::Start(index.end)).map_err(err)?;
+        }
+
+        while len - index.end >= RECORD_HEADER {
+            let mut header = [0u8; RECORD_HEADER as usize];
+            reader.read_exact(&mut header).map_err(err)?;
+            let key_len = u16::from_le_bytes([header[0], header[1]]) as u64;
+            let data_len = u64::from_le_bytes(header[2..10].try_into().unwrap());
+            let checksum = u32::from_le_bytes(header[10..14].try_into().unwrap());
+            let header_checksum = u32::from_le_bytes(header[14..18].try_into().unwrap());
+            let record_len = RECORD_HEADER
+                .saturating_add(key_len)
+                .saturating_add(data_len);
+            if len - index.end < record_len {
+                break;
+            }
+            let mut key = vec![0u8; key_len as usize];
+            reader.read_exact(&mut key).map_err(err)?;
+            let mut hasher = crc32fast::Hasher::new();
+            hasher.update(&header[..14]);
+            hasher.update(&key);
+            if hasher.finalize() != header_checksum {
+                break;
+            }
+            let key = String::from_utf8(key)
+                .map_err(|_| format!("{} has a corrupt record", self.path.display()))?;
+            reader.seek_relative(data_len as i64).map_err(err)?;
+            let record = PackRecord {
+                offset: index.end + RECORD_HEADER + key_len,
+                len: data_len,
+                checksum,
+            };
+            index.unchecked_tail = Some((key.clone(), index.end));
+            index.records.insert(key, record);
+            index.end += record_len;
+        }
+        Ok(())
+    }
+
+    /// Cuts off anything after the last whole record, and the last record
+    /// itself when its data does not match its checksum. Only the last
+    /// record can be torn, since every writer repairs the tail before
+    /// appending. Called with the pack's lock held.
+    fn repair(&self, index: &mut PackIndex, file: &mut File) -> Result<(), String> {
+        let err = |e: io::Error| format!("Failed to repair {}: {}", self.path.display(), e);
+        if let Some((key, start)) = index.unchecked_tail.take() {
+            let record = index.records[&key];
+            if read_record(file, &record).map_err(err)?.is_none() {
+                index.records.remove(&key);
+                index.end = start;
+            }
+        }
+        if file.metadata().map_err(err)?.len() > index.end {
+            file.set_len(index.end).map_err(err)?;
+        }
+        Ok(())
+    }
+
+    /// Creates the pack with its header unless it exists. The header is
+    /// written to a temporary file that is then linked into place, so no
+    /// writer ever appends to a pack without one.
+    fn create(&self) -> Result<(), String> {
+        if self.path.exists() {
+            return Ok(());
+        }
+        let err = |e: io::Error| format!("Failed to create {}: {}", self.path.display(), e);
+        let dir = self.path.parent().unwrap_or(Path::new("."));
+        fs::create_dir_all(dir).map_err(err)?;
+        let mut tmp = tempfile::NamedTempFile::new_in(dir).map_err(err)?;
+        tmp.write_all(PACK_MAGIC).map_err(err)?;
+        match fs::hard_link(tmp.path(), &self.path) {
+            Ok(()) => Ok(()),
+            Err(e) if e.kind() == io::ErrorKind::AlreadyExists => Ok(()),
+            Err(e) => Err(err(e)),
+        }
+    }
+
+    /// The record of `key`, indexing new records if it is unknown.
+    fn locate(&self, key: &str) -> Result<Option<PackRecord>, String> {
+        let mut index = self.index.lock().unwrap();
+        if let Some(record) = index.records.get(key) {
+            return Ok(Some(*record));
+        }
+        self.refresh(&mut index)?;
+        Ok(index.records.get(key).copied())
+    }
+}
+
+/// Data of `record`, or `None` when it is cut short or does not match its
+/// checksum.
+fn read_record(file: &mut File, record: &PackRecord) -> io::Result<Option<Vec<u8>>> {
+    file.seek(SeekFrom::Start(record.offset))?;
+    let mut data = Vec::with_capacity(record.len as usize);
+    Read::by_ref(file).take(record.len).read_to_end(&mut data)?;
+    if data.len() as u64 != record.len || crc32fast::hash(&data) != record.checksum {
+        return Ok(None);
+    }
+    Ok(Some(data))
+}
+
+impl ObjectStore for PackStore {
+    fn backend(&self) -> Backend {
+        Backend::Pack
+    }
+
+    fn read(&self, key: &str) -> Result<Option<Vec<u8>>, String> {
+        let Some(record) = self.locate(key)? else {
+            return Ok(None);
+        };
+        let err = |e: io::Error| format!("Failed to read object {}: {}", key, e);
+        let mut file = File::open(&self.path).map_err(err)?;
+        match read_record(&mut file, &record).map_err(err)? {
+            Some(data) => Ok(Some(data)),
+            None => Err(format!(
+                "Object {} in {} does not match its checksum",
+                key,
+                self.path.display()
+            )),
+        }
+    }
+
+    fn contains(&self, key: &str) -> bool {
+        matches!(self.locate(key), Ok(Some(_)))
+    }
+
+    fn size(&self, key: &str) -> Result<Option<u64>, String> {
+        Ok(self.locate(key)?.map(|record| record.len))
+    }
+
+    fn write(&self, key: &str, data: &[u8]) -> Result<bool, String> {
+        let key_len =
+            u16::try_from(key.len()).map_err(|_| format!("Object key {} is too long", key))?;
+        let err = |e: io::Error| format!("Failed to write {}: {}", self.path.display(), e);
+        // Held across the append so threads of this process never write a
+        // key twice
+        let mut index = self.index.lock().unwrap();
+        self.refresh(&mut index)?;
+        if index.records.contains_key(key) {
+            return Ok(false);
+        }
+
+        if index.end == 0 {
+            self.create()?;
+        }
+        let _lock = Lock::acquire(&self.path)?;
+        // Another process may have appended the key before the lock
+        self.refresh(&mut index)?;
+        if index.records.contains_key(key) {
+            return Ok(false);
+        }
+        let mut file = OpenOptions::new()
+            .read(true)
+            .write(true)
+            .open(&self.path)
+            .map_err(err)?;
+        self.repair(&mut index, &mut file)?;
+
+        let record = encode_record(key, key_len, data);
+        file.seek(SeekFrom::Start(index.end)).map_err(err)?;
+        file.write_all(&record).map_err(err)?;
+
+        let offset = index.end + RECORD_HEADER + key.len() as u64;
+        index.records.insert(
+            key.to_string(),
+            PackRecord {
+                offset,
+                len: data.len() as u64,
+                checksum: crc32fast::hash(data),
+            },
+        );
+        index.end += record.len() as u64;
+        Ok(true)
+    }
+}
+
+/// A table of `key, data` rows in one SQLite database. SQLite's journal
+/// keeps the file consistent across crashed writers, and its locking
+/// serialises writers of several processes.
+pub struct SqliteStore {
+    conn: Mutex<Connection>,
+}
+
+impl SqliteStore {
+    pub fn open(path: &Path) -> Result<SqliteStore, String> {
+        let err = |e: rusqlite::Error| format!("Failed to open {}: {}", path.display(), e);
+        if let Some(dir) = path.parent() {
+            fs::create_dir_all(dir)
+                .map_err(|e| format!("Failed to create {}: {}", dir.display(), e))?;
+        }
+        let conn = Connection::open(path).map_err(err)?;
+        conn.busy_timeout(SQLITE_BUSY_TIMEOUT).map_err(err)?;
+        // Readers then never wait for a writer
+        conn.query_row("PRAGMA journal_mode = WAL", [], |_| Ok(()))
+            .map_err(err)?;
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS objects \
+             (key TEXT PRIMARY KEY, data BLOB NOT NULL) WITHOUT ROWID",
+            [],
+        )
+        .map_err(err)?;
+        Ok(SqliteStore {
+            conn: Mutex::new(conn),
+        })
+    }
+}
+
+impl ObjectStore for SqliteStore {
+    fn backend(&self) -> Backend {
+        Backend::Sqlite
+    }
+
+    fn read(&self, key: &str) -> Result<Option<Vec<u8>>, String> {
+        self.conn
+            .lock()
+            .unwrap()
+            .query_row("SELECT data FROM objects WHERE key = ?1", [key], |row| {
+                row.get(0)
+            })
+            .optional()
+            .map_err(|e| format!("Failed to read object {}: {}", key, e))
+    }
+
+    fn contains(&self, key: &str) -> bool {
+        matches!(self.size(key), Ok(Some(_)))
+    }
+
+    fn size(&self, key: &str) -> Result<Option<u64>, String> {
+        self.conn
+            .lock()
+            .unwrap()
+            .query_row(
+                "SELECT length(data) FROM objects WHERE key = ?1",
+                [key],
+                |row| row.get::<_, i64>(0),
+            )
+            .optional()
+            .map(|size| size.map(|size| size as u64))
+            .map_err(|e| format!("Failed to stat object {}: {}", key, e))
+    }
+
+    fn write(&self, key: &str, data: &[u8]) -> Result<bool, String> {
+        self.conn
+            .lock()
+            .unwrap()
+            .execute(
+                "INSERT OR IGNORE INTO objects (key, data) VALUES (?1, ?2)",
+                params![key, data],
+            )
+            .map(|inserted| inserted > 0)
+            .map_err(|e| format!("Failed to write object {}: {}", key, e))
+    }
+}
+
+/// Objects in a map that lives as long as the process.
+#[derive(Default)]
+pub struct MemoryStore {
+    objects: RwLock<HashMap<String, Arc<[u8]>>>,
+}
+
+impl ObjectStore for MemoryStore {
+    fn backend(&self) -> Backend {
+        Backend::Memory
+    }
+
+    fn read(&self, key: &str) -> Result<Option<Vec<u8>>, String> {
+        Ok(self
+            .objects
+            .read()
+            .unwrap()
+            .get(key)
+            .map(|data| data.to_vec()))
+    }
+
+    fn contains(&self, key: &str) -> bool {
+        self.objects.read().unwrap().contains_key(key)
+    }
+
+    fn size(&self, key: &str) -> Result<Option<u64>, String> {
+        Ok(self
+            .objects
+            .read()
+            .unwrap()
+            .get(key)
+            .map(|data| data.len() as u64))
+    }
+
+    fn write(&self, key: &str, data: &[u8]) -> Result<bool, String> {
+        let mut objects = self.objects.write().unwrap();
+        if objects.contains_key(key) {
+            return Ok(false);
+        }
+        objects.insert(key.to_string(), Arc::from(data));
+        Ok(true)
+    }
+}
+
+/// Open stores per spacedock, so a pack is indexed and a memory store
+/// filled once per process.
+static STORES: Mutex<Option<HashMap<PathBuf, Arc<dyn ObjectStore>>>> = Mutex::new(None);
+
+/// The object store of the spacedock at `repo`, as selected by its config.
+pub fn open(repo: &Path) -> Result<Arc<dyn ObjectStore>, String> {
+    let backend = repo_config::core_config(repo)?.object_store;
+    let key = std::path::absolute(repo).unwrap_or_else(|_| repo.to_path_buf());
+
+    let mut guard = STORES.lock().unwrap();
+    let stores = guard.get_or_insert_with(HashMap::new);
+    if let Some(store) = stores.get(&key) {
+        if store.backend() == backend {
+            return Ok(Arc::clone(store));
+        }
+    }
+    let store: Arc<dyn ObjectStore> = match backend {
+        Backend::Loose => Arc::new(LooseStore { repo: key.clone() }),
+        Backend::Pack => Arc::new(PackStore::new(
+            alternates::objects_dir(&key).join(PACK_FILE),
+        )),
+        Backend::Sqlite => Arc::new(SqliteStore::open(
+            &alternates::objects_dir(&key).join(SQLITE_FILE),
+        )?),
+        Backend::Memory => Arc::new(MemoryStore::default()),
+    };
+    stores.insert(key, Arc::clone(&store));
+    Ok(store)
+}
+
+/// Fails unless the spacedock at `repo` keeps loose objects, for commands
+/// that work on the object files themselves.
+pub fn require_loose(repo: &Path, command: &str) -> Result<(), String> {
+    match repo_config::core_config(repo)?.object_store {
+        Backend::Loose => Ok(()),
+        backend => Err(format!(
+            "{} needs the loose object store, but core.object_store is '{}'",
+            command,
+            backend.name()
+        )),
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use crate::refs::lock_path;
+
+    #[test]
+    fn test_loose_store_leaves_only_whole_objects() {
+        let dir = tempfile::tempdir().unwrap();
+        let store = LooseStore {
+            repo: dir.path().to_path_buf(),
+        };
+        assert!(store.write("aa01", b"alpha").unwrap());
+        assert!(!store.write("aa01", b"alpha").unwrap());
+        assert_eq!(store.read("aa01").unwrap().unwrap(), b"alpha");
+
+        let fanout = alternates::objects_dir(dir.path()).join("aa");
+        let names: Vec<_> = fs::read_dir(fanout)
+            .unwrap()
+            .map(|entry| entry.unwrap().file_name())
+            .collect();
+        assert_eq!(names, vec!["01"]);
+    }
+
+    #[test]
+    fn test_pack_store_round_trips_and_sees_other_writers() {
+        let dir = tempfile::tempdir().unwrap();
+        let path = dir.path().join(PACK_FILE);
+        let store = PackStore::new(path.clone());
+        assert!(store.write("aa01", b"alpha").unwrap());
+        assert!(!store.write("aa01", b"alpha").unwrap());
+        assert!(store.write("bb02.chunks", b"").unwrap());
+        assert_eq!(store.read("aa01").unwrap().unwrap(), b"alpha");
+        assert_eq!(store.size("bb02.chunks").unwrap(), Some(0));
+        assert_eq!(store.read("cc03").unwrap(), None);
+
+        // Another process appending to the same pack
+        let other = PackStore::new(path.clone());
+        assert_eq!(other.read("aa01").unwrap().unwrap(), b"alpha");
+        assert!(other.write("cc03", b"gamma").unwrap());
+        assert_eq!(store.read("cc03").unwrap().unwrap(), b"gamma");
+    }
+
+    #[test]
+    fn test_pack_store_skips_a_record_being_written() {
+        let dir = tempfile::tempdir().unwrap();
+        let path = dir.path().join(PACK_FILE);
+        PackStore::new(path.clone())
+            .write("aa01", b"alpha")
+            .unwrap();
+        let mut file = OpenOptions::new().append(true).open(&path).unwrap();
+        let record = encode_record("bb02", 4, &[7u8; 100]);
+        file.write_all(&record[..40]).unwrap();
+
+        let store = PackStore::new(path);
+        assert_eq!(store.read("aa01").unwrap().unwrap(), b"alpha");
+        assert!(!store.contains("bb02"));
+    }
+
+    #[test]
+    fn test_pack_store_cuts_off_a_torn_tail_before_appending() {
+        let dir = tempfile::tempdir().unwrap();
+        let path = dir.path().join(PACK_FILE);
+        PackStore::new(path.clone())
+            .write("aa01", b"alpha")
+            .unwrap();
+        // A writer that crashed halfway through its record
+        let mut file = OpenOptions::new().append(true).open(&path).unwrap();
+        let record = encode_record("bb02", 4, &[7u8; 100]);
+        file.write_all(&record[..40]).unwrap();
+
+        let store = PackStore::new(path.clone());
+        assert!(store.write("cc03", b"gamma").unwrap());
+        assert!(store.write("dd04", b"delta").unwrap());
+        assert!(store.write("bb02", b"beta").unwrap());
+
+        let other = PackStore::new(path.clone());
+        assert_eq!(other.read("aa01").unwrap().unwrap(), b"alpha");
+        assert_eq!(other.read("bb02").unwrap().unwrap(), b"beta");
+        assert_eq!(other.read("cc03").unwrap().unwrap(), b"gamma");
+        assert_eq!(other.read("dd04").unwrap().unwrap(), b"delta");
+        assert!(!lock_path(&path).exists());
+    }
+
+    #[test]
+    fn test_pack_store_drops_a_last_record_with_bad_data() {
+        let dir = tempfile::tempdir().unwrap();
+        let path = dir.path().join(PACK_FILE);
+        PackStore::new(path.clone())
+            .write("aa01", b"alpha")
+            .unwrap();
+        // Whole length on disk, but the data never made it
+        let mut record = encode_record("bb02", 4, b"beta");
+        let len = record.len();
+        record[len - 4..].fill(0);
+        let mut file = OpenOptions::new().append(true).open(&path).unwrap();
+        file.write_all(&record).unwrap();
+
+        let store = PackStore::new(path.clone());
+        assert!(store.read("bb02").is_err());
+        assert!(store.write("cc03", b"gamma").unwrap());
+        assert!(store.write("bb02", b"beta").unwrap());
+
+        let other = PackStore::new(path);
+        assert_eq!(other.read("bb02").unwrap().unwrap(), b"beta");
+        assert_eq!(other.read("cc03").unwrap().unwrap(), b"gamma");
+    }
+
+    #[test]
+    fn test_sqlite_store_round_trips_and_sees_other_writers() {
+        let dir = tempfile::tempdir().unwrap();
+        let path = dir.path().join(SQLITE_FILE);
+        let store = SqliteStore::open(&path).unwrap();
+        assert!(store.write("aa01", b"alpha").unwrap());
+        assert!(!store.write("aa01", b"other").unwrap());
+        assert!(store.write("bb02.chunks", b"").unwrap());
+        assert_eq!(store.read("aa01").unwrap().unwrap(), b"alpha");
+        assert_eq!(store.size("bb02.chunks").unwrap(), Some(0));
+        assert_eq!(store.read("cc03").unwrap(), None);
+
+        let other = SqliteStore::open(&path).unwrap();
+        assert!(other.contains("aa01"));
+        assert!(other.write("cc03", b"gamma").unwrap());
+        assert_eq!(store.read("cc03").unwrap().unwrap(), b"gamma");
+    }
+
+    #[test]
+    fn test_memory_store_keeps_first_write() {
+        let store = MemoryStore::default();
+        assert!(store.write("aa01", b"alpha").unwrap());
+        assert!(!store.write("aa01", b"other").unwrap());
+        let mut out = Vec::new();
+        assert_eq!(store.copy_to("aa01", &mut out).unwrap(), Some(5));
+        assert_eq!(out, b"alpha");
+    }
+
+    #[test]
+    fn test_config_selects_backend() {
+        let dir = tempfile::tempdir().unwrap();
+        let repo = dir.path();
+        fs::create_dir_all(repo.join(".dock/objects")).unwrap();
+        fs::write(
+            repo.join(".dock/config.toml"),
+            "[core]\nobject_store = \"pack\"\n",
+        )
+        .unwrap();
+
+        let store = open(repo).unwrap();
+        assert_eq!(store.backend(), Backend::Pack);
+        store.write("aa01", b"alpha").unwrap();
+        assert!(repo.join(".dock/objects").join(PACK_FILE).is_file());
+        assert!(!repo.join(".dock/objects/aa").exists());
+        assert!(require_loose(repo, "gc").is_err());
+    }
+}
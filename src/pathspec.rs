@@ -0,0 +1,200 @@
+use ignore::overrides::OverrideBuilder;
+use pyo3::exceptions::PyRuntimeError;
+use pyo3::prelude::*;
+use std::collections::BTreeSet;
+use std::path::Path;
+
+use crate::dircache;
+use crate::trace;
+use crate::walker::{to_rel_string, DockignoreMatcher};
+
+/// Files named by a list of pathspecs, "/"-separated and relative to the
+/// spacedock root.
+#[derive(Debug, Default, PartialEq, Eq)]
+pub struct Expansion {
+    pub files: Vec<String>,
+    /// Specs that named no file.
+    pub unmatched: Vec<String>,
+}
+
+fn is_glob(spec: &str) -> bool {
+    spec.contains(['*', '?', '['])
+}
+
+/// Joins `spec` onto `base` (both relative to the root) lexically; `None`
+/// when it climbs out of the root.
+fn join_rel(base: &str, spec: &str) -> Option<String> {
+    let mut parts: Vec<&str> = base.split('/').filter(|p| !p.is_empty()).collect();
+    for part in spec.split(['/', std::path::MAIN_SEPARATOR]) {
+        match part {
+            "" | "." => {}
+            ".." => {
+                parts.pop()?;
+            }
+            _ => parts.push(part),
+        }
+    }
+    Some(parts.join("/"))
+}
+
+/// Listing of the non-ignored files of `root`, walked at most once.
+fn listing<'a>(cache: &'a mut Option<Vec<String>>, root: &Path) -> &'a [String] {
+    cache.get_or_insert_with(|| dircache::list_files(root))
+}
+
+/// Expands `specs`, given relative to `cwd`, into the files of the working
+/// tree at `root` that they name. A spec is a file, a directory (every file
+/// below it) or a glob; `all` adds every file. Directories and globs are
+/// resolved against one walk of the tree that already excludes
+/// `.dockignore`d paths; explicitly named files are checked against the same
+/// rules.
+pub fn expand(root: &Path, cwd: &Path, specs: &[String], all: bool) -> Result<Expansion, String> {
+    let _span = trace::span("expand_pathspecs");
+    let base = to_rel_string(root, cwd)
+        .ok_or_else(|| format!("{} is outside the spacedock", cwd.display()))?;
+
+    let mut cache = None;
+    let mut matcher = DockignoreMatcher::new(root);
+    let mut files = BTreeSet::new();
+    let mut unmatched = Vec::new();
+
+    if all {
+        files.extend(listing(&mut cache, root).iter().cloned());
+    }
+    for spec in specs {
+        let found = if is_glob(spec) {
+            // A bare pattern matches at any depth below the directory it is
+            // given from, as it does from the root
+            let pattern = if spec.contains('/') || base.is_empty() {
+                join_rel(&base, spec)
+            } else {
+                Some(format!("{}/**/{}", base, spec))
+            };
+            match pattern {
+                Some(pattern) => {
+                    let mut builder = OverrideBuilder::new(root);
+                    builder
+                        .add(&pattern)
+                        .map_err(|e| format!("Invalid pattern {}: {}", spec, e))?;
+                    let globs = builder
+                        .build()
+                        .map_err(|e| format!("Invalid pattern {}: {}", spec, e))?;
+                    let before = files.len();
+                    files.extend(
+                        listing(&mut cache, root)
+                            .iter()
+                            .filter(|file| globs.matched(file, false).is_whitelist())
+                            .cloned(),
+                    );
+                    files.len() > before
+                }
+                None => false,
+            }
+        } else {
+            match join_rel(&base, spec) {
+                Some(rel) if root.join(&rel).is_dir() => {
+                    let prefix = if rel.is_empty() {
+                        String::new()
+                    } else {
+                        format!("{}/", rel)
+                    };
+                    let before = files.len();
+                    files.extend(
+                        listing(&mut cache, root)
+                            .iter()
+                            .filter(|file| file.starts_with(&prefix))
+                            .cloned(),
+                    );
+                    files.len() > before
+                }
+                Some(rel) if root.join(&rel).is_file() => {
+                    // Named but ignored files are dropped quietly
+                    if !matcher.is_ignored(Path::new(&rel)) {
+                        files.insert(rel);
+                    }
+                    true
+                }
+                _ => false,
+            }
+        };
+        if !found {
+            unmatched.push(spec.clone());
+        }
+    }
+
+    Ok(Expansion {
+        files: files.into_iter().collect(),
+        unmatched,
+    })
+}
+
+/// Expands pathspecs given relative to the current directory into the
+/// spacedock-relative files they name; returns `(files, unmatched specs)`.
+#[pyfunction]
+#[pyo3(signature = (repo_path, specs, all=false))]
+pub fn expand_pathspecs(
+    py: Python<'_>,
+    repo_path: &str,
+    specs: Vec<String>,
+    all: bool,
+) -> PyResult<(Vec<String>, Vec<String>)> {
+    let cwd = std::env::current_dir()?;
+    let root = Path::new(repo_path)
+        .canonicalize()
+        .map_err(|e| PyRuntimeError::new_err(format!("Failed to resolve {}: {}", repo_path, e)))?;
+    let cwd = cwd.canonicalize().unwrap_or(cwd);
+    let expansion = py
+        .allow_threads(|| expand(&root, &cwd, &specs, all))
+        .map_err(PyRuntimeError::new_err)?;
+    Ok((expansion.files, expansion.unmatched))
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use std::fs;
+
+    fn setup() -> tempfile::TempDir {
+        let dir = tempfile::tempdir().unwrap();
+        let root = dir.path();
+        fs::create_dir_all(root.join(".dock")).unwrap();
+        fs::create_dir_all(root.join("src/gen")).unwrap();
+        fs::write(root.join("README.md"), "readme").unwrap();
+        fs::write(root.join("src/lib.rs"), "lib").unwrap();
+        fs::write(root.join("src/gen/out.rs"), "out").unwrap();
+        fs::write(root.join("src/gen/out.log"), "log").unwrap();
+        fs::write(root.join(".dockignore"), "*.log\n").unwrap();
+        dir
+    }
+
+    fn specs(list: &[&str]) -> Vec<String> {
+        list.iter().map(|s| s.to_string()).collect()
+    }
+
+    #[test]
+    fn test_directories_globs_and_files() {
+        let dir = setup();
+        let root = dir.path();
+
+        let expansion = expand(root, root, &specs(&["src"]), false).unwrap();
+        assert_eq!(expansion.files, vec!["src/gen/out.rs", "src/lib.rs"]);
+
+        let expansion = expand(root, root, &specs(&["*.rs", "missing.txt"]), false).unwrap();
+        assert_eq!(expansion.files, vec!["src/gen/out.rs", "src/lib.rs"]);
+        assert_eq!(expansion.unmatched, vec!["missing.txt"]);
+
+        // Relative to a subdirectory, and ignored files stay out
+        let cwd = root.join("src");
+        let expansion =
+            expand(root, &cwd, &specs(&["gen/out.log", "../README.md"]), false).unwrap();
+        assert_eq!(expansion.files, vec!["README.md"]);
+    }
+
+    #[test]
+    fn test_all_lists_every_file() {
+        let dir = setup();
+        let expansion = expand(dir.path(), dir.path(), &[], true).unwrap();
+        assert!(expansion.files.contains(&"README.md".to_string()));
+        assert!(!expansion.files.iter().any(|f| f.ends_with(".log")));
+    }
+}
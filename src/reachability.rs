@@ -0,0 +1,209 @@
+use rayon::prelude::*;
+use serde_json::Value;
+use std::collections::HashSet;
+use std::fs;
+use std::path::{Path, PathBuf};
+use std::time::SystemTime;
+
+use crate::chunking::{self, MANIFEST_SUFFIX};
+use crate::objcache;
+use crate::refs;
+use crate::spacedock::Spacedock;
+use crate::stage;
+
+/// Directory of course refs; every file in it names a starlog tip.
+pub fn helm_dir(repo: &Path) -> PathBuf {
+    let rel = Spacedock::get_path_info_internal("helm_d").map_or(".dock/links/helm", |p| p.path);
+    repo.join(rel)
+}
+
+pub fn starlog_path(repo: &Path, hash: &str) -> PathBuf {
+    let (prefix, rest) = hash.split_at(2);
+    repo.join(".dock").join("starlogs").join(prefix).join(rest)
+}
+
+pub fn is_object_id(name: &str) -> bool {
+    name.len() > 2 && name.bytes().all(|b| b.is_ascii_hexdigit())
+}
+
+/// `(course, starlog hash)` for every course with at least one starlog.
+pub fn course_tips(repo: &Path) -> Result<Vec<(String, String)>, String> {
+    Ok(refs::course_map(&helm_dir(repo))?
+        .into_iter()
+        .filter(|(_, tip)| !tip.is_empty())
+        .collect())
+}
+
+/// A loose file in a fan-out store (`objects/` or `starlogs/`).
+pub struct Loose {
+    pub path: PathBuf,
+    pub id: String,
+    /// A chunk manifest standing in for blob `id`.
+    pub manifest: bool,
+    pub size: u64,
+    pub modified: SystemTime,
+}
+
+/// Lists the `xx/yyyy` files under `store`, one fan-out directory per task.
+pub fn list_loose(store: &Path) -> Vec<Loose> {
+    let Ok(entries) = fs::read_dir(store) else {
+        return Vec::new();
+    };
+    let subdirs: Vec<PathBuf> = entries
+        .flatten()
+        .filter(|e| e.file_type().is_ok_and(|t| t.is_dir()))
+        .map(|e| e.path())
+        .collect();
+
+    subdirs
+        .par_iter()
+        .flat_map_iter(|subdir| {
+            let prefix = subdir
+                .file_name()
+                .map(|n| n.to_string_lossy().to_string())
+                .unwrap_or_default();
+            fs::read_dir(subdir)
+                .into_iter()
+                .flatten()
+                .flatten()
+                .filter_map(move |entry| {
+                    let name = entry.file_name().to_string_lossy().to_string();
+                    let rest = name.strip_suffix(MANIFEST_SUFFIX);
+                    let id = format!("{}{}", prefix, rest.unwrap_or(&name));
+                    let meta = entry.metadata().ok()?;
+                    (meta.is_file() && is_object_id(&id)).then(|| Loose {
+                        path: entry.path(),
+                        id,
+                        manifest: rest.is_some(),
+                        size: meta.len(),
+                        modified: meta.modified().unwrap_or(SystemTime::UNIX_EPOCH),
+                    })
+                })
+                .collect::<Vec<_>>()
+        })
+        .collect()
+}
+
+/// Everything reachable from the course refs.
+#[derive(Default, Debug)]
+pub struct Reachable {
+    pub starlogs: HashSet<String>,
+    /// Trees, blobs and chunks in `.dock/objects`.
+    pub objects: HashSet<String>,
+}
+
+/// Object ids a starlog refers to: its tree, the tree's blobs and the
+/// blobs listed in its own `files`.
+fn starlog_objects(repo: &Path, starlog: &Value) -> Result<Vec<String>, String> {
+    let mut ids = Vec::new();
+    if let Some(files) = starlog.get("files").and_then(Value::as_object) {
+        ids.extend(files.values().filter_map(Value::as_str).map(String::from));
+    }
+    if let Some(tree) = starlog.get("tree").and_then(Value::as_str) {
+        let tree_obj =
+            objcache::load_object(repo, tree).map_err(|e| format!("tree {}: {}", tree, e))?;
+        if let Some(entries) = tree_obj.as_object() {
+            ids.extend(entries.values().filter_map(Value::as_str).map(String::from));
+        }
+        ids.push(tree.to_string());
+    }
+    Ok(ids)
+}
+
+/// Link from a linked worktree's `.dock` to the main one, and the registry
+/// of linked worktrees in the main `.dock`, as `ruxpy worktree` lays them out.
+const COMMONDIR_FILE: &str = "commondir";
+const WORKTREES_DIR: &str = "worktrees";
+
+/// The main spacedock sharing objects with `repo` and all its linked
+/// worktrees, `repo` included.
+pub fn checkouts(repo: &Path) -> Vec<PathBuf> {
+    let dock = repo.join(".dock");
+    let common = fs::read_to_string(dock.join(COMMONDIR_FILE))
+        .map(|path| PathBuf::from(path.trim()))
+        .unwrap_or(dock);
+    let mut checkouts = vec![repo.to_path_buf()];
+    if let Some(main) = common.parent() {
+        checkouts.push(main.to_path_buf());
+    }
+    if let Ok(entries) = fs::read_dir(common.join(WORKTREES_DIR)) {
+        for entry in entries.flatten() {
+            if let Ok(path) = fs::read_to_string(entry.path()) {
+                checkouts.push(PathBuf::from(path.trim()));
+            }
+        }
+    }
+    checkouts
+}
+
+/// Blobs staged in any checkout sharing objects with `repo`, with their
+/// chunks. They are written at beam time, before any starlog refers to
+/// them, so they must survive a collection.
+pub fn staged_objects(repo: &Path) -> Result<HashSet<String>, String> {
+    let mut blobs = HashSet::new();
+    for checkout in checkouts(repo) {
+        // A worktree removed without unregistering has nothing staged
+        if !stage::stage_path(&checkout).is_file() {
+            continue;
+        }
+        let index = stage::load(&checkout)
+            .map_err(|e| format!("stage of {}: {}", checkout.display(), e))?;
+        blobs.extend(
+            index
+                .into_values()
+                .map(|entry| entry.hash)
+                .filter(|hash| !hash.is_empty()),
+        );
+    }
+
+    let mut objects = blobs.clone();
+    for hash in &blobs {
+        if let Some(manifest) = chunking::read_manifest(repo, hash)? {
+            objects.extend(manifest.chunks.into_iter().map(|c| c.hash));
+        }
+    }
+    Ok(objects)
+}
+
+/// Marks every starlog and object reachable from `tips`. Fails instead of
+/// returning a partial set when part of the graph cannot be read, since
+/// callers may delete whatever is not marked.
+pub fn mark(repo: &Path, tips: &[String]) -> Result<Reachable, String> {
+    let mut reachable = Reachable::default();
+
+    // Parent chains are inherently sequential
+    let mut pending: Vec<String> = tips.to_vec();
+    let mut starlogs = Vec::new();
+    while let Some(hash) = pending.pop() {
+        if !reachable.starlogs.insert(hash.clone()) {
+            continue;
+        }
+        let starlog = objcache::load_json(&starlog_path(repo, &hash))
+            .map_err(|e| format!("starlog {}: {}", hash, e))?;
+        if let Some(parent) = starlog.get("parent").and_then(Value::as_str) {
+            pending.push(parent.to_string());
+        }
+        starlogs.push(starlog);
+    }
+
+    // Trees and chunk manifests are independent, so load them in parallel
+    let blobs: HashSet<String> = starlogs
+        .par_iter()
+        .map(|starlog| starlog_objects(repo, starlog))
+        .collect::<Result<Vec<_>, _>>()?
+        .into_iter()
+        .flatten()
+        .collect();
+    let chunks: Vec<String> = blobs
+        .par_iter()
+        .map(|hash| chunking::read_manifest(repo, hash))
+        .collect::<Result<Vec<_>, _>>()?
+        .into_iter()
+        .flatten()
+        .flat_map(|manifest| manifest.chunks.into_iter().map(|c| c.hash))
+        .collect();
+
+    reachable.objects = blobs;
+    reachable.objects.extend(chunks);
+    Ok(reachable)
+}
@@ -0,0 +1,486 @@
+use pyo3::exceptions::PyRuntimeError;
+use pyo3::prelude::*;
+use std::collections::{BTreeMap, HashMap};
+use std::fs::{self, File, OpenOptions};
+use std::io::{ErrorKind, Write};
+use std::path::{Path, PathBuf};
+use std::sync::{Arc, Mutex};
+use std::thread;
+use std::time::{Duration, SystemTime};
+
+/// A ref (course tip, HELM) or the stage is locked by creating this file
+/// next to it. The new contents are written to the lock file, which is then
+/// renamed over the ref, so readers never see a partial write.
+pub const LOCK_SUFFIX: &str = ".lock";
+
+/// Attempts to take a held lock before giving up; the wait between
+/// attempts doubles up to `MAX_BACKOFF`, about six seconds in all.
+const LOCK_ATTEMPTS: u32 = 64;
+const FIRST_BACKOFF: Duration = Duration::from_millis(1);
+const MAX_BACKOFF: Duration = Duration::from_millis(100);
+
+/// Course tips packed into one file next to the `helm` directory, as
+/// `<course>\t<tip>` lines sorted by course. A loose ref in `helm`
+/// overrides the packed entry of the same course.
+pub const PACKED_COURSES_FILE: &str = "packed-courses";
+const PACKED_HEADER: &str = "# ruxpy packed courses";
+
+/// Parsed packed courses per file, revalidated by the file's size and
+/// mtime so that a lookup costs one `stat` and a binary search.
+type PackedCache = HashMap<PathBuf, (Option<(u64, SystemTime)>, Arc<Vec<(String, String)>>)>;
+static PACKED: Mutex<Option<PackedCache>> = Mutex::new(None);
+
+pub fn lock_path(target: &Path) -> PathBuf {
+    let mut name = target.as_os_str().to_owned();
+    name.push(LOCK_SUFFIX);
+    PathBuf::from(name)
+}
+
+/// Whether `name` is a lock file rather than a ref.
+pub fn is_lock_file(name: &str) -> bool {
+    name.ends_with(LOCK_SUFFIX)
+}
+
+/// Exclusive hold on `target`, released when dropped unless committed.
+pub struct Lock {
+    target: PathBuf,
+    path: PathBuf,
+    file: Option<File>,
+}
+
+impl Lock {
+    /// Creates the lock file of `target`, retrying with backoff while
+    /// another process holds it.
+    pub fn acquire(target: &Path) -> Result<Lock, String> {
+        Lock::acquire_within(target, LOCK_ATTEMPTS)
+    }
+
+    /// Creates the lock file of `target` only if no one holds it.
+    pub fn try_acquire(target: &Path) -> Result<Lock, String> {
+        Lock::acquire_within(target, 1)
+    }
+
+    fn acquire_within(target: &Path, attempts: u32) -> Result<Lock, String> {
+        let path = lock_path(target);
+        let mut backoff = FIRST_BACKOFF;
+        for attempt in 1..=attempts {
+            match OpenOptions::new().write(true).create_new(true).open(&path) {
+                Ok(file) => {
+                    return Ok(Lock {
+                        target: target.to_path_buf(),
+                        path,
+                        file: Some(file),
+                    })
+                }
+                Err(e) if e.kind() == ErrorKind::AlreadyExists && attempt < attempts => {
+                    thread::sleep(backoff);
+                    backoff = (backoff * 2).min(MAX_BACKOFF);
+                }
+                Err(e) if e.kind() == ErrorKind::AlreadyExists => break,
+                Err(e) => return Err(format!("Failed to lock {}: {}", target.display(), e)),
+            }
+        }
+        Err(format!(
+            "Failed to lock {}: {} exists. Another ruxpy process may be running; \
+             if not, remove the file and try again",
+            target.display(),
+            path.display()
+        ))
+    }
+
+    /// Replaces the target with `data` and releases the lock.
+    pub fn commit(mut self, data: &[u8]) -> Result<(), String> {
+        let mut file = self.file.take().expect("lock already committed");
+        file.write_all(data)
+            .and_then(|_| file.sync_all())
+            .and_then(|_| fs::rename(&self.path, &self.target))
+            .map_err(|e| format!("Failed to update {}: {}", self.target.display(), e))
+    }
+}
+
+impl Drop for Lock {
+    fn drop(&mut self) {
+        if self.file.take().is_some() {
+            let _ = fs::remove_file(&self.path);
+        }
+    }
+}
+
+/// Contents of the ref at `path`, trimmed; empty when it does not exist.
+pub fn read_ref(path: &Path) -> Result<String, String> {
+    match fs::read_to_string(path) {
+        Ok(contents) => Ok(contents.trim().to_string()),
+        Err(e) if e.kind() == ErrorKind::NotFound => Ok(String::new()),
+        Err(e) => Err(format!("Failed to read {}: {}", path.display(), e)),
+    }
+}
+
+/// Sets the ref at `path` to `new` if it still holds `expected` (empty for
+/// a ref that is empty or does not exist yet), under the ref's lock.
+pub fn compare_and_swap(path: &Path, expected: &str, new: &str) -> Result<(), String> {
+    let lock = Lock::acquire(path)?;
+    let current = read_ref(path)?;
+    if current != expected.trim() {
+        return Err(format!(
+            "{} moved: expected '{}', found '{}'",
+            path.display(),
+            expected.trim(),
+            current
+        ));
+    }
+    lock.commit(new.as_bytes())
+}
+
+/// Sets the ref at `path` to `contents` under the ref's lock, whatever it
+/// held before.
+pub fn write_ref(path: &Path, contents: &str) -> Result<(), String> {
+    Lock::acquire(path)?.commit(contents.as_bytes())
+}
+
+pub fn packed_courses_path(helm: &Path) -> PathBuf {
+    helm.with_file_name(PACKED_COURSES_FILE)
+}
+
+fn parse_packed(contents: &str) -> Vec<(String, String)> {
+    let mut courses: Vec<(String, String)> = contents
+        .lines()
+        .filter(|line| !line.is_empty() && !line.starts_with('#'))
+        .filter_map(|line| {
+            let (course, tip) = line.split_once('\t')?;
+            Some((course.to_string(), tip.trim().to_string()))
+        })
+        .collect();
+    // Written sorted; only a hand-edited file needs sorting
+    if !courses.windows(2).all(|pair| pair[0].0 < pair[1].0) {
+        courses.sort();
+        courses.dedup_by(|later, earlier| later.0 == earlier.0);
+    }
+    courses
+}
+
+/// Packed courses of the `helm` directory, sorted by course; read once and
+/// cached until the file changes.
+pub fn packed_courses(helm: &Path) -> Result<Arc<Vec<(String, String)>>, String> {
+    let path = packed_courses_path(helm);
+    let stamp = match fs::metadata(&path) {
+        Ok(meta) => Some((
+            meta.len(),
+            meta.modified().unwrap_or(SystemTime::UNIX_EPOCH),
+        )),
+        Err(e) if e.kind() == ErrorKind::NotFound => None,
+        Err(e) => return Err(format!("Failed to read {}: {}", path.display(), e)),
+    };
+
+    let mut guard = PACKED.lock().unwrap();
+    let cache = guard.get_or_insert_with(HashMap::new);
+    if let Some((cached_stamp, courses)) = cache.get(&path) {
+        if *cached_stamp == stamp {
+            return Ok(Arc::clone(courses));
+        }
+    }
+
+    let courses = match fs::read_to_string(&path) {
+        Ok(contents) => parse_packed(&contents),
+        Err(e) if e.kind() == ErrorKind::NotFound => Vec::new(),
+        Err(e) => return Err(format!("Failed to read {}: {}", path.display(), e)),
+    };
+    let courses = Arc::new(courses);
+    cache.insert(path, (stamp, Arc::clone(&courses)));
+    Ok(courses)
+}
+
+/// Tip of `course` in the `helm` directory ("" before its first starlog):
+/// the loose ref if there is one, else the packed entry. `None` when the
+/// course does not exist.
+pub fn course_tip(helm: &Path, course: &str) -> Result<Option<String>, String> {
+    match fs::read_to_string(helm.join(course)) {
+        Ok(tip) => return Ok(Some(tip.trim().to_string())),
+        Err(e) if e.kind() == ErrorKind::NotFound => {}
+        Err(e) => return Err(format!("Failed to read course {}: {}", course, e)),
+    }
+    let packed = packed_courses(helm)?;
+    Ok(packed
+        .binary_search_by(|(name, _)| name.as_str().cmp(course))
+        .ok()
+        .map(|i| packed[i].1.clone()))
+}
+
+fn loose_courses(helm: &Path) -> Result<Vec<(String, String)>, String> {
+    let entries = fs::read_dir(helm).map_err(|e| format!("Failed to list courses: {}", e))?;
+    let mut courses = Vec::new();
+    for entry in entries.flatten() {
+        let course = entry.file_name().to_string_lossy().to_string();
+        if is_lock_file(&course) || !entry.file_type().is_ok_and(|t| t.is_file()) {
+            continue;
+        }
+        match fs::read_to_string(entry.path()) {
+            Ok(tip) => courses.push((course, tip.trim().to_string())),
+            // Deleted or packed away since listing
+            Err(e) if e.kind() == ErrorKind::NotFound => {}
+            Err(e) => return Err(format!("Failed to read course {}: {}", course, e)),
+        }
+    }
+    Ok(courses)
+}
+
+/// Every course of the `helm` directory with its tip ("" before the first
+/// starlog): the packed file in one read, overridden by the loose refs.
+pub fn course_map(helm: &Path) -> Result<BTreeMap<String, String>, String> {
+    let mut courses: BTreeMap<String, String> = packed_courses(helm)?.iter().cloned().collect();
+    courses.extend(loose_courses(helm)?);
+    Ok(courses)
+}
+
+/// Sets `course` to `tip`, if it still points at `expected` when given.
+pub fn update_course(
+    helm: &Path,
+    course: &str,
+    tip: &str,
+    expected: Option<&str>,
+) -> Result<(), String> {
+    let lock = Lock::acquire(&helm.join(course))?;
+    if let Some(expected) = expected {
+        let current = course_tip(helm, course)?.unwrap_or_default();
+        if current != expected.trim() {
+            return Err(format!(
+                "Course {} moved: expected '{}', found '{}'",
+                course,
+                expected.trim(),
+                current
+            ));
+        }
+    }
+    lock.commit(tip.as_bytes())
+}
+
+/// Creates `course` at `tip`; fails if the course already exists.
+pub fn create_course(helm: &Path, course: &str, tip: &str) -> Result<(), String> {
+    let lock = Lock::acquire(&helm.join(course))?;
+    if course_tip(helm, course)?.is_some() {
+        return Err(format!("Course {} already exists", course));
+    }
+    lock.commit(tip.as_bytes())
+}
+
+fn write_packed(lock: Lock, courses: &BTreeMap<String, String>) -> Result<(), String> {
+    let mut data = format!("{}\n", PACKED_HEADER);
+    for (course, tip) in courses {
+        data.push_str(&format!("{}\t{}\n", course, tip));
+    }
+    lock.commit(data.as_bytes())
+}
+
+/// Removes `course`, loose and packed.
+pub fn delete_course(helm: &Path, course: &str) -> Result<(), String> {
+    let path = helm.join(course);
+    let _lock = Lock::acquire(&path)?;
+    // Held even when the course is not packed, so a concurrent pack cannot
+    // copy the loose ref into the packed file after it is removed
+    let packed_lock = Lock::acquire(&packed_courses_path(helm))?;
+    let mut packed: BTreeMap<String, String> = packed_courses(helm)?.iter().cloned().collect();
+    let was_packed = packed.remove(course).is_some();
+    let was_loose = match fs::remove_file(&path) {
+        Ok(()) => true,
+        Err(e) if e.kind() == ErrorKind::NotFound => false,
+        Err(e) => return Err(format!("Failed to delete course {}: {}", course, e)),
+    };
+    if was_packed {
+        write_packed(packed_lock, &packed)?;
+    }
+    if !was_packed && !was_loose {
+        return Err(format!("Course {} does not exist", course));
+    }
+    Ok(())
+}
+
+/// Moves every course into the packed file and removes the loose refs that
+/// still match it. `core` stays loose as well, since it marks a spacedock.
+/// Returns the number of courses packed.
+pub fn pack_courses(helm: &Path) -> Result<usize, String> {
+    let packed_lock = Lock::acquire(&packed_courses_path(helm))?;
+    let loose = loose_courses(helm)?;
+    let mut courses: BTreeMap<String, String> = packed_courses(helm)?.iter().cloned().collect();
+    courses.extend(
+        loose
+            .iter()
+            .filter(|(course, _)| !course.contains(['\t', '\n']))
+            .cloned(),
+    );
+    let count = courses.len();
+    write_packed(packed_lock, &courses)?;
+
+    for (course, tip) in loose {
+        if course == "core" || courses.get(&course) != Some(&tip) {
+            continue;
+        }
+        // A ref being updated right now stays loose, overriding its entry
+        let path = helm.join(&course);
+        if let Ok(_lock) = Lock::try_acquire(&path) {
+            if read_ref(&path)? == tip {
+                fs::remove_file(&path)
+                    .map_err(|e| format!("Failed to remove course {}: {}", course, e))?;
+            }
+        }
+    }
+    Ok(count)
+}
+
+#[pyclass]
+pub struct Refs;
+
+#[pymethods]
+impl Refs {
+    /// Contents of the ref at `path`, trimmed; "" when it does not exist.
+    #[staticmethod]
+    fn read(path: &str) -> PyResult<String> {
+        read_ref(Path::new(path)).map_err(PyRuntimeError::new_err)
+    }
+
+    /// Sets the ref at `path` to `value`. With `expected`, fails instead if
+    /// the ref no longer holds it ("" for an empty or missing ref).
+    #[staticmethod]
+    #[pyo3(signature = (path, value, expected=None))]
+    fn update(py: Python<'_>, path: &str, value: &str, expected: Option<&str>) -> PyResult<()> {
+        py.allow_threads(|| match expected {
+            Some(expected) => compare_and_swap(Path::new(path), expected, value),
+            None => write_ref(Path::new(path), value),
+        })
+        .map_err(PyRuntimeError::new_err)
+    }
+
+    /// Tip of `course` in the `helm_dir` ("" before its first starlog), or
+    /// None when the course does not exist.
+    #[staticmethod]
+    fn course_tip(helm_dir: &str, course: &str) -> PyResult<Option<String>> {
+        course_tip(Path::new(helm_dir), course).map_err(PyRuntimeError::new_err)
+    }
+
+    /// Every course of `helm_dir` mapped to its tip.
+    #[staticmethod]
+    fn courses(helm_dir: &str) -> PyResult<BTreeMap<String, String>> {
+        course_map(Path::new(helm_dir)).map_err(PyRuntimeError::new_err)
+    }
+
+    /// Sets `course` to `tip`. With `expected`, fails instead if the course
+    /// no longer points at it ("" for a course without starlogs).
+    #[staticmethod]
+    #[pyo3(signature = (helm_dir, course, tip, expected=None))]
+    fn update_course(
+        py: Python<'_>,
+        helm_dir: &str,
+        course: &str,
+        tip: &str,
+        expected: Option<&str>,
+    ) -> PyResult<()> {
+        py.allow_threads(|| update_course(Path::new(helm_dir), course, tip, expected))
+            .map_err(PyRuntimeError::new_err)
+    }
+
+    /// Packs every course of `helm_dir` into one file; returns their number.
+    #[staticmethod]
+    fn pack_courses(py: Python<'_>, helm_dir: &str) -> PyResult<usize> {
+        py.allow_threads(|| pack_courses(Path::new(helm_dir)))
+            .map_err(PyRuntimeError::new_err)
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use std::sync::{Arc, Barrier};
+
+    #[test]
+    fn test_compare_and_swap_rejects_a_moved_ref() {
+        let dir = tempfile::tempdir().unwrap();
+        let course = dir.path().join("core");
+
+        compare_and_swap(&course, "", "a").unwrap();
+        compare_and_swap(&course, "a", "b").unwrap();
+        assert!(compare_and_swap(&course, "a", "c").is_err());
+        assert_eq!(read_ref(&course).unwrap(), "b");
+        assert!(!lock_path(&course).exists());
+    }
+
+    #[test]
+    fn test_concurrent_swaps_lose_no_update() {
+        let dir = tempfile::tempdir().unwrap();
+        let counter = Arc::new(dir.path().join("counter"));
+        write_ref(&counter, "0").unwrap();
+        let barrier = Arc::new(Barrier::new(8));
+
+        let workers: Vec<_> = (0..8)
+            .map(|_| {
+                let (counter, barrier) = (counter.clone(), barrier.clone());
+                thread::spawn(move || {
+                    barrier.wait();
+                    for _ in 0..25 {
+                        loop {
+                            let seen = read_ref(&counter).unwrap();
+                            let next = (seen.parse::<u32>().unwrap() + 1).to_string();
+                            if compare_and_swap(&counter, &seen, &next).is_ok() {
+                                break;
+                            }
+                        }
+                    }
+                })
+            })
+            .collect();
+        for worker in workers {
+            worker.join().unwrap();
+        }
+        assert_eq!(read_ref(&counter).unwrap(), "200");
+    }
+
+    fn helm() -> (tempfile::TempDir, PathBuf) {
+        let dir = tempfile::tempdir().unwrap();
+        let helm = dir.path().join("links").join("helm");
+        fs::create_dir_all(&helm).unwrap();
+        (dir, helm)
+    }
+
+    #[test]
+    fn test_packed_courses_are_overridden_by_loose_refs() {
+        let (_dir, helm) = helm();
+        for i in 0..100 {
+            create_course(&helm, &format!("feat-{:03}", i), &format!("{:064x}", i)).unwrap();
+        }
+        create_course(&helm, "core", "").unwrap();
+
+        assert_eq!(pack_courses(&helm).unwrap(), 101);
+        let loose: Vec<_> = fs::read_dir(&helm).unwrap().flatten().collect();
+        assert_eq!(loose.len(), 1);
+        assert_eq!(
+            course_tip(&helm, "feat-042").unwrap(),
+            Some(format!("{:064x}", 42))
+        );
+        assert_eq!(course_tip(&helm, "core").unwrap(), Some(String::new()));
+        assert_eq!(course_tip(&helm, "feat-100").unwrap(), None);
+
+        update_course(&helm, "feat-042", "ab", Some(&format!("{:064x}", 42))).unwrap();
+        assert!(update_course(&helm, "feat-042", "cd", Some("00")).is_err());
+        assert!(create_course(&helm, "feat-007", "ef").is_err());
+        assert_eq!(
+            course_tip(&helm, "feat-042").unwrap().as_deref(),
+            Some("ab")
+        );
+        assert_eq!(course_map(&helm).unwrap()["feat-042"], "ab");
+
+        delete_course(&helm, "feat-042").unwrap();
+        delete_course(&helm, "feat-007").unwrap();
+        assert_eq!(course_tip(&helm, "feat-042").unwrap(), None);
+        assert_eq!(course_tip(&helm, "feat-007").unwrap(), None);
+        assert_eq!(course_map(&helm).unwrap().len(), 99);
+        assert!(delete_course(&helm, "feat-007").is_err());
+    }
+
+    #[test]
+    fn test_held_lock_times_out_and_is_released_on_drop() {
+        let dir = tempfile::tempdir().unwrap();
+        let helm = dir.path().join("HELM");
+        let lock = Lock::acquire(&helm).unwrap();
+        assert!(write_ref(&helm, "link: links/helm/core").is_err());
+        drop(lock);
+        write_ref(&helm, "link: links/helm/core").unwrap();
+        assert_eq!(read_ref(&helm).unwrap(), "link: links/helm/core");
+    }
+}
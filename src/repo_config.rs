@@ -0,0 +1,124 @@
+use std::collections::HashMap;
+use std::fs;
+use std::path::{Path, PathBuf};
+use std::sync::Mutex;
+use std::time::SystemTime;
+
+use crate::object_store::Backend;
+
+pub const CONFIG_FILE: &str = "config.toml";
+
+/// Format version of spacedocks created before `core.format_version` existed.
+pub const DEFAULT_FORMAT_VERSION: i64 = 1;
+/// Files at least this large are stored as chunk manifests.
+pub const DEFAULT_CHUNK_THRESHOLD: u64 = 8 * 1024 * 1024;
+
+/// The `[core]` table of `.dock/config.toml`, the settings the Rust core
+/// needs on every object read or write.
+#[derive(Clone, Copy, Debug, PartialEq, Eq)]
+pub struct CoreConfig {
+    pub format_version: i64,
+    /// 0 disables chunking.
+    pub chunk_threshold: u64,
+    pub object_store: Backend,
+}
+
+impl Default for CoreConfig {
+    fn default() -> Self {
+        CoreConfig {
+            format_version: DEFAULT_FORMAT_VERSION,
+            chunk_threshold: DEFAULT_CHUNK_THRESHOLD,
+            object_store: Backend::Loose,
+        }
+    }
+}
+
+/// Parsed configs per spacedock, revalidated by the config file's mtime so
+/// that per-object lookups cost one `stat`.
+static CONFIGS: Mutex<Option<HashMap<PathBuf, (Option<SystemTime>, CoreConfig)>>> =
+    Mutex::new(None);
+
+fn integer(core: &toml::Table, key: &str) -> Result<Option<i64>, String> {
+    match core.get(key) {
+        None => Ok(None),
+        Some(value) => value
+            .as_integer()
+            .map(Some)
+            .ok_or_else(|| format!("core.{} must be an integer", key)),
+    }
+}
+
+fn read_core_config(config_path: &Path) -> Result<CoreConfig, String> {
+    let mut config = CoreConfig::default();
+    let Ok(contents) = fs::read_to_string(config_path) else {
+        return Ok(config);
+    };
+    let table: toml::Table = contents
+        .parse()
+        .map_err(|e| format!("Failed to parse {}: {}", config_path.display(), e))?;
+    let Some(core) = table.get("core").and_then(|core| core.as_table()) else {
+        return Ok(config);
+    };
+
+    if let Some(version) = integer(core, "format_version")? {
+        config.format_version = version;
+    }
+    if let Some(threshold) = integer(core, "chunk_threshold")? {
+        config.chunk_threshold = u64::try_from(threshold)
+            .map_err(|_| "core.chunk_threshold must not be negative".to_string())?;
+    }
+    if let Some(value) = core.get("object_store") {
+        let name = value
+            .as_str()
+            .ok_or_else(|| "core.object_store must be a string".to_string())?;
+        config.object_store = Backend::from_name(name)?;
+    }
+    Ok(config)
+}
+
+/// Core settings of the spacedock at `root`; defaults when the config file
+/// or its `[core]` table is missing.
+pub fn core_config(root: &Path) -> Result<CoreConfig, String> {
+    let config_path = root.join(".dock").join(CONFIG_FILE);
+    let mtime = fs::metadata(&config_path).and_then(|m| m.modified()).ok();
+
+    let mut guard = CONFIGS.lock().unwrap();
+    let cache = guard.get_or_insert_with(HashMap::new);
+    if let Some((cached_mtime, config)) = cache.get(root) {
+        if *cached_mtime == mtime && mtime.is_some() {
+            return Ok(*config);
+        }
+    }
+
+    let config = read_core_config(&config_path)?;
+    cache.insert(root.to_path_buf(), (mtime, config));
+    Ok(config)
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn test_core_config_reads_overrides() {
+        let dir = tempfile::tempdir().unwrap();
+        fs::create_dir_all(dir.path().join(".dock")).unwrap();
+        fs::write(
+            dir.path().join(".dock").join(CONFIG_FILE),
+            "username = \"picard\"\n\n[core]\nformat_version = 2\nchunk_threshold = 1024\n\
+             object_store = \"pack\"\n",
+        )
+        .unwrap();
+
+        let config = core_config(dir.path()).unwrap();
+        assert_eq!(config.format_version, 2);
+        assert_eq!(config.chunk_threshold, 1024);
+        assert_eq!(config.object_store, Backend::Pack);
+    }
+
+    #[test]
+    fn test_missing_config_uses_defaults() {
+        let dir = tempfile::tempdir().unwrap();
+        assert_eq!(core_config(dir.path()).unwrap(), CoreConfig::default());
+    }
+}
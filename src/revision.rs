@@ -0,0 +1,308 @@
+use pyo3::exceptions::PyRuntimeError;
+use pyo3::prelude::*;
+use serde_json::{Map, Value};
+use std::fs;
+use std::io::{self, BufWriter, Write};
+use std::path::Path;
+
+use crate::chunking;
+use crate::objcache;
+use crate::reachability::{self, is_object_id};
+use crate::refs;
+
+/// Shortest starlog id prefix accepted in place of a full id.
+pub const MIN_PREFIX: usize = 4;
+
+/// Resolves a course name, full starlog id or unique id prefix to a
+/// starlog id. Only the course ref (loose or packed) or one fan-out
+/// directory is read.
+pub fn resolve_starlog(repo: &Path, rev: &str) -> Result<String, String> {
+    if !rev.contains(['/', '\\']) && !rev.starts_with('.') {
+        if let Some(hash) = refs::course_tip(&reachability::helm_dir(repo), rev)? {
+            if hash.is_empty() {
+                return Err(format!("Course {} has no starlogs yet", rev));
+            }
+            return Ok(hash);
+        }
+    }
+
+    let rev = rev.to_ascii_lowercase();
+    if rev.len() < MIN_PREFIX || !is_object_id(&rev) {
+        return Err(format!("Unknown course or starlog '{}'", rev));
+    }
+    if reachability::starlog_path(repo, &rev).is_file() {
+        return Ok(rev);
+    }
+
+    let (prefix, rest) = rev.split_at(2);
+    let fanout = repo.join(".dock").join("starlogs").join(prefix);
+    let matches: Vec<String> = fs::read_dir(&fanout)
+        .into_iter()
+        .flatten()
+        .flatten()
+        .map(|e| e.file_name().to_string_lossy().to_string())
+        .filter(|name| name.starts_with(rest))
+        .map(|name| format!("{}{}", prefix, name))
+        .collect();
+    match matches.as_slice() {
+        [hash] => Ok(hash.clone()),
+        [] => Err(format!("Unknown course or starlog '{}'", rev)),
+        _ => Err(format!("Starlog prefix '{}' is ambiguous", rev)),
+    }
+}
+
+pub fn load_starlog(repo: &Path, starlog_hash: &str) -> Result<Value, String> {
+    objcache::load_json(&reachability::starlog_path(repo, starlog_hash))
+        .map_err(|e| format!("starlog {}: {}", starlog_hash, e))
+}
+
+/// The flat tree (`path -> blob id`) recorded by a starlog.
+pub fn load_tree(repo: &Path, starlog_hash: &str) -> Result<Map<String, Value>, String> {
+    let starlog = load_starlog(repo, starlog_hash)?;
+    let tree_hash = starlog
+        .get("tree")
+        .and_then(Value::as_str)
+        .ok_or_else(|| format!("Starlog {} has no tree", starlog_hash))?;
+    match objcache::load_object(repo, tree_hash)
+        .map_err(|e| format!("tree {}: {}", tree_hash, e))?
+    {
+        Value::Object(tree) => Ok(tree),
+        _ => Err(format!("Tree {} is not an object", tree_hash)),
+    }
+}
+
+fn normalize(path: &str) -> String {
+    path.replace('\\', "/").trim_matches('/').to_string()
+}
+
+/// Blob id of `path` as of `rev`.
+pub fn lookup_path(repo: &Path, rev: &str, path: &str) -> Result<String, String> {
+    let starlog = resolve_starlog(repo, rev)?;
+    let tree = load_tree(repo, &starlog)?;
+    let path = normalize(path);
+    if let Some(hash) = tree.get(&path).and_then(Value::as_str) {
+        return Ok(hash.to_string());
+    }
+    let dir_prefix = format!("{}/", path);
+    if path.is_empty() || tree.keys().any(|k| k.starts_with(&dir_prefix)) {
+        Err(format!("'{}' is a directory in {}", path, rev))
+    } else {
+        Err(format!("'{}' does not exist in {}", path, rev))
+    }
+}
+
+/// An entry of a historical directory listing.
+#[derive(Debug, Clone, PartialEq, Eq)]
+pub enum TreeEntry {
+    Blob { path: String, hash: String },
+    Dir { path: String },
+}
+
+/// Entries of directory `dir` as of `rev`: files and subdirectories
+/// directly inside it, or every file below it with `recursive`.
+pub fn ls_tree(
+    repo: &Path,
+    rev: &str,
+    dir: &str,
+    recursive: bool,
+) -> Result<Vec<TreeEntry>, String> {
+    let starlog = resolve_starlog(repo, rev)?;
+    let tree = load_tree(repo, &starlog)?;
+    let dir = normalize(dir);
+    let prefix = if dir.is_empty() {
+        String::new()
+    } else {
+        format!("{}/", dir)
+    };
+
+    let mut entries = Vec::new();
+    let mut last_dir: Option<String> = None;
+    // serde_json maps iterate in key order, so subdirectories are contiguous
+    for (path, hash) in tree.iter() {
+        let Some(rest) = path.strip_prefix(&prefix) else {
+            continue;
+        };
+        match rest.split_once('/') {
+            Some((sub, _)) if !recursive => {
+                let sub_path = format!("{}{}", prefix, sub);
+                if last_dir.as_deref() != Some(&sub_path) {
+                    entries.push(TreeEntry::Dir {
+                        path: sub_path.clone(),
+                    });
+                    last_dir = Some(sub_path);
+                }
+            }
+            _ => entries.push(TreeEntry::Blob {
+                path: path.clone(),
+                hash: hash.as_str().unwrap_or_default().to_string(),
+            }),
+        }
+    }
+    if entries.is_empty() && !dir.is_empty() {
+        return Err(format!("'{}' is not a directory in {}", dir, rev));
+    }
+    Ok(entries)
+}
+
+/// Forwards writes to a Python binary file object, taking the GIL per call.
+pub(crate) struct PyFileWriter(pub(crate) PyObject);
+
+impl Write for PyFileWriter {
+    fn write(&mut self, buf: &[u8]) -> io::Result<usize> {
+        Python::with_gil(|py| {
+            self.0
+                .call_method1(py, "write", (pyo3::types::PyBytes::new(py, buf),))
+                .map_err(|e| io::Error::other(e.to_string()))?;
+            Ok(buf.len())
+        })
+    }
+
+    fn flush(&mut self) -> io::Result<()> {
+        Python::with_gil(|py| {
+            self.0
+                .call_method0(py, "flush")
+                .map(|_| ())
+                .map_err(|e| io::Error::other(e.to_string()))
+        })
+    }
+}
+
+/// Size of the batches handed to the Python file object by `write_file`.
+pub(crate) const STREAM_BUFFER: usize = 1 << 20;
+
+#[pyclass]
+pub struct Revision;
+
+#[pymethods]
+impl Revision {
+    /// Starlog id named by `rev` (a course, full id or unique id prefix)
+    #[staticmethod]
+    pub fn resolve(repo_path: &str, rev: &str) -> PyResult<String> {
+        resolve_starlog(Path::new(repo_path), rev).map_err(PyRuntimeError::new_err)
+    }
+
+    /// Blob id of `path` as recorded by `rev`
+    #[staticmethod]
+    pub fn lookup(repo_path: &str, rev: &str, path: &str) -> PyResult<String> {
+        lookup_path(Path::new(repo_path), rev, path).map_err(PyRuntimeError::new_err)
+    }
+
+    /// Contents of `path` as recorded by `rev`
+    #[staticmethod]
+    pub fn read_file(py: Python<'_>, repo_path: &str, rev: &str, path: &str) -> PyResult<Vec<u8>> {
+        let repo = Path::new(repo_path);
+        py.allow_threads(|| {
+            let hash = lookup_path(repo, rev, path)?;
+            let mut contents = Vec::new();
+            chunking::copy_blob_to(repo, &hash, &mut contents)?;
+            Ok(contents)
+        })
+        .map_err(PyRuntimeError::new_err)
+    }
+
+    /// Streams `path` as recorded by `rev` into the binary file object
+    /// `file` without holding the whole blob in memory; returns the bytes
+    /// written.
+    #[staticmethod]
+    pub fn write_file(
+        py: Python<'_>,
+        repo_path: &str,
+        rev: &str,
+        path: &str,
+        file: PyObject,
+    ) -> PyResult<u64> {
+        let repo = Path::new(repo_path);
+        py.allow_threads(|| {
+            let hash = lookup_path(repo, rev, path)?;
+            let mut out = BufWriter::with_capacity(STREAM_BUFFER, PyFileWriter(file));
+            let written = chunking::copy_blob_to(repo, &hash, &mut out)?;
+            out.flush()
+                .map_err(|e| format!("Failed to write output: {}", e))?;
+            Ok(written)
+        })
+        .map_err(PyRuntimeError::new_err)
+    }
+
+    /// `(kind, blob id, path)` for the entries of directory `dir` as of
+    /// `rev`; `kind` is `blob` or `tree`, and trees have no id since trees
+    /// are stored flat.
+    #[staticmethod]
+    #[pyo3(signature = (repo_path, rev, dir="", recursive=false))]
+    pub fn ls_tree(
+        repo_path: &str,
+        rev: &str,
+        dir: &str,
+        recursive: bool,
+    ) -> PyResult<Vec<(&'static str, String, String)>> {
+        let entries =
+            ls_tree(Path::new(repo_path), rev, dir, recursive).map_err(PyRuntimeError::new_err)?;
+        Ok(entries
+            .into_iter()
+            .map(|entry| match entry {
+                TreeEntry::Blob { path, hash } => ("blob", hash, path),
+                TreeEntry::Dir { path } => ("tree", String::new(), path),
+            })
+            .collect())
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use serde_json::json;
+
+    fn setup() -> tempfile::TempDir {
+        let dir = tempfile::tempdir().unwrap();
+        let repo = dir.path();
+        let tree = json!({"README.md": "aa11", "src/lib.rs": "bb22", "src/bin/main.rs": "cc33"});
+        let tree_path = chunking::object_path(repo, "dd44");
+        fs::create_dir_all(tree_path.parent().unwrap()).unwrap();
+        fs::write(tree_path, tree.to_string()).unwrap();
+
+        let starlog = "ee55".repeat(16);
+        let starlog_path = reachability::starlog_path(repo, &starlog);
+        fs::create_dir_all(starlog_path.parent().unwrap()).unwrap();
+        fs::write(
+            starlog_path,
+            json!({"tree": "dd44", "parent": null}).to_string(),
+        )
+        .unwrap();
+        fs::create_dir_all(reachability::helm_dir(repo)).unwrap();
+        fs::write(reachability::helm_dir(repo).join("core"), &starlog).unwrap();
+        dir
+    }
+
+    #[test]
+    fn test_resolve_course_and_prefix() {
+        let dir = setup();
+        let full = "ee55".repeat(16);
+        assert_eq!(resolve_starlog(dir.path(), "core").unwrap(), full);
+        assert_eq!(resolve_starlog(dir.path(), "ee55ee").unwrap(), full);
+        assert!(resolve_starlog(dir.path(), "ff00").is_err());
+    }
+
+    #[test]
+    fn test_lookup_and_ls_tree() {
+        let dir = setup();
+        assert_eq!(
+            lookup_path(dir.path(), "core", "src/lib.rs").unwrap(),
+            "bb22"
+        );
+        assert!(lookup_path(dir.path(), "core", "src").is_err());
+
+        let entries = ls_tree(dir.path(), "core", "src", false).unwrap();
+        assert_eq!(
+            entries,
+            vec![
+                TreeEntry::Dir {
+                    path: "src/bin".to_string()
+                },
+                TreeEntry::Blob {
+                    path: "src/lib.rs".to_string(),
+                    hash: "bb22".to_string()
+                },
+            ]
+        );
+        assert_eq!(ls_tree(dir.path(), "core", "", true).unwrap().len(), 3);
+    }
+}
@@ -1,22 +1,21 @@
 use pyo3::types::PyDict;
 use pyo3::{exceptions::PyRuntimeError, prelude::*};
 use serde_json::{Map, Value};
-use sha3::{Digest, Sha3_256};
 use std::collections::HashSet;
 use std::fs;
 use std::path::Path;
-use walkdir::WalkDir;
 
+use crate::chunking;
+use crate::hashing::{self, HashAlgorithm};
 use crate::starlog::Starlog;
+use crate::trace;
+use crate::walker;
 
 #[pyclass]
 pub struct RuxpyTree;
 
-fn hash_bytes(data: &[u8]) -> String {
-    let mut h = Sha3_256::new();
-    h.update(data);
-    let hash = format!("{:x}", h.finalize());
-    hash
+fn repo_algorithm(repo: &Path) -> PyResult<HashAlgorithm> {
+    hashing::repo_algorithm(repo).map_err(PyRuntimeError::new_err)
 }
 
 #[pymethods]
@@ -24,6 +23,7 @@ impl RuxpyTree {
     /// Returns Tree JSON mapping relative paths -> Blob hash for "repo_path"
     #[staticmethod]
     pub fn build_tree(repo_path: &str) -> PyResult<String> {
+        let _span = trace::span("build_tree");
         let repo = Path::new(repo_path);
         if !repo.exists() || !repo.is_dir() {
             return Err(PyRuntimeError::new_err(
@@ -31,38 +31,13 @@ impl RuxpyTree {
             ));
         }
 
+        let algorithm = repo_algorithm(repo)?;
         let mut tree = Map::new();
 
-        for entry in WalkDir::new(repo).into_iter().filter_map(|e| e.ok()) {
-            let p = entry.path();
-            if p.is_file() {
-                // todo: integrate with .gitignore
-                if p.starts_with(repo.join(".dock")) {
-                    continue;
-                }
-
-                let rel = match p.strip_prefix(repo) {
-                    Ok(r) => r,
-                    Err(_) => continue,
-                };
-                let rel_str = rel
-                    .to_string_lossy()
-                    .replace(std::path::MAIN_SEPARATOR, "/");
-
-                let bytes = match fs::read(p) {
-                    Ok(b) => b,
-                    Err(e) => {
-                        return Err(PyRuntimeError::new_err(format!(
-                            "Failed to read file {}: {}",
-                            p.display(),
-                            e
-                        )))
-                    }
-                };
-
-                let blob_hash = hash_bytes(&bytes);
-                tree.insert(rel_str, Value::String(blob_hash));
-            }
+        for rel_str in walker::walk(repo).files {
+            let blob_hash = hashing::hash_file(algorithm, &repo.join(&rel_str))
+                .map_err(PyRuntimeError::new_err)?;
+            tree.insert(rel_str, Value::String(blob_hash));
         }
 
         serde_json::to_string(&Value::Object(tree))
@@ -76,6 +51,7 @@ impl RuxpyTree {
         starlog_hash: Option<String>,
         repo_path: &str,
     ) -> PyResult<String> {
+        let _span = trace::span("build_tree_from_staged");
         let repo = Path::new(repo_path);
         if !repo.exists() || !repo.is_dir() {
             return Err(PyRuntimeError::new_err(
@@ -126,20 +102,17 @@ impl RuxpyTree {
             return Err(PyRuntimeError::new_err("Invalid tree hash"));
         }
 
-        let repo = Path::new(repo_path);
-        let objects_dir = repo.join(".dock").join("objects");
-        let (prefix, rest) = tree_hash.split_at(2);
-        let object_path = objects_dir.join(prefix).join(rest);
-
-        let contents = fs::read_to_string(&object_path)
+        let contents = chunking::read_object(Path::new(repo_path), tree_hash)
             .map_err(|e| PyRuntimeError::new_err(format!("Failed to read tree object: {}", e)))?;
 
-        Ok(contents)
+        String::from_utf8(contents)
+            .map_err(|_| PyRuntimeError::new_err("Tree object is not valid UTF-8"))
     }
 
     /// Write tree JSON (string) into the object store
     #[staticmethod]
     pub fn write_tree_object(tree_json: &str, repo_path: &str) -> PyResult<String> {
+        let _span = trace::span("write_tree_object");
         let repo = Path::new(repo_path);
         if !repo.exists() || !repo.is_dir() {
             return Err(PyRuntimeError::new_err(
@@ -147,26 +120,10 @@ impl RuxpyTree {
             ));
         }
 
-        let tree_hash = hash_bytes(tree_json.as_bytes());
-
-        let objects_dir = repo.join(".dock").join("objects");
-        let (prefix, rest) = tree_hash.split_at(2);
-        let object_dir = objects_dir.join(prefix);
-        let object_path = object_dir.join(rest);
-
-        if let Err(e) = fs::create_dir_all(&object_dir) {
-            return Err(PyRuntimeError::new_err(format!(
-                "Failed to create objects dir: {}",
-                e
-            )));
-        }
+        let tree_hash = hashing::hash_bytes(repo_algorithm(repo)?, tree_json.as_bytes());
 
-        if let Err(e) = fs::write(&object_path, tree_json) {
-            return Err(PyRuntimeError::new_err(format!(
-                "Failed to write tree object: {}",
-                e
-            )));
-        }
+        chunking::put_object(repo, &tree_hash, tree_json.as_bytes())
+            .map_err(|e| PyRuntimeError::new_err(format!("Failed to write tree object: {}", e)))?;
 
         Ok(tree_hash)
     }
@@ -174,6 +131,7 @@ impl RuxpyTree {
     /// Perform warp to course from tree perspective - create/remove files and dirs to sync the project state
     #[staticmethod]
     pub fn warp_to_course(tree_hash: &str, repo_path: &str) -> PyResult<()> {
+        let _span = trace::span("warp_to_course");
         let tree_json = RuxpyTree::load_tree(tree_hash, repo_path)?;
         let parsed: Value = serde_json::from_str(&tree_json)
             .map_err(|e| PyRuntimeError::new_err(format!("Failed to parse tree JSON: {}", e)))?;
@@ -192,49 +150,23 @@ impl RuxpyTree {
             }
         }
 
-        // remove files in working dir that are NOT present in tree
-        for entry in WalkDir::new(repo).into_iter().filter_map(|e| e.ok()) {
-            let p = entry.path();
-            if p.is_file() {
-                // todo: extend to also check .gitignore paths
-                if p.starts_with(repo.join(".dock")) {
-                    continue;
-                }
-
-                let rel = match p.strip_prefix(repo) {
-                    Ok(r) => r,
-                    Err(_) => continue,
-                };
-                let rel_str = rel
-                    .to_string_lossy()
-                    .replace(std::path::MAIN_SEPARATOR, "/");
-                if !tree_paths.contains(&rel_str) {
-                    fs::remove_file(p).map_err(|e| {
-                        PyRuntimeError::new_err(format!(
-                            "Failed to remove file {}: {}",
-                            p.display(),
-                            e
-                        ))
-                    })?;
-                }
+        // remove files in working dir that are NOT present in tree;
+        // ignored and internal paths are never visited
+        let working_tree = walker::walk(repo);
+        for rel_str in working_tree.files.iter() {
+            if !tree_paths.contains(rel_str) {
+                let p = repo.join(rel_str);
+                fs::remove_file(&p).map_err(|e| {
+                    PyRuntimeError::new_err(format!("Failed to remove file {}: {}", p.display(), e))
+                })?;
             }
         }
 
         // Remove empty directories
-        let mut dirs: Vec<std::path::PathBuf> = WalkDir::new(repo)
-            .into_iter()
-            .filter_map(|e| e.ok())
-            .filter(|e| e.file_type().is_dir())
-            .map(|e| e.into_path())
-            .collect();
+        let mut dirs: Vec<std::path::PathBuf> =
+            working_tree.dirs.iter().map(|d| repo.join(d)).collect();
         dirs.sort_by_key(|p| std::cmp::Reverse(p.components().count()));
         for dir in dirs {
-            if dir == repo.join(".dock") || dir.starts_with(repo.join(".dock")) {
-                continue;
-            }
-            if dir == repo {
-                continue;
-            }
             if let Ok(mut rd) = fs::read_dir(&dir) {
                 if rd.next().is_none() {
                     let _ = fs::remove_dir(&dir);
@@ -245,11 +177,7 @@ impl RuxpyTree {
         // create files from tree
         for (rel_path, v) in obj.iter() {
             if let Some(blob_hash) = v.as_str() {
-                let prefix = &blob_hash[..2];
-                let rest = &blob_hash[2..];
-                let blob_path = repo.join(".dock").join("objects").join(prefix).join(rest);
-
-                if !blob_path.exists() {
+                if !chunking::blob_exists(repo, blob_hash) {
                     return Err(PyRuntimeError::new_err(format!(
                         "Blob {} missing in object store",
                         blob_hash
@@ -267,16 +195,16 @@ impl RuxpyTree {
                     }
                 }
 
-                let data = fs::read(&blob_path).map_err(|e| {
-                    PyRuntimeError::new_err(format!("Failed to read blob {}: {}", blob_hash, e))
-                })?;
-                fs::write(&dest, &data).map_err(|e| {
+                // Stream into place so chunked blobs are never held whole
+                let mut out = fs::File::create(&dest).map_err(|e| {
                     PyRuntimeError::new_err(format!(
                         "Failed to write file {}: {}",
                         dest.display(),
                         e
                     ))
                 })?;
+                chunking::copy_blob_to(repo, blob_hash, &mut out)
+                    .map_err(PyRuntimeError::new_err)?;
             }
         }
 
@@ -317,13 +245,7 @@ mod tests {
         assert!(obj.contains_key("src/main.rs"));
 
         let file_bytes = fs::read(repo_path.join("file1.txt")).unwrap();
-        let expected_hash = {
-            use sha3::{Digest, Sha3_256};
-            let mut h = Sha3_256::new();
-            h.update(&file_bytes);
-            let hash = format!("{:x}", h.finalize());
-            hash
-        };
+        let expected_hash = hashing::hash_bytes(HashAlgorithm::Sha3_256, &file_bytes);
 
         let actual_hash = obj.get("file1.txt").unwrap().as_str().unwrap();
         assert_eq!(actual_hash, expected_hash);
@@ -363,10 +285,7 @@ mod tests {
         let tree_hash =
             RuxpyTree::write_tree_object(tree_json.as_str(), repo_path.to_str().unwrap()).unwrap();
 
-        use sha3::{Digest, Sha3_256};
-        let mut h = Sha3_256::new();
-        h.update(tree_json.as_bytes());
-        let expected_hash = format!("{:x}", h.finalize());
+        let expected_hash = hashing::hash_bytes(HashAlgorithm::Sha3_256, tree_json.as_bytes());
         assert_eq!(
             tree_hash, expected_hash,
             "tree hash should match expected SHA3_256"
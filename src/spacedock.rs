@@ -149,7 +149,7 @@ impl Spacedock {
     }
 
     #[staticmethod]
-    fn find_dock_root(start_path: Option<String>) -> Option<String> {
+    pub fn find_dock_root(start_path: Option<String>) -> Option<String> {
         let mut current = match start_path {
             Some(path) => std::path::PathBuf::from(path),
             None => std::env::current_dir().unwrap(),
@@ -0,0 +1,525 @@
+use pyo3::exceptions::PyRuntimeError;
+use pyo3::prelude::*;
+use rayon::prelude::*;
+use std::collections::BTreeMap;
+use std::fs::{self, OpenOptions};
+use std::io::Write;
+use std::path::{Path, PathBuf};
+use std::time::{SystemTime, UNIX_EPOCH};
+
+use crate::blob;
+use crate::refs;
+use crate::trace;
+
+/// `.dock/stage` starts with this, then the number of sorted records and
+/// their byte length. Sorted records follow, then records appended since
+/// the last rewrite; a later record for a path replaces an earlier one.
+const MAGIC: &[u8; 8] = b"RXSTAGE1";
+const HEADER_LEN: usize = 8 + 4 + 8;
+/// Appended records are folded into the sorted section once they take
+/// more space than this or than the sorted section, whichever is larger.
+const MIN_COMPACT_BYTES: u64 = 64 * 1024;
+
+/// A file modified this close to being staged may change again within the
+/// same mtime tick, so its entry gets a zero mtime and is rehashed when the
+/// starlog is recorded (as the directory cache does for listings).
+const RACY_WINDOW_NS: i64 = 2_000_000_000;
+
+const FLAG_STAGED: u8 = 0;
+const FLAG_REMOVED: u8 = 1;
+
+const TRUNCATED: &str = "Stage index is truncated";
+
+/// A staged file: its blob, written when the file was beamed, and the
+/// file's size and mtime at that moment.
+#[derive(Debug, Clone, PartialEq, Eq)]
+pub struct StageEntry {
+    pub hash: String,
+    pub size: u64,
+    pub mtime_ns: i64,
+}
+
+pub type StageIndex = BTreeMap<String, StageEntry>;
+
+pub fn stage_path(repo: &Path) -> PathBuf {
+    repo.join(".dock").join("stage")
+}
+
+fn encode(out: &mut Vec<u8>, flag: u8, path: &str, entry: Option<&StageEntry>) {
+    out.push(flag);
+    out.extend_from_slice(&(path.len() as u32).to_le_bytes());
+    out.extend_from_slice(path.as_bytes());
+    if let Some(entry) = entry {
+        out.extend_from_slice(&entry.size.to_le_bytes());
+        out.extend_from_slice(&entry.mtime_ns.to_le_bytes());
+        out.push(entry.hash.len() as u8);
+        out.extend_from_slice(entry.hash.as_bytes());
+    }
+}
+
+struct Reader<'a> {
+    data: &'a [u8],
+    pos: usize,
+}
+
+impl<'a> Reader<'a> {
+    fn take(&mut self, n: usize) -> Result<&'a [u8], String> {
+        let end = self.pos + n;
+        let bytes = self
+            .data
+            .get(self.pos..end)
+            .ok_or_else(|| TRUNCATED.to_string())?;
+        self.pos = end;
+        Ok(bytes)
+    }
+
+    fn u8(&mut self) -> Result<u8, String> {
+        Ok(self.take(1)?[0])
+    }
+
+    fn u32(&mut self) -> Result<u32, String> {
+        Ok(u32::from_le_bytes(self.take(4)?.try_into().unwrap()))
+    }
+
+    fn u64(&mut self) -> Result<u64, String> {
+        Ok(u64::from_le_bytes(self.take(8)?.try_into().unwrap()))
+    }
+
+    fn string(&mut self, len: usize) -> Result<String, String> {
+        String::from_utf8(self.take(len)?.to_vec())
+            .map_err(|_| "Stage index has a non UTF-8 path".to_string())
+    }
+
+    /// One record; `None` as the entry means the path was unstaged.
+    fn record(&mut self) -> Result<(String, Option<StageEntry>), String> {
+        let flag = self.u8()?;
+        let len = self.u32()? as usize;
+        let path = self.string(len)?;
+        if flag == FLAG_REMOVED {
+            return Ok((path, None));
+        }
+        let size = self.u64()?;
+        let mtime_ns = self.u64()? as i64;
+        let hash_len = self.u8()? as usize;
+        let hash = self.string(hash_len)?;
+        Ok((
+            path,
+            Some(StageEntry {
+                hash,
+                size,
+                mtime_ns,
+            }),
+        ))
+    }
+}
+
+/// Stages written before the binary index are a JSON list of paths with
+/// no blobs yet; their entries have an empty hash.
+fn parse_legacy(data: &[u8]) -> Result<StageIndex, String> {
+    let paths: Vec<String> =
+        serde_json::from_slice(data).map_err(|e| format!("Failed to parse stage: {}", e))?;
+    Ok(paths
+        .into_iter()
+        .map(|path| {
+            let entry = StageEntry {
+                hash: String::new(),
+                size: 0,
+                mtime_ns: 0,
+            };
+            (path, entry)
+        })
+        .collect())
+}
+
+/// Parsed index plus the byte lengths of its sorted and appended sections;
+/// `None` lengths mean the file must be rewritten before appending. An
+/// append cut short by a crash leaves a partial record at the end; reading
+/// stops at the last complete record and the appended length excludes it.
+fn read(repo: &Path) -> Result<(StageIndex, Option<(u64, u64)>), String> {
+    let data = match fs::read(stage_path(repo)) {
+        Ok(data) => data,
+        Err(e) if e.kind() == std::io::ErrorKind::NotFound => return Ok((StageIndex::new(), None)),
+        Err(e) => return Err(format!("Failed to read stage: {}", e)),
+    };
+    if !data.starts_with(MAGIC) {
+        return parse_legacy(&data).map(|index| (index, None));
+    }
+
+    let mut reader = Reader {
+        data: &data,
+        pos: MAGIC.len(),
+    };
+    let sorted_count = reader.u32()?;
+    let sorted_len = reader.u64()?;
+    let mut index = StageIndex::new();
+    for _ in 0..sorted_count {
+        let (path, entry) = reader.record()?;
+        if let Some(entry) = entry {
+            index.insert(path, entry);
+        }
+    }
+    let mut complete = reader.pos;
+    while reader.pos < data.len() {
+        match reader.record() {
+            Ok((path, Some(entry))) => index.insert(path, entry),
+            Ok((path, None)) => index.remove(&path),
+            Err(e) if e == TRUNCATED => break,
+            Err(e) => return Err(e),
+        };
+        complete = reader.pos;
+    }
+    let appended_len = ((complete - HEADER_LEN) as u64).saturating_sub(sorted_len);
+    Ok((index, Some((sorted_len, appended_len))))
+}
+
+pub fn load(repo: &Path) -> Result<StageIndex, String> {
+    read(repo).map(|(index, _)| index)
+}
+
+/// Rewrites the stage as one sorted section, atomically.
+pub fn write(repo: &Path, index: &StageIndex) -> Result<(), String> {
+    rewrite(refs::Lock::acquire(&stage_path(repo))?, index)
+}
+
+fn rewrite(lock: refs::Lock, index: &StageIndex) -> Result<(), String> {
+    let mut records = Vec::new();
+    for (path, entry) in index {
+        encode(&mut records, FLAG_STAGED, path, Some(entry));
+    }
+    let mut data = Vec::with_capacity(HEADER_LEN + records.len());
+    data.extend_from_slice(MAGIC);
+    data.extend_from_slice(&(index.len() as u32).to_le_bytes());
+    data.extend_from_slice(&(records.len() as u64).to_le_bytes());
+    data.extend_from_slice(&records);
+    lock.commit(&data)
+}
+
+/// Applies `changes` (`None` unstages the path) by appending records,
+/// rewriting the file when it is not yet a binary index or the appended
+/// section has outgrown the sorted one. The stage stays locked from the
+/// read to the write, so concurrent updates are applied one after another.
+pub fn update(repo: &Path, changes: &[(String, Option<StageEntry>)]) -> Result<(), String> {
+    update_with(repo, |_| changes.to_vec())
+}
+
+/// `update` with the changes worked out from the stage once it is locked.
+fn update_with(
+    repo: &Path,
+    changes: impl FnOnce(&StageIndex) -> Vec<(String, Option<StageEntry>)>,
+) -> Result<(), String> {
+    let lock = refs::Lock::acquire(&stage_path(repo))?;
+    let (mut index, sections) = read(repo)?;
+    let changes = changes(&index);
+    if changes.is_empty() {
+        return Ok(());
+    }
+    let mut records = Vec::new();
+    for (path, entry) in &changes {
+        let flag = if entry.is_some() {
+            FLAG_STAGED
+        } else {
+            FLAG_REMOVED
+        };
+        encode(&mut records, flag, path, entry.as_ref());
+    }
+
+    let append_at = sections
+        .filter(|&(sorted_len, appended_len)| {
+            appended_len + (records.len() as u64) <= sorted_len.max(MIN_COMPACT_BYTES)
+        })
+        .map(|(sorted_len, appended_len)| HEADER_LEN as u64 + sorted_len + appended_len);
+    if let Some(end) = append_at {
+        let mut file = OpenOptions::new()
+            .append(true)
+            .open(stage_path(repo))
+            .map_err(|e| format!("Failed to open stage: {}", e))?;
+        // Cut off a partial record left by an interrupted append, so the
+        // new records follow the last complete one.
+        file.set_len(end)
+            .map_err(|e| format!("Failed to write stage: {}", e))?;
+        return file
+            .write_all(&records)
+            .map_err(|e| format!("Failed to write stage: {}", e));
+    }
+
+    for (path, entry) in changes {
+        match entry {
+            Some(entry) => index.insert(path, entry),
+            None => index.remove(&path),
+        };
+    }
+    rewrite(lock, &index)
+}
+
+/// Unstages `files`. A file with a blob id in `hashes` is only unstaged
+/// while its entry still has that id, so an entry beamed again since the
+/// id was read stays staged.
+pub fn remove(
+    repo: &Path,
+    files: &[String],
+    hashes: Option<&BTreeMap<String, String>>,
+) -> Result<(), String> {
+    update_with(repo, |index| {
+        files
+            .iter()
+            .filter(|path| match hashes.and_then(|hashes| hashes.get(*path)) {
+                Some(hash) => index.get(*path).is_some_and(|entry| entry.hash == *hash),
+                None => true,
+            })
+            .map(|path| (path.clone(), None))
+            .collect()
+    })
+}
+
+/// Size and mtime of `path`, as recorded in stage entries.
+pub fn stat(path: &Path) -> Option<(u64, i64)> {
+    let meta = fs::metadata(path).ok()?;
+    let mtime_ns = meta
+        .modified()
+        .ok()
+        .and_then(|m| m.duration_since(UNIX_EPOCH).ok())
+        .map_or(0, |d| d.as_nanos() as i64);
+    Some((meta.len(), mtime_ns))
+}
+
+/// Writes the blob of `rel` and returns its stage entry.
+fn stage_file(repo: &Path, rel: &str) -> Result<StageEntry, String> {
+    // Stat first, so a write during hashing shows up as a later change
+    let (size, mtime_ns) =
+        stat(&repo.join(rel)).ok_or_else(|| format!("Failed to locate {}", rel))?;
+    let hash = blob::store_file(repo, rel)?;
+    let staged_ns = SystemTime::now()
+        .duration_since(UNIX_EPOCH)
+        .map_or(0, |d| d.as_nanos() as i64);
+    let mtime_ns = if mtime_ns.saturating_add(RACY_WINDOW_NS) < staged_ns {
+        mtime_ns
+    } else {
+        0
+    };
+    Ok(StageEntry {
+        hash,
+        size,
+        mtime_ns,
+    })
+}
+
+/// Stages `files` (relative to `repo`), writing their blobs across all
+/// cores.
+pub fn add(repo: &Path, files: &[String]) -> Result<(), String> {
+    let _span = trace::span("stage_add");
+    let changes = files
+        .par_iter()
+        .map(|rel| Ok((rel.clone(), Some(stage_file(repo, rel)?))))
+        .collect::<Result<Vec<_>, String>>()?;
+    update(repo, &changes)
+}
+
+/// Blob ids to record for the staged files, plus the staged files that no
+/// longer exist. Blobs written at beam time are reused unless the file's
+/// size or mtime changed since; only those files are read again.
+pub fn resolve(repo: &Path) -> Result<(BTreeMap<String, String>, Vec<String>), String> {
+    let _span = trace::span("stage_resolve");
+    let index = load(repo)?;
+    let resolved: Vec<(String, Option<String>)> = index
+        .par_iter()
+        .map(|(path, entry)| {
+            let current = stat(&repo.join(path));
+            let hash = match current {
+                None => None,
+                Some((size, mtime_ns))
+                    if !entry.hash.is_empty()
+                        && entry.mtime_ns != 0
+                        && size == entry.size
+                        && mtime_ns == entry.mtime_ns =>
+                {
+                    Some(entry.hash.clone())
+                }
+                Some(_) => Some(blob::store_file(repo, path)?),
+            };
+            Ok((path.clone(), hash))
+        })
+        .collect::<Result<_, String>>()?;
+
+    let mut hashes = BTreeMap::new();
+    let mut missing = Vec::new();
+    for (path, hash) in resolved {
+        match hash {
+            Some(hash) => {
+                hashes.insert(path, hash);
+            }
+            None => missing.push(path),
+        }
+    }
+    Ok((hashes, missing))
+}
+
+#[pyclass]
+pub struct Stage;
+
+#[pymethods]
+impl Stage {
+    /// Staged paths, sorted
+    #[staticmethod]
+    pub fn paths(repo_path: &str) -> PyResult<Vec<String>> {
+        let index = load(Path::new(repo_path)).map_err(PyRuntimeError::new_err)?;
+        Ok(index.into_keys().collect())
+    }
+
+    /// Staged path -> blob id (empty for entries staged before blobs were
+    /// written at beam time)
+    #[staticmethod]
+    pub fn entries(repo_path: &str) -> PyResult<BTreeMap<String, String>> {
+        let index = load(Path::new(repo_path)).map_err(PyRuntimeError::new_err)?;
+        Ok(index
+            .into_iter()
+            .map(|(path, entry)| (path, entry.hash))
+            .collect())
+    }
+
+    /// Write blobs for `files` and stage them
+    #[staticmethod]
+    pub fn add(py: Python<'_>, repo_path: &str, files: Vec<String>) -> PyResult<()> {
+        py.allow_threads(|| add(Path::new(repo_path), &files))
+            .map_err(PyRuntimeError::new_err)
+    }
+
+    /// Unstage `files`; those in `hashes` (path -> blob id) only while
+    /// they are still staged with that blob
+    #[staticmethod]
+    #[pyo3(signature = (repo_path, files, hashes=None))]
+    pub fn remove(
+        repo_path: &str,
+        files: Vec<String>,
+        hashes: Option<BTreeMap<String, String>>,
+    ) -> PyResult<()> {
+        remove(Path::new(repo_path), &files, hashes.as_ref()).map_err(PyRuntimeError::new_err)
+    }
+
+    #[staticmethod]
+    pub fn clear(repo_path: &str) -> PyResult<()> {
+        write(Path::new(repo_path), &StageIndex::new()).map_err(PyRuntimeError::new_err)
+    }
+
+    /// `(path -> blob id, missing paths)` to record in a starlog
+    #[staticmethod]
+    pub fn resolve(
+        py: Python<'_>,
+        repo_path: &str,
+    ) -> PyResult<(BTreeMap<String, String>, Vec<String>)> {
+        py.allow_threads(|| resolve(Path::new(repo_path)))
+            .map_err(PyRuntimeError::new_err)
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn setup() -> tempfile::TempDir {
+        let dir = tempfile::tempdir().unwrap();
+        fs::create_dir_all(dir.path().join(".dock/objects")).unwrap();
+        fs::write(dir.path().join("a.txt"), "alpha").unwrap();
+        fs::write(dir.path().join("b.txt"), "beta").unwrap();
+        dir
+    }
+
+    #[test]
+    fn test_add_appends_and_reloads() {
+        let dir = setup();
+        let repo = dir.path();
+        add(repo, &["b.txt".to_string()]).unwrap();
+        add(repo, &["a.txt".to_string()]).unwrap();
+
+        let index = load(repo).unwrap();
+        assert_eq!(index.keys().collect::<Vec<_>>(), vec!["a.txt", "b.txt"]);
+        assert!(crate::chunking::blob_exists(repo, &index["a.txt"].hash));
+
+        update(repo, &[("b.txt".to_string(), None)]).unwrap();
+        assert_eq!(load(repo).unwrap().len(), 1);
+    }
+
+    #[test]
+    fn test_torn_append_is_ignored_and_cut_off() {
+        let dir = setup();
+        let repo = dir.path();
+        add(repo, &["a.txt".to_string()]).unwrap();
+        update(repo, &[("b.txt".to_string(), None)]).unwrap();
+        // An append that crashed partway through its record
+        let path = stage_path(repo);
+        let len = fs::metadata(&path).unwrap().len();
+        OpenOptions::new()
+            .write(true)
+            .open(&path)
+            .unwrap()
+            .set_len(len - 2)
+            .unwrap();
+        assert_eq!(
+            load(repo).unwrap().keys().collect::<Vec<_>>(),
+            vec!["a.txt"]
+        );
+
+        add(repo, &["b.txt".to_string()]).unwrap();
+        let index = load(repo).unwrap();
+        assert_eq!(index.keys().collect::<Vec<_>>(), vec!["a.txt", "b.txt"]);
+    }
+
+    #[test]
+    fn test_resolve_rehashes_only_changed_files() {
+        let dir = setup();
+        let repo = dir.path();
+        add(repo, &["a.txt".to_string(), "b.txt".to_string()]).unwrap();
+        let staged = load(repo).unwrap()["a.txt"].hash.clone();
+
+        fs::write(repo.join("a.txt"), "alpha, edited").unwrap();
+        fs::remove_file(repo.join("b.txt")).unwrap();
+        let (hashes, missing) = resolve(repo).unwrap();
+        assert_ne!(hashes["a.txt"], staged);
+        assert_eq!(missing, vec!["b.txt"]);
+    }
+
+    #[test]
+    fn test_racy_entry_is_rehashed() {
+        let dir = setup();
+        let repo = dir.path();
+        add(repo, &["a.txt".to_string()]).unwrap();
+        let entry = load(repo).unwrap()["a.txt"].clone();
+        assert_eq!(entry.mtime_ns, 0);
+
+        // Same size, and possibly the same mtime tick
+        fs::write(repo.join("a.txt"), "ALPHA").unwrap();
+        let (hashes, _) = resolve(repo).unwrap();
+        assert_ne!(hashes["a.txt"], entry.hash);
+    }
+
+    #[test]
+    fn test_remove_keeps_entries_beamed_again() {
+        let dir = setup();
+        let repo = dir.path();
+        let files = vec!["a.txt".to_string(), "b.txt".to_string()];
+        add(repo, &files).unwrap();
+        let (recorded, _) = resolve(repo).unwrap();
+
+        fs::write(repo.join("a.txt"), "alpha, again").unwrap();
+        add(repo, &["a.txt".to_string()]).unwrap();
+        remove(repo, &files, Some(&recorded)).unwrap();
+        let index = load(repo).unwrap();
+        assert_eq!(index.keys().collect::<Vec<_>>(), ["a.txt"]);
+        assert_ne!(index["a.txt"].hash, recorded["a.txt"]);
+
+        remove(repo, &files, None).unwrap();
+        assert!(load(repo).unwrap().is_empty());
+    }
+
+    #[test]
+    fn test_reads_legacy_json_stage() {
+        let dir = setup();
+        fs::write(stage_path(dir.path()), "[\"a.txt\"]").unwrap();
+        let (hashes, _) = resolve(dir.path()).unwrap();
+        assert!(hashes.contains_key("a.txt"));
+
+        // The next update converts it to the binary index
+        add(dir.path(), &["b.txt".to_string()]).unwrap();
+        assert!(fs::read(stage_path(dir.path())).unwrap().starts_with(MAGIC));
+        assert_eq!(load(dir.path()).unwrap().len(), 2);
+    }
+}
@@ -7,7 +7,10 @@ use std::path::{Path, PathBuf};
 use std::str;
 use std::{collections::HashMap, fs};
 
+use crate::objcache;
+use crate::refs;
 use crate::spacedock::{Spacedock, PATHS};
+use crate::trace;
 
 #[pyclass]
 pub struct Starlog;
@@ -34,11 +37,12 @@ impl Starlog {
             )
             .join(course_file);
 
-            if course_path.exists() && course_path.is_file() {
-                let hash_contents = fs::read_to_string(course_path)
-                    .map_err(|_| "course read failed".to_string())?;
-                let latest_starlog_hash = hash_contents.trim();
-
+            let (Some(helm), Some(course)) = (course_path.parent(), course_path.file_name()) else {
+                return Err("HELM malformed".to_string());
+            };
+            let tip = refs::course_tip(helm, &course.to_string_lossy())
+                .map_err(|_| "course read failed".to_string())?;
+            if let Some(latest_starlog_hash) = tip {
                 if latest_starlog_hash.is_empty() {
                     return Err(
                         "No Starlog entry yet. Please use `ruxpy starlog` to make an entry."
@@ -46,7 +50,7 @@ impl Starlog {
                     );
                 }
 
-                return Ok(latest_starlog_hash.to_string());
+                return Ok(latest_starlog_hash);
             } else {
                 return Err("course does not exist".to_string());
             }
@@ -73,10 +77,7 @@ impl Starlog {
             return Err("FileNotFound Error".to_string());
         }
 
-        let file_content =
-            fs::read_to_string(&obj_file).map_err(|e| format!("Failed to read file: {}", e))?;
-        let starlog_obj: Value = serde_json::from_str(&file_content)
-            .map_err(|e| format!("Failed to parse JSON: {}", e))?;
+        let starlog_obj = objcache::load_json(&obj_file)?;
 
         match starlog_obj.get("files") {
             Some(files) if files.is_object() => {
@@ -96,13 +97,7 @@ impl Starlog {
             .join(prefix)
             .join(rest);
 
-        let starlog_obj = std::fs::read_to_string(starlog_obj_path)
-            .map_err(|e| format!("Failed to read tree object: {}", e))?;
-
-        let parsed: Value = serde_json::from_str(&starlog_obj)
-            .map_err(|e| format!("Failed to parse tree JSON: {}", e))?;
-
-        Ok(parsed)
+        objcache::load_json(&starlog_obj_path)
     }
 
     pub fn load_parent_starlog_files(parent_hash: Option<&str>) -> Result<Value, String> {
@@ -147,6 +142,7 @@ impl Starlog {
         let files_map = Starlog::load_starlog_files(base_path, starlog_hash)
             .map_err(pyo3::exceptions::PyRuntimeError::new_err)?;
 
+        let _span = trace::span("json_to_py");
         let py_dict = PyDict::new(py);
         for (key, value) in files_map {
             // Convert serde_json::Value to Python object
@@ -180,11 +176,7 @@ impl Starlog {
         let (prefix, rest) = starlog_hash.split_at(2);
         let full_path = starlog_path.join(prefix).join(rest);
 
-        let starlog_obj = std::fs::read_to_string(full_path)
-            .map_err(|e| PyRuntimeError::new_err(format!("Failed to read tree object: {}", e)))?;
-
-        let parsed: Value = serde_json::from_str(&starlog_obj)
-            .map_err(|e| PyRuntimeError::new_err(format!("Failed to parse tree JSON: {}", e)))?;
+        let parsed = objcache::load_json(&full_path).map_err(PyRuntimeError::new_err)?;
 
         let obj = parsed
             .as_object()
@@ -225,7 +217,7 @@ impl Starlog {
     }
 }
 
-fn serde_json_to_pyobject(py: Python, value: &Value) -> PyResult<PyObject> {
+pub fn serde_json_to_pyobject(py: Python, value: &Value) -> PyResult<PyObject> {
     match value {
         Value::Null => Ok(py.None()),
         Value::Bool(b) => Ok(b.into_py_any(py)?),
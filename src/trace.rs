@@ -0,0 +1,146 @@
+use pyo3::prelude::*;
+use pyo3::types::PyDict;
+use std::sync::atomic::{AtomicBool, AtomicU64, Ordering};
+use std::sync::Mutex;
+use std::time::{Instant, SystemTime, UNIX_EPOCH};
+
+/// Work counters, always maintained; they are plain relaxed atomics.
+#[derive(Clone, Copy)]
+pub enum Counter {
+    FilesStat,
+    BytesHashed,
+    ObjectsWritten,
+    ObjectsSkipped,
+    CacheHits,
+}
+
+const COUNTER_NAMES: [&str; 5] = [
+    "files_stat",
+    "bytes_hashed",
+    "objects_written",
+    "objects_skipped",
+    "cache_hits",
+];
+
+static COUNTERS: [AtomicU64; 5] = [const { AtomicU64::new(0) }; 5];
+
+/// Spans are only recorded once tracing is enabled (`--timings` or
+/// `RUXPY_TRACE`), so a disabled span costs one atomic load.
+static ENABLED: AtomicBool = AtomicBool::new(false);
+static SPANS: Mutex<Vec<SpanRecord>> = Mutex::new(Vec::new());
+static NEXT_TID: AtomicU64 = AtomicU64::new(1);
+
+thread_local! {
+    static TID: u64 = NEXT_TID.fetch_add(1, Ordering::Relaxed);
+}
+
+struct SpanRecord {
+    name: String,
+    ts_us: u64,
+    dur_us: u64,
+    tid: u64,
+}
+
+pub fn add(counter: Counter, n: u64) {
+    COUNTERS[counter as usize].fetch_add(n, Ordering::Relaxed);
+}
+
+fn now_us() -> u64 {
+    SystemTime::now()
+        .duration_since(UNIX_EPOCH)
+        .map(|d| d.as_micros() as u64)
+        .unwrap_or(0)
+}
+
+fn record(name: String, ts_us: u64, dur_us: u64) {
+    let tid = TID.with(|tid| *tid);
+    SPANS.lock().unwrap().push(SpanRecord {
+        name,
+        ts_us,
+        dur_us,
+        tid,
+    });
+}
+
+/// Records the time until it is dropped as a span named `name`.
+pub struct Span {
+    name: &'static str,
+    start: Option<(u64, Instant)>,
+}
+
+pub fn span(name: &'static str) -> Span {
+    let start = ENABLED
+        .load(Ordering::Relaxed)
+        .then(|| (now_us(), Instant::now()));
+    Span { name, start }
+}
+
+impl Drop for Span {
+    fn drop(&mut self) {
+        if let Some((ts_us, started)) = self.start {
+            record(
+                self.name.to_string(),
+                ts_us,
+                started.elapsed().as_micros() as u64,
+            );
+        }
+    }
+}
+
+#[pyclass]
+pub struct Trace;
+
+#[pymethods]
+impl Trace {
+    #[staticmethod]
+    fn enable() {
+        ENABLED.store(true, Ordering::Relaxed);
+    }
+
+    /// Stop recording spans; already recorded ones are kept until `reset`.
+    #[staticmethod]
+    fn disable() {
+        ENABLED.store(false, Ordering::Relaxed);
+    }
+
+    #[staticmethod]
+    fn is_enabled() -> bool {
+        ENABLED.load(Ordering::Relaxed)
+    }
+
+    /// Record a span measured on the Python side (wall-clock microseconds).
+    #[staticmethod]
+    fn record_span(name: &str, ts_us: u64, dur_us: u64) {
+        if ENABLED.load(Ordering::Relaxed) {
+            record(name.to_string(), ts_us, dur_us);
+        }
+    }
+
+    #[staticmethod]
+    fn counters(py: Python) -> PyResult<PyObject> {
+        let dict = PyDict::new(py);
+        for (name, counter) in COUNTER_NAMES.iter().zip(COUNTERS.iter()) {
+            dict.set_item(name, counter.load(Ordering::Relaxed))?;
+        }
+        Ok(dict.into())
+    }
+
+    /// Recorded spans as (name, start_us, duration_us, thread_id) tuples.
+    #[staticmethod]
+    fn spans() -> Vec<(String, u64, u64, u64)> {
+        SPANS
+            .lock()
+            .unwrap()
+            .iter()
+            .map(|s| (s.name.clone(), s.ts_us, s.dur_us, s.tid))
+            .collect()
+    }
+
+    #[staticmethod]
+    fn reset() {
+        for counter in COUNTERS.iter() {
+            counter.store(0, Ordering::Relaxed);
+        }
+        SPANS.lock().unwrap().clear();
+    }
+}
@@ -0,0 +1,202 @@
+use ignore::gitignore::{Gitignore, GitignoreBuilder};
+use ignore::{WalkBuilder, WalkState};
+use std::collections::HashMap;
+use std::path::{Path, PathBuf};
+use std::sync::Mutex;
+
+use crate::trace::{self, Counter};
+
+/// Per-directory ignore file honoured by every working tree traversal.
+pub const DOCKIGNORE: &str = ".dockignore";
+
+/// Directories that never belong to the working tree.
+const INTERNAL_DIRS: &[&str] = &[".dock", ".git", "__pycache__"];
+
+/// Files and directories of a working tree, relative to its root and
+/// "/"-separated. Both lists are sorted.
+#[derive(Default)]
+pub struct WalkResult {
+    pub files: Vec<String>,
+    pub dirs: Vec<String>,
+}
+
+pub fn is_internal_name(name: &str) -> bool {
+    INTERNAL_DIRS.contains(&name)
+}
+
+pub fn to_rel_string(root: &Path, path: &Path) -> Option<String> {
+    path.strip_prefix(root).ok().map(|rel| {
+        rel.to_string_lossy()
+            .replace(std::path::MAIN_SEPARATOR, "/")
+    })
+}
+
+/// Walks the working tree rooted at `root` in parallel.
+///
+/// Internal directories and anything matched by a `.dockignore` (at any
+/// level) are pruned before they are read, so ignored subtrees cost nothing.
+pub fn walk(root: &Path) -> WalkResult {
+    let _span = trace::span("walk");
+    let files = Mutex::new(Vec::new());
+    let dirs = Mutex::new(Vec::new());
+
+    WalkBuilder::new(root)
+        .standard_filters(false)
+        .add_custom_ignore_filename(DOCKIGNORE)
+        .filter_entry(|entry| !entry.file_name().to_str().is_some_and(is_internal_name))
+        .build_parallel()
+        .run(|| {
+            let files = &files;
+            let dirs = &dirs;
+            Box::new(move |result| {
+                let entry = match result {
+                    Ok(entry) => entry,
+                    Err(_) => return WalkState::Continue,
+                };
+                if entry.depth() == 0 {
+                    return WalkState::Continue;
+                }
+                let Some(file_type) = entry.file_type() else {
+                    return WalkState::Continue;
+                };
+                if let Some(rel) = to_rel_string(root, entry.path()) {
+                    if file_type.is_file() {
+                        files.lock().unwrap().push(rel);
+                    } else if file_type.is_dir() {
+                        dirs.lock().unwrap().push(rel);
+                    }
+                }
+                WalkState::Continue
+            })
+        });
+
+    let mut files = files.into_inner().unwrap();
+    let mut dirs = dirs.into_inner().unwrap();
+    files.sort_unstable();
+    dirs.sort_unstable();
+    trace::add(Counter::FilesStat, (files.len() + dirs.len()) as u64);
+    WalkResult { files, dirs }
+}
+
+/// Answers ignore queries for individual paths using the same rules as
+/// `walk`, loading each directory's `.dockignore` at most once.
+pub struct DockignoreMatcher {
+    root: PathBuf,
+    cache: HashMap<PathBuf, Option<Gitignore>>,
+}
+
+impl DockignoreMatcher {
+    pub fn new(root: &Path) -> Self {
+        DockignoreMatcher {
+            root: root.to_path_buf(),
+            cache: HashMap::new(),
+        }
+    }
+
+    fn matcher_for(&mut self, dir: &Path) -> Option<&Gitignore> {
+        self.cache
+            .entry(dir.to_path_buf())
+            .or_insert_with(|| {
+                let dockignore_path = dir.join(DOCKIGNORE);
+                if !dockignore_path.is_file() {
+                    return None;
+                }
+                let mut builder = GitignoreBuilder::new(dir);
+                builder.add(dockignore_path);
+                builder.build().ok()
+            })
+            .as_ref()
+    }
+
+    /// Check if `path` (absolute, or relative to the root) should be ignored.
+    /// The deepest `.dockignore` with an opinion wins.
+    pub fn is_ignored(&mut self, path: &Path) -> bool {
+        let full = self.root.join(path);
+        let rel = match full.strip_prefix(&self.root) {
+            Ok(rel) => rel.to_path_buf(),
+            Err(_) => return false,
+        };
+        if rel
+            .components()
+            .any(|c| c.as_os_str().to_str().is_some_and(is_internal_name))
+        {
+            return true;
+        }
+
+        let is_dir = full.is_dir();
+        let ancestors: Vec<PathBuf> = match full.parent() {
+            Some(parent) => parent
+                .ancestors()
+                .take_while(|dir| dir.starts_with(&self.root))
+                .map(Path::to_path_buf)
+                .collect(),
+            None => Vec::new(),
+        };
+
+        for dir in ancestors {
+            if let Some(gitignore) = self.matcher_for(&dir) {
+                let matched = gitignore.matched_path_or_any_parents(&full, is_dir);
+                if matched.is_ignore() {
+                    return true;
+                }
+                if matched.is_whitelist() {
+                    return false;
+                }
+            }
+        }
+        false
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use std::fs;
+
+    #[test]
+    fn test_walk_prunes_internal_and_ignored_dirs() {
+        let dir = tempfile::tempdir().unwrap();
+        let root = dir.path();
+        fs::create_dir_all(root.join(".dock/objects")).unwrap();
+        fs::create_dir_all(root.join("build/deep")).unwrap();
+        fs::create_dir_all(root.join("src/gen")).unwrap();
+        fs::write(root.join(".dock/HELM"), "link: links/helm/core").unwrap();
+        fs::write(root.join(".dockignore"), "build/\n").unwrap();
+        fs::write(root.join("build/deep/out.o"), "obj").unwrap();
+        fs::write(root.join("src/main.rs"), "fn main() {}").unwrap();
+        fs::write(root.join("src/.dockignore"), "gen/\n*.tmp\n").unwrap();
+        fs::write(root.join("src/gen/code.rs"), "// generated").unwrap();
+        fs::write(root.join("src/scratch.tmp"), "tmp").unwrap();
+        fs::write(root.join("scratch.tmp"), "kept").unwrap();
+
+        let result = walk(root);
+
+        assert_eq!(
+            result.files,
+            vec![
+                ".dockignore",
+                "scratch.tmp",
+                "src/.dockignore",
+                "src/main.rs"
+            ]
+        );
+        assert_eq!(result.dirs, vec!["src"]);
+    }
+
+    #[test]
+    fn test_matcher_honours_nested_dockignore() {
+        let dir = tempfile::tempdir().unwrap();
+        let root = dir.path();
+        fs::create_dir_all(root.join("src/gen")).unwrap();
+        fs::write(root.join(".dockignore"), "*.log\n").unwrap();
+        fs::write(root.join("src/.dockignore"), "gen/\n!keep.log\n").unwrap();
+
+        let mut matcher = DockignoreMatcher::new(root);
+
+        assert!(matcher.is_ignored(Path::new("app.log")));
+        assert!(matcher.is_ignored(Path::new("src/gen/code.rs")));
+        assert!(!matcher.is_ignored(Path::new("src/keep.log")));
+        assert!(!matcher.is_ignored(Path::new("src/main.rs")));
+        assert!(matcher.is_ignored(Path::new(".dock/HELM")));
+    }
+}
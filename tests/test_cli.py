@@ -1,10 +1,13 @@
 import os
 import json
+import hashlib
+import shutil
+import subprocess
 import tomlkit
 import pytest
 from click.testing import CliRunner
 from ruxpy.cli import main
-from ruxpy import get_paths, Spacedock
+from ruxpy import get_paths, hash_object, Revision, Spacedock, Stage
 
 
 @pytest.fixture
@@ -19,6 +22,14 @@ def init_repo(tmp_path):
         yield repo_path
 
 
+def record_starlog(runner, *files, message="first"):
+    runner.invoke(main, ["config", "-sn", "Jean-luc Picard"])
+    runner.invoke(main, ["config", "-se", "picard@gmail.com"])
+    runner.invoke(main, ["beam", *files])
+    result = runner.invoke(main, ["starlog", "-cm", message])
+    assert "Starlog entry saved!" in result.output
+
+
 def test_start_creates_spacedock(tmp_path):
     repo_path = tmp_path / "repo"
     repo_path.mkdir()
@@ -91,6 +102,74 @@ def test_start_initializes_with_missing_items(tmp_path):
         assert "Initialized ruxpy repository in" in result.output
 
 
+def test_start_with_blake3_records_format_version(tmp_path):
+    repo_path = tmp_path / "repo"
+    repo_path.mkdir()
+    runner = CliRunner()
+
+    with runner.isolated_filesystem():
+        os.chdir(repo_path)
+        result = runner.invoke(main, ["start", "--hash", "blake3"])
+        assert result.exit_code == 0
+
+        with open(repo_path / ".dock" / "config.toml", "r") as f:
+            config = tomlkit.parse(f.read())
+        assert config["core"]["format_version"] == 2
+
+        (repo_path / "a.txt").write_text("alpha")
+        record_starlog(runner, "a.txt")
+
+        blob = hash_object(str(repo_path), b"alpha")
+        assert blob != hashlib.sha3_256(b"alpha").hexdigest()
+        assert (repo_path / ".dock" / "objects" / blob[:2] / blob[2:]).is_file()
+        assert Revision.read_file(str(repo_path), "core", "a.txt") == b"alpha"
+
+        result = runner.invoke(main, ["scan"])
+        assert "modified:" not in result.output
+
+
+def test_start_with_pack_object_store(tmp_path):
+    repo_path = tmp_path / "repo"
+    repo_path.mkdir()
+    runner = CliRunner()
+
+    with runner.isolated_filesystem():
+        os.chdir(repo_path)
+        result = runner.invoke(main, ["start", "--object-store", "pack"])
+        assert result.exit_code == 0
+
+        (repo_path / "a.txt").write_text("alpha")
+        record_starlog(runner, "a.txt")
+
+        objects = repo_path / ".dock" / "objects"
+        assert [p.name for p in objects.iterdir()] == ["objects.pack"]
+        assert Revision.read_file(str(repo_path), "core", "a.txt") == b"alpha"
+
+        result = runner.invoke(main, ["scan"])
+        assert "modified:" not in result.output
+        result = runner.invoke(main, ["gc"])
+        assert "needs the loose object store" in result.output
+
+
+def test_start_with_sqlite_object_store(tmp_path):
+    repo_path = tmp_path / "repo"
+    repo_path.mkdir()
+    runner = CliRunner()
+
+    with runner.isolated_filesystem():
+        os.chdir(repo_path)
+        result = runner.invoke(main, ["start", "--object-store", "sqlite"])
+        assert result.exit_code == 0
+
+        (repo_path / "a.txt").write_text("alpha")
+        record_starlog(runner, "a.txt")
+
+        objects = repo_path / ".dock" / "objects"
+        assert (objects / "objects.sqlite").is_file()
+        assert not any(len(p.name) == 2 for p in objects.iterdir())
+        assert Revision.read_file(str(repo_path), "core", "a.txt") == b"alpha"
+
+
 def test_scan_shows_status(init_repo):
     _ = init_repo
     runner = CliRunner()
@@ -110,12 +189,59 @@ def test_beam_stages_files(init_repo):
     result = runner.invoke(main, ["beam", "file1.txt", "file2.txt"])
     assert result.exit_code == 0
     # Check .dock/stage contents
-    with open(repo_path / ".dock/stage") as f:
-        staged = json.load(f)
+    staged = Stage.paths(str(repo_path))
     assert "file1.txt" in staged
     assert "file2.txt" in staged
 
 
+def test_beam_accepts_directories_globs_and_stdin(init_repo):
+    runner = CliRunner()
+    (init_repo / "src" / "gen").mkdir(parents=True)
+    (init_repo / "src" / "lib.py").write_text("lib")
+    (init_repo / "src" / "gen" / "out.py").write_text("out")
+    (init_repo / "src" / "gen" / "out.log").write_text("log")
+    (init_repo / "notes.txt").write_text("notes")
+    (init_repo / ".dockignore").write_text("*.log\n")
+
+    def staged():
+        return Stage.paths(str(init_repo))
+
+    result = runner.invoke(main, ["beam", "src", "missing.txt"])
+    assert "missing.txt did not match any file" in result.output
+    assert staged() == ["src/gen/out.py", "src/lib.py"]
+
+    result = runner.invoke(main, ["beam", "-"], input=b"notes.txt\0src/lib.py\0")
+    assert "2 file(s) successfully beamed" in result.output
+    assert "notes.txt" in staged()
+
+    Stage.clear(str(init_repo))
+    runner.invoke(main, ["beam", "*.py"])
+    assert staged() == ["src/gen/out.py", "src/lib.py"]
+
+    runner.invoke(main, ["beam", "--all"])
+    assert "src/gen/out.log" not in staged()
+    assert {".dockignore", "notes.txt"} <= set(staged())
+
+
+def test_beam_writes_blobs_and_starlog_reuses_them(init_repo):
+    runner = CliRunner()
+    (init_repo / "kept.txt").write_text("kept")
+    (init_repo / "edited.txt").write_text("before")
+    runner.invoke(main, ["beam", "kept.txt", "edited.txt"])
+
+    entries = Stage.entries(str(init_repo))
+    assert sorted(entries) == ["edited.txt", "kept.txt"]
+    for blob_id in entries.values():
+        assert (init_repo / ".dock" / "objects" / blob_id[:2] / blob_id[2:]).exists()
+
+    # Files changed after beaming are recorded as they are now
+    (init_repo / "edited.txt").write_text("after, and longer")
+    record_starlog(runner)
+    assert Stage.paths(str(init_repo)) == []
+    content = Revision.read_file(str(init_repo), "core", "edited.txt")
+    assert content == b"after, and longer"
+
+
 def test_beam_fails_when_spacedock_uninitialized(tmp_path):
     repo_path = tmp_path / "repo"
     repo_path.mkdir()
@@ -225,3 +351,537 @@ def test_course_lists_courses_and_current(init_repo):
     assert "core" in result.output
     assert "bugfix" in result.output
     assert "main" in result.output
+
+
+def test_course_pack_keeps_courses_usable(init_repo):
+    runner = CliRunner()
+    (init_repo / "a.txt").write_text("alpha")
+    record_starlog(runner, "a.txt")
+    for i in range(50):
+        result = runner.invoke(main, ["course", f"feat-{i:02}"])
+        assert "set at warp speed" in result.output
+
+    result = runner.invoke(main, ["course", "--pack"])
+    assert "Packed 51 courses" in result.output
+    helm = init_repo / ".dock" / "links" / "helm"
+    assert sorted(p.name for p in helm.iterdir()) == ["core"]
+    assert (init_repo / ".dock" / "links" / "packed-courses").is_file()
+
+    result = runner.invoke(main, ["course"])
+    assert "feat-07" in result.output and "feat-49" in result.output
+    result = runner.invoke(main, ["course", "feat-07"])
+    assert "already exists" in result.output
+
+    worktree_path = init_repo.parent / "feat-10-wt"
+    result = runner.invoke(main, ["worktree", "add", str(worktree_path), "feat-10"])
+    assert "created at" in result.output
+    assert (worktree_path / "a.txt").read_text() == "alpha"
+
+    result = runner.invoke(main, ["warp", "feat-07"])
+    assert "Warped successfully" in result.output
+    result = runner.invoke(main, ["scan"])
+    assert result.exit_code == 0
+    assert "On course '-feat-07-'" in result.output
+    (init_repo / "b.txt").write_text("beta")
+    record_starlog(runner, "b.txt", message="second")
+    assert (helm / "feat-07").is_file()
+    assert Revision.read_file(str(init_repo), "feat-07", "b.txt") == b"beta"
+
+    result = runner.invoke(main, ["starlog", "-l"])
+    assert "feat-49" in result.output
+
+    runner.invoke(main, ["warp", "core"])
+    result = runner.invoke(main, ["course", "-d", "feat-08"])
+    assert "Successfully deleted" in result.output
+    assert "feat-08" not in runner.invoke(main, ["course"]).output
+
+
+def test_course_verbose_shows_divergence_from_core(init_repo):
+    from ruxpy import Ancestry
+
+    runner = CliRunner()
+    (init_repo / "a.txt").write_text("alpha")
+    record_starlog(runner, "a.txt")
+    base = Revision.resolve(str(init_repo), "core")
+    runner.invoke(main, ["course", "feat-x"])
+    runner.invoke(main, ["warp", "feat-x"])
+    for name in ("b.txt", "c.txt"):
+        (init_repo / name).write_text(name)
+        record_starlog(runner, name, message=name)
+    runner.invoke(main, ["warp", "core"])
+    (init_repo / "d.txt").write_text("delta")
+    record_starlog(runner, "d.txt", message="d.txt")
+
+    repo = str(init_repo)
+    assert Ancestry.merge_base(repo, "feat-x", "core") == base
+    assert Ancestry.ahead_behind(repo, "feat-x", "core") == (2, 1)
+    assert (init_repo / ".dock" / "starlog-graph").is_file()
+
+    result = runner.invoke(main, ["course", "-v"])
+    lines = result.output.splitlines()
+    assert any("feat-x" in line and "2 ahead, 1 behind core" in line for line in lines)
+    assert any("[On Course] => core" in line for line in lines)
+
+
+def test_monitor_status_when_not_running(init_repo):
+    _ = init_repo
+    runner = CliRunner()
+    result = runner.invoke(main, ["monitor", "--status"])
+    assert result.exit_code == 0
+    assert "[INFO] Monitor is not running" in result.output
+
+
+def test_timings_reports_phases_and_counters(init_repo):
+    (init_repo / "a.txt").write_text("alpha")
+    runner = CliRunner()
+    # scan_compare only runs against a starlog
+    record_starlog(runner, "a.txt")
+
+    result = runner.invoke(main, ["--timings", "scan"])
+    assert result.exit_code == 0
+    assert "ruxpy scan" in result.output
+    assert "scan_compare" in result.output
+    assert "files_stat" in result.output
+    assert "objects_written" in result.output
+
+    from ruxpy import Trace
+
+    # Spans of the previous command are not reported again
+    result = runner.invoke(main, ["--timings", "scan"])
+    calls = [line.split() for line in result.output.splitlines()]
+    assert ["ruxpy", "scan", "1"] in [line[:3] for line in calls]
+    assert not Trace.is_enabled()
+
+
+def test_unknown_trace_mode_prints_timings(init_repo, monkeypatch):
+    monkeypatch.setenv("RUXPY_TRACE", "1")
+    result = CliRunner().invoke(main, ["scan"])
+    assert result.exit_code == 0
+    assert "ruxpy scan" in result.output
+    assert "Counters:" in result.output
+
+
+def test_gc_removes_unreachable_objects(init_repo):
+    (init_repo / "a.txt").write_text("alpha")
+    runner = CliRunner()
+    record_starlog(runner, "a.txt")
+
+    objects_dir = init_repo / ".dock" / "objects"
+    garbage = objects_dir / "ff" / ("0" * 62)
+    garbage.parent.mkdir(exist_ok=True)
+    garbage.write_bytes(b"unreachable")
+    kept = [p for p in objects_dir.rglob("*") if p.is_file() and p != garbage]
+
+    result = runner.invoke(main, ["gc", "--grace-days", "0", "--dry-run"])
+    assert "Would remove 1 object(s)" in result.output
+    assert garbage.exists()
+
+    result = runner.invoke(main, ["gc", "--grace-days", "0"])
+    assert "Removed 1 object(s)" in result.output
+    assert "11 B" in result.output
+    assert not garbage.exists()
+    assert all(p.exists() for p in kept)
+
+
+def test_gc_keeps_staged_blobs(init_repo):
+    (init_repo / "a.txt").write_text("alpha")
+    runner = CliRunner()
+    record_starlog(runner, "a.txt")
+    runner.invoke(main, ["course", "feature"])
+    worktree_path = init_repo.parent / "feature-wt"
+    runner.invoke(main, ["worktree", "add", str(worktree_path), "feature"])
+    (worktree_path / "c.txt").write_text("staged in the worktree")
+    os.chdir(worktree_path)
+    runner.invoke(main, ["beam", "c.txt"])
+
+    os.chdir(init_repo)
+    (init_repo / "b.txt").write_text("staged, not recorded")
+    runner.invoke(main, ["beam", "b.txt"])
+    result = runner.invoke(main, ["gc", "--grace-days", "0"])
+    assert "Removed 0 object(s)" in result.output
+
+    result = runner.invoke(main, ["starlog", "-cm", "after gc"])
+    assert "Starlog entry saved!" in result.output
+    assert (
+        Revision.read_file(str(init_repo), "core", "b.txt") == b"staged, not recorded"
+    )
+
+    os.chdir(worktree_path)
+    result = runner.invoke(main, ["starlog", "-cm", "after gc"])
+    assert "Starlog entry saved!" in result.output
+    assert (
+        Revision.read_file(str(init_repo), "feature", "c.txt")
+        == b"staged in the worktree"
+    )
+
+
+def test_fsck_reports_corrupt_and_missing_objects(init_repo):
+    (init_repo / "a.txt").write_text("alpha")
+    (init_repo / "b.txt").write_text("beta")
+    runner = CliRunner()
+    record_starlog(runner, "a.txt", "b.txt")
+
+    result = runner.invoke(main, ["fsck"])
+    assert result.exit_code == 0
+    assert "no problems found" in result.output
+
+    with open(init_repo / ".dock" / "links" / "helm" / "core") as f:
+        starlog_hash = f.read().strip()
+    starlog_path = (
+        init_repo / ".dock" / "starlogs" / starlog_hash[:2] / starlog_hash[2:]
+    )
+    files = json.loads(starlog_path.read_text())["files"]
+    objects_dir = init_repo / ".dock" / "objects"
+    (objects_dir / files["a.txt"][:2] / files["a.txt"][2:]).write_text("tampered")
+    (objects_dir / files["b.txt"][:2] / files["b.txt"][2:]).unlink()
+
+    result = runner.invoke(main, ["fsck"])
+    assert result.exit_code == 1
+    assert f"corrupt {files['a.txt']}" in result.output
+    assert f"missing {files['b.txt']}" in result.output
+
+    result = runner.invoke(main, ["fsck", "--quick"])
+    assert result.exit_code == 1
+    assert "corrupt" not in result.output
+    assert f"missing {files['b.txt']}" in result.output
+
+
+def test_worktree_add_shares_object_store(init_repo):
+    (init_repo / "a.txt").write_text("alpha")
+    runner = CliRunner()
+    record_starlog(runner, "a.txt")
+    runner.invoke(main, ["course", "feature"])
+
+    worktree_path = init_repo.parent / "feature-wt"
+    result = runner.invoke(main, ["worktree", "add", str(worktree_path), "core"])
+    assert "already checked out" in result.output
+
+    result = runner.invoke(main, ["worktree", "add", str(worktree_path), "feature"])
+    assert "[SUCCESS]" in result.output
+    assert (worktree_path / "a.txt").read_text() == "alpha"
+    assert (worktree_path / ".dock" / "objects").is_symlink()
+
+    os.chdir(worktree_path)
+    (worktree_path / "b.txt").write_text("beta")
+    record_starlog(runner, "b.txt", message="from worktree")
+    with open(init_repo / ".dock" / "links" / "helm" / "feature") as f:
+        feature_tip = f.read().strip()
+    with open(init_repo / ".dock" / "links" / "helm" / "core") as f:
+        assert f.read().strip() != feature_tip
+
+    result = runner.invoke(main, ["worktree", "list"])
+    assert "feature-wt" in result.output
+    assert "-feature-" in result.output
+
+
+def test_show_and_ls_tree_read_history(init_repo):
+    (init_repo / "docs").mkdir()
+    (init_repo / "a.txt").write_text("first version")
+    (init_repo / "docs" / "guide.md").write_text("guide")
+    runner = CliRunner()
+    record_starlog(runner, "a.txt", "docs/guide.md")
+    with open(init_repo / ".dock" / "links" / "helm" / "core") as f:
+        first = f.read().strip()
+
+    (init_repo / "a.txt").write_text("second version")
+    record_starlog(runner, "a.txt", message="second")
+
+    result = runner.invoke(main, ["show", f"{first[:8]}:a.txt"])
+    assert result.exit_code == 0
+    assert result.output == "first version"
+    result = runner.invoke(main, ["show", "core:a.txt"])
+    assert result.output == "second version"
+    result = runner.invoke(main, ["show", "core:missing.txt"])
+    assert result.exit_code == 1
+    assert "does not exist" in result.output
+
+    result = runner.invoke(main, ["ls-tree", "core"])
+    assert "\ta.txt" in result.output
+    assert "\tdocs/" in result.output
+    assert "guide.md" not in result.output
+    result = runner.invoke(main, ["ls-tree", "-r", first])
+    assert "\tdocs/guide.md" in result.output
+
+    assert Revision.read_file(str(init_repo), first, "docs/guide.md") == b"guide"
+
+
+def test_start_from_clones_local_spacedock(init_repo):
+    (init_repo / "a.txt").write_text("alpha")
+    runner = CliRunner()
+    record_starlog(runner, "a.txt")
+
+    clone_path = init_repo.parent / "clone"
+    result = runner.invoke(main, ["start", "--from", str(init_repo), str(clone_path)])
+    assert result.exit_code == 0
+    assert "Cloned" in result.output
+    assert (clone_path / "a.txt").read_text() == "alpha"
+
+    core_ref = os.path.join(".dock", "links", "helm", "core")
+    with open(init_repo / core_ref) as f, open(clone_path / core_ref) as g:
+        assert f.read() == g.read()
+    assert Revision.read_file(str(clone_path), "core", "a.txt") == b"alpha"
+    blob = Revision.lookup(str(clone_path), "core", "a.txt")
+    source_blob = init_repo / ".dock" / "objects" / blob[:2] / blob[2:]
+    cloned_blob = clone_path / ".dock" / "objects" / blob[:2] / blob[2:]
+    assert os.stat(source_blob).st_ino == os.stat(cloned_blob).st_ino
+
+    result = runner.invoke(main, ["start", "--from", str(init_repo), str(clone_path)])
+    assert "[ERROR]" in result.output
+
+
+def test_dedupe_shares_objects_between_spacedocks(init_repo):
+    (init_repo / "a.txt").write_text("alpha")
+    runner = CliRunner()
+    record_starlog(runner, "a.txt")
+    clone_path = init_repo.parent / "clone"
+    runner.invoke(main, ["start", "--from", str(init_repo), str(clone_path)])
+    shared = init_repo.parent / "shared"
+
+    result = runner.invoke(main, ["dedupe", str(shared)])
+    assert "[SUCCESS]" in result.output
+    os.chdir(clone_path)
+    result = runner.invoke(main, ["dedupe", str(shared)])
+    assert "dropped" in result.output
+
+    blob = Revision.lookup(str(clone_path), "core", "a.txt")
+    assert (shared / blob[:2] / blob[2:]).exists()
+    for repo in (init_repo, clone_path):
+        assert not (repo / ".dock" / "objects" / blob[:2] / blob[2:]).exists()
+        assert Revision.read_file(str(repo), "core", "a.txt") == b"alpha"
+
+    # New objects are still written locally
+    (clone_path / "b.txt").write_text("beta")
+    record_starlog(runner, "b.txt", message="second")
+    blob = Revision.lookup(str(clone_path), "core", "b.txt")
+    assert (clone_path / ".dock" / "objects" / blob[:2] / blob[2:]).exists()
+
+
+def test_fast_export_and_import_round_trip(init_repo):
+    runner = CliRunner()
+    (init_repo / "a.txt").write_text("alpha")
+    record_starlog(runner, "a.txt")
+    (init_repo / "a.txt").write_text("alpha, edited")
+    (init_repo / "b.txt").write_text("beta")
+    record_starlog(runner, "a.txt", "b.txt", message="second")
+
+    stream_path = init_repo.parent / "history.stream"
+    result = runner.invoke(main, ["fast-export", "-o", str(stream_path)])
+    assert result.exit_code == 0
+    assert b"starlog core" in stream_path.read_bytes()
+
+    target = init_repo.parent / "imported"
+    runner.invoke(main, ["start", str(target)])
+    os.chdir(target)
+    result = runner.invoke(main, ["fast-import"], input=stream_path.read_bytes())
+    assert "Imported 2 starlog(s)" in result.output
+
+    assert Revision.read_file(str(target), "core", "a.txt") == b"alpha, edited"
+    tip = Revision.resolve(str(target), "core")
+    dock = get_paths(str(target))["dock"]
+    with open(os.path.join(dock, "starlogs", tip[:2], tip[2:])) as f:
+        starlog = json.load(f)
+    assert starlog["message"] == "second"
+    assert Revision.read_file(str(target), starlog["parent"], "a.txt") == b"alpha"
+
+    result = runner.invoke(main, ["fast-import"], input=b"bogus\n")
+    assert result.exit_code == 1
+    assert "line 1" in result.output
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+def test_import_git_maps_branches_to_courses(init_repo):
+    source = init_repo.parent / "git-source"
+    source.mkdir()
+
+    def git(*args):
+        subprocess.run(["git", *args], cwd=source, check=True, capture_output=True)
+
+    git("init", "-q", "-b", "main")
+    git("config", "user.name", "Jean-Luc Picard")
+    git("config", "user.email", "picard@example.com")
+    (source / "a.txt").write_text("alpha")
+    git("add", "a.txt")
+    git("commit", "-q", "-m", "first")
+    git("checkout", "-q", "-b", "feature/warp")
+    (source / "src").mkdir()
+    (source / "src" / "b.txt").write_text("beta")
+    git("add", "src/b.txt")
+    git("commit", "-q", "-m", "second")
+    # Pack everything so deltas and the pack index are read as well
+    git("gc", "-q")
+
+    runner = CliRunner()
+    result = runner.invoke(main, ["import-git", str(source)])
+    assert result.exit_code == 0
+    assert "Imported 2 commit(s) and 2 blob(s), updating 2 course(s)" in result.output
+
+    repo = str(init_repo)
+    assert Revision.read_file(repo, "main", "a.txt") == b"alpha"
+    assert Revision.read_file(repo, "feature-warp", "src/b.txt") == b"beta"
+
+    (source / "a.txt").write_text("alpha, edited")
+    git("commit", "-q", "-am", "third")
+    result = runner.invoke(main, ["import-git", str(source)])
+    assert "Imported 1 commit(s)" in result.output
+    assert "2 commit(s) were already imported" in result.output
+    assert Revision.read_file(repo, "feature-warp", "a.txt") == b"alpha, edited"
+
+
+def test_fleet_scan_reports_each_spacedock(init_repo):
+    import asyncio
+    from ruxpy import fleet
+
+    runner = CliRunner()
+    (init_repo / "a.txt").write_text("alpha")
+    record_starlog(runner, "a.txt")
+    (init_repo / "a.txt").write_text("alpha, edited")
+    (init_repo / "b.txt").write_text("beta")
+
+    other = init_repo.parent / "other"
+    runner.invoke(main, ["start", str(other)])
+    missing = init_repo.parent / "missing"
+    missing.mkdir()
+
+    results = fleet.scan([init_repo, other, missing], concurrency=2)
+    assert [r["path"] for r in results] == [str(init_repo), str(other), str(missing)]
+    assert results[0]["course"] == "core"
+    assert results[0]["modified"] == ["a.txt"]
+    assert results[0]["untracked"] == ["b.txt"]
+    assert results[1]["clean"] and results[1]["tip"] is None
+    assert results[2]["error"] is not None
+    assert asyncio.run(fleet.scan_async([other]))[0]["clean"]
+
+    result = runner.invoke(main, ["fleet", "scan", "--json", str(init_repo)])
+    assert result.exit_code == 0
+    assert json.loads(result.output)["modified"] == ["a.txt"]
+    result = runner.invoke(main, ["fleet", "scan", str(other), str(missing)])
+    assert result.exit_code == 1
+    assert f"{other}: on course '-core-', clean" in result.output
+
+
+def test_course_updates_compare_and_swap(init_repo):
+    from concurrent.futures import ThreadPoolExecutor
+    from ruxpy import Refs
+
+    runner = CliRunner()
+    (init_repo / "a.txt").write_text("alpha")
+    record_starlog(runner, "a.txt")
+    course = str(init_repo / ".dock" / "links" / "helm" / "core")
+    tip = Refs.read(course)
+
+    with pytest.raises(RuntimeError, match="moved"):
+        Refs.update(course, "f" * len(tip), expected="0" * len(tip))
+    assert Refs.read(course) == tip
+
+    counter = str(init_repo / "counter")
+    Refs.update(counter, "0")
+
+    def bump(_):
+        while True:
+            seen = Refs.read(counter)
+            try:
+                return Refs.update(counter, str(int(seen) + 1), expected=seen)
+            except RuntimeError:
+                continue
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(bump, range(40)))
+    assert Refs.read(counter) == "40"
+    assert not os.path.exists(counter + ".lock")
+
+    (init_repo / "b.txt").write_text("beta")
+    record_starlog(runner, "b.txt", message="second")
+    assert Revision.read_file(str(init_repo), "core", "a.txt") == b"alpha"
+
+
+def test_beam_during_starlog_stays_staged(init_repo, monkeypatch):
+    import ruxpy
+
+    runner = CliRunner()
+    (init_repo / "a.txt").write_text("alpha")
+    (init_repo / "b.txt").write_text("beta")
+    runner.invoke(main, ["config", "-sn", "Jean-luc Picard"])
+    runner.invoke(main, ["config", "-se", "picard@gmail.com"])
+    runner.invoke(main, ["beam", "a.txt", "b.txt"])
+    beamed = Stage.entries(str(init_repo))
+    refs = ruxpy.Refs
+
+    class BeamWhileRecording:
+        """Beams a.txt and c.txt while the starlog is being recorded."""
+
+        def __getattr__(self, name):
+            return getattr(refs, name)
+
+        def update_course(self, *args, **kwargs):
+            (init_repo / "a.txt").write_text("alpha, again")
+            (init_repo / "c.txt").write_text("gamma")
+            Stage.add(str(init_repo), ["a.txt", "c.txt"])
+            return refs.update_course(*args, **kwargs)
+
+    monkeypatch.setattr(ruxpy, "Refs", BeamWhileRecording())
+    result = runner.invoke(main, ["starlog", "-cm", "first"])
+    assert "Starlog entry saved!" in result.output
+    monkeypatch.undo()
+
+    entries = Stage.entries(str(init_repo))
+    assert sorted(entries) == ["a.txt", "c.txt"]
+    assert entries["a.txt"] != beamed["a.txt"]
+    assert Revision.read_file(str(init_repo), "core", "a.txt") == b"alpha"
+
+
+def test_server_forwards_commands(init_repo, capsys):
+    import threading
+    from ruxpy.client import forward, get_socket_path
+    from ruxpy.server import CommandServer
+
+    command_server = CommandServer(get_socket_path(str(init_repo)), main)
+    thread = threading.Thread(target=command_server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        exit_code = forward(["scan"], cwd=str(init_repo))
+        assert exit_code == 0
+        assert "On course '-core-'" in capsys.readouterr().out
+
+        exit_code = forward(["scan", "--bogus"], cwd=str(init_repo))
+        assert exit_code == 2
+        assert "No such option" in capsys.readouterr().out
+
+        # The server's own streams are back in place between commands
+        exit_code = forward(["course"], cwd=str(init_repo))
+        assert exit_code == 0
+        assert "core" in capsys.readouterr().out
+    finally:
+        command_server.shutdown()
+        command_server.server_close()
+
+
+def test_server_forwards_binary_stdin_and_output(init_repo, monkeypatch):
+    import io
+    import sys
+    import threading
+    from ruxpy.client import forward, get_socket_path
+    from ruxpy.server import CommandServer
+
+    runner = CliRunner()
+    (init_repo / "a.bin").write_bytes(b"\xff\xfe\x00binary")
+    record_starlog(runner, "a.bin")
+    stream_path = init_repo.parent / "history.stream"
+    runner.invoke(main, ["fast-export", "-o", str(stream_path)])
+
+    command_server = CommandServer(get_socket_path(str(init_repo)), main)
+    thread = threading.Thread(target=command_server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        stdout = io.BytesIO()
+        monkeypatch.setattr(sys, "stdout", io.TextIOWrapper(stdout))
+        monkeypatch.setattr(sys, "stdin", io.TextIOWrapper(io.BytesIO()))
+        assert forward(["fast-export"], cwd=str(init_repo)) == 0
+        assert stdout.getvalue() == stream_path.read_bytes()
+
+        # Piped input is forwarded without "-" on the command line
+        monkeypatch.setattr(sys, "stdin", io.TextIOWrapper(io.BytesIO(b"bogus\n")))
+        assert forward(["fast-import"], cwd=str(init_repo)) == 1
+        assert b"line 1" in stdout.getvalue()
+    finally:
+        command_server.shutdown()
+        command_server.server_close()
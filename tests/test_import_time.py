@@ -0,0 +1,45 @@
+import subprocess
+import sys
+
+# Cumulative microseconds `import ruxpy.cli` may take. click alone costs
+# roughly 30ms; loading the Rust extension, tomlkit or every subcommand
+# eagerly pushes well past this.
+IMPORT_BUDGET_US = 80_000
+
+# Modules that must not be loaded just to build the CLI
+DEFERRED_MODULES = ["ruxpy.ruxpy", "tomlkit", "hashlib", "json", "ruxpy.starlog"]
+
+
+def measure_import_us(module):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1].strip())
+    raise AssertionError(f"No importtime entry for {module}")
+
+
+def test_cli_import_time_within_budget():
+    # Best of three to keep scheduler noise out of the measurement
+    elapsed = min(measure_import_us("ruxpy.cli") for _ in range(3))
+    assert elapsed < IMPORT_BUDGET_US
+
+
+def test_cli_import_defers_heavy_modules():
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, ruxpy.cli; "
+            f"print([m for m in {DEFERRED_MODULES!r} if m in sys.modules])",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == "[]"
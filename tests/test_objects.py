@@ -24,3 +24,54 @@ def test_object_store(tmp_path):
         assert False, "Should have raised an error"
     except Exception:
         pass
+
+
+def test_format_version_selects_hash_algorithm(tmp_path):
+    from ruxpy import hash_object, hash_file_object, get_hash_algorithm
+
+    repo_path = tmp_path / "repo"
+    (repo_path / ".dock").mkdir(parents=True)
+    (repo_path / "file1.txt").write_text("hello world")
+    init_object_dir(str(repo_path))
+
+    # Spacedocks without a format version keep SHA3-256
+    assert get_hash_algorithm(str(repo_path)) == "sha3-256"
+    assert hash_object(str(repo_path), b"hello world") == (
+        "644bcc7e564373040999aac89e7622f3ca71fba1d972fd94a31c3bfbf24e3938"
+    )
+
+    (repo_path / ".dock" / "config.toml").write_text("[core]\nformat_version = 2\n")
+    assert get_hash_algorithm(str(repo_path)) == "blake3"
+
+    hash = Blob.save_blob(str(repo_path), "file1.txt")
+    assert hash == hash_object(str(repo_path), b"hello world")
+    assert hash == hash_file_object(str(repo_path), "file1.txt")
+    assert (repo_path / ".dock" / "objects" / hash[:2] / hash[2:]).exists()
+
+
+def test_large_files_are_stored_as_chunks(tmp_path):
+    repo_path = tmp_path / "repo"
+    (repo_path / ".dock").mkdir(parents=True)
+    (repo_path / ".dock" / "config.toml").write_text("[core]\nchunk_threshold = 1024\n")
+    init_object_dir(str(repo_path))
+    objects_dir = repo_path / ".dock" / "objects"
+
+    data = os.urandom(4 * 1024 * 1024)
+    (repo_path / "model.bin").write_bytes(data)
+    hash = Blob.save_blob(str(repo_path), "model.bin")
+
+    assert (objects_dir / hash[:2] / (hash[2:] + ".chunks")).exists()
+    assert Blob.read_blob(str(repo_path), hash) == data
+
+    def stored_bytes():
+        return sum(p.stat().st_size for p in objects_dir.rglob("*") if p.is_file())
+
+    before = stored_bytes()
+    edited = data[:1000] + b"patched" + data[1000:]
+    (repo_path / "model.bin").write_bytes(edited)
+    new_hash = Blob.save_blob(str(repo_path), "model.bin")
+
+    assert new_hash != hash
+    assert Blob.read_blob(str(repo_path), new_hash) == edited
+    # Only the chunks around the edit are stored again
+    assert stored_bytes() - before < len(data) // 2
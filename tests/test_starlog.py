@@ -1,5 +1,5 @@
 import os
-import json
+from ruxpy import Stage
 from ruxpy.cli import main
 from click.testing import CliRunner
 
@@ -27,8 +27,7 @@ def test_starlog_command(tmp_path):
     assert any(starlogs_dir.iterdir())
 
     # Check stage file is cleared
-    with open(repo / ".dock" / "stage") as f:
-        assert json.load(f) == []
+    assert Stage.paths(str(repo)) == []
 
 
 def test_starlog_requires_name_and_email(tmp_path):
@@ -81,5 +80,4 @@ def test_starlog_clears_stage_if_all_beamed_files_deleted(init_repo):
     )
     runner.invoke(main, ["starlog", "-cm", "init"])
 
-    with open(init_repo / ".dock" / "stage") as f:
-        assert json.load(f) == []
+    assert Stage.paths(str(init_repo)) == []
@@ -88,3 +88,23 @@ def test_echo_success(capsys):
     Messages.echo_success(msg)
     captured = capsys.readouterr()
     assert f"[SUCCESS] {msg}" in captured.out
+
+
+def test_list_repo_files_honours_nested_dockignore(tmp_path):
+    test_repo = tmp_path / "repo"
+    os.makedirs(test_repo)
+    os.chdir(test_repo)
+
+    runner = CliRunner()
+    runner.invoke(main, ["start", str(test_repo)])
+
+    (test_repo / ".dockignore").write_text("build/\n")
+    (test_repo / "build").mkdir()
+    (test_repo / "build" / "out.o").write_text("obj")
+    (test_repo / "src" / "gen").mkdir(parents=True)
+    (test_repo / "src" / ".dockignore").write_text("gen/\n")
+    (test_repo / "src" / "gen" / "code.py").write_text("x = 1")
+    (test_repo / "src" / "main.py").write_text("print('engage')")
+
+    all_files = list_repo_files(test_repo)
+    assert set(all_files) == {".dockignore", "src/.dockignore", "src/main.py"}